@@ -0,0 +1,196 @@
+# analytics/export.py
+"""
+Выгрузка аналитики в колоночные файлы (Parquet или Arrow IPC, сжатие zstd)
+для анализа вне бота (pandas, DuckDB, Jupyter).
+
+Строки читаются курсором порциями по CHUNK_ROWS и сразу пишутся в файл
+отдельными row group / record batch, поэтому память не зависит от размера
+таблиц. Для таблиц с помесячными партициями (analytics/retention.py)
+сначала читаются архивные месяцы из диапазона, затем живая база.
+
+pyarrow импортируется лениво - бот стартует и без него, не работает только /export.
+
+Запуск из консоли:
+    python -m analytics.export --from 2025-12-01 --to 2025-12-31 --format parquet --out exports
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from analytics.reader import connect_readonly, time_limit
+from analytics.retention import range_sources
+from analytics.schema import DEFAULT_DB_PATH, table_exists
+
+CHUNK_ROWS = 10000
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Колонки выгрузки: (имя, тип). Типы: int, str, bool, time.
+# SQLite хранит значения без строгих типов, поэтому явная схема держит
+# типы одинаковыми во всех порциях и во всех файлах.
+EXPORT_TABLES = {
+    'user_actions': ('timestamp', [
+        ('id', 'int'), ('user_id', 'int'), ('action', 'str'), ('stage', 'str'),
+        ('tour_id', 'int'), ('category', 'str'), ('session_data', 'str'), ('timestamp', 'time'),
+    ]),
+    'tour_views': ('timestamp', [
+        ('id', 'int'), ('user_id', 'int'), ('tour_id', 'int'), ('tour_name', 'str'),
+        ('view_time_seconds', 'int'), ('price_shown', 'str'), ('category', 'str'), ('timestamp', 'time'),
+    ]),
+    'user_questions': ('timestamp', [
+        ('id', 'int'), ('user_id', 'int'), ('question_text', 'str'), ('tour_name', 'str'),
+        ('bot_response', 'str'), ('question_type', 'str'), ('was_helpful', 'bool'), ('timestamp', 'time'),
+    ]),
+    'drop_off_points': ('timestamp', [
+        ('id', 'int'), ('user_id', 'int'), ('drop_off_stage', 'str'), ('last_action', 'str'),
+        ('session_duration', 'int'), ('user_profile', 'str'), ('timestamp', 'time'),
+    ]),
+    'conversations': ('conversation_start', [
+        ('id', 'int'), ('user_id', 'int'), ('category', 'str'), ('adults', 'int'),
+        ('children_count', 'int'), ('children_ages', 'str'), ('pregnant', 'bool'),
+        ('priorities', 'str'), ('health_issues', 'str'), ('selected_tour_id', 'int'),
+        ('conversation_start', 'time'), ('conversation_end', 'time'), ('successful', 'bool'),
+    ]),
+}
+
+
+def _arrow_schema(pa, columns):
+    types = {
+        'int': pa.int64(),
+        'str': pa.string(),
+        'bool': pa.bool_(),
+        'time': pa.timestamp('us'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _select_sql(table, time_column, columns):
+    """SELECT с приведением типов в SQLite: числа - CAST, время и флаги приводит pyarrow"""
+    select = []
+    for name, kind in columns:
+        if kind in ('int', 'bool'):
+            select.append(f"CAST({name} AS INTEGER)")
+        elif kind == 'str':
+            select.append(f"CAST({name} AS TEXT)")
+        else:
+            select.append(name)
+    return (
+        f"SELECT {', '.join(select)} FROM {table} "
+        f"WHERE {time_column} >= ? AND {time_column} < ? ORDER BY {time_column}"
+    )
+
+
+def _batch(pa, schema, columns, rows):
+    arrays = []
+    for (name, kind), values in zip(columns, zip(*rows)):
+        if kind == 'int':
+            arrays.append(pa.array(values, type=pa.int64()))
+        elif kind == 'str':
+            arrays.append(pa.array(values, type=pa.string()))
+        elif kind == 'bool':
+            arrays.append(pa.array(values, type=pa.int64()).cast(pa.bool_()))
+        else:
+            arrays.append(pa.array([str(v) if v is not None else None for v in values], type=pa.string())
+                          .cast(pa.timestamp('us')))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Writer:
+    """Общий интерфейс для ParquetWriter и Arrow IPC"""
+
+    def __init__(self, path, schema, file_format):
+        import pyarrow as pa
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression='zstd')
+            self._write = lambda batch: self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            options = pa.ipc.IpcWriteOptions(compression='zstd')
+            self._writer = pa.ipc.new_file(path, schema, options=options)
+            self._write = self._writer.write_batch
+
+    def write(self, batch):
+        self._write(batch)
+
+    def close(self):
+        self._writer.close()
+
+
+def export_table(table, out_path, date_from, date_to, file_format='parquet', db_path=DEFAULT_DB_PATH,
+                 deadline=None):
+    """Выгружает одну таблицу за период [date_from, date_to] (даты включительно). Возвращает число строк"""
+    import pyarrow as pa
+
+    time_column, columns = EXPORT_TABLES[table]
+    schema = _arrow_schema(pa, columns)
+    sql = _select_sql(table, time_column, columns)
+    params = (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat())
+
+    rows_written = 0
+    writer = _Writer(out_path, schema, file_format)
+    try:
+        for source in range_sources(table, db_path, date_from, date_to):
+            # Только чтение: выгрузка не мешает боту писать в живую базу (WAL)
+            conn = connect_readonly(source, deadline)
+            try:
+                if not table_exists(conn, table):
+                    continue
+                cursor = conn.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(CHUNK_ROWS)
+                    if not rows:
+                        break
+                    writer.write(_batch(pa, schema, columns, rows))
+                    rows_written += len(rows)
+            finally:
+                conn.close()
+    finally:
+        writer.close()
+    return rows_written
+
+
+def export_analytics(out_dir, date_from, date_to, file_format='parquet', tables=None, db_path=DEFAULT_DB_PATH,
+                     timeout=None):
+    """
+    Выгружает таблицы аналитики за период в out_dir (файл на таблицу).
+    Возвращает список (таблица, путь, строк) и время в секундах.
+    timeout - срок на всю выгрузку, дольше - StatsTimeout (analytics/reader.py).
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {file_format} (доступны: {', '.join(FORMATS)})")
+    if date_from > date_to:
+        raise ValueError("Начало периода позже конца")
+
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    results = []
+    with time_limit(timeout) as deadline:
+        for table in tables or EXPORT_TABLES:
+            name = f"{table}_{date_from:%Y%m%d}_{date_to:%Y%m%d}{FORMATS[file_format]}"
+            path = os.path.join(out_dir, name)
+            rows = export_table(table, path, date_from, date_to, file_format, db_path, deadline)
+            results.append((table, path, rows))
+    return results, time.perf_counter() - started
+
+
+def parse_date(text):
+    return datetime.strptime(text, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка аналитики в Parquet / Arrow IPC")
+    parser.add_argument('--from', dest='date_from', type=parse_date, required=True, help="ГГГГ-ММ-ДД")
+    parser.add_argument('--to', dest='date_to', type=parse_date, required=True, help="ГГГГ-ММ-ДД включительно")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+    parser.add_argument('--out', default='exports', help="Папка для файлов")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+
+    results, seconds = export_analytics(args.out, args.date_from, args.date_to, args.format, db_path=args.db)
+    for table, path, rows in results:
+        print(f"✅ {table}: {rows} строк → {path} ({os.path.getsize(path) / 1024:.0f} КБ)")
+    print(f"⏱ {seconds:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# analytics/funnel.py
+"""
+Воронка и когорты по действиям пользователей (user_actions).
+
+Воронка упорядоченная: шаг засчитывается, только если он случился не
+раньше предыдущего шага этого же пользователя. Для каждого пользователя
+берется первое прохождение: первый /start за период, затем первое
+событие следующего шага после него и т.д.
+
+Из SQLite читаются только нужные колонки и только события шагов: по
+запросу на шаг, в порядке времени по покрывающему индексу
+idx_user_actions_funnel (без сортировки). Время остается строкой
+(формат ISO сравнивается как текст) до последнего шага - в datetime
+переводится одна строка на пользователя и шаг, а не все события периода.
+
+Разрезы:
+- по категории (категория первого выбора после /start);
+- по дням (день первого /start за период);
+- по когортам (неделя самого первого /start пользователя за все время,
+  включая сводку rollup_action_users по удаленным старым событиям).
+
+pandas импортируется лениво, только при расчете.
+"""
+import time
+from datetime import timedelta
+
+from analytics.reader import connect_readonly, time_limit
+from analytics.retention import range_sources
+from analytics.schema import DEFAULT_DB_PATH, table_exists
+
+FUNNEL_STEPS = ('started_bot', 'chose_category', 'viewed_tour', 'booking_completed')
+
+STEP_TITLES = {
+    'started_bot': '/start',
+    'chose_category': 'Выбор категории',
+    'viewed_tour': 'Просмотр экскурсии',
+    'booking_completed': 'Бронирование',
+}
+
+NO_CATEGORY = 'без категории'
+
+# Колонки событий шага: категория нужна только у выбора категории
+STEP_COLUMNS = {step: ['user_id', 'timestamp'] for step in FUNNEL_STEPS}
+STEP_COLUMNS['chose_category'].append('category')
+
+# События одного шага за период в порядке времени
+STEP_EVENTS_SQL = '''
+    SELECT {columns} FROM user_actions
+    WHERE action = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp
+'''
+
+# /start до периода: живые события + сводка по удаленным
+EARLIER_START_SQL = '''
+    SELECT user_id, MIN(timestamp) FROM user_actions
+    WHERE action = 'started_bot' AND timestamp < ?
+    GROUP BY user_id
+    UNION ALL
+    SELECT user_id, first_day FROM rollup_action_users WHERE action = 'started_bot'
+'''
+
+
+def load_steps(date_from, date_to, db_path=DEFAULT_DB_PATH, deadline=None):
+    """
+    События шагов за период [date_from, date_to]: словарь шаг -> DataFrame
+    (user_id, timestamp строкой[, category]) в порядке времени
+    """
+    import pandas as pd
+
+    start, end = date_from.isoformat(), (date_to + timedelta(days=1)).isoformat()
+    rows = {step: [] for step in FUNNEL_STEPS}
+    sources = range_sources('user_actions', db_path, date_from, date_to)
+    for source in sources:
+        conn = connect_readonly(source, deadline)
+        try:
+            if not table_exists(conn, 'user_actions'):
+                continue
+            for step in FUNNEL_STEPS:
+                sql = STEP_EVENTS_SQL.format(columns=', '.join(STEP_COLUMNS[step]))
+                rows[step].extend(conn.execute(sql, (step, start, end)))
+        finally:
+            conn.close()
+
+    steps = {}
+    for step, step_rows in rows.items():
+        events = pd.DataFrame.from_records(step_rows, columns=STEP_COLUMNS[step])
+        if len(sources) > 1:
+            # Порядок времени - внутри каждой базы, между партициями сводим заново
+            events = events.sort_values('timestamp', kind='stable', ignore_index=True)
+        steps[step] = events
+    return steps
+
+
+def load_earlier_starts(date_from, db_path=DEFAULT_DB_PATH, deadline=None):
+    """Строки (user_id, первый /start) до начала периода"""
+    conn = connect_readonly(db_path, deadline)
+    try:
+        return conn.execute(EARLIER_START_SQL, (date_from.isoformat(),)).fetchall()
+    finally:
+        conn.close()
+
+
+def user_paths(steps):
+    """
+    Таблица "пользователь -> время прохождения каждого шага" (NaT, если шаг
+    не пройден) + категория выбора. Цикл только по шагам, внутри шага -
+    векторные операции над всеми пользователями.
+    """
+    import pandas as pd
+
+    paths = None
+    reached = None
+    for step in FUNNEL_STEPS:
+        events = steps[step]
+        if reached is not None:
+            # Только пользователи, прошедшие предыдущий шаг, и только события не раньше него
+            events = events.loc[events['user_id'].isin(reached.index)]
+            previous = reached.reindex(events['user_id']).to_numpy()
+            events = events.loc[events['timestamp'].to_numpy() >= previous]
+
+        # События уже по времени: первое подходящее событие пользователя - его первая строка
+        first = events.drop_duplicates('user_id').set_index('user_id')
+        reached = first['timestamp']
+        if paths is None:
+            paths = pd.to_datetime(reached, format='ISO8601').rename(step).to_frame()
+        else:
+            paths[step] = pd.to_datetime(reached, format='ISO8601')
+        if step == 'chose_category':
+            category = first['category']
+
+    paths['category'] = category.reindex(paths.index).fillna(NO_CATEGORY)
+    return paths
+
+
+def first_seen_times(paths, earlier_rows):
+    """Series user_id -> время самого первого /start (до периода или первый в периоде)"""
+    import pandas as pd
+
+    start = paths[FUNNEL_STEPS[0]]
+    earlier = pd.DataFrame.from_records(earlier_rows, columns=['user_id', 'first_seen'])
+    earlier = pd.to_datetime(earlier['first_seen'], format='ISO8601').groupby(earlier['user_id']).min()
+    earlier = earlier.reindex(paths.index)
+    return earlier.where(earlier < start, start)
+
+
+def step_counts(frame):
+    """Сколько пользователей дошло до каждого шага (по группам, если frame сгруппирован)"""
+    return frame[list(FUNNEL_STEPS)].count()
+
+
+def median_step_times(paths):
+    """Медианное время между соседними шагами и от /start до бронирования"""
+    times = {}
+    for previous, step in zip(FUNNEL_STEPS, FUNNEL_STEPS[1:]):
+        times[(previous, step)] = (paths[step] - paths[previous]).median()
+    times[(FUNNEL_STEPS[0], FUNNEL_STEPS[-1])] = (paths[FUNNEL_STEPS[-1]] - paths[FUNNEL_STEPS[0]]).median()
+    return times
+
+
+def compute_funnel(date_from, date_to, db_path=DEFAULT_DB_PATH, timeout=None):
+    """
+    Полный расчет воронки за период. Возвращает словарь:
+    steps (шаг -> пользователей), median_times, by_category, by_day, by_cohort (DataFrame),
+    timings (секунды на загрузку и расчет).
+    timeout - срок на запросы к базам, дольше - StatsTimeout (analytics/reader.py).
+    """
+    started = time.perf_counter()
+    with time_limit(timeout) as deadline:
+        steps = load_steps(date_from, date_to, db_path, deadline)
+        earlier = load_earlier_starts(date_from, db_path, deadline)
+    loaded = time.perf_counter()
+    paths = user_paths(steps)
+
+    chose = paths.loc[paths['chose_category'].notna()]
+    by_category = chose.groupby('category')[list(FUNNEL_STEPS[1:])].count()
+    by_category = by_category.sort_values('chose_category', ascending=False)
+
+    by_day = paths.groupby(paths[FUNNEL_STEPS[0]].dt.normalize())[list(FUNNEL_STEPS)].count()
+
+    cohort = first_seen_times(paths, earlier).dt.to_period('W-SUN').dt.start_time
+    by_cohort = paths.groupby(cohort.rename('cohort'))[list(FUNNEL_STEPS)].count()
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'events': sum(len(events) for events in steps.values()),
+        'steps': step_counts(paths),
+        'median_times': median_step_times(paths),
+        'by_category': by_category,
+        'by_day': by_day,
+        'by_cohort': by_cohort,
+        'timings': {'load': loaded - started, 'compute': time.perf_counter() - loaded},
+    }
+
+
+def _percent(part, total):
+    return f"{part / total * 100:.0f}%" if total else "—"
+
+
+def _duration(value):
+    """Timedelta -> '2 ч 05 мин' / '3 мин 10 с'"""
+    if value is None or value != value:  # NaT
+        return "—"
+    seconds = int(value.total_seconds())
+    if seconds >= 3600:
+        return f"{seconds // 3600} ч {seconds % 3600 // 60:02d} мин"
+    if seconds >= 60:
+        return f"{seconds // 60} мин {seconds % 60:02d} с"
+    return f"{seconds} с"
+
+
+def format_report(report, max_rows=7):
+    """Текст отчета для Telegram (укладывается в лимит сообщения)"""
+    steps = report['steps']
+    started = int(steps[FUNNEL_STEPS[0]])
+
+    text = f"📊 ВОРОНКА {report['date_from']} — {report['date_to']}\n"
+    text += f"(событий: {report['events']})\n\n"
+
+    if not started:
+        return text + "📭 За период нет стартов бота"
+
+    text += "📈 ШАГИ (упорядоченно):\n"
+    previous = started
+    for step in FUNNEL_STEPS:
+        count = int(steps[step])
+        text += (f"• {STEP_TITLES[step]}: {count} "
+                 f"({_percent(count, started)} от стартов, {_percent(count, previous)} от пред.)\n")
+        previous = count
+
+    text += "\n⏱ МЕДИАНА ВРЕМЕНИ МЕЖДУ ШАГАМИ:\n"
+    for (previous_step, step), value in report['median_times'].items():
+        text += f"• {STEP_TITLES[previous_step]} → {STEP_TITLES[step]}: {_duration(value)}\n"
+
+    by_category = report['by_category']
+    if len(by_category):
+        text += "\n📂 ПО КАТЕГОРИЯМ (выбор → просмотр → бронь):\n"
+        for category, row in by_category.head(max_rows).iterrows():
+            text += (f"• {category}: {row['chose_category']} → {row['viewed_tour']} → "
+                     f"{row['booking_completed']} ({_percent(row['booking_completed'], row['chose_category'])})\n")
+
+    by_day = report['by_day']
+    if len(by_day):
+        text += f"\n📅 ПО ДНЯМ (последние {min(max_rows, len(by_day))}, старт → бронь):\n"
+        for day, row in by_day.tail(max_rows).iterrows():
+            text += (f"• {day:%d.%m}: {row['started_bot']} → {row['booking_completed']} "
+                     f"({_percent(row['booking_completed'], row['started_bot'])})\n")
+
+    by_cohort = report['by_cohort']
+    if len(by_cohort):
+        text += "\n👥 КОГОРТЫ ПО НЕДЕЛЕ ПЕРВОГО ВИЗИТА (старт → бронь):\n"
+        for week, row in by_cohort.tail(max_rows).iterrows():
+            text += (f"• с {week:%d.%m.%Y}: {row['started_bot']} → {row['booking_completed']} "
+                     f"({_percent(row['booking_completed'], row['started_bot'])})\n")
+
+    return text
@@ -0,0 +1,228 @@
+# analytics/learn_to_rank.py
+"""
+Офлайн-обучение модели ранжирования туров по логам (ranking.RankingModel).
+
+Примеры берутся из user_actions за последние дни (живая база и архивные
+партиции):
+- viewed_tour с tour_id - открытая карточка, метка 1;
+- booking_completed - бронирование, метка 1 с весом BOOKING_WEIGHT;
+- отрицательные - туры той же категории каталога, которые пользователь в
+  этот день не открывал (до NEGATIVES_PER_POSITIVE на положительный).
+Профиль группы (взрослые, дети, беременность, приоритеты) пишется ботом
+в session_data этих событий.
+
+Признаки примера - попарные произведения признаков профиля и признаков
+тура (ranking.PROFILE_FEATURES x ranking.FEATURES), модель - логистическая
+регрессия с L2 (метод Ньютона, numpy). Результат - таблица весов в JSON,
+бот читает ее при загрузке каталога.
+
+numpy импортируется лениво.
+
+Запуск из консоли:
+    python -m analytics.learn_to_rank --days 90 --out ranking_model.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from analytics.retention import range_sources
+from analytics.schema import DEFAULT_DB_PATH, table_exists
+from catalog import load_catalog
+from ranking import (FEATURES, PRIORITY_WEIGHTS, PROFILE_FEATURES, RANKING_MODEL_PATH, RankingModel,
+                     dot, priority_weights, profile_vector, save_ranking_model)
+
+DEFAULT_CSV = 'Price22.12.2025.csv'
+DEFAULT_DAYS = 90
+BOOKING_WEIGHT = 3.0
+NEGATIVES_PER_POSITIVE = 5
+L2 = 1.0
+NEWTON_STEPS = 25
+MIN_POSITIVES = 50         # меньше - модель не сохраняется
+HOLDOUT_SHARE = 0.2        # доля пользователей для проверки (AUC)
+
+EVENTS_SQL = '''
+    SELECT user_id, action, tour_id, category, session_data, timestamp
+    FROM user_actions
+    WHERE timestamp >= ? AND timestamp < ? AND tour_id IS NOT NULL
+      AND action IN ('viewed_tour', 'booking_completed')
+'''
+
+
+def load_sessions(date_from, date_to, db_path=DEFAULT_DB_PATH):
+    """
+    (user_id, день) -> {'profile', 'category', 'viewed': set(ID), 'booked': set(ID)}.
+    События без профиля (логи до появления профиля) пропускаются.
+    """
+    sessions = {}
+    params = (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat())
+    for source in range_sources('user_actions', db_path, date_from, date_to):
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            if not table_exists(conn, 'user_actions'):
+                continue
+            for user_id, action, tour_id, category, session_json, timestamp in conn.execute(EVENTS_SQL, params):
+                try:
+                    session_data = json.loads(session_json) if session_json else {}
+                except ValueError:
+                    continue
+                profile = session_data.get('profile') if isinstance(session_data, dict) else None
+                if not profile:
+                    continue
+                key = (user_id, str(timestamp)[:10])
+                session = sessions.setdefault(key, {'profile': profile, 'category': None,
+                                                    'viewed': set(), 'booked': set()})
+                session['profile'] = profile
+                session['category'] = category or session['category']
+                target = session['booked'] if action == 'booking_completed' else session['viewed']
+                target.add(str(tour_id))
+        finally:
+            conn.close()
+    return sessions
+
+
+def build_examples(sessions, catalog, seed=0):
+    """Список (user_id, вектор профиля, ID тура, метка, вес)"""
+    rng = random.Random(seed)
+    all_ids = sorted(catalog.features.vectors, key=lambda tour_id: (len(tour_id), tour_id))
+    examples = []
+    for (user_id, _), session in sorted(sessions.items()):
+        profile = profile_vector(session['profile'])
+        positives = (session['viewed'] | session['booked']) & set(all_ids)
+        if not positives:
+            continue
+        for tour_id in sorted(positives):
+            weight = BOOKING_WEIGHT if tour_id in session['booked'] else 1.0
+            examples.append((user_id, profile, tour_id, 1, weight))
+
+        pool_tours = catalog.by_category.get(session['category'] or '', [])
+        pool = [str(t.get('ID', '')).strip() for t in pool_tours] or all_ids
+        pool = [tour_id for tour_id in pool if tour_id in catalog.features.vectors and tour_id not in positives]
+        for tour_id in rng.sample(pool, min(len(pool), NEGATIVES_PER_POSITIVE * len(positives))):
+            examples.append((user_id, profile, tour_id, 0, 1.0))
+    return examples
+
+
+def design_matrix(examples, catalog):
+    """Признаки: произведение профиля на вектор тура (PROFILE_FEATURES x FEATURES)"""
+    import numpy as np
+
+    profiles = np.array([profile for _, profile, _, _, _ in examples], dtype=float)
+    tours = np.array([catalog.features.vectors[tour_id] for _, _, tour_id, _, _ in examples], dtype=float)
+    X = (profiles[:, :, None] * tours[:, None, :]).reshape(len(examples), -1)
+    y = np.array([label for *_, label, _ in examples], dtype=float)
+    w = np.array([weight for *_, weight in examples], dtype=float)
+    return X, y, w
+
+
+def fit_logistic(X, y, sample_weight, l2=L2, steps=NEWTON_STEPS):
+    """Взвешенная логистическая регрессия с L2, метод Ньютона. Возвращает (coef, intercept)"""
+    import numpy as np
+
+    Xb = np.hstack([X, np.ones((len(X), 1))])
+    beta = np.zeros(Xb.shape[1])
+    penalty = np.full(Xb.shape[1], l2)
+    penalty[-1] = 0.0   # свободный член не штрафуется
+    for _ in range(steps):
+        p = 1.0 / (1.0 + np.exp(-(Xb @ beta)))
+        gradient = Xb.T @ (sample_weight * (p - y)) + penalty * beta
+        hessian = (Xb * (sample_weight * p * (1 - p))[:, None]).T @ Xb + np.diag(penalty + 1e-9)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return beta[:-1], beta[-1]
+
+
+def auc(scores, labels):
+    """Площадь под ROC (вероятность, что положительный пример выше отрицательного)"""
+    import numpy as np
+
+    order = np.argsort(scores, kind='mergesort')
+    ranks = np.empty(len(scores))
+    ranks[order] = np.arange(1, len(scores) + 1)
+    positives = labels == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if not n_pos or not n_neg:
+        return float('nan')
+    return (ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def train(db_path=DEFAULT_DB_PATH, csv_path=DEFAULT_CSV, days=DEFAULT_DAYS, today=None, seed=0):
+    """
+    Обучает модель по логам за days дней. Возвращает (RankingModel или None, отчет).
+    None - мало данных (меньше MIN_POSITIVES положительных примеров).
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    today = today or datetime.now().date()
+    catalog, _ = load_catalog(csv_path)
+    sessions = load_sessions(today - timedelta(days=days), today, db_path)
+    examples = build_examples(sessions, catalog, seed=seed)
+    report = {
+        'sessions': len(sessions),
+        'examples': len(examples),
+        'positives': sum(1 for example in examples if example[3] == 1),
+    }
+    if report['positives'] < MIN_POSITIVES:
+        report['seconds'] = time.perf_counter() - started
+        return None, report
+
+    X, y, w = design_matrix(examples, catalog)
+
+    # Проверка на отложенных пользователях, затем обучение на всех
+    rng = random.Random(seed)
+    users = sorted({example[0] for example in examples})
+    holdout = set(rng.sample(users, int(len(users) * HOLDOUT_SHARE)))
+    test = np.array([example[0] in holdout for example in examples])
+    if test.any() and (~test).any():
+        coef, intercept = fit_logistic(X[~test], y[~test], w[~test])
+        report['holdout_auc'] = round(float(auc(X[test] @ coef + intercept, y[test])), 4)
+        # Для сравнения - баллы одних приоритетов (без модели) на тех же примерах
+        baseline = np.array([
+            dot(priority_weights([name for name, value in zip(PROFILE_FEATURES, profile)
+                                  if value and name in PRIORITY_WEIGHTS]),
+                catalog.features.vectors[tour_id])
+            for _, profile, tour_id, _, _ in examples
+        ])
+        report['baseline_auc'] = round(float(auc(baseline[test], y[test])), 4)
+
+    coef, _ = fit_logistic(X, y, w)
+    table = coef.reshape(len(PROFILE_FEATURES), len(FEATURES))
+    report['seconds'] = time.perf_counter() - started
+
+    meta = {
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'days': days,
+        **{key: value for key, value in report.items() if key != 'seconds'},
+    }
+    return RankingModel(table.tolist(), meta), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение модели ранжирования туров по логам")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="За сколько последних дней брать логи")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--out', default=RANKING_MODEL_PATH)
+    args = parser.parse_args()
+
+    model, report = train(args.db, args.csv, args.days)
+    print(f"📊 Сессий: {report['sessions']}, примеров: {report['examples']}, "
+          f"положительных: {report['positives']}")
+    if model is None:
+        print(f"⚠️ Мало данных для обучения (нужно хотя бы {MIN_POSITIVES} положительных), модель не сохранена")
+        raise SystemExit(1)
+    if 'holdout_auc' in report:
+        print(f"🎯 AUC на отложенных пользователях: {report['holdout_auc']} "
+              f"(только приоритеты: {report['baseline_auc']})")
+    save_ranking_model(model, args.out)
+    print(f"✅ Модель → {args.out} ({os.path.getsize(args.out)} байт), {report['seconds']:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
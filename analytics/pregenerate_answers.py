@@ -0,0 +1,245 @@
+# analytics/pregenerate_answers.py
+"""
+Офлайн-генерация ответов на частые вопросы по каждому туру (answer_cache.py).
+
+Для каждого тура каталога и каждого вопроса config.PREGENERATED_QUESTIONS
+задача спрашивает DeepSeek тем же промптом, что и бот (prompts.py: общий
+префикс + блок тура, дополнительные поля - в контексте), и пишет ответ в
+tour_answers с хешем строки тура.
+
+- Ограниченная параллельность: не больше --concurrency запросов сразу.
+- Возобновляемость: каждый ответ сохраняется сразу после получения; при
+  повторном запуске пропускаются пары (тур, вопрос), для которых уже есть
+  ответ с текущим хешем строки и тем же текстом вопроса. Прерванный
+  запуск (Ctrl+C, сбой сети) просто продолжается с места остановки.
+- Поменялась строка тура в CSV - меняется хеш, и перегенерируется только
+  этот тур; старые ответы тура удаляются после записи нового.
+- Временные ошибки (лимит запросов, сервер недоступен, таймаут)
+  повторяются с паузой; ошибки ключа и баланса останавливают задачу.
+- --clusters: прогрев частыми кластерами вопросов клиентов
+  (analytics/question_clusters.py). Вопрос - представитель кластера,
+  туры - только те, о которых его задавали; бот узнает такие вопросы
+  через AnswerCache.cluster_key().
+
+Адрес API - DEEPSEEK_BASE_URL (для проверки - локальный фейковый сервер,
+см. benchmarks/pregenerate_check.py).
+
+Запуск из консоли:
+    python -m analytics.pregenerate_answers --concurrency 4
+    python -m analytics.pregenerate_answers --only children,pregnancy --dry-run
+    python -m analytics.pregenerate_answers --clusters question_clusters.json --top 30
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from analytics.question_clusters import load_clusters
+from analytics.schema import DEFAULT_DB_PATH, migrate
+from answer_cache import row_hash, tour_facts
+from catalog import load_catalog
+from circuit_breaker import DeepSeekRateLimited, DeepSeekTimeout, DeepSeekUnavailable, classify_error
+from config import PREGENERATED_QUESTIONS
+from prompts import PromptBuilder
+
+DEFAULT_CSV = 'Price22.12.2025.csv'
+DEFAULT_CONCURRENCY = 4
+MODEL = "deepseek-chat"
+CALL_TIMEOUT = 60.0        # офлайн можно ждать дольше, чем в диалоге
+RETRIES = 3
+RETRY_DELAY = 2.0          # сек, удваивается с каждой попыткой
+DEFAULT_TOP_CLUSTERS = 20
+
+STORED_SQL = 'SELECT tour_id, question_key, row_hash, question FROM tour_answers'
+SAVE_SQL = '''
+    INSERT OR REPLACE INTO tour_answers
+        (tour_id, question_key, row_hash, question, answer, model, generated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# Ответы на прежние версии строки тура
+PRUNE_SQL = 'DELETE FROM tour_answers WHERE tour_id = ? AND question_key = ? AND row_hash != ?'
+
+
+class FatalAPIError(Exception):
+    """Ключ, баланс или модель - дальше вызывать бесполезно"""
+
+
+def cluster_questions(clusters, top=DEFAULT_TOP_CLUSTERS):
+    """
+    Вопросы для прогрева из кластеров: ключ кластера -> {'question', 'tours'}.
+    Кластеры без туров (вопросы не про конкретный тур) пропускаются.
+    """
+    questions = {}
+    for cluster in clusters:
+        if len(questions) >= top:
+            break
+        tours = [name for name, _ in cluster.get('tours', ())]
+        if tours:
+            questions[cluster['key']] = {'question': cluster['representative'], 'tours': tours}
+    return questions
+
+
+def plan_jobs(tours, questions, conn, force=False):
+    """Список (тур, ключ, вопрос, хеш строки), для которых нет актуального ответа"""
+    stored = set(conn.execute(STORED_SQL).fetchall())
+    jobs = []
+    for tour in tours:
+        tour_id = str(tour.get('ID', '')).strip()
+        if not tour_id:
+            continue
+        current_hash = row_hash(tour)
+        for key, spec in questions.items():
+            # Вопрос кластера - только для туров, о которых его задавали
+            if 'tours' in spec and tour.get('Название') not in spec['tours']:
+                continue
+            if force or (tour_id, key, current_hash, spec['question']) not in stored:
+                jobs.append((tour, key, spec['question'], current_hash))
+    return jobs
+
+
+async def generate_answer(client, prompts, tour, question):
+    """Ответ DeepSeek с повторами временных ошибок"""
+    messages = prompts.messages(question, tour, tour_facts(tour))
+    for attempt in range(RETRIES + 1):
+        try:
+            response = await asyncio.wait_for(client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                max_tokens=1024,
+                temperature=0.7,
+            ), timeout=CALL_TIMEOUT)
+            return response.choices[0].message.content.strip()
+        except asyncio.TimeoutError:
+            error = DeepSeekTimeout(f"нет ответа за {CALL_TIMEOUT:.0f} с")
+        except Exception as e:
+            error = classify_error(e)
+        if error.cooldown:
+            raise FatalAPIError(f"{error.kind}: {error}")
+        if attempt < RETRIES and isinstance(error, (DeepSeekRateLimited, DeepSeekUnavailable)):
+            await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+            continue
+        raise error
+
+
+async def run_jobs(jobs, client, conn, concurrency=DEFAULT_CONCURRENCY, progress_every=50):
+    """Генерирует ответы не больше concurrency сразу; каждый ответ сохраняется сразу"""
+    prompts = PromptBuilder()
+    semaphore = asyncio.Semaphore(concurrency)
+    report = {'done': 0, 'failed': 0, 'fatal': None}
+    stop = asyncio.Event()
+
+    async def worker(tour, key, question, current_hash):
+        async with semaphore:
+            if stop.is_set():
+                return
+            tour_id = str(tour.get('ID', '')).strip()
+            try:
+                answer = await generate_answer(client, prompts, tour, question)
+            except FatalAPIError as e:
+                report['fatal'] = str(e)
+                stop.set()
+                return
+            except Exception as e:
+                report['failed'] += 1
+                print(f"⚠️ Тур {tour_id}, вопрос {key}: {e}")
+                return
+            # Запись из event loop - без гонок между задачами
+            conn.execute(SAVE_SQL, (tour_id, key, current_hash, question, answer, MODEL,
+                                    datetime.now().isoformat(timespec='seconds')))
+            conn.execute(PRUNE_SQL, (tour_id, key, current_hash))
+            conn.commit()
+            report['done'] += 1
+            if report['done'] % progress_every == 0:
+                print(f"… готово {report['done']} из {len(jobs)}")
+
+    await asyncio.gather(*(worker(*job) for job in jobs))
+    return report
+
+
+def make_client(api_key=None, base_url=None):
+    import openai
+    return openai.AsyncOpenAI(
+        api_key=api_key or os.getenv('DEEPSEEK_API_KEY'),
+        base_url=base_url or os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com/v1"),
+        max_retries=0,       # повторы - в generate_answer()
+    )
+
+
+def pregenerate(csv_path=DEFAULT_CSV, db_path=DEFAULT_DB_PATH, questions=PREGENERATED_QUESTIONS,
+                concurrency=DEFAULT_CONCURRENCY, force=False, limit=None):
+    """Генерирует недостающие ответы. Возвращает отчет (словарь)"""
+    started = time.perf_counter()
+    migrate(db_path)
+    catalog, _ = load_catalog(csv_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        jobs = plan_jobs(catalog.tours, questions, conn, force)
+        report = {'tours': len(catalog.tours), 'planned': len(jobs)}
+        if limit is not None:
+            jobs = jobs[:limit]
+        if jobs:
+            report.update(asyncio.run(run_jobs(jobs, make_client(), conn, concurrency)))
+        report['seconds'] = time.perf_counter() - started
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Заранее сгенерировать ответы на частые вопросы по турам")
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--only', help="Ключи вопросов через запятую (по умолчанию - все)")
+    parser.add_argument('--limit', type=int, help="Не больше N ответов за запуск")
+    parser.add_argument('--force', action='store_true', help="Перегенерировать и актуальные ответы")
+    parser.add_argument('--dry-run', action='store_true', help="Только показать, сколько ответов нужно")
+    parser.add_argument('--clusters', metavar='PATH', help="Добавить частые кластеры вопросов из JSON")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_CLUSTERS, help="Сколько кластеров прогреть")
+    args = parser.parse_args()
+
+    questions = PREGENERATED_QUESTIONS
+    if args.only:
+        keys = [key.strip() for key in args.only.split(',') if key.strip()]
+        unknown = [key for key in keys if key not in PREGENERATED_QUESTIONS]
+        if unknown:
+            print(f"❌ Неизвестные вопросы: {', '.join(unknown)}. Есть: {', '.join(PREGENERATED_QUESTIONS)}")
+            raise SystemExit(2)
+        questions = {key: PREGENERATED_QUESTIONS[key] for key in keys}
+    if args.clusters:
+        clusters = cluster_questions(load_clusters(args.clusters), args.top)
+        print(f"🧩 Кластеров вопросов для прогрева: {len(clusters)}")
+        questions = {**questions, **clusters}
+
+    if args.dry_run:
+        migrate(args.db)
+        catalog, _ = load_catalog(args.csv)
+        conn = sqlite3.connect(args.db)
+        try:
+            jobs = plan_jobs(catalog.tours, questions, conn, args.force)
+        finally:
+            conn.close()
+        print(f"📋 Туров: {len(catalog.tours)}, вопросов: {len(questions)}, нужно ответов: {len(jobs)}")
+        return
+
+    if not os.getenv('DEEPSEEK_API_KEY'):
+        print("❌ DEEPSEEK_API_KEY не задан")
+        raise SystemExit(1)
+
+    report = pregenerate(args.csv, args.db, questions, args.concurrency, args.force, args.limit)
+    print(f"📋 Туров: {report['tours']}, нужно ответов: {report['planned']}")
+    if report['planned']:
+        print(f"✅ Сгенерировано: {report.get('done', 0)}, ошибок: {report.get('failed', 0)}, "
+              f"{report['seconds']:.1f} с")
+    if report.get('fatal'):
+        print(f"❌ Остановлено: {report['fatal']}. Запустите снова после исправления - готовые ответы сохранены")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
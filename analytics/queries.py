@@ -0,0 +1,84 @@
+# analytics/queries.py
+"""
+SQL запросов статистики (/stats, /stats_drops).
+
+Запросы вынесены из bot.py, чтобы benchmarks/query_plan_check.py проверял
+через EXPLAIN QUERY PLAN ровно те запросы, которые выполняет бот.
+Индексы под них заведены в analytics/schema.py.
+
+События старше окна хранения остаются только в сводках rollup_*
+(analytics/retention.py), поэтому итоги "за все время" объединяют живые
+таблицы со сводками. Запросы "за сегодня" и "за 7 дней" читают только
+живые таблицы - такие события никогда не старше окна хранения.
+"""
+
+# Уникальные пользователи, совершившие действие (параметр - action)
+DISTINCT_USERS_BY_ACTION = '''
+    SELECT COUNT(*) FROM (
+        SELECT user_id FROM user_actions WHERE action = :action
+        UNION
+        SELECT user_id FROM rollup_action_users WHERE action = :action
+    )
+'''
+
+DROP_OFFS_BY_STAGE = '''
+    SELECT drop_off_stage, COUNT(*) as count
+    FROM drop_off_points
+    GROUP BY drop_off_stage
+    ORDER BY count DESC
+'''
+
+TOP_TOURS = '''
+    SELECT tour_name, SUM(views) as views, SUM(total_seconds) / NULLIF(SUM(timed_views), 0) as avg_time
+    FROM (
+        SELECT tour_name, COUNT(*) as views, COUNT(view_time_seconds) as timed_views,
+               TOTAL(view_time_seconds) as total_seconds
+        FROM tour_views
+        WHERE tour_name IS NOT NULL
+        GROUP BY tour_name
+        UNION ALL
+        SELECT tour_name, views, timed_views, total_seconds FROM rollup_tour_views
+    )
+    GROUP BY tour_name
+    ORDER BY views DESC
+    LIMIT 5
+'''
+
+FREQUENT_QUESTION_TYPES = '''
+    SELECT question_type, SUM(count) as count
+    FROM (
+        SELECT question_type, COUNT(*) as count
+        FROM user_questions
+        WHERE question_type IS NOT NULL
+        GROUP BY question_type
+        UNION ALL
+        SELECT question_type, questions FROM rollup_question_types
+    )
+    GROUP BY question_type
+    ORDER BY count DESC
+    LIMIT 5
+'''
+
+RECENT_ERRORS = '''
+    SELECT error_type, COUNT(*) as count
+    FROM error_logs
+    WHERE timestamp > datetime('now', '-7 days')
+    GROUP BY error_type
+    ORDER BY count DESC
+'''
+
+AVG_SESSION_DURATION = 'SELECT AVG(session_duration) FROM drop_off_points WHERE session_duration > 0'
+
+TODAY_ACTIONS = "SELECT COUNT(*) FROM user_actions WHERE DATE(timestamp) = DATE('now')"
+
+TODAY_USERS = "SELECT COUNT(DISTINCT user_id) FROM user_actions WHERE DATE(timestamp) = DATE('now')"
+
+DROP_OFF_DETAILS = '''
+    SELECT drop_off_stage, COUNT(*) as count,
+           AVG(session_duration) as avg_time,
+           MIN(timestamp) as first_occurrence,
+           MAX(timestamp) as last_occurrence
+    FROM drop_off_points
+    GROUP BY drop_off_stage
+    ORDER BY count DESC
+'''
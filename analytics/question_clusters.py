@@ -0,0 +1,247 @@
+# analytics/question_clusters.py
+"""
+Кластеры почти одинаковых вопросов клиентов (user_questions.question_text).
+
+1. Вопросы за период читаются из живой базы и архивных партиций и сразу
+   сворачиваются по нормализованному тексту (регистр, знаки, пробелы) -
+   дословные повторы дальше не обрабатываются.
+2. Для уникальных текстов считаются MinHash-подписи (near_duplicates.py,
+   пачками на numpy), LSH-полосы дают пары кандидатов: вопросы с
+   одинаковой полосой. Пара принимается, если оценка сходства не ниже
+   SIMILARITY; принятые пары склеиваются в кластеры (union-find).
+   Все шаги линейны по числу уникальных вопросов - сотни тысяч строк
+   обрабатываются за секунды.
+3. Кластер: число вопросов, представитель (самая частая формулировка),
+   варианты, туры, о которых спрашивали, и частый тип вопроса.
+   Ключ кластера - хеш представителя, он не меняется между запусками,
+   пока представитель тот же.
+
+Кластеры показывает админ-команда /stats_questions; сохраненные в JSON
+(QUESTION_CLUSTERS_PATH) - источник вопросов для прогрева готовых ответов
+(python -m analytics.pregenerate_answers --clusters ...) и индекс, по
+которому бот узнает такие вопросы (answer_cache.AnswerCache).
+
+numpy импортируется лениво.
+
+Запуск из консоли:
+    python -m analytics.question_clusters --days 90 --out question_clusters.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from analytics.reader import connect_readonly, time_limit
+from analytics.retention import range_sources
+from analytics.schema import DEFAULT_DB_PATH, table_exists
+from near_duplicates import SIMILARITY, band_keys, minhash_signatures, shingles
+from singleflight import normalize_question
+
+QUESTION_CLUSTERS_PATH = os.getenv('QUESTION_CLUSTERS_PATH', 'question_clusters.json')
+DEFAULT_DAYS = 90
+MAX_VARIANTS = 5
+MAX_TOURS = 5
+MAX_SAVED = 500            # сколько кластеров сохранять в JSON
+MIN_SAVED_COUNT = 2        # одиночные вопросы в JSON не попадают
+COMPARE_CHUNK = 50000      # пар кандидатов за одно сравнение подписей
+REPRESENTATIVE_SHARE = 0.8
+
+QUESTIONS_SQL = '''
+    SELECT question_text, tour_name, question_type FROM user_questions
+    WHERE timestamp >= ? AND timestamp < ? AND question_text IS NOT NULL
+'''
+
+
+def load_questions(date_from, date_to, db_path=DEFAULT_DB_PATH, deadline=None):
+    """
+    Вопросы за период, свернутые по нормализованному тексту:
+    нормализованный текст -> {'count', 'texts', 'tours', 'types'} (Counter)
+    """
+    groups = {}
+    params = (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat())
+    for source in range_sources('user_questions', db_path, date_from, date_to):
+        if not os.path.exists(source):
+            continue
+        conn = connect_readonly(source, deadline)
+        try:
+            if not table_exists(conn, 'user_questions'):
+                continue
+            for text, tour_name, question_type in conn.execute(QUESTIONS_SQL, params):
+                add_question(groups, text, tour_name, question_type)
+        finally:
+            conn.close()
+    return groups
+
+
+def add_question(groups, text, tour_name=None, question_type=None):
+    normalized = normalize_question(text)
+    if not normalized:
+        return
+    group = groups.get(normalized)
+    if group is None:
+        group = groups[normalized] = {'count': 0, 'texts': Counter(), 'tours': Counter(), 'types': Counter()}
+    group['count'] += 1
+    group['texts'][str(text).strip()] += 1
+    if tour_name:
+        group['tours'][tour_name] += 1
+    if question_type:
+        group['types'][question_type] += 1
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def similar_pairs(signatures, threshold=SIMILARITY):
+    """
+    Пары (i, j) почти одинаковых текстов: внутри каждой LSH-полосы каждый
+    текст сравнивается с первым текстом своей корзины
+    """
+    import numpy as np
+
+    keys = band_keys(signatures)
+    for band in range(keys.shape[1]):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        # Номер первого текста корзины для каждой позиции
+        first_positions = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+        members = order[~starts]
+        firsts = order[first_positions[~starts]]
+        for chunk in range(0, len(members), COMPARE_CHUNK):
+            a = firsts[chunk:chunk + COMPARE_CHUNK]
+            b = members[chunk:chunk + COMPARE_CHUNK]
+            agreement = (signatures[a] == signatures[b]).mean(axis=1)
+            accepted = agreement >= threshold
+            yield from zip(a[accepted].tolist(), b[accepted].tolist())
+
+
+def cluster_groups(groups, threshold=SIMILARITY):
+    """Список кластеров (словари), по убыванию числа вопросов"""
+    normalized_texts = list(groups)
+    if not normalized_texts:
+        return []
+    signatures = minhash_signatures([shingles(text) for text in normalized_texts])
+    parents = list(range(len(normalized_texts)))
+    for i, j in similar_pairs(signatures, threshold):
+        root_i, root_j = _find(parents, i), _find(parents, j)
+        if root_i != root_j:
+            parents[root_j] = root_i
+
+    members = {}
+    for i in range(len(normalized_texts)):
+        members.setdefault(_find(parents, i), []).append(normalized_texts[i])
+
+    clusters = []
+    for normalized_members in members.values():
+        # Представитель - самая частая формулировка; из почти одинаково частых - самая короткая
+        top_count = max(groups[text]['count'] for text in normalized_members)
+        normalized_members.sort(key=lambda text: (groups[text]['count'] < REPRESENTATIVE_SHARE * top_count,
+                                                  len(text), -groups[text]['count']))
+        tours, types = Counter(), Counter()
+        for text in normalized_members:
+            tours.update(groups[text]['tours'])
+            types.update(groups[text]['types'])
+        variants = [groups[text]['texts'].most_common(1)[0][0] for text in normalized_members[:MAX_VARIANTS]]
+        top_type = types.most_common(1)
+        clusters.append({
+            'key': 'q' + hashlib.sha1(normalized_members[0].encode('utf-8')).hexdigest()[:10],
+            'count': sum(groups[text]['count'] for text in normalized_members),
+            'unique': len(normalized_members),
+            'representative': variants[0],
+            'variants': variants,
+            'tours': tours.most_common(MAX_TOURS),
+            'question_type': top_type[0][0] if top_type else None,
+        })
+    clusters.sort(key=lambda cluster: (-cluster['count'], cluster['representative']))
+    return clusters
+
+
+def compute_clusters(date_from, date_to, db_path=DEFAULT_DB_PATH, threshold=SIMILARITY, timeout=None):
+    """
+    Кластеры вопросов за период и сводка для отчета.
+    timeout - срок на чтение вопросов, дольше - StatsTimeout (analytics/reader.py)
+    """
+    started = time.perf_counter()
+    with time_limit(timeout) as deadline:
+        groups = load_questions(date_from, date_to, db_path, deadline)
+    clusters = cluster_groups(groups, threshold)
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'questions': sum(group['count'] for group in groups.values()),
+        'unique': len(groups),
+        'clusters': clusters,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def format_report(report, top=10):
+    """Текст для Telegram: самые частые кластеры вопросов"""
+    text = f"❓ ВОПРОСЫ {report['date_from']} — {report['date_to']}\n"
+    text += (f"(всего {report['questions']}, разных формулировок {report['unique']}, "
+             f"кластеров {len(report['clusters'])}, {report['seconds']:.1f} с)\n\n")
+    if not report['clusters']:
+        return text + "📭 За период вопросов нет"
+
+    for number, cluster in enumerate(report['clusters'][:top], 1):
+        text += f"{number}. «{cluster['representative'][:120]}» — {cluster['count']} раз"
+        if cluster['unique'] > 1:
+            text += f" ({cluster['unique']} формулировок)"
+        text += "\n"
+        if cluster['tours']:
+            text += "   🏝 " + ", ".join(f"{name} ({count})" for name, count in cluster['tours'][:3]) + "\n"
+    return text
+
+
+def save_clusters(report, path=QUESTION_CLUSTERS_PATH):
+    """Сохраняет частые кластеры в JSON (атомарно)"""
+    data = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'date_from': report['date_from'],
+        'date_to': report['date_to'],
+        'clusters': [cluster for cluster in report['clusters'] if cluster['count'] >= MIN_SAVED_COUNT][:MAX_SAVED],
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return len(data['clusters'])
+
+
+def load_clusters(path=QUESTION_CLUSTERS_PATH):
+    """Кластеры из JSON или [] (нет файла или он испорчен)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('clusters', [])
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"⚠️ Кластеры вопросов {path} не загружены: {e}")
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Кластеры почти одинаковых вопросов клиентов")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="За сколько последних дней брать вопросы")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--out', default=QUESTION_CLUSTERS_PATH)
+    parser.add_argument('--top', type=int, default=20, help="Сколько кластеров показать")
+    args = parser.parse_args()
+
+    date_to = datetime.now().date()
+    report = compute_clusters(date_to - timedelta(days=args.days), date_to, args.db)
+    print(format_report(report, args.top))
+    saved = save_clusters(report, args.out)
+    print(f"✅ Кластеров с повторами: {saved} → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# analytics/reader.py
+"""
+Чтение статистики для админ-команд вне event loop.
+
+StatsReader держит одно соединение только для чтения (mode=ro) в своем
+рабочем потоке: все запросы админ-команд выполняются там, а обработчик
+лишь ждет результат через await. Диалоги клиентов на event loop при
+этом не стоят. В режиме WAL чтение не блокирует запись логов.
+
+У каждого вызова есть лимит времени: progress handler SQLite прерывает
+запрос, если он идет дольше timeout, и вызывающий получает StatsTimeout.
+
+Отчеты, которые читают сразу несколько баз (архивные партиции + живая:
+воронка, частые вопросы, выгрузка), открывают свои соединения через
+connect_readonly() с тем же progress handler; общий срок на весь отчет
+задает time_limit().
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from analytics.schema import DEFAULT_DB_PATH
+
+QUERY_TIMEOUT = 5.0
+# Как часто (в инструкциях виртуальной машины SQLite) проверять лимит времени
+PROGRESS_STEPS = 10000
+
+
+class StatsTimeout(Exception):
+    """Запрос статистики не уложился в лимит времени и был прерван"""
+
+
+def connect_readonly(db_path, deadline=None):
+    """
+    Соединение только для чтения (mode=ro). deadline - момент time.monotonic(),
+    после которого запросы на соединении прерываются (None - без срока)
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    if deadline is not None:
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, PROGRESS_STEPS)
+    return conn
+
+
+def _interrupted(error):
+    # pandas.read_sql_query заворачивает ошибку SQLite в свою, исходная - в __cause__
+    while error is not None:
+        if isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error):
+            return True
+        error = error.__cause__
+    return False
+
+
+@contextmanager
+def time_limit(timeout):
+    """
+    Общий срок для запросов внутри блока: отдает deadline для
+    connect_readonly(), прерванный запрос превращает в StatsTimeout.
+    timeout=None - без срока (офлайн-скрипты)
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        yield deadline
+    except Exception as e:
+        if deadline is not None and _interrupted(e):
+            raise StatsTimeout(f"Запрос статистики дольше {timeout:g} с") from e
+        raise
+
+
+class StatsReader:
+    def __init__(self, db_path=DEFAULT_DB_PATH, timeout=QUERY_TIMEOUT):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats-reader')
+        self._conn = None      # создается и используется только в рабочем потоке
+        self._deadline = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._conn.set_progress_handler(self._check_deadline, PROGRESS_STEPS)
+        return self._conn
+
+    def _check_deadline(self):
+        # Ненулевой ответ прерывает текущий запрос (sqlite3.OperationalError: interrupted)
+        return 1 if self._deadline is not None and time.monotonic() > self._deadline else 0
+
+    def _call(self, func, timeout):
+        conn = self._connection()
+        self._deadline = time.monotonic() + timeout
+        try:
+            return func(conn)
+        except sqlite3.OperationalError as e:
+            if 'interrupted' in str(e):
+                raise StatsTimeout(f"Запрос статистики дольше {timeout:g} с") from e
+            raise
+        finally:
+            self._deadline = None
+
+    async def run(self, func, timeout=None):
+        """Выполняет func(conn) в потоке чтения и возвращает ее результат"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, timeout or self.timeout)
+
+    async def fetchall(self, sql, params=(), timeout=None):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall(), timeout)
+
+    async def fetchone(self, sql, params=(), timeout=None):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone(), timeout)
+
+    def close(self):
+        """Закрывает соединение в его потоке и останавливает поток"""
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._executor.submit(_close).result()
+        self._executor.shutdown(wait=True)
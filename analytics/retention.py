@@ -0,0 +1,292 @@
+# analytics/retention.py
+"""
+Хранение сырых событий аналитики по месяцам, сжатие в сводки и очистка.
+
+В живой базе (bot_statistics.db) остаются только события за последние
+RETENTION_DAYS дней. Более старые события обслуживание (run_maintenance):
+1. копирует в помесячные файлы-партиции analytics_archive/ГГГГ-ММ.db (ATTACH);
+2. сворачивает в сводные таблицы rollup_* (см. миграцию 3 в schema.py),
+   которые запросы /stats объединяют с живыми данными;
+3. удаляет из живой базы;
+и затем делает checkpoint WAL и инкрементальный VACUUM, чтобы файл базы
+оставался маленьким и помещался в кэш.
+
+Шаги 1-3 идут пачками по диапазонам rowid (ARCHIVE_BATCH_ROWS строк), каждая
+пачка - своя короткая транзакция: бот, пишущий события, ждет блокировку не
+дольше одной пачки. Повторный запуск после сбоя не создает дублей (в
+партициях уникальный id, INSERT OR IGNORE; сводка и удаление пачки - в одной
+транзакции).
+
+Пока бот работает, освобожденные страницы возвращаются только через
+PRAGMA incremental_vacuum(VACUUM_PAGES). Полный VACUUM (нужен один раз, чтобы
+перевести старую базу на auto_vacuum=INCREMENTAL) держит базу целиком и
+запускается офлайн, при остановленном боте:
+    python -m analytics.retention --vacuum
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+from analytics.schema import DEFAULT_DB_PATH
+
+RETENTION_DAYS = 90
+ARCHIVE_DIR_NAME = 'analytics_archive'
+ARCHIVE_BATCH_ROWS = 5000     # строк rowid на одну транзакцию переноса
+ARCHIVE_BATCH_PAUSE = 0.01    # сек между пачками - окно для записей бота
+VACUUM_PAGES = 2000           # страниц за один incremental_vacuum (~8 МБ при 4 КБ)
+
+# Таблицы с сырыми событиями, которые уходят в партиции
+PARTITIONED_TABLES = ('user_actions', 'actions', 'tour_views', 'user_questions', 'error_logs')
+
+# Сводки: что остается в живой базе от удаленных событий.
+# Параметры каждого запроса - :start, :end (границы месяца), :cutoff
+# и :low, :high (диапазон rowid пачки)
+ROLLUP_QUERIES = {
+    'user_actions': [
+        '''
+        INSERT INTO rollup_daily_actions (source, day, action, events)
+        SELECT 'user_actions', DATE(timestamp), action, COUNT(*)
+        FROM user_actions
+        WHERE timestamp >= :start AND timestamp < :end AND timestamp < :cutoff
+          AND rowid >= :low AND rowid < :high
+        GROUP BY DATE(timestamp), action
+        ON CONFLICT (source, day, action) DO UPDATE SET events = events + excluded.events
+        ''',
+        '''
+        INSERT INTO rollup_action_users (action, user_id, first_day)
+        SELECT action, user_id, MIN(DATE(timestamp))
+        FROM user_actions
+        WHERE timestamp >= :start AND timestamp < :end AND timestamp < :cutoff
+          AND rowid >= :low AND rowid < :high
+        GROUP BY action, user_id
+        ON CONFLICT (action, user_id) DO UPDATE SET first_day = MIN(first_day, excluded.first_day)
+        ''',
+    ],
+    'actions': [
+        '''
+        INSERT INTO rollup_daily_actions (source, day, action, events)
+        SELECT 'actions', DATE(timestamp), action_type, COUNT(*)
+        FROM actions
+        WHERE timestamp >= :start AND timestamp < :end AND timestamp < :cutoff
+          AND rowid >= :low AND rowid < :high
+          AND action_type IS NOT NULL
+        GROUP BY DATE(timestamp), action_type
+        ON CONFLICT (source, day, action) DO UPDATE SET events = events + excluded.events
+        ''',
+    ],
+    'tour_views': [
+        '''
+        INSERT INTO rollup_tour_views (tour_name, views, timed_views, total_seconds)
+        SELECT tour_name, COUNT(*), COUNT(view_time_seconds), TOTAL(view_time_seconds)
+        FROM tour_views
+        WHERE timestamp >= :start AND timestamp < :end AND timestamp < :cutoff
+          AND rowid >= :low AND rowid < :high
+          AND tour_name IS NOT NULL
+        GROUP BY tour_name
+        ON CONFLICT (tour_name) DO UPDATE SET
+            views = views + excluded.views,
+            timed_views = timed_views + excluded.timed_views,
+            total_seconds = total_seconds + excluded.total_seconds
+        ''',
+    ],
+    'user_questions': [
+        '''
+        INSERT INTO rollup_question_types (question_type, questions)
+        SELECT question_type, COUNT(*)
+        FROM user_questions
+        WHERE timestamp >= :start AND timestamp < :end AND timestamp < :cutoff
+          AND rowid >= :low AND rowid < :high
+          AND question_type IS NOT NULL
+        GROUP BY question_type
+        ON CONFLICT (question_type) DO UPDATE SET questions = questions + excluded.questions
+        ''',
+    ],
+    # error_logs: в /stats показываются только последние 7 дней, сводка не нужна
+    'error_logs': [],
+}
+
+
+def month_bounds(month):
+    """'2025-07' -> ('2025-07-01', '2025-08-01')"""
+    year, mon = (int(part) for part in month.split('-'))
+    next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
+
+
+def archive_dir_for(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), ARCHIVE_DIR_NAME)
+
+
+def months_in_range(date_from, date_to):
+    """Месяцы 'ГГГГ-ММ', пересекающиеся с периодом [date_from, date_to]"""
+    month = date(date_from.year, date_from.month, 1)
+    while month <= date_to:
+        yield month.strftime('%Y-%m')
+        month = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def range_sources(table, db_path, date_from, date_to):
+    """
+    Базы, где лежат строки таблицы за период: архивные партиции месяцев
+    из периода (по возрастанию), затем живая база.
+    """
+    sources = []
+    if table in PARTITIONED_TABLES:
+        archive_dir = archive_dir_for(db_path)
+        for month in months_in_range(date_from, date_to):
+            path = os.path.join(archive_dir, f"{month}.db")
+            if os.path.exists(path):
+                sources.append(path)
+    sources.append(db_path)
+    return sources
+
+
+def expired_months(conn, cutoff):
+    """Месяцы, в которых есть события старше cutoff"""
+    months = set()
+    for table in PARTITIONED_TABLES:
+        rows = conn.execute(
+            f"SELECT DISTINCT substr(timestamp, 1, 7) FROM {table} WHERE timestamp < ?", (cutoff,)
+        )
+        months.update(month for (month,) in rows if month)
+    return sorted(months)
+
+
+def archive_month(conn, month, cutoff, archive_dir, batch_rows=ARCHIVE_BATCH_ROWS, stats=None):
+    """
+    Переносит события месяца старше cutoff в партицию и сводки пачками по
+    batch_rows rowid, с COMMIT после каждой пачки. Возвращает число строк.
+    stats - словарь, куда добавляются число пачек и самая долгая транзакция
+    """
+    start, end = month_bounds(month)
+    where = "timestamp >= :start AND timestamp < :end AND timestamp < :cutoff"
+    path = os.path.join(archive_dir, f"{month}.db")
+    stats = stats if stats is not None else {}
+
+    conn.execute("ATTACH DATABASE ? AS part", (path,))
+    try:
+        moved = 0
+        for table in PARTITIONED_TABLES:
+            # Та же структура колонок, что и в живой таблице
+            conn.execute(f"CREATE TABLE IF NOT EXISTS part.{table} AS SELECT * FROM main.{table} WHERE 0")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS part.{table}_id ON {table}(id)")
+
+            low, high = conn.execute(
+                f"SELECT MIN(rowid), MAX(rowid) FROM main.{table} WHERE {where}",
+                {'start': start, 'end': end, 'cutoff': cutoff}
+            ).fetchone()
+            if low is None:
+                continue
+            while low <= high:
+                params = {'start': start, 'end': end, 'cutoff': cutoff, 'low': low, 'high': low + batch_rows}
+                batch = f"{where} AND rowid >= :low AND rowid < :high"
+                started = time.perf_counter()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    conn.execute(f"INSERT OR IGNORE INTO part.{table} SELECT * FROM main.{table} WHERE {batch}",
+                                 params)
+                    for query in ROLLUP_QUERIES[table]:
+                        conn.execute(query, params)
+                    rows = conn.execute(f"DELETE FROM main.{table} WHERE {batch}", params).rowcount
+                    conn.execute('''
+                    INSERT INTO archive_partitions (month, path, rows_archived, archived_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (month) DO UPDATE SET
+                        rows_archived = rows_archived + excluded.rows_archived,
+                        archived_at = excluded.archived_at
+                    ''', (month, path, rows))
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                moved += rows
+                stats['batches'] = stats.get('batches', 0) + 1
+                stats['max_batch_seconds'] = max(stats.get('max_batch_seconds', 0.0),
+                                                 time.perf_counter() - started)
+                low += batch_rows
+                time.sleep(ARCHIVE_BATCH_PAUSE)
+    finally:
+        conn.execute("DETACH DATABASE part")
+    return moved
+
+
+def compact(conn, full=False, pages=VACUUM_PAGES):
+    """
+    Возвращает освобожденные страницы ОС и сбрасывает WAL. Возвращает 'full',
+    'incremental' или None. Без full - только incremental_vacuum не больше
+    pages страниц за раз (остальное - в следующий цикл). full - полный VACUUM
+    с переходом на auto_vacuum=INCREMENTAL: блокирует всю базу, только офлайн
+    """
+    mode = None
+    if full:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        mode = 'full'
+    elif (conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+          and conn.execute('PRAGMA freelist_count').fetchone()[0]):
+        # executescript проходит PRAGMA до конца (execute() освобождает по одной странице за шаг)
+        conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+        mode = 'incremental'
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return mode
+
+
+def run_maintenance(db_path=DEFAULT_DB_PATH, retention_days=RETENTION_DAYS, archive_dir=None, now=None,
+                    full_vacuum=False):
+    """
+    Полный цикл обслуживания: партиции + сводки + очистка + VACUUM/checkpoint.
+    Синхронная функция - из бота вызывается через asyncio.to_thread.
+    full_vacuum - полный VACUUM вместо инкрементального (только при
+    остановленном боте). Возвращает словарь с итогами для логов;
+    needs_vacuum - база еще без auto_vacuum=INCREMENTAL и ждет офлайн-VACUUM.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+    archive_dir = archive_dir or archive_dir_for(db_path)
+
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        months = expired_months(conn, cutoff)
+        archived = {}
+        stats = {'batches': 0, 'max_batch_seconds': 0.0}
+        if months:
+            os.makedirs(archive_dir, exist_ok=True)
+            for month in months:
+                archived[month] = archive_month(conn, month, cutoff, archive_dir, stats=stats)
+        vacuum = compact(conn, full=full_vacuum)
+        needs_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2
+    finally:
+        conn.close()
+
+    return {
+        'cutoff': cutoff,
+        'archived': archived,
+        'vacuum': vacuum,
+        'needs_vacuum': needs_vacuum,
+        'batches': stats['batches'],
+        'max_batch_seconds': stats['max_batch_seconds'],
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание базы статистики: партиции, сводки, VACUUM")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+    parser.add_argument('--vacuum', action='store_true',
+                        help="Полный VACUUM и переход на auto_vacuum=INCREMENTAL (только при остановленном боте)")
+    args = parser.parse_args()
+
+    summary = run_maintenance(args.db, args.retention_days, full_vacuum=args.vacuum)
+    print(f"✅ Перенесено {sum(summary['archived'].values())} событий старше {summary['cutoff']} "
+          f"({summary['batches']} пачек, самая долгая {summary['max_batch_seconds'] * 1000:.0f} мс)")
+    print(f"🧹 VACUUM: {summary['vacuum'] or 'не нужен'}, {summary['seconds']:.1f} с")
+    if summary['needs_vacuum']:
+        print("⚠️ База без auto_vacuum=INCREMENTAL: остановите бота и запустите с --vacuum")
+
+
+if __name__ == "__main__":
+    main()
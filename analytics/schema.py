@@ -0,0 +1,259 @@
+# analytics/schema.py
+"""
+Единая схема bot_statistics.db и ее миграции.
+
+Все таблицы и индексы (и bot.py: users, actions, conversations, и аналитики:
+user_actions, tour_views, user_questions, drop_off_points, error_logs)
+создаются только здесь. Версия схемы хранится в PRAGMA user_version;
+migrate() применяет недостающие миграции по порядку, каждую в своей
+транзакции. Новая миграция = новый элемент в конце MIGRATIONS, старые
+не редактируются.
+"""
+import sqlite3
+
+DEFAULT_DB_PATH = 'bot_statistics.db'
+
+# Таблицы с данными конкретного пользователя, которые чистит /clear
+USER_ANALYTICS_TABLES = ('user_actions', 'tour_views', 'user_questions', 'drop_off_points')
+
+# ==================== МИГРАЦИИ ====================
+# (версия, описание, список SQL)
+MIGRATIONS = [
+    (1, "Базовые таблицы бота и аналитики", [
+        # --- Таблицы bot.py ---
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action_type TEXT,
+            action_details TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            category TEXT,
+            adults INTEGER DEFAULT 0,
+            children_count INTEGER DEFAULT 0,
+            children_ages TEXT,
+            pregnant BOOLEAN,
+            priorities TEXT,
+            health_issues TEXT,
+            selected_tour_id INTEGER,
+            conversation_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            conversation_end TIMESTAMP,
+            successful BOOLEAN DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # --- Таблицы аналитики (бывший create_tables.py) ---
+        '''
+        CREATE TABLE IF NOT EXISTS user_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            stage TEXT,
+            tour_id INTEGER,
+            category TEXT,
+            session_data TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tour_views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            tour_id INTEGER NOT NULL,
+            tour_name TEXT,
+            view_time_seconds INTEGER,
+            price_shown TEXT,
+            category TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            question_text TEXT NOT NULL,
+            tour_name TEXT,
+            bot_response TEXT,
+            question_type TEXT,
+            was_helpful BOOLEAN,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS drop_off_points (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            drop_off_stage TEXT NOT NULL,
+            last_action TEXT,
+            session_duration INTEGER,
+            user_profile TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS error_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            error_type TEXT NOT NULL,
+            error_message TEXT,
+            user_id INTEGER,
+            bot_state TEXT,
+            user_action TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_actions_user ON user_actions(user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_actions_type ON user_actions(action, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_drops_stage ON drop_off_points(drop_off_stage, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_errors_type ON error_logs(error_type, timestamp)',
+    ]),
+    (2, "Индексы под запросы /stats", [
+        # COUNT(DISTINCT user_id) ... WHERE action = ? - покрывающий индекс,
+        # таблица не читается вовсе
+        'CREATE INDEX IF NOT EXISTS idx_user_actions_action_user ON user_actions(action, user_id)',
+        # WHERE DATE(timestamp) = DATE('now') - индекс по выражению
+        'CREATE INDEX IF NOT EXISTS idx_user_actions_day ON user_actions(DATE(timestamp), user_id)',
+        # GROUP BY tour_name + AVG(view_time_seconds) - группировка по индексу без сортировки
+        'CREATE INDEX IF NOT EXISTS idx_tour_views_name ON tour_views(tour_name, view_time_seconds)',
+        # GROUP BY question_type
+        'CREATE INDEX IF NOT EXISTS idx_user_questions_type ON user_questions(question_type)',
+        # /stats_drops: группировка по этапу с длительностью и временем без чтения таблицы
+        'CREATE INDEX IF NOT EXISTS idx_drops_stage_duration '
+        'ON drop_off_points(drop_off_stage, session_duration, timestamp)',
+    ]),
+    (3, "Сводки и индексы для хранения по месяцам", [
+        # Сводки по событиям, удаленным из живой базы (см. analytics/retention.py)
+        '''
+        CREATE TABLE IF NOT EXISTS rollup_daily_actions (
+            source TEXT NOT NULL,
+            day TEXT NOT NULL,
+            action TEXT NOT NULL,
+            events INTEGER NOT NULL,
+            PRIMARY KEY (source, day, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rollup_action_users (
+            action TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            first_day TEXT,
+            PRIMARY KEY (action, user_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rollup_tour_views (
+            tour_name TEXT PRIMARY KEY,
+            views INTEGER NOT NULL,
+            timed_views INTEGER NOT NULL,
+            total_seconds REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rollup_question_types (
+            question_type TEXT PRIMARY KEY,
+            questions INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            rows_archived INTEGER NOT NULL,
+            archived_at TIMESTAMP
+        )
+        ''',
+        # Поиск событий старше окна хранения
+        'CREATE INDEX IF NOT EXISTS idx_user_actions_time ON user_actions(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_legacy_actions_time ON actions(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_tour_views_time ON tour_views(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_user_questions_time ON user_questions(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_error_logs_time ON error_logs(timestamp)',
+    ]),
+    (4, "Индексы для выгрузки по периоду", [
+        # analytics/export.py читает таблицы по диапазону дат в порядке времени
+        'CREATE INDEX IF NOT EXISTS idx_drops_time ON drop_off_points(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_conversations_start ON conversations(conversation_start)',
+    ]),
+    (5, "Покрывающий индекс для воронки", [
+        # analytics/funnel.py: action = ? AND timestamp в периоде по порядку времени, нужны user_id и category.
+        # Заменяет idx_actions_type (action, timestamp) - тот же префикс
+        'CREATE INDEX IF NOT EXISTS idx_user_actions_funnel ON user_actions(action, timestamp, user_id, category)',
+        'DROP INDEX IF EXISTS idx_actions_type',
+    ]),
+    (6, "Заранее сгенерированные ответы по турам", [
+        # analytics/pregenerate_answers.py: ответ DeepSeek на частый вопрос для
+        # строки прайса; row_hash меняется вместе со строкой - ответ устаревает
+        '''
+        CREATE TABLE IF NOT EXISTS tour_answers (
+            tour_id TEXT NOT NULL,
+            question_key TEXT NOT NULL,
+            row_hash TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            model TEXT,
+            generated_at TIMESTAMP,
+            PRIMARY KEY (tour_id, question_key, row_hash)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def table_exists(conn, table):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db_path=DEFAULT_DB_PATH):
+    """
+    Доводит схему БД до SCHEMA_VERSION и включает WAL (чтение статистики
+    не блокирует запись логов). Возвращает список примененных версий.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        # Действует только для новой БД; существующую переводит analytics/retention.py
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        current = get_version(conn)
+
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            conn.execute('BEGIN')
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                # PRAGMA не принимает параметры, версия - целое из MIGRATIONS
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+            print(f"🗄 Миграция {version}: {description}")
+    finally:
+        conn.close()
+    return applied
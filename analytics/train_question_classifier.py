@@ -0,0 +1,131 @@
+# analytics/train_question_classifier.py
+"""
+Офлайн-обучение классификатора типов вопросов (question_classifier.py).
+
+Примеры:
+- SEED_QUESTIONS - вручную собранные вопросы по каждому типу QUESTION_TYPES;
+- вопросы клиентов из user_questions за последние дни (живая база и
+  архивные партиции), размеченные словами config.QUESTION_TYPE_KEYWORDS:
+  вопрос берется, только если совпали слова ровно одного типа.
+  Типы, записанные самим ботом, не используются - модель не должна
+  учиться на своих же ответах.
+
+Модель обучается на всех примерах; перед этим - проверка на отложенной
+доле (точность и точность/охват при пороге ROUTE_THRESHOLD, с которым
+бот отвечает шаблоном без DeepSeek).
+
+Запуск из консоли:
+    python -m analytics.train_question_classifier --days 90 --out question_classifier.json
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from analytics.retention import range_sources
+from analytics.schema import DEFAULT_DB_PATH, table_exists
+from config import QUESTION_TYPE_KEYWORDS
+from question_classifier import (QUESTION_MODEL_PATH, ROUTE_THRESHOLD, QuestionClassifier,
+                                 normalize, save_question_classifier, seed_examples)
+
+DEFAULT_DAYS = 90
+HOLDOUT_SHARE = 0.2
+
+QUESTIONS_SQL = '''
+    SELECT question_text FROM user_questions
+    WHERE timestamp >= ? AND timestamp < ? AND question_text IS NOT NULL
+'''
+
+
+def weak_label(text):
+    """Тип по словам QUESTION_TYPE_KEYWORDS или None (ни одного или несколько типов)"""
+    text = normalize(text)
+    matched = [label for label, words in QUESTION_TYPE_KEYWORDS.items() if any(word in text for word in words)]
+    return matched[0] if len(matched) == 1 else None
+
+
+def load_logged_questions(date_from, date_to, db_path=DEFAULT_DB_PATH):
+    """Тексты вопросов за период (без повторов, в порядке появления)"""
+    seen = {}
+    params = (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat())
+    for source in range_sources('user_questions', db_path, date_from, date_to):
+        if not os.path.exists(source):
+            continue
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            if not table_exists(conn, 'user_questions'):
+                continue
+            for (text,) in conn.execute(QUESTIONS_SQL, params):
+                seen.setdefault(normalize(text).strip(), text)
+        finally:
+            conn.close()
+    return list(seen.values())
+
+
+def evaluate(model, examples, threshold=ROUTE_THRESHOLD):
+    """Точность, а также доля и точность ответов с уверенностью >= threshold"""
+    correct = routed = routed_correct = 0
+    for text, label in examples:
+        predicted, confidence = model.predict(text)
+        correct += predicted == label
+        if confidence >= threshold:
+            routed += 1
+            routed_correct += predicted == label
+    return {
+        'accuracy': round(correct / len(examples), 4) if examples else None,
+        'coverage': round(routed / len(examples), 4) if examples else None,
+        'routed_precision': round(routed_correct / routed, 4) if routed else None,
+    }
+
+
+def train(db_path=DEFAULT_DB_PATH, days=DEFAULT_DAYS, today=None, seed=0):
+    """Обучает модель на SEED_QUESTIONS и размеченных логах. Возвращает (модель, отчет)"""
+    started = time.perf_counter()
+    today = today or datetime.now().date()
+    logged = load_logged_questions(today - timedelta(days=days), today, db_path)
+    labeled = [(text, label) for text, label in ((text, weak_label(text)) for text in logged) if label]
+    examples = seed_examples() + labeled
+    report = {'logged': len(logged), 'labeled': len(labeled), 'examples': len(examples)}
+
+    rng = random.Random(seed)
+    shuffled = examples[:]
+    rng.shuffle(shuffled)
+    split = int(len(shuffled) * HOLDOUT_SHARE)
+    holdout, rest = shuffled[:split], shuffled[split:]
+    if holdout and len({label for _, label in rest}) > 1:
+        report.update({f"holdout_{key}": value
+                       for key, value in evaluate(QuestionClassifier.train(rest), holdout).items()})
+
+    meta = {
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'days': days,
+        **report,
+    }
+    model = QuestionClassifier.train(examples, meta=meta)
+    report['features'] = len(model.table)
+    report['seconds'] = time.perf_counter() - started
+    return model, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение классификатора типов вопросов")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="За сколько последних дней брать вопросы")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--out', default=QUESTION_MODEL_PATH)
+    args = parser.parse_args()
+
+    model, report = train(args.db, args.days)
+    print(f"📊 Вопросов в логах: {report['logged']}, размечено словами: {report['labeled']}, "
+          f"примеров всего: {report['examples']}, признаков: {report['features']}")
+    if 'holdout_accuracy' in report:
+        print(f"🎯 На отложенных: точность {report['holdout_accuracy']}, "
+              f"охват при пороге {ROUTE_THRESHOLD}: {report['holdout_coverage']}, "
+              f"точность при пороге: {report['holdout_routed_precision']}")
+    save_question_classifier(model, args.out)
+    print(f"✅ Модель → {args.out} ({os.path.getsize(args.out)} байт), {report['seconds']:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# answer_cache.py - заранее сгенерированные ответы на частые вопросы по турам
+"""
+Про каждый тур спрашивают одно и то же: можно ли с детьми, беременным,
+что взять с собой, кормят ли, есть ли доплата за трансфер, будет ли
+качать. Ответы на эти вопросы (config.PREGENERATED_QUESTIONS) заранее
+генерирует офлайн-задача analytics/pregenerate_answers.py и кладет в
+таблицу tour_answers (миграция 6):
+
+    (tour_id, question_key, row_hash) -> ответ DeepSeek
+
+row_hash - хеш всей строки тура в прайсе. Поменялась строка (цена,
+ограничения, описание) - у нее новый хеш, старый ответ больше не
+выдается, а задача перегенерирует только такие туры.
+
+AnswerCache держит в памяти актуальные ответы (хеш совпадает с текущей
+строкой каталога) - бот отдает их мгновенно, без вызова DeepSeek.
+
+Кроме вопросов из конфига, задача прогревает и частые кластеры вопросов
+клиентов (analytics/question_clusters.py, ключ кластера 'q...'). Их
+формулировки кеш держит в LSH-индексе (near_duplicates.py): cluster_key()
+узнает почти такой же вопрос и возвращает ключ кластера.
+"""
+import hashlib
+import json
+import sqlite3
+
+from analytics.schema import table_exists
+from config import PREGENERATED_QUESTIONS
+
+# Поля, которых нет в блоке тура prompts.tour_block, но нужны для этих вопросов
+EXTRA_FACT_FIELDS = ('Питание', 'Что взять с собой', 'Дни выезда', 'Гид')
+
+
+def row_hash(tour):
+    """Короткий хеш строки тура (все поля CSV)"""
+    payload = json.dumps(tour, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def tour_facts(tour):
+    """Дополнительные факты о туре для промпта генерации"""
+    lines = [f"{field}: {str(tour.get(field, '')).strip()}"
+             for field in EXTRA_FACT_FIELDS if str(tour.get(field, '')).strip()]
+    return "Дополнительные данные о туре:\n" + "\n".join(lines) if lines else None
+
+
+def match_question_key(text, question_type=None, confident=False, questions=PREGENERATED_QUESTIONS):
+    """
+    Ключ заранее сгенерированного ответа для вопроса клиента или None.
+    Сначала слова (узкие темы: укачивание, что взять), затем уверенный тип
+    из классификатора вопросов.
+    """
+    text = str(text or '').lower().replace('ё', 'е')
+    for key, spec in questions.items():
+        if any(word in text for word in spec.get('words', ())):
+            return key
+    if confident:
+        for key, spec in questions.items():
+            if question_type in spec.get('types', ()):
+                return key
+    return None
+
+
+class AnswerCache:
+    """(ID тура, ключ вопроса) -> ответ для текущих строк каталога"""
+
+    def __init__(self):
+        self.answers = {}
+        self.clusters = None       # LSHIndex формулировок прогретых кластеров
+
+    def __len__(self):
+        return len(self.answers)
+
+    def load(self, db_path, tours):
+        """
+        Читает tour_answers и оставляет ответы, чей row_hash совпадает с
+        текущей строкой тура. Нет базы или таблицы - кеш пустой.
+        Возвращает число загруженных ответов.
+        """
+        current = {str(tour.get('ID', '')).strip(): row_hash(tour) for tour in tours}
+        answers = {}
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        except sqlite3.Error:
+            self.answers = {}
+            return 0
+        try:
+            if table_exists(conn, 'tour_answers'):
+                rows = conn.execute('SELECT tour_id, question_key, row_hash, answer FROM tour_answers')
+                for tour_id, key, stored_hash, answer in rows:
+                    if current.get(tour_id) == stored_hash:
+                        answers[(tour_id, key)] = answer
+        except sqlite3.Error as e:
+            print(f"⚠️ Заранее сгенерированные ответы не загружены: {e}")
+        finally:
+            conn.close()
+        self.answers = answers
+        return len(answers)
+
+    def get(self, tour_id, question_key):
+        return self.answers.get((str(tour_id).strip(), question_key))
+
+    def load_clusters(self, clusters):
+        """
+        Индексирует формулировки кластеров, для которых есть хотя бы один
+        готовый ответ. Вызывается после load(). Возвращает число кластеров.
+        """
+        from near_duplicates import LSHIndex
+
+        stored_keys = {key for _, key in self.answers}
+        index = LSHIndex()
+        count = 0
+        for cluster in clusters:
+            if cluster.get('key') in stored_keys and cluster.get('variants'):
+                index.add_many(cluster['variants'], [cluster['key']] * len(cluster['variants']))
+                count += 1
+        self.clusters = index if count else None
+        return count
+
+    def cluster_key(self, text):
+        """Ключ кластера, на вопросы которого похож текст, или None"""
+        if self.clusters is None:
+            return None
+        key, _ = self.clusters.query(text)
+        return key
@@ -0,0 +1,347 @@
+# answer_format.py - форматирование ответов DeepSeek для Telegram за один проход
+"""
+Ответ DeepSeek приходит с разметкой Markdown, которую Telegram понимает
+по-своему: непарная "*" или "_" в названии ("Phi_Phi", "5*") - и
+сообщение с parse_mode='Markdown' не отправляется вовсе. Поэтому ответ
+переводится в HTML Telegram (<b>, <i>, <code>, <pre>) с экранированием
+&, <, >, а открытые теги всегда закрываются - разметка сбалансирована в
+любой момент.
+
+AnswerFormatter читает ответ кусками (feed), каждый символ один раз:
+обычный текст между служебными символами копируется целиком (поиск по
+регулярному выражению), а служебные - "**", "*", "_", "`", "```",
+переводы строк, "#"/"-" в начале строки, ". " - обрабатываются на месте.
+Несколько последних символов придерживаются до следующего куска: "*" в
+конце куска может оказаться началом "**", а "Пхи" - началом "Пхи-Пхи".
+
+Оформление то же, что раньше делал format_deepseek_answer:
+- "•" и маркеры списков "-"/"*" -> "▪️";
+- если предложений больше двух - каждое с новой строки через пустую;
+- эмодзи перед первым упоминанием ключевых слов (EMOJI_KEYWORDS), если
+  такого эмодзи в ответе еще нет.
+
+snapshot() - текущий HTML с закрытыми тегами: его можно отправлять
+правкой сообщения, пока ответ еще дописывается; finish() - итог.
+
+ProgressiveReply показывает потоковый ответ DeepSeek (stream=True) по мере
+генерации: первое сообщение - с первым текстом, дальше правки не чаще раза
+в EDIT_INTERVAL секунд (Telegram ограничивает частоту правок), в конце -
+итоговый текст.
+"""
+import asyncio
+import re
+import time
+
+# Ключевое слово -> эмодзи перед первым упоминанием (с начала слова)
+EMOJI_KEYWORDS = {
+    'Пхи-Пхи': '🏝️',
+    'Симилан': '🌊',
+    'тур': '🎫',
+    'цена': '💰',
+    'группа': '👥',
+    'кораллы': '🪸',
+    'дайвинг': '🤿',
+    'снорклинг': '🏊',
+    'пляж': '🏖️',
+    'рыба': '🐠',
+    'Юг': '⛵',
+    'Север': '🧭',
+}
+BULLET = '▪️'
+EDIT_INTERVAL = 1.0            # сек между правками сообщения при потоковом ответе
+PARAGRAPH_MIN_BREAKS = 2       # ". " встретилось хотя бы дважды - больше двух предложений
+FENCE_LANGUAGE_MAX = 20
+# Сколько символов придерживать: самое длинное ключевое слово и язык после ```
+LOOKAHEAD = max(max(len(word) for word in EMOJI_KEYWORDS), FENCE_LANGUAGE_MAX + 1) + 3
+
+_EMOJI_CHARS = ''.join(sorted({emoji[0] for emoji in EMOJI_KEYWORDS.values()}))
+_KEYWORDS = '|'.join(sorted(map(re.escape, EMOJI_KEYWORDS), key=len, reverse=True))
+# Служебные фрагменты вне кода; все остальное копируется как есть
+_TOKEN_RE = re.compile(
+    r"```|`|\*\*|__|\*|_|\n|&|<|>|•|\. +|[" + _EMOJI_CHARS + r"]|(?<![^\W\d_])(?:" + _KEYWORDS + r")"
+)
+_CODE_TOKEN_RE = {'code': re.compile(r"`|\n\n|&|<|>"), 'pre': re.compile(r"```|&|<|>")}
+# Начало строки: заголовок "## ..." или маркер списка
+_LINE_START_RE = re.compile(r"[ \t]*(?:(#{1,6})[ \t]+|([-*•])[ \t]+)?")
+_FENCE_LANGUAGE_RE = re.compile(r"[A-Za-z0-9_+-]{0,%d}\n" % FENCE_LANGUAGE_MAX)
+_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+_BREAK = None                  # место возможного разрыва абзаца между предложениями
+
+
+class AnswerFormatter:
+    """Потоковый перевод ответа DeepSeek в сбалансированный HTML Telegram"""
+
+    def __init__(self, decorate=True):
+        self.decorate = decorate   # эмодзи и разбиение на абзацы
+        self.parts = []            # куски HTML и _BREAK
+        self.breaks = 0
+        self.stack = []            # открытые теги b/i, внешний - первый
+        self.code = None           # 'code' / 'pre' внутри кода
+        self.heading = False       # внутри строки-заголовка (свой <b>)
+        self.pending = ''          # еще не разобранный хвост
+        self.context = ''          # предыдущий символ перед хвостом (начало слова, "_" внутри слова)
+        self.line_start = True
+        self.digits_only = True    # строка пока из одних цифр ("1. Пхи-Пхи" - не конец предложения)
+        self.last_char = ''        # последний разобранный символ исходного текста
+        self.used_keywords = set()
+        self.seen_emojis = set()
+
+    # ---------- ввод ----------
+    def feed(self, chunk):
+        """Добавляет очередной кусок ответа"""
+        if chunk:
+            self.pending += chunk
+            self._consume(final=False)
+
+    def finish(self):
+        """Разбирает остаток и возвращает итоговый HTML"""
+        self._consume(final=True)
+        return self.snapshot().strip()
+
+    def snapshot(self):
+        """HTML разобранной части с закрытыми тегами - можно показывать правкой сообщения"""
+        separator = '\n\n' if self.breaks >= PARAGRAPH_MIN_BREAKS else ' '
+        html = ''.join(separator if part is _BREAK else part for part in self.parts)
+        if self.code:
+            html += f'</{self.code}>'
+        html += ''.join(f'</{tag}>' for tag in reversed(self.stack))
+        return html + '</b>' if self.heading else html
+
+    # ---------- разбор ----------
+    def _consume(self, final):
+        text = self.context + self.pending
+        limit = len(text) if final else len(text) - LOOKAHEAD
+        i = len(self.context)
+        while i < limit:
+            if self.line_start and not self.code:
+                i = self._line_start(text, i)
+                if i >= limit:
+                    break
+            pattern = _CODE_TOKEN_RE[self.code] if self.code else _TOKEN_RE
+            match = pattern.search(text, i, limit if final else len(text))
+            if match is None or match.start() >= limit:
+                self._text(text[i:limit])
+                i = limit
+                break
+            if match.start() > i:
+                self._text(text[i:match.start()])
+            i = self._token(text, match)
+        if i > len(self.context):
+            self.context = text[i - 1]
+        self.pending = text[i:]
+
+    def _text(self, text):
+        if text:
+            self.parts.append(text)
+            self.last_char = text[-1]
+            if self.digits_only and not text.isdigit():
+                self.digits_only = False
+            self.line_start = False
+
+    def _line_start(self, text, i):
+        match = _LINE_START_RE.match(text, i)
+        heading, bullet = match.group(1), match.group(2)
+        if heading:
+            # Заголовок - отдельная строка жирным; незакрытое выделение до него закрываем
+            self._close_heading()
+            self._close_inline()
+            self.parts.append('<b>')
+            self.heading = True
+        elif bullet:
+            self.parts.append(BULLET + ' ')
+        if heading or bullet or match.end() < len(text):
+            self.line_start = False
+        return match.end()
+
+    def _token(self, text, match):
+        token = match.group()
+        end = match.end()
+        if token in _ESCAPES:
+            self._text(_ESCAPES[token])
+        elif self.code:
+            self._code_token(token)
+        elif token == '```':
+            self._close_inline()
+            self._close_heading()
+            self.parts.append('<pre>')
+            self.code = 'pre'
+            # Язык после ``` (```python) не показываем
+            language = _FENCE_LANGUAGE_RE.match(text, end)
+            if language:
+                end = language.end()
+        elif token == '`':
+            self.parts.append('<code>')
+            self.code = 'code'
+        elif token in ('**', '__', '*'):
+            self._toggle('b', text, match)
+        elif token == '_':
+            self._toggle('i', text, match)
+        elif token == '\n':
+            self._newline(text, end)
+        elif token == '•':
+            self._text(BULLET)
+        elif token[0] == '.':
+            self._sentence_end(token)
+        elif token in EMOJI_KEYWORDS:
+            self._keyword(token)
+        else:
+            self.seen_emojis.add(token)
+            self._text(token)
+        return end
+
+    def _code_token(self, token):
+        if token == '\n\n':
+            # Непарная "`" не должна съесть весь ответ до конца
+            self.parts.append('</code>')
+            self.code = None
+            self._close_heading()
+            self._close_inline()
+            self.parts.append('\n\n')
+            self.line_start = True
+            self.digits_only = True
+            self.last_char = '\n'
+        elif token == ('```' if self.code == 'pre' else '`'):
+            self.parts.append(f'</{self.code}>')
+            self.code = None
+            self.last_char = token[-1]
+            self.line_start = False
+
+    def _toggle(self, tag, text, match):
+        token = match.group()
+        before = text[match.start() - 1] if match.start() else ''
+        after = text[match.end()] if match.end() < len(text) else ''
+        if tag == 'b' and self.heading:
+            return          # "## **Заголовок**" - строка и так жирная
+        if tag in self.stack:
+            self._close(tag)
+        elif after and not after.isspace() and not (token == '_' and before.isalnum()):
+            self.parts.append(f'<{tag}>')
+            self.stack.append(tag)
+        else:
+            # Одиночная "*" ("5* отель", "2 * 3") - просто символ
+            self._text(token)
+            return
+        self.last_char = token[-1]
+        self.line_start = False
+
+    def _close(self, tag):
+        """Закрывает tag, сохраняя вложенность: внутренние теги закрываются и открываются снова"""
+        position = self.stack.index(tag)
+        inner = self.stack[position + 1:]
+        self.parts.append(''.join(f'</{t}>' for t in reversed(inner)) + f'</{tag}>' +
+                          ''.join(f'<{t}>' for t in inner))
+        del self.stack[position]
+
+    def _close_inline(self):
+        if self.stack:
+            self.parts.append(''.join(f'</{tag}>' for tag in reversed(self.stack)))
+            self.stack = []
+
+    def _close_heading(self):
+        if self.heading:
+            self._close_inline()
+            self.parts.append('</b>')
+            self.heading = False
+
+    def _newline(self, text, end):
+        self._close_heading()
+        # Пустая строка - конец абзаца: непарные * и _ дальше не тянутся
+        if self.last_char == '\n' or text.startswith('\n', end):
+            self._close_inline()
+        self.parts.append('\n')
+        self.last_char = '\n'
+        self.line_start = True
+        self.digits_only = True
+
+    def _sentence_end(self, token):
+        if not self.decorate or self.digits_only or self.heading:
+            self._text(token)
+            return
+        self.parts.append('.')
+        self.parts.append(_BREAK)
+        self.breaks += 1
+        self.last_char = ' '
+        self.line_start = False
+
+    def _keyword(self, word):
+        emoji = EMOJI_KEYWORDS[word]
+        if self.decorate and word not in self.used_keywords and emoji[0] not in self.seen_emojis:
+            self.used_keywords.add(word)
+            self.seen_emojis.add(emoji[0])
+            self.parts.append(emoji + ' ')
+        self._text(word)
+
+
+def format_answer(text, decorate=True):
+    """Весь ответ целиком -> HTML Telegram"""
+    formatter = AnswerFormatter(decorate)
+    formatter.feed(text or '')
+    return formatter.finish()
+
+
+class ProgressiveReply:
+    """
+    Сообщение, которое дописывается вместе с потоковым ответом. send(html) -
+    корутина, отправляющая сообщение (возвращает его), edit(message, html) -
+    корутина правки. feed() вызывается на каждый кусок ответа и не ждет сеть:
+    отправка и правки идут отдельной задачей, не чаще раза в interval
+    """
+
+    def __init__(self, send, edit, interval=EDIT_INTERVAL, decorate=True):
+        self.send = send
+        self.edit = edit
+        self.interval = interval
+        self.formatter = AnswerFormatter(decorate)
+        self.message = None        # отправленное сообщение (после первой отправки)
+        self.shown = ''            # HTML, который сейчас в сообщении
+        self._task = None
+        self._next_edit = 0.0
+        self.closed = False        # после finish() куски не показываются
+
+    def feed(self, chunk):
+        # Общий вызов (singleflight) может дописывать ответ и после того,
+        # как этот клиент получил запасной ответ по своему сроку
+        if self.closed:
+            return
+        self.formatter.feed(chunk)
+        if self._task is None and time.monotonic() >= self._next_edit:
+            # Пока текст придерживается (LOOKAHEAD), показывать нечего - ждем следующий кусок
+            html = self.formatter.snapshot()
+            if html and html != self.shown:
+                self._task = asyncio.create_task(self._show(html))
+
+    async def finish(self, html):
+        """
+        Итоговый текст в показанное сообщение. False - сообщение еще не
+        отправлялось (ответ не потоковый или упал до первого куска) или
+        правка не удалась: отправьте html обычным ответом
+        """
+        self.closed = True
+        if self._task is not None:
+            await self._task
+        if self.message is None:
+            return False
+        if html != self.shown:
+            try:
+                await self._show(html, final=True)
+            except Exception as e:
+                print(f"⚠️ Итог потокового ответа не показан правкой: {e}")
+                return False
+        return True
+
+    async def _show(self, html, final=False):
+        try:
+            if self.message is None:
+                self.message = await self.send(html)
+            else:
+                await self.edit(self.message, html)
+            self.shown = html
+        except Exception as e:
+            # Не удалась промежуточная правка - покажем следующую; итог решает finish()
+            if final:
+                raise
+            print(f"⚠️ Правка потокового ответа не удалась: {e}")
+        finally:
+            if not final:
+                self._next_edit = time.monotonic() + self.interval
+                self._task = None
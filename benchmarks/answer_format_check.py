@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка форматирования ответов DeepSeek (answer_format.py).
+
+1. Фазз: случайные ответы из слов, ключевых слов туров и служебных
+   символов Markdown ("*", "_", "`", "```", "#", "- ", "<", "&", переводы
+   строк) подаются кусками случайной длины. Каждый промежуточный
+   snapshot() и итог проверяются строгим разбором HTML по правилам
+   Telegram: только <b>, <i>, <code>, <pre>, правильная вложенность,
+   внутри кода нет тегов, &/</> только сущностями. Итог по кускам должен
+   совпадать с итогом за один вызов.
+2. Для сравнения - сколько тех же ответов старая версия отправила бы с
+   непарными "*" / "_" (Telegram отклоняет такой Markdown).
+3. Скорость: старая версия целиком, новая целиком и потоком (куски по
+   --chunk символов, snapshot для правки сообщения раз в --edit-every кусков).
+4. ProgressiveReply: ответы приходят кусками с паузой --delay, как поток
+   DeepSeek; каждое отправленное и исправленное сообщение - валидный HTML,
+   правок не чаще раза в interval, в конце в сообщении итог format_answer.
+
+Запуск:
+    python benchmarks/answer_format_check.py --answers 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from answer_format import EMOJI_KEYWORDS, AnswerFormatter, ProgressiveReply, format_answer  # noqa: E402
+
+WORDS = ('экскурсия остров лодка обед трансфер отель дети взрослые бат Phi_Phi 5 1500 '
+         'можно нельзя берите с собой крем полотенце snake_case').split()
+SPECIALS = ['*', '**', '_', '__', '`', '```', '\n', '\n\n', '# ', '## ', '- ', '* ', '• ', '. ', '<', '>', '&',
+            '&amp;', '<b>', '1. ', '🏝️', '!', '?', ', ']
+SAMPLE = """## **Пхи-Пхи** за один день
+Отличный тур для всей семьи. Цена для взрослого 1500 бат, детям до 4 лет бесплатно. Группа до 30 человек.
+На островах снорклинг, кораллы и рыба - маски выдают.
+*Что взять с собой:*
+- крем от солнца
+- полотенце и сменную одежду
+- наличные на нацпарк (400 бат)
+Трансфер с Юга острова бесплатный, с Севера - доплата. Если будут вопросы - пишите!"""
+
+_TAG_RE = re.compile(r"<(/?)([a-z]+)>|&(amp|lt|gt|quot);|[<>&]")
+ALLOWED_TAGS = {'b', 'i', 'code', 'pre'}
+
+
+def telegram_html_error(html):
+    """Описание ошибки разбора, как у Telegram (parse_mode='HTML'), или None"""
+    stack = []
+    for match in _TAG_RE.finditer(html):
+        closing, tag, entity = match.group(1), match.group(2), match.group(3)
+        if entity:
+            continue
+        if tag is None:
+            return f"неэкранированный {match.group()!r} в позиции {match.start()}"
+        if tag not in ALLOWED_TAGS:
+            return f"неподдерживаемый тег <{tag}>"
+        if closing:
+            if not stack or stack[-1] != tag:
+                return f"</{tag}> не закрывает {stack[-1] if stack else 'ничего'}"
+            stack.pop()
+        else:
+            if stack and stack[-1] in ('code', 'pre'):
+                return f"<{tag}> внутри <{stack[-1]}>"
+            stack.append(tag)
+    return f"не закрыты: {stack}" if stack else None
+
+
+def legacy_format(text):
+    """format_deepseek_answer до перехода на answer_format.py"""
+    text = text.replace('•', '▪️')
+    sentences = text.split('. ')
+    if len(sentences) > 2:
+        formatted_lines = []
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if not sentence.endswith('.'):
+                sentence += '.'
+            formatted_lines.append(sentence)
+        text = '\n\n'.join(formatted_lines)
+    for key, emoji in EMOJI_KEYWORDS.items():
+        emoji = f"{emoji} {key}"
+        if key in text and emoji not in text:
+            text = text.replace(key, emoji, 1)
+    return text
+
+
+def legacy_markdown_broken(text):
+    """Непарные * или _ вне `кода` - Telegram Markdown отклонит сообщение"""
+    outside = re.sub(r"`[^`]*`", "", text)
+    return outside.count('*') % 2 == 1 or outside.count('_') % 2 == 1 or outside.count('`') % 2 == 1
+
+
+def random_answer(rng):
+    pieces = []
+    for _ in range(rng.randrange(5, 80)):
+        roll = rng.random()
+        if roll < 0.45:
+            pieces.append(rng.choice(WORDS))
+        elif roll < 0.55:
+            pieces.append(rng.choice(list(EMOJI_KEYWORDS)))
+        else:
+            pieces.append(rng.choice(SPECIALS))
+        pieces.append(' ' if rng.random() < 0.7 else '')
+    return ''.join(pieces)
+
+
+def chunks(text, rng):
+    i = 0
+    while i < len(text):
+        size = rng.randrange(1, 30)
+        yield text[i:i + size]
+        i += size
+
+
+def fuzz(answers, rng):
+    failures = legacy_broken = 0
+    for number in range(answers):
+        text = random_answer(rng)
+        formatter = AnswerFormatter()
+        for chunk in chunks(text, rng):
+            formatter.feed(chunk)
+            error = telegram_html_error(formatter.snapshot())
+            if error:
+                break
+        final = formatter.finish()
+        error = error or telegram_html_error(final)
+        if not error and final != format_answer(text):
+            error = "итог по кускам отличается от итога целиком"
+        if error:
+            failures += 1
+            if failures <= 3:
+                print(f"❌ {error}\n   вход: {text!r}\n   выход: {final!r}")
+        legacy_broken += legacy_markdown_broken(legacy_format(text))
+    return failures, legacy_broken
+
+
+def timed(function, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+def stream(text, chunk, edit_every):
+    formatter = AnswerFormatter()
+    for number, start in enumerate(range(0, len(text), chunk), 1):
+        formatter.feed(text[start:start + chunk])
+        if number % edit_every == 0:
+            formatter.snapshot()
+    return formatter.finish()
+
+
+async def progressive(texts, rng, delay, interval):
+    """(невалидных показов, самый короткий интервал между правками, итог не совпал, показов всего)"""
+    invalid = mismatched = shown = 0
+    min_gap = None
+    for text in texts:
+        sent = []
+
+        async def send(html):
+            sent.append((time.monotonic(), html))
+            return len(sent)
+
+        async def edit(message, html):
+            sent.append((time.monotonic(), html))
+
+        reply = ProgressiveReply(send, edit, interval=interval)
+        for chunk in chunks(text, rng):
+            reply.feed(chunk)
+            await asyncio.sleep(delay)
+        final = format_answer(text)
+        if not await reply.finish(final):
+            sent.append((time.monotonic(), final))      # обычный ответ, как в handle_question
+        invalid += sum(telegram_html_error(html) is not None for _, html in sent)
+        mismatched += sent[-1][1] != final
+        shown += len(sent)
+        # Интервал между промежуточными показами (итоговая правка - сразу, без ожидания)
+        for (before, _), (after, _) in zip(sent, sent[1:-1]):
+            gap = after - before
+            min_gap = gap if min_gap is None else min(min_gap, gap)
+    return invalid, min_gap, mismatched, shown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка форматирования ответов DeepSeek")
+    parser.add_argument('--answers', type=int, default=20000, help="Сколько случайных ответов в фаззе")
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--chunk', type=int, default=16, help="Символов в куске потока")
+    parser.add_argument('--edit-every', type=int, default=10, help="snapshot раз в N кусков")
+    parser.add_argument('--streams', type=int, default=30, help="Ответов для проверки ProgressiveReply")
+    parser.add_argument('--delay', type=float, default=0.01, help="Пауза между кусками потока, с")
+    args = parser.parse_args()
+
+    rng = random.Random(48)
+    started = time.perf_counter()
+    failures, legacy_broken = fuzz(args.answers, rng)
+    print(f"🎲 Фазз: {args.answers} ответов за {time.perf_counter() - started:.1f} с, "
+          f"невалидный HTML: {failures}")
+    print(f"   старая версия: непарные * / _ / ` (Telegram отклонит) в {legacy_broken} "
+          f"({legacy_broken / args.answers * 100:.0f}%)")
+
+    error = telegram_html_error(format_answer(SAMPLE))
+    print(f"📝 Пример ответа: {'ошибка ' + error if error else 'валидный HTML'}")
+    legacy_us = timed(lambda: legacy_format(SAMPLE), args.runs)
+    whole_us = timed(lambda: format_answer(SAMPLE), args.runs)
+    stream_us = timed(lambda: stream(SAMPLE, args.chunk, args.edit_every), args.runs)
+    print(f"⚡ {len(SAMPLE)} символов: старая версия {legacy_us:.0f} мкс, новая целиком {whole_us:.0f} мкс, "
+          f"потоком по {args.chunk} символов {stream_us:.0f} мкс")
+
+    interval = 0.05
+    invalid, min_gap, mismatched, shown = asyncio.run(progressive(
+        [random_answer(rng) for _ in range(args.streams)] + [SAMPLE], rng, args.delay, interval
+    ))
+    print(f"📡 Поток: {args.streams + 1} ответов, {shown} отправок и правок, невалидных {invalid}, "
+          f"итог не совпал {mismatched}, минимум между правками "
+          f"{min_gap * 1000 if min_gap is not None else 0:.0f} мс (interval {interval * 1000:.0f} мс)")
+
+    ok = (failures == 0 and error is None and invalid == 0 and mismatched == 0
+          and (min_gap is None or min_gap >= interval * 0.9))
+    print("✅ Все проверки пройдены" if ok else "❌ Есть расхождения")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
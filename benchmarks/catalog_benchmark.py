@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк загрузки каталога: разбор CSV против бинарного снимка.
+
+Прайс можно размножить (--scale), чтобы увидеть разницу на каталоге,
+который больше текущих 99 экскурсий. Копии получают новые ID.
+
+Запуск:
+    python benchmarks/catalog_benchmark.py --scale 50 --runs 20
+"""
+import argparse
+import csv
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+
+SOURCE_CSV = os.path.join(REPO_DIR, 'Price22.12.2025.csv')
+
+
+def build_scaled_csv(path, scale):
+    """Пишет прайс, размноженный scale раз (ID сдвигаются, чтобы остаться уникальными)"""
+    with open(SOURCE_CSV, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    rows = list(csv.reader(io.StringIO(text), delimiter=';'))
+    header, body = rows[0], rows[1:]
+    id_column = [h.strip() for h in header].index('ID')
+
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(header)
+        for copy in range(scale):
+            for row in body:
+                row = list(row)
+                if copy and row[id_column].strip().isdigit():
+                    row[id_column] = str(int(row[id_column]) + copy * 1000)
+                writer.writerow(row)
+
+
+def measure(func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки каталога")
+    parser.add_argument('--scale', type=int, default=1, help="Во сколько раз размножить прайс")
+    parser.add_argument('--runs', type=int, default=20, help="Число замеров")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='alex_catalog_')
+    try:
+        csv_path = os.path.join(workdir, 'price.csv')
+        build_scaled_csv(csv_path, args.scale)
+
+        parsed, _ = catalog.load_catalog(csv_path, use_snapshot=False)
+        csv_time = measure(lambda: catalog.load_catalog(csv_path, use_snapshot=False), args.runs)
+
+        catalog.load_catalog(csv_path)  # первый запуск пишет снимок
+        loaded, source = catalog.load_catalog(csv_path)
+        assert source == 'snapshot', source
+        assert loaded.tours == parsed.tours and loaded.by_id.keys() == parsed.by_id.keys()
+        snapshot_time = measure(lambda: catalog.load_catalog(csv_path), args.runs)
+
+        # Изменение прайса должно инвалидировать снимок
+        with open(csv_path, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        _, source_after_edit = catalog.load_catalog(csv_path)
+
+        print("=" * 60)
+        print("📚 ЗАГРУЗКА КАТАЛОГА")
+        print("=" * 60)
+        print(f"Экскурсий: {len(parsed.tours)} (x{args.scale}), "
+              f"CSV {os.path.getsize(csv_path) / 1024:.0f} КБ, "
+              f"снимок {os.path.getsize(catalog.snapshot_path(csv_path)) / 1024:.0f} КБ")
+        print(f"Разбор CSV + индексы: медиана {csv_time * 1000:.2f} мс")
+        print(f"Снимок (pickle):      медиана {snapshot_time * 1000:.2f} мс")
+        print(f"Ускорение: x{csv_time / snapshot_time:.1f}")
+        print(f"После правки CSV источник: {source_after_edit} (ожидается csv)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
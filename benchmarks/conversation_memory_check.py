@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка памяти диалога (conversation.py).
+
+--users клиентов задают по --turns вопросов о своем туре (уточнения
+вроде "а детям сколько?"), ответы - тексты по 100-120 слов, как просит
+SYSTEM_PROMPT. Для каждого запроса считаются:
+1. размер истории по estimate_tokens - не больше MEMORY_TOKENS при любом
+   числе вопросов;
+2. кеш префиксов DeepSeek (эмуляция PrefixCache из prompt_cache_check.py)
+   без памяти и с памятью: общий префикс (SYSTEM_PROMPT + блок тура) и
+   уже отправленная история берутся из кеша, новыми остаются в основном
+   последняя пара и вопрос;
+3. размер памяти одного клиента (pickle) и время add() + history().
+
+Запуск:
+    python benchmarks/conversation_memory_check.py --users 200 --turns 30
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+import prompts  # noqa: E402
+from benchmarks.prompt_cache_check import PrefixCache  # noqa: E402
+from conversation import MEMORY_TOKENS, ConversationMemory, estimate_tokens  # noqa: E402
+
+CSV_PATH = os.path.join(REPO_DIR, 'Price22.12.2025.csv')
+QUESTIONS = ["Сколько стоит для взрослого?", "а детям сколько?", "А если ребенку 3 года?",
+             "Во сколько заберут из отеля в Карон?", "а обратно во сколько?", "Кормят ли обедом?",
+             "Есть вегетарианское меню?", "Будет ли сильно качать на лодке?", "А таблетки дадут?",
+             "Что взять с собой?", "Полотенца дают?", "Можно оплатить картой?", "А рублями?"]
+ANSWER_WORDS = ('экскурсия остров лодка обед трансфер отель дети взрослые бат пляж снорклинг маски '
+                'гид программа включено отдельно оплачивается нацпарк сбор время выезд возвращение').split()
+
+
+def fake_answer(rng):
+    words = [rng.choice(ANSWER_WORDS) for _ in range(rng.randrange(100, 121))]
+    for i in range(12, len(words), 14):
+        words[i] += '.'
+    return ' '.join(words).capitalize() + '.'
+
+
+def run(tours, users, turns, with_memory, rng):
+    cache = PrefixCache()
+    builder = prompts.PromptBuilder(tours)
+    hit = total = max_history = 0
+    memory_time = 0.0
+    memories = []
+    for user in range(users):
+        tour = rng.choice(tours)
+        tour_id = str(tour.get('ID', '')).strip()
+        memory = ConversationMemory()
+        memories.append(memory)
+        context_info = f"Состав группы: {rng.randint(1, 4)} взрослых"
+        for turn in range(turns):
+            question = rng.choice(QUESTIONS)
+            started = time.perf_counter()
+            history = memory.history(tour_id) if with_memory else None
+            memory_time += time.perf_counter() - started
+            if history:
+                max_history = max(max_history, sum(estimate_tokens(m['content']) + 4 for m in history))
+            messages = builder.messages(question, tour, context_info, None, history)
+            request_hit, request_total = cache.lookup(messages)
+            hit += request_hit
+            total += request_total
+            started = time.perf_counter()
+            memory.add(tour_id, question, fake_answer(rng))
+            memory_time += time.perf_counter() - started
+    requests = users * turns
+    return {
+        'hit_share': hit / total,
+        'avg_prompt': total / requests,
+        'max_history': max_history,
+        'memory_us': memory_time / requests * 1e6,
+        'memory_bytes': sum(len(pickle.dumps(memory)) for memory in memories) / len(memories),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка памяти диалога")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=30)
+    args = parser.parse_args()
+
+    cat, _ = catalog.load_catalog(CSV_PATH, use_snapshot=False)
+    stateless = run(cat.tours, args.users, args.turns, False, random.Random(49))
+    remembered = run(cat.tours, args.users, args.turns, True, random.Random(49))
+    for title, result in (("без памяти", stateless), ("с памятью", remembered)):
+        print(f"{title:<11} промпт в среднем {result['avg_prompt']:.0f} токенов, "
+              f"из кеша {result['hit_share']:.1%}, новых {result['avg_prompt'] * (1 - result['hit_share']):.0f}")
+    print(f"📏 История: максимум {remembered['max_history']} токенов (бюджет {MEMORY_TOKENS}) "
+          f"после {args.turns} вопросов")
+    print(f"💾 Память клиента: {remembered['memory_bytes'] / 1024:.1f} КБ, "
+          f"add + history {remembered['memory_us']:.0f} мкс на вопрос")
+
+    ok = remembered['max_history'] <= MEMORY_TOKENS
+    print("✅ История в бюджете" if ok else "❌ История больше бюджета")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
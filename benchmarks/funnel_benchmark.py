@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк и сверка воронки analytics/funnel.py.
+
+Генерирует во временной БД пользователей с правдоподобными путями
+(/start → категория → просмотр → бронь, с отвалами, повторами и шагами
+не по порядку), считает воронку векторным движком и сверяет число
+пользователей на каждом шаге с простым построчным расчетом на Python.
+Для сравнения скорости - прежняя схема загрузки: все события шагов
+периода, все колонки, через pandas.read_sql_query. Время - лучшее из
+RUNS запусков после прогревочного (первый вызов включает ленивый
+импорт pandas).
+Код выхода 1 при расхождении.
+
+Запуск:
+    python benchmarks/funnel_benchmark.py --users 50000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import funnel, schema  # noqa: E402
+from analytics.reader import StatsTimeout  # noqa: E402
+
+RUNS = 3
+
+CATEGORIES = ['Море (Острова)', 'Суша (обзорные)', 'Суша (семейные)', 'Вечерние Шоу', 'Рыбалка']
+
+
+def generate(conn, users, days, now):
+    rng = random.Random(7)
+    rows = []
+    for user_id in range(users):
+        moment = now - timedelta(days=rng.uniform(0, days))
+        # Шум: случайное действие до /start (не должно засчитываться в воронку)
+        if rng.random() < 0.05:
+            rows.append((user_id, rng.choice(funnel.FUNNEL_STEPS[1:]), None, moment - timedelta(minutes=5)))
+        for visit in range(rng.choice([1, 1, 1, 2])):
+            rows.append((user_id, 'started_bot', None, moment))
+            category = rng.choice(CATEGORIES)
+            for step, chance in (('chose_category', 0.7), ('viewed_tour', 0.6), ('booking_completed', 0.2)):
+                if rng.random() > chance:
+                    break
+                moment += timedelta(seconds=rng.randint(5, 900))
+                rows.append((user_id, step, category if step != 'viewed_tour' else None, moment))
+            moment += timedelta(days=rng.randint(1, 5))
+    conn.executemany(
+        "INSERT INTO user_actions (user_id, action, category, timestamp) VALUES (?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    return len(rows)
+
+
+def reference_counts(conn, date_from, date_to):
+    """Построчный расчет: по каждому пользователю идем по его событиям во времени"""
+    events = defaultdict(list)
+    cursor = conn.execute(
+        "SELECT user_id, action, timestamp FROM user_actions WHERE timestamp >= ? AND timestamp < ?",
+        (date_from.isoformat(), (date_to + timedelta(days=1)).isoformat())
+    )
+    for user_id, action, timestamp in cursor:
+        events[user_id].append((datetime.fromisoformat(timestamp), action))
+
+    counts = dict.fromkeys(funnel.FUNNEL_STEPS, 0)
+    for user_events in events.values():
+        user_events.sort(key=lambda item: item[0])
+        starts = [moment for moment, action in user_events if action == funnel.FUNNEL_STEPS[0]]
+        if not starts:
+            continue
+        reached_at = min(starts)
+        counts[funnel.FUNNEL_STEPS[0]] += 1
+        for step in funnel.FUNNEL_STEPS[1:]:
+            later = [moment for moment, action in user_events if action == step and moment >= reached_at]
+            if not later:
+                break
+            reached_at = min(later)
+            counts[step] += 1
+    return counts
+
+
+def read_all_events(db_path, date_from, date_to):
+    """Прежняя загрузка: все события шагов за период, все колонки, в DataFrame"""
+    import pandas as pd
+
+    conn = sqlite3.connect(db_path)
+    try:
+        events = pd.read_sql_query(
+            "SELECT user_id, action, category, timestamp FROM user_actions "
+            "WHERE timestamp >= ? AND timestamp < ? AND action IN (?, ?, ?, ?)",
+            conn, params=[date_from.isoformat(), (date_to + timedelta(days=1)).isoformat(), *funnel.FUNNEL_STEPS]
+        )
+    finally:
+        conn.close()
+    events['action'] = events['action'].astype(pd.CategoricalDtype(funnel.FUNNEL_STEPS))
+    events['category'] = events['category'].astype('category')
+    events['timestamp'] = pd.to_datetime(events['timestamp'], format='ISO8601')
+    return events
+
+
+def best_time(function, *args):
+    """(лучшее время из RUNS запусков, результат последнего)"""
+    best = None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк воронки")
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=60)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='alex_funnel_')
+    try:
+        db_path = os.path.join(workdir, 'bot_statistics.db')
+        schema.migrate(db_path)
+        now = datetime.now()
+        conn = sqlite3.connect(db_path)
+        events = generate(conn, args.users, args.days, now)
+
+        date_from, date_to = (now - timedelta(days=args.days + 1)).date(), now.date()
+
+        started = time.perf_counter()
+        funnel.compute_funnel(date_from, date_to, db_path)
+        cold_seconds = time.perf_counter() - started
+
+        engine_seconds, report = best_time(funnel.compute_funnel, date_from, date_to, db_path)
+        load_seconds, _ = best_time(funnel.load_steps, date_from, date_to, db_path)
+        read_all_seconds, _ = best_time(read_all_events, db_path, date_from, date_to)
+
+        started = time.perf_counter()
+        expected = reference_counts(conn, date_from, date_to)
+        reference_seconds = time.perf_counter() - started
+        conn.close()
+
+        # Срок /stats_funnel: запрос прерывается progress handler'ом, а не идет до конца
+        started = time.perf_counter()
+        try:
+            funnel.compute_funnel(date_from, date_to, db_path, timeout=0.01)
+            interrupted = None
+        except StatsTimeout:
+            interrupted = time.perf_counter() - started
+
+        print(funnel.format_report(report))
+        print("=" * 60)
+        print(f"Событий: {events}, пользователей: {args.users}")
+        print(f"Векторный движок: {engine_seconds:.2f} с "
+              f"(первый вызов с импортом pandas {cold_seconds:.2f} с)")
+        print(f"Загрузка событий шагов: {load_seconds:.2f} с, прежняя через read_sql_query: "
+              f"{read_all_seconds:.2f} с (в {read_all_seconds / load_seconds:.1f} раза быстрее)")
+        print(f"Построчный расчет на Python (только шаги): {reference_seconds:.2f} с")
+        if interrupted is not None:
+            print(f"Срок 10 мс: расчет прерван через {interrupted * 1000:.0f} мс (StatsTimeout)")
+
+        actual = {step: int(report['steps'][step]) for step in funnel.FUNNEL_STEPS}
+        if actual != expected:
+            print(f"❌ Расхождение: движок {actual}, построчно {expected}")
+            sys.exit(1)
+        if interrupted is None:
+            print("❌ Расчет со сроком 10 мс не прерван")
+            sys.exit(1)
+        print("✅ Шаги воронки совпадают с построчным расчетом")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка и бенчмарк планировщика программы (itinerary.py).
+
+1. Сверка с полным перебором на маленьких случайных каталогах:
+   балл плана динамики должен совпадать с оптимумом.
+2. Время на реальном прайсе и на синтетическом каталоге из тысяч туров
+   (цены, баллы и дни выезда случайные, чтобы прореживание не было тривиальным).
+
+Запуск:
+    python benchmarks/itinerary_benchmark.py --tours 5000 --days 7 --budget 30000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+import itinerary  # noqa: E402
+from pricing import PriceBook  # noqa: E402
+from schedule import WEEKDAY_NAMES, day_bit, parse_weekdays  # noqa: E402
+
+START = date(2025, 12, 22)  # понедельник
+DAY_TEXTS = ['Ежедневно'] * 6 + ['Вт, Чт, Сб', 'Пн, Ср, Пт', 'Ср, Вс', 'Сб', 'По запросу']
+
+
+def synthetic_tours(count, seed):
+    rng = random.Random(seed)
+    tours = []
+    for i in range(count):
+        adult = rng.randrange(5, 120) * 100
+        tours.append({
+            'ID': str(i + 1),
+            'Название': f"Тур {i + 1}",
+            'Цена Взр': str(adult),
+            'Цена Дет': rng.choice(['⛔️', str(adult * 8 // 10 // 100 * 100)]),
+            'Предоплата': rng.choice(['50%', '100%']),
+            'Дни выезда': rng.choice(DAY_TEXTS),
+            'score': rng.randrange(1, 10),
+        })
+    return tours
+
+
+def brute_force(tours, dates, budget, book, adults, kids):
+    """Оптимальный балл полным перебором (только для маленьких случаев)"""
+    options = []
+    for tour in tours:
+        quote = book.quote_for(tour['ID'], adults, kids)
+        cost = -(-quote.total // itinerary.BUDGET_STEP) * itinerary.BUDGET_STEP
+        mask, _ = parse_weekdays(tour['Дни выезда'])
+        options.append((tour['ID'], cost, tour['score'], mask))
+
+    best = 0
+
+    def walk(day_index, used, score, taken):
+        nonlocal best
+        if day_index == len(dates):
+            best = max(best, score)
+            return
+        walk(day_index + 1, used, score, taken)
+        bit = day_bit(dates[day_index])
+        for tour_id, cost, tour_score, mask in options:
+            if mask & bit and tour_id not in taken and used + cost <= budget:
+                taken.add(tour_id)
+                walk(day_index + 1, used + cost, score + tour_score, taken)
+                taken.remove(tour_id)
+
+    walk(0, 0, 0, set())
+    return best
+
+
+def check_optimality(cases):
+    mismatches = 0
+    for case in range(cases):
+        rng = random.Random(case)
+        tours = synthetic_tours(rng.randrange(4, 10), seed=case)
+        book = PriceBook(tours)
+        dates = [START + timedelta(days=rng.randrange(7) + d) for d in range(rng.randrange(2, 5))]
+        budget = rng.randrange(20, 300) * 100
+        plan = itinerary.plan_itinerary(tours, dates, budget, 2, [], book, lambda t: t['score'], time_limit=10)
+        got = sum(t['score'] for t in plan.tours)
+        expected = brute_force(tours, dates, budget, book, 2, 0)
+        if got != expected or plan.total > budget:
+            mismatches += 1
+            print(f"❌ случай {case}: динамика {got}, перебор {expected}, итог {plan.total} / {budget}")
+    return mismatches
+
+
+def measure(tours, dates, budget, runs, time_limit):
+    # Маски дней и цены - из индексов каталога, как в боте
+    cat = catalog.Catalog(tours)
+    score_fn = (lambda t: t['score']) if 'score' in tours[0] else (lambda t: 3 if t.get('') == 'ХИТ' else 1)
+    timings = []
+    plan = None
+    for _ in range(runs):
+        plan = itinerary.plan_itinerary(tours, dates, budget, 2, [60], cat.prices, score_fn,
+                                        time_limit=time_limit, weekday_mask=cat.weekday_mask)
+        timings.append(plan.seconds)
+    return plan, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и бенчмарк планировщика программы")
+    parser.add_argument('--tours', type=int, default=5000, help="Туров в синтетическом каталоге")
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--budget', type=int, default=30000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cases', type=int, default=200, help="Случаев сверки с перебором")
+    args = parser.parse_args()
+
+    mismatches = check_optimality(args.cases)
+    print(f"🔍 Сверка с полным перебором: {args.cases - mismatches}/{args.cases} совпали")
+
+    dates = [START + timedelta(days=d) for d in range(args.days)]
+    real, _ = catalog.load_catalog(os.path.join(REPO_DIR, 'Price22.12.2025.csv'), use_snapshot=False)
+
+    for title, tours in (("Прайс", real.tours), ("Синтетика", synthetic_tours(args.tours, seed=1))):
+        plan, timings = measure(tours, dates, args.budget, args.runs, itinerary.PLAN_TIME_LIMIT)
+        print(f"\n📅 {title}: {len(tours)} туров, {args.days} дней, бюджет {args.budget}฿ (2 взр. + ребенок)")
+        print(f"   время: медиана {statistics.median(timings) * 1000:.1f} мс, max {max(timings) * 1000:.1f} мс, "
+              f"метод: {plan.method}")
+        print(f"   план: {len(plan.tours)} туров, {plan.total}฿, предоплата {plan.prepayment}฿")
+        for day, tour, quote in plan.days:
+            name = tour.get('Название', '')[:40] if tour else '— свободный день'
+            price = f"{quote.total}฿" if quote else ''
+            print(f"     {WEEKDAY_NAMES[day.weekday()]} {day:%d.%m}  {name:<40} {price}")
+
+    # Без ограничения времени - сколько занимает полная динамика на большом каталоге
+    started = time.perf_counter()
+    plan, _ = measure(synthetic_tours(args.tours, seed=1), dates, args.budget, 1, 60)
+    print(f"\n⏱ Динамика без лимита времени на {args.tours} турах: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка обучения ранжирования (analytics/learn_to_rank.py) на синтетических логах.
+
+Во временной базе генерируются сессии со "скрытыми вкусами": семьи с
+детьми чаще открывают спокойные туры без толп, группы с приоритетом
+"бюджет" - дешевые, остальные - ХИТы и туры с поздним выездом. Затем:
+1. обучение и AUC на отложенных пользователях (против одних приоритетов);
+2. модель сохраняется в JSON и загружается обратно, как в боте;
+3. время ранжирования каталога с моделью и без нее.
+
+Запуск:
+    python benchmarks/learn_to_rank_check.py --sessions 3000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import learn_to_rank, schema  # noqa: E402
+import catalog  # noqa: E402
+import ranking  # noqa: E402
+
+CSV_PATH = os.path.join(REPO_DIR, 'Price22.12.2025.csv')
+PRIORITIES = list(ranking.PRIORITY_WEIGHTS)
+
+
+def random_user_data(rng):
+    children = [rng.randrange(6, 150) for _ in range(rng.choice([0, 0, 1, 2]))]
+    return {
+        'adults': rng.choice([1, 2, 2, 2, 3, 4]),
+        'children': children,
+        'pregnant': rng.random() < 0.08,
+        'priorities': rng.sample(PRIORITIES, rng.choice([0, 1, 1, 2])),
+    }
+
+
+def hidden_utility(vector, profile):
+    """Скрытые предпочтения, которые модель должна восстановить"""
+    comfort, photo, quiet, late_start, budget, hit = vector
+    utility = 1.2 * hit + 0.8 * late_start
+    if profile['children']:
+        utility += 2.0 * quiet - 0.8 * hit
+    if 'бюджет' in profile['priorities']:
+        utility += 2.5 * budget
+    if 'комфорт' in profile['priorities']:
+        utility += 1.5 * comfort
+    return utility
+
+
+def fill_logs(db_path, cat, sessions, rng, now):
+    rows = []
+    categories = [name for name in cat.categories if cat.by_category[name]]
+    for user_id in range(1, sessions + 1):
+        profile = ranking.group_profile(random_user_data(rng))
+        category = rng.choice(categories)
+        tours = cat.by_category[category]
+        weights = [math.exp(hidden_utility(cat.features.vector(tour), profile)) for tour in tours]
+        moment = now - timedelta(days=rng.randrange(30), minutes=rng.randrange(1440))
+        opened = {tour['ID'] for tour in rng.choices(tours, weights=weights, k=rng.randrange(1, 4))}
+        for tour_id in sorted(opened):
+            rows.append((user_id, 'viewed_tour', tour_id, category,
+                         json.dumps({'profile': profile}), moment.isoformat(sep=' ')))
+            if rng.random() < 0.15:
+                rows.append((user_id, 'booking_completed', tour_id, category,
+                             json.dumps({'profile': profile}), moment.isoformat(sep=' ')))
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO user_actions (user_id, action, tour_id, category, session_data, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка обучения ранжирования на синтетических логах")
+    parser.add_argument('--sessions', type=int, default=3000)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    cat, _ = catalog.load_catalog(CSV_PATH, use_snapshot=False)
+    now = datetime.now()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stats.db')
+        schema.migrate(db_path)
+        events = fill_logs(db_path, cat, args.sessions, rng, now)
+        print(f"🗂 Синтетических событий: {events}")
+
+        model, report = learn_to_rank.train(db_path, CSV_PATH, days=60, today=now.date())
+        print(f"📊 Сессий: {report['sessions']}, примеров: {report['examples']}, "
+              f"положительных: {report['positives']}, {report['seconds']:.2f} с")
+        if model is None:
+            print("❌ Модель не обучилась")
+            sys.exit(1)
+        print(f"🎯 AUC: модель {report['holdout_auc']}, только приоритеты {report['baseline_auc']}")
+
+        model_path = os.path.join(tmp, 'ranking_model.json')
+        ranking.save_ranking_model(model, model_path)
+        loaded = ranking.load_ranking_model(model_path)
+        print(f"💾 Модель: {os.path.getsize(model_path)} байт, загружена: {loaded is not None}")
+
+    family = ranking.group_profile({'adults': 2, 'children': [60], 'priorities': []})
+    print("\n👨‍👩‍👧 Веса для семьи с ребенком:",
+          ", ".join(f"{name} {weight:+.2f}" for name, weight in zip(ranking.FEATURES, loaded.weights_for(family))))
+
+    tours = cat.tours
+    priorities = ['комфорт']
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        cat.features.rank(tours, priorities)
+    plain = (time.perf_counter() - started) / args.runs
+    started = time.perf_counter()
+    for _ in range(args.runs):
+        cat.features.rank(tours, priorities, loaded.weights_for(family))
+    with_model = (time.perf_counter() - started) / args.runs
+    print(f"\n⏱ Ранжирование {len(tours)} туров: без модели {plain * 1e6:.1f} мкс, "
+          f"с моделью {with_model * 1e6:.1f} мкс")
+
+    if not report['holdout_auc'] > report['baseline_auc']:
+        print("❌ Модель не лучше одних приоритетов")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
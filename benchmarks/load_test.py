@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест бота: прогоняет сценарии диалога через настоящий
+ConversationHandler из bot.build_application() против локального
+фейкового Telegram Bot API и фейкового DeepSeek.
+
+Сценарий одного виртуального пользователя:
+/start → категория → состав группы → подтверждение → карточка тура →
+вопрос → бронирование (телефон + отель).
+
+Отчет: пропускная способность, перцентили задержки по шагам,
+лаг event loop и прирост памяти.
+
+С --admin-stats параллельно с клиентами администратор вызывает /stats и
+/stats_drops по заполненной синтетикой БД. --admin-inline - для сравнения:
+те же запросы выполняются прямо в event loop, как было до StatsReader.
+
+Запуск:
+    python benchmarks/load_test.py --users 200 --concurrency 50
+    python benchmarks/load_test.py --admin-stats 20 --stats-events 500000
+    python benchmarks/load_test.py --admin-stats 20 --stats-events 500000 --admin-inline
+    python benchmarks/load_test.py --users 100 --concurrency 50 --llm-latency 2 --distinct-questions
+    python benchmarks/load_test.py --users 50 --distinct-questions --llm-status 503
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+FAKE_TOKEN = "123456:LOADTEST"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Alex", "username": "alex_loadtest_bot"}
+ADMIN_ID = 7966971037
+ADMIN_COMMANDS = ('/stats', '/stats_drops')
+
+# ==================== ФЕЙКОВЫЙ TELEGRAM BOT API ====================
+class FakeTelegramState:
+    """Общее состояние фейкового Bot API: счетчики вызовов и последняя клавиатура по чатам"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.message_id = 1000
+        self.calls = {}
+        self.last_inline_keyboard = {}
+
+    def next_message_id(self):
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+    def record(self, method, params):
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            markup = params.get('reply_markup')
+            chat_id = params.get('chat_id')
+            if markup and chat_id is not None:
+                try:
+                    markup = json.loads(markup) if isinstance(markup, str) else markup
+                except ValueError:
+                    return
+                keyboard = markup.get('inline_keyboard') or []
+                # Запоминаем только клавиатуры со ссылками на туры - по ним виртуальный пользователь выбирает тур
+                if any('_id_' in button.get('callback_data', '') for row in keyboard for button in row):
+                    self.last_inline_keyboard[int(chat_id)] = keyboard
+
+
+def _read_params(handler):
+    """Читает параметры запроса: PTB шлет form-urlencoded (сложные значения в JSON)"""
+    length = int(handler.headers.get('Content-Length') or 0)
+    body = handler.rfile.read(length) if length else b''
+    content_type = handler.headers.get('Content-Type', '')
+    if 'application/json' in content_type:
+        return json.loads(body or b'{}')
+    return dict(parse_qsl(body.decode('utf-8')))
+
+
+def _make_message(state, params):
+    chat_id = int(params.get('chat_id', 0))
+    return {
+        "message_id": int(params.get('message_id') or state.next_message_id()),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": BOT_USER,
+        "text": params.get('text', ''),
+    }
+
+
+def make_telegram_handler(state):
+    class FakeTelegramHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            method = self.path.rstrip('/').rsplit('/', 1)[-1]
+            params = _read_params(self)
+            state.record(method, params)
+
+            if method == 'getMe':
+                result = BOT_USER
+            elif method in ('sendMessage', 'editMessageText', 'editMessageReplyMarkup'):
+                result = _make_message(state, params)
+            elif method in ('getUpdates',):
+                result = []
+            else:
+                # sendChatAction, answerCallbackQuery, deleteWebhook и прочие
+                result = True
+
+            payload = json.dumps({"ok": True, "result": result}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return FakeTelegramHandler
+
+# ==================== ФЕЙКОВЫЙ DEEPSEEK ====================
+STREAM_PIECE_CHARS = 12   # символов в куске потокового ответа фейкового DeepSeek
+
+def make_deepseek_handler(latency, counter, status=200):
+    from benchmarks.prompt_cache_check import PrefixCache
+    prefix_cache = PrefixCache()
+    cache_lock = threading.Lock()
+    counter_lock = threading.Lock()   # ThreadingHTTPServer: запросы идут из разных потоков
+
+    class FakeDeepSeekHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            with counter_lock:
+                counter['calls'] += 1
+                call_number = counter['calls']
+            streaming = bool(request.get('stream'))
+            if latency:
+                # Поток: первый кусок через половину задержки, остальное - за вторую половину
+                time.sleep(latency / 2 if streaming and status == 200 else latency)
+            if status != 200:
+                # Имитация сбоя DeepSeek (--llm-status 503, 429...)
+                payload = json.dumps({"error": {"message": f"fake error {status}", "type": "server_error",
+                                                "code": status}}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            question = request.get('messages', [{}])[-1].get('content', '')
+            answer = (
+                f"По вашему запросу нашел несколько вариантов. Вопрос был: {question[:60]}. "
+                "Смотрите описания и выбирайте то, что по душе. Пхи-Пхи и Симиланы — самые популярные."
+            )
+            # Кеш префиксов, как у DeepSeek: prompt_cache_hit_tokens / prompt_cache_miss_tokens
+            with cache_lock:
+                hit_tokens, prompt_tokens = prefix_cache.lookup(request.get('messages', []))
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(answer) // 3,
+                "total_tokens": prompt_tokens + len(answer) // 3,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+            }
+            if streaming:
+                self.stream_answer(request, call_number, answer, usage)
+                return
+            payload = json.dumps({
+                "id": f"chatcmpl-{call_number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get('model', 'deepseek-chat'),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def stream_answer(self, request, call_number, answer, usage):
+            """Ответ как у DeepSeek при stream=True: куски text/event-stream, usage последним"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            def event(choices, **extra):
+                chunk = {
+                    "id": f"chatcmpl-{call_number}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get('model', 'deepseek-chat'),
+                    "choices": choices,
+                    **extra,
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            pieces = [answer[i:i + STREAM_PIECE_CHARS] for i in range(0, len(answer), STREAM_PIECE_CHARS)]
+            for piece in pieces:
+                event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                if latency:
+                    time.sleep(latency / 2 / len(pieces))
+            event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (request.get('stream_options') or {}).get('include_usage'):
+                event([], usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return FakeDeepSeekHandler
+
+
+def start_server(handler_cls):
+    """Запускает HTTP сервер в отдельном потоке, чтобы не нагружать event loop бота"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_cls)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+# ==================== СЦЕНАРИЙ ====================
+SCENARIO = [
+    ('start', 'text', '/start'),
+    ('category', 'text', 'Море (Острова)'),
+    ('group', 'text', '2 взрослых, ребенок 5 лет, не беременны, хотим комфорт'),
+    ('confirm', 'text', '✅ Да, всё верно'),
+    ('tour_card', 'callback', 'first_tour'),
+    ('ask_button', 'callback', 'ask_question'),
+    ('question', 'text', 'А сколько по времени длится экскурсия и что взять с собой ребенку?'),
+    ('back', 'text', '⬅️ Назад к выбору'),
+    ('book', 'callback', 'book_first_tour'),
+    ('phone', 'text', 'Мой телефон +66 812 345 678'),
+    ('hotel', 'text', '🏨 Patong Beach'),
+]
+
+
+class UpdateFactory:
+    """Собирает JSON апдейтов Telegram для виртуальных пользователей"""
+
+    def __init__(self):
+        self.update_id = 0
+        self.message_id = 1
+
+    def _next_ids(self):
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    def message(self, user_id, text):
+        update_id, message_id = self._next_ids()
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Гость{user_id}"},
+            "text": text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"update_id": update_id, "message": message}
+
+    def callback(self, user_id, data):
+        update_id, message_id = self._next_ids()
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": f"cb{update_id}",
+                "from": {"id": user_id, "is_bot": False, "first_name": f"Гость{user_id}"},
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "📋 Выберите экскурсию",
+                },
+            },
+        }
+
+
+def resolve_callback(state, user_id, data):
+    """Подставляет реальный ID тура из последней инлайн-клавиатуры, присланной пользователю"""
+    if data not in ('first_tour', 'book_first_tour'):
+        return data
+    keyboard = state.last_inline_keyboard.get(user_id, [])
+    tour_id = None
+    for row in keyboard:
+        for button in row:
+            callback = button.get('callback_data', '')
+            for prefix in ('tour_id_', 'book_id_', 'more_info_id_'):
+                if callback.startswith(prefix):
+                    tour_id = callback[len(prefix):]
+                    break
+            if tour_id:
+                break
+        if tour_id:
+            break
+    if tour_id is None:
+        return None
+    return f"tour_id_{tour_id}" if data == 'first_tour' else f"book_id_{tour_id}"
+
+# ==================== ИЗМЕРЕНИЯ ====================
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def measure_loop_lag(samples, stop_event, interval=0.01):
+    """Меряет задержку event loop: насколько позже запланированного просыпается таймер"""
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def run_user(application, bot_module, factory, state, user_id, latencies, errors, distinct=False):
+    from telegram import Update
+
+    for step, kind, payload in SCENARIO:
+        if distinct and step == 'question':
+            payload = f"{payload} Вопрос №{user_id}"
+        if kind == 'callback':
+            payload = resolve_callback(state, user_id, payload)
+            if payload is None:
+                errors[step] = errors.get(step, 0) + 1
+                return False
+            data = factory.callback(user_id, payload)
+        else:
+            data = factory.message(user_id, payload)
+
+        update = Update.de_json(data, application.bot)
+        started = time.perf_counter()
+        try:
+            await application.process_update(update)
+        except Exception as e:
+            errors[step] = errors.get(step, 0) + 1
+            print(f"❌ {step} ({user_id}): {type(e).__name__}: {e}")
+            return False
+        latencies.setdefault(step, []).append(time.perf_counter() - started)
+    return True
+
+
+async def run_admin(application, factory, count, latencies, errors, stop_event):
+    """Администратор по кругу вызывает команды статистики, пока идут диалоги клиентов"""
+    from telegram import Update
+
+    for i in range(count):
+        if stop_event.is_set():
+            break
+        command = ADMIN_COMMANDS[i % len(ADMIN_COMMANDS)]
+        update = Update.de_json(factory.message(ADMIN_ID, command), application.bot)
+        started = time.perf_counter()
+        try:
+            await application.process_update(update)
+        except Exception as e:
+            errors[command] = errors.get(command, 0) + 1
+            print(f"❌ {command}: {type(e).__name__}: {e}")
+            continue
+        latencies.setdefault(command, []).append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+class InlineStatsReader:
+    """Старое поведение для сравнения: запросы статистики прямо в event loop"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    async def run(self, func, timeout=None):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return func(conn)
+        finally:
+            conn.close()
+
+    async def fetchall(self, sql, params=(), timeout=None):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+
+def seed_statistics(db_path, events):
+    """Синтетическая история для команд статистики (генератор из retention_check)"""
+    from datetime import datetime
+    from benchmarks.retention_check import fill
+
+    conn = sqlite3.connect(db_path)
+    try:
+        fill(conn, events, 3, datetime.now())
+        conn.executemany(
+            "INSERT INTO drop_off_points (user_id, drop_off_stage, session_duration) VALUES (?, ?, ?)",
+            [(i, ('category', 'qualification', 'tour_details')[i % 3], i % 600) for i in range(events // 10)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def run_load(args, bot_module, state):
+    application = bot_module.build_application(
+        token=FAKE_TOKEN,
+        base_url=f"http://127.0.0.1:{args.telegram_port}/bot",
+    )
+    await application.initialize()
+
+    factory = UpdateFactory()
+    latencies = {}
+    errors = {}
+    lag_samples = []
+    stop_event = asyncio.Event()
+    admin_stop = asyncio.Event()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(user_id):
+        async with semaphore:
+            return await run_user(application, bot_module, factory, state, user_id, latencies, errors,
+                                  distinct=args.distinct_questions)
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop_event))
+
+    admin_latencies = {}
+    admin_task = None
+    if args.admin_stats:
+        admin_task = asyncio.create_task(
+            run_admin(application, factory, args.admin_stats, admin_latencies, errors, admin_stop)
+        )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(100000 + i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    admin_stop.set()
+    if admin_task:
+        await admin_task
+    stop_event.set()
+    await lag_task
+    bot_module.close_stats_reader()
+    memory_after, memory_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await application.shutdown()
+
+    return {
+        'elapsed': elapsed,
+        'completed': sum(1 for r in results if r),
+        'latencies': latencies,
+        'admin_latencies': admin_latencies,
+        'errors': errors,
+        'lag': lag_samples,
+        'memory_growth': memory_after - memory_before,
+        'memory_peak': memory_peak,
+    }
+
+
+def print_report(args, report, state, llm_counter, prompt_cache, flights, pool, breaker):
+    steps_total = sum(len(v) for v in report['latencies'].values())
+    print()
+    print("=" * 70)
+    print("📊 РЕЗУЛЬТАТЫ НАГРУЗОЧНОГО ТЕСТА")
+    print("=" * 70)
+    print(f"Пользователей: {args.users}, параллельно: {args.concurrency}, задержка LLM: {args.llm_latency}с")
+    if args.admin_stats:
+        mode = "в event loop (--admin-inline)" if args.admin_inline else "через StatsReader"
+        print(f"Админ-команд статистики: {args.admin_stats}, событий в БД: {args.stats_events}, {mode}")
+    print(f"Завершили сценарий: {report['completed']}/{args.users} за {report['elapsed']:.2f}с")
+    print(f"Пропускная способность: {report['completed'] / report['elapsed']:.2f} диалогов/с, "
+          f"{steps_total / report['elapsed']:.1f} апдейтов/с")
+    print()
+    print(f"{'Шаг':<12}{'n':>6}{'p50, мс':>10}{'p90, мс':>10}{'p99, мс':>10}{'max, мс':>10}")
+    for step, _, _ in SCENARIO:
+        values = report['latencies'].get(step, [])
+        if not values:
+            continue
+        print(f"{step:<12}{len(values):>6}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 90) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    for command, values in report['admin_latencies'].items():
+        print(f"{command:<12}{len(values):>6}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 90) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    if report['errors']:
+        print(f"\n⚠️ Ошибки по шагам: {report['errors']}")
+
+    lag = report['lag']
+    print()
+    print(f"⏱ Лаг event loop: p50 {percentile(lag, 50) * 1000:.1f} мс, "
+          f"p99 {percentile(lag, 99) * 1000:.1f} мс, max {max(lag) * 1000 if lag else 0:.1f} мс")
+    print(f"🧠 Память (tracemalloc): прирост {report['memory_growth'] / 1024:.0f} КБ, "
+          f"пик {report['memory_peak'] / 1024:.0f} КБ")
+    print(f"🤖 Вызовов DeepSeek: {llm_counter['calls']}, токенов промпта из кеша: "
+          f"{prompt_cache['hit_share'] * 100:.1f}% ({prompt_cache['hit_tokens']} из {prompt_cache['prompt_tokens']})")
+    print(f"🔗 Вопросов к DeepSeek: {flights['calls']}, ждали чужой ответ: {flights['shared']}")
+    print(f"⚡ Предохранитель: {breaker['state']}, размыкался {breaker['opened']} раз, "
+          f"без вызова {breaker['rejected']}, ошибки {breaker['errors']}, таймаут {breaker['timeout']:.1f} с")
+    print(f"🚦 Пул DeepSeek (лимит {pool['concurrency']}): ожидание p50 {pool['wait_p50'] * 1000:.0f} мс, "
+          f"p95 {pool['wait_p95'] * 1000:.0f} мс, макс. очередь {pool['max_depth']}, "
+          f"сброшено {pool['shed']}, отменено {pool['cancelled']}")
+    print(f"📨 Вызовов Bot API: {dict(sorted(state.calls.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест диалогов бота")
+    parser.add_argument('--users', type=int, default=50, help="Сколько виртуальных пользователей")
+    parser.add_argument('--concurrency', type=int, default=10, help="Сколько диалогов идут одновременно")
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="Задержка фейкового DeepSeek, сек")
+    parser.add_argument('--admin-stats', type=int, default=0, help="Сколько раз админ вызывает /stats и /stats_drops")
+    parser.add_argument('--stats-events', type=int, default=0, help="Сколько синтетических событий положить в БД")
+    parser.add_argument('--llm-status', type=int, default=200,
+                        help="HTTP статус фейкового DeepSeek: 503, 429... - проверка предохранителя")
+    parser.add_argument('--distinct-questions', action='store_true',
+                        help="Каждый пользователь задает свой вопрос (без объединения одинаковых вызовов DeepSeek)")
+    parser.add_argument('--admin-inline', action='store_true',
+                        help="Для сравнения: запросы статистики прямо в event loop")
+    args = parser.parse_args()
+
+    state = FakeTelegramState()
+    llm_counter = {'calls': 0}
+    telegram_server = start_server(make_telegram_handler(state))
+    deepseek_server = start_server(make_deepseek_handler(args.llm_latency, llm_counter, args.llm_status))
+    args.telegram_port = telegram_server.server_address[1]
+
+    # Бот работает в отдельной временной папке: своя БД статистики, копия прайса
+    workdir = tempfile.mkdtemp(prefix='alex_loadtest_')
+    for name in os.listdir(REPO_DIR):
+        if name.endswith('.csv'):
+            shutil.copy(os.path.join(REPO_DIR, name), workdir)
+    os.chdir(workdir)
+
+    os.environ['TELEGRAM_BOT_TOKEN'] = FAKE_TOKEN
+    os.environ['DEEPSEEK_API_KEY'] = 'sk-loadtest'
+    os.environ['DEEPSEEK_BASE_URL'] = f"http://127.0.0.1:{deepseek_server.server_address[1]}/v1"
+
+    # Логи каждого HTTP запроса к фейковым серверам только мешают отчету
+    import logging
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    # run_startup() загружает каталог и применяет миграции схемы БД
+    import bot as bot_module
+    bot_module.run_startup()
+    if args.stats_events:
+        seed_statistics(bot_module.DB_FILE, args.stats_events)
+    if args.admin_inline:
+        inline_reader = InlineStatsReader(bot_module.DB_FILE)
+        bot_module.get_stats_reader = lambda: inline_reader
+
+    try:
+        report = asyncio.run(run_load(args, bot_module, state))
+        print_report(args, report, state, llm_counter, bot_module.PROMPT_CACHE_STATS.snapshot(),
+                     bot_module.LLM_FLIGHTS.snapshot(), bot_module.LLM_POOL.snapshot(),
+                     bot_module.LLM_BREAKER.snapshot())
+    finally:
+        telegram_server.shutdown()
+        deepseek_server.shutdown()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
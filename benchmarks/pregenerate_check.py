@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка офлайн-генерации ответов по турам (analytics/pregenerate_answers.py)
+против локального фейкового DeepSeek (тот же, что в load_test.py).
+
+1. Прерванный запуск: генерируется только часть ответов (--limit), затем
+   повторный запуск доделывает остальное - уже готовые не запрашиваются.
+2. Изменение прайса: у нескольких туров меняется цена - перегенерируются
+   только их ответы, старые версии удаляются.
+3. Ограниченная параллельность: максимум одновременных запросов на
+   фейковом сервере не больше --concurrency.
+4. Выдача в боте: загрузка AnswerCache и время получения ответа.
+
+Запуск:
+    python benchmarks/pregenerate_check.py --concurrency 8 --llm-latency 0.05
+"""
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import pregenerate_answers  # noqa: E402
+from answer_cache import AnswerCache, match_question_key  # noqa: E402
+from benchmarks.load_test import make_deepseek_handler, start_server  # noqa: E402
+from catalog import load_catalog  # noqa: E402
+from config import PREGENERATED_QUESTIONS  # noqa: E402
+
+CSV_PATH = os.path.join(REPO_DIR, 'Price22.12.2025.csv')
+
+
+def count_concurrency(handler_cls, peak):
+    """Обертка над фейковым DeepSeek: максимум одновременных запросов"""
+    lock = threading.Lock()
+    active = [0]
+
+    class CountingHandler(handler_cls):
+        def do_POST(self):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                super().do_POST()
+            finally:
+                with lock:
+                    active[0] -= 1
+
+    return CountingHandler
+
+
+def change_prices(csv_path, count):
+    """Поднимает цену взрослого у первых count туров с числовой ценой"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        fieldnames, rows = reader.fieldnames, list(reader)
+    changed = []
+    for row in rows:
+        if len(changed) < count and row['Цена Взр'].strip().isdigit():
+            row['Цена Взр'] = str(int(row['Цена Взр']) + 100)
+            changed.append(row['ID'])
+    with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
+        writer.writeheader()
+        writer.writerows(rows)
+    return changed
+
+
+def run(label, counter, **kwargs):
+    calls_before = counter['calls']
+    report = pregenerate_answers.pregenerate(**kwargs)
+    print(f"{label}: нужно {report['planned']}, сгенерировано {report.get('done', 0)}, "
+          f"ошибок {report.get('failed', 0)}, вызовов API {counter['calls'] - calls_before}, "
+          f"{report['seconds']:.1f} с")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка офлайн-генерации ответов по турам")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--changed', type=int, default=3, help="У скольких туров поменять цену")
+    args = parser.parse_args()
+
+    counter = {'calls': 0}
+    peak = [0]
+    server = start_server(count_concurrency(make_deepseek_handler(args.llm_latency, counter), peak))
+    os.environ['DEEPSEEK_API_KEY'] = 'fake'
+    os.environ['DEEPSEEK_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'price.csv')
+        db_path = os.path.join(tmp, 'stats.db')
+        shutil.copy(CSV_PATH, csv_path)
+        options = dict(csv_path=csv_path, db_path=db_path, concurrency=args.concurrency)
+
+        first = run("1️⃣ Прерванный запуск (--limit 100)", counter, limit=100, **options)
+        second = run("2️⃣ Продолжение", counter, **options)
+        third = run("3️⃣ Повтор без изменений", counter, **options)
+        resumed = first.get('done', 0) + second.get('done', 0) == first['planned'] and third['planned'] == 0
+
+        changed = change_prices(csv_path, args.changed)
+        fourth = run(f"4️⃣ Цена изменена у {len(changed)} туров", counter, **options)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('SELECT COUNT(*) FROM tour_answers').fetchone()[0]
+        conn.close()
+        expected = len(changed) * len(PREGENERATED_QUESTIONS)
+        print(f"   перегенерировано {fourth.get('done', 0)} (ожидалось {expected}), строк в таблице: {rows}")
+        print(f"🚦 Максимум одновременных запросов: {peak[0]} (лимит {args.concurrency})")
+
+        catalog, _ = load_catalog(csv_path)
+        cache = AnswerCache()
+        started = time.perf_counter()
+        loaded = cache.load(db_path, catalog.tours)
+        load_ms = (time.perf_counter() - started) * 1000
+        tour_id = str(catalog.tours[0]['ID'])
+        key = match_question_key("А что взять с собой на экскурсию?")
+        runs = 100000
+        started = time.perf_counter()
+        for _ in range(runs):
+            cache.get(tour_id, key)
+        get_us = (time.perf_counter() - started) / runs * 1e6
+        print(f"💬 В боте: загружено {loaded} ответов за {load_ms:.1f} мс, выдача {get_us:.2f} мкс "
+              f"(вопрос -> '{key}')")
+
+        ok = resumed and fourth.get('done', 0) == expected and peak[0] <= args.concurrency
+        print("✅ Все проверки пройдены" if ok else "❌ Есть расхождения")
+
+    server.shutdown()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка и бенчмарк расчета стоимости (pricing.py).
+
+1. Сверяет PriceBook с прежним разбором строк цен (копия старого
+   calculate_total_cost) по всем турам прайса и набору составов групп.
+   Расхождения допустимы только там, где старый разбор давал 0
+   ("от 28000", "2500 (3-11 лет)") - они выводятся списком.
+2. Меряет: старый разбор на каждый показ, расчет PriceBook без кеша
+   и с кешем, корзину из нескольких туров и "N самых дешевых" по всему прайсу.
+
+Запуск:
+    python benchmarks/pricing_benchmark.py --runs 200
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+import pricing  # noqa: E402
+
+GROUPS = [
+    (1, []), (2, []), (2, [60]), (2, [6, 60]), (2, [24, 96, 150]), (4, [36]), (0, [120]),
+]
+
+
+def legacy_total(tour, adults, children_ages):
+    """Прежний разбор цен из calculate_total_cost (без форматирования)"""
+    price_adult_str = str(tour.get('Цена Взр', '0')).replace('฿', '').strip()
+    price_child_str = str(tour.get('Цена Дет', '0')).replace('฿', '').strip()
+
+    if '/' in price_adult_str:
+        price_adult = int(price_adult_str.split('/')[0].strip())
+    else:
+        price_adult = int(price_adult_str) if price_adult_str.isdigit() else 0
+
+    if price_child_str and price_child_str != "⛔️" and price_child_str.lower() != "уточняйте":
+        if '/' in price_child_str:
+            price_child = int(price_child_str.split('/')[0].strip())
+        else:
+            price_child = int(price_child_str) if price_child_str.isdigit() else 0
+    else:
+        price_child = 0
+
+    kids_total = 0
+    for age_months in children_ages:
+        if age_months >= 12:
+            kids_total += price_child if price_child > 0 else price_adult
+    return adults * price_adult + kids_total
+
+
+def legacy_understood(text):
+    """Понимал ли старый разбор строку цены: число, "A / B" или пометка об отсутствии цены"""
+    text = str(text).replace('฿', '').strip()
+    if text in ('', '⛔️') or text.lower() == 'уточняйте':
+        return True
+    return text.split('/')[0].strip().isdigit()
+
+
+def check(tours, book):
+    differences = []
+    for tour in tours:
+        for adults, children in GROUPS:
+            old = legacy_total(tour, adults, children)
+            new = book.quote(tour['ID'], adults, children).total
+            if old != new:
+                differences.append((tour['ID'], tour['Цена Взр'], tour['Цена Дет'], adults, children, old, new))
+    return differences
+
+
+def timed(func, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - started) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и бенчмарк расчета стоимости")
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    cat, _ = catalog.load_catalog(os.path.join(REPO_DIR, 'Price22.12.2025.csv'), use_snapshot=False)
+    tours = cat.tours
+    book = cat.prices
+
+    differences = check(tours, book)
+    # Допустимы только туры, цену которых старый разбор не понимал и считал нулем
+    unexpected = [d for d in differences if legacy_understood(d[1]) and legacy_understood(d[2])]
+    print(f"💰 Туров: {len(tours)}, составов групп: {len(GROUPS)}, расхождений со старым разбором: {len(differences)}")
+    for tour_id, adult, child, adults, children, old, new in differences:
+        print(f"   ID {tour_id}: '{adult}' / '{child}', {adults} взр. + {children}: было {old}, стало {new}")
+
+    def legacy_all():
+        for tour in tours:
+            for adults, children in GROUPS:
+                legacy_total(tour, adults, children)
+
+    def book_uncached():
+        for tour in tours:
+            for adults, children in GROUPS:
+                pricing.Quote(book.get(tour['ID']), adults, pricing.paying_children(children))
+
+    def book_cached():
+        for tour in tours:
+            for adults, children in GROUPS:
+                book.quote(tour['ID'], adults, children)
+
+    ids = [tour['ID'] for tour in tours]
+    quotes = len(tours) * len(GROUPS)
+    print(f"\n⏱ {quotes} расчетов (все туры × все группы), среднее за {args.runs} прогонов:")
+    print(f"   старый разбор строк:   {timed(legacy_all, args.runs) * 1000:.2f} мс")
+    print(f"   PriceBook без кеша:    {timed(book_uncached, args.runs) * 1000:.2f} мс")
+    print(f"   PriceBook с кешем:     {timed(book_cached, args.runs) * 1000:.2f} мс")
+    print(f"   корзина из 5 туров:    {timed(lambda: book.basket(ids[:5], 2, [60]), args.runs) * 1e6:.1f} мкс")
+    print(f"   5 самых дешевых ({len(tours)}): "
+          f"{timed(lambda: book.cheapest(tours, 2, [60], 5), args.runs) * 1e6:.1f} мкс")
+
+    basket = book.basket(ids[:5], 2, [60])
+    print(f"\n🧺 Корзина {ids[:5]} для 2 взр. + ребенок 5 лет: {basket.total}฿, "
+          f"предоплата {basket.prepayment}฿, без цены: {basket.unpriced}")
+
+    if unexpected:
+        print(f"\n❌ Неожиданные расхождения: {len(unexpected)}")
+        sys.exit(1)
+    print("\n✅ Расчет совпадает со старым везде, где старый разбор понимал цену")
+
+
+if __name__ == "__main__":
+    main()
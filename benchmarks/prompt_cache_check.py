@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка, насколько промпты DeepSeek попадают в кеш префиксов (prompts.py).
+
+DeepSeek кеширует начало запроса блоками по 64 токена: блок засчитывается
+как "cache hit", если весь префикс до его конца уже встречался. PrefixCache
+эмулирует это (токен ~ 3 символа русского текста); им же пользуется фейковый
+DeepSeek в benchmarks/load_test.py.
+
+Поток вопросов: разные клиенты (имя, состав группы) спрашивают о популярных
+турах (распределение Ципфа) и без тура. Сравниваются:
+- "прежний" - имя клиента во второй строке системного промпта, затем блок
+  тура и контекст (как было в generate_deepseek_response);
+- "новый" - PromptBuilder: общий префикс -> блок тура -> персональное.
+
+Запуск:
+    python benchmarks/prompt_cache_check.py --requests 2000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+import prompts  # noqa: E402
+
+CSV_PATH = os.path.join(REPO_DIR, 'Price22.12.2025.csv')
+CHARS_PER_TOKEN = 3
+CACHE_UNIT_TOKENS = 64
+
+
+class PrefixCache:
+    """Эмуляция кеша префиксов DeepSeek: блоки по 64 токена от начала запроса"""
+
+    def __init__(self):
+        self._seen = set()
+
+    def lookup(self, messages):
+        """Учитывает запрос, возвращает (токены из кеша, токены промпта)"""
+        text = "".join(f"<{m['role']}>{m['content']}" for m in messages)
+        prompt_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+        unit = CACHE_UNIT_TOKENS * CHARS_PER_TOKEN
+        digest = hashlib.sha1()
+        hit_units, missed = 0, False
+        for start in range(0, len(text) - unit + 1, unit):
+            digest.update(text[start:start + unit].encode('utf-8'))
+            key = digest.copy().digest()
+            if not missed and key in self._seen:
+                hit_units += 1
+            else:
+                missed = True
+                self._seen.add(key)
+        return hit_units * CACHE_UNIT_TOKENS, prompt_tokens
+
+
+def old_messages(user_query, tour_data=None, context_info=None, user_name=None):
+    """Прежняя сборка: имя клиента во второй строке системного промпта"""
+    greeting = f"Ты общаешься с пользователем {user_name}." if user_name else "Ты общаешься с пользователем."
+    role, rest = prompts.SYSTEM_PROMPT.split('\n', 1)
+    system = f"{role}\n{greeting}\n{rest}"
+    if tour_data:
+        system += prompts.tour_block(tour_data)
+    if context_info:
+        system += f"\n\nКОНТЕКСТ: {context_info}"
+    return [{"role": "system", "content": system}, {"role": "user", "content": user_query}]
+
+
+def request_stream(tours, count, rng):
+    names = [f"Клиент{i}" for i in range(300)]
+    popular = sorted(tours, key=lambda tour: rng.random())
+    weights = [1 / (rank + 1) for rank in range(len(popular))]
+    questions = ["А трансфер включен?", "Можно ли с ребенком 3 лет?", "Что взять с собой?",
+                 "Во сколько выезд?", "Будет ли обед?", "Сильно качает на лодке?"]
+    for _ in range(count):
+        tour = rng.choices(popular, weights=weights)[0] if rng.random() < 0.8 else None
+        context_info = f"Состав группы: {rng.randint(1, 4)} взрослых"
+        if rng.random() < 0.3:
+            context_info += f", {rng.randint(1, 2)} детей"
+        yield rng.choice(questions), tour, context_info, rng.choice(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Эмуляция кеша префиксов для промптов DeepSeek")
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    cat, _ = catalog.load_catalog(CSV_PATH, use_snapshot=False)
+
+    started = time.perf_counter()
+    builder = prompts.PromptBuilder(cat.tours)
+    precompute = time.perf_counter() - started
+    print(f"🧱 Блоки {len(cat.tours)} туров собраны за {precompute * 1000:.1f} мс")
+
+    results = {}
+    for title, build in (("прежний", old_messages), ("новый", builder.messages)):
+        cache, hit, total, elapsed = PrefixCache(), 0, 0, 0.0
+        for question, tour, context_info, name in request_stream(cat.tours, args.requests, random.Random(3)):
+            started = time.perf_counter()
+            messages = build(question, tour, context_info, name)
+            elapsed += time.perf_counter() - started
+            request_hit, request_total = cache.lookup(messages)
+            hit += request_hit
+            total += request_total
+        results[title] = hit / total
+        print(f"{title:<8} из кеша {hit / total:6.1%} токенов промпта "
+              f"({hit} из {total}), сборка {elapsed / args.requests * 1e6:.1f} мкс")
+
+    if not results["новый"] > results["прежний"]:
+        print("❌ Новый порядок сообщений не лучше прежнего")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
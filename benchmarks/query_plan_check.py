@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка планов запросов статистики через EXPLAIN QUERY PLAN.
+
+Создает временную БД миграциями из analytics/schema.py и для каждого
+запроса из analytics/queries.py проверяет, что SQLite выбирает ожидаемый
+индекс и не читает таблицу целиком. Код выхода 1, если план разошелся
+с ожиданием (удобно запускать перед деплоем после правки схемы).
+
+Запуск:
+    python benchmarks/query_plan_check.py
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import queries, schema  # noqa: E402
+
+# запрос -> (параметры, индекс, который должен быть в плане)
+EXPECTED_PLANS = {
+    'DISTINCT_USERS_BY_ACTION': ({'action': 'started_bot'}, 'idx_user_actions_action_user'),
+    'TODAY_ACTIONS': ((), 'idx_user_actions_day'),
+    'TODAY_USERS': ((), 'idx_user_actions_day'),
+    'TOP_TOURS': ((), 'idx_tour_views_name'),
+    'FREQUENT_QUESTION_TYPES': ((), 'idx_user_questions_type'),
+    'DROP_OFFS_BY_STAGE': ((), 'idx_drops_stage'),
+    'DROP_OFF_DETAILS': ((), 'idx_drops_stage_duration'),
+    'AVG_SESSION_DURATION': ((), 'idx_drops_stage_duration'),
+    'RECENT_ERRORS': ((), 'idx_errors_type'),
+}
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+# Сводки маленькие (строка на тур / тип вопроса) - читать их целиком нормально
+SCAN_ALLOWED_PREFIXES = ('SCAN (subquery', 'SCAN rollup_')
+
+
+def full_table_scan(plan):
+    """Строка плана вида 'SCAN table' без индекса - чтение всей живой таблицы"""
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and 'INDEX' not in step and not step.startswith(SCAN_ALLOWED_PREFIXES)
+    ]
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='alex_plans_')
+    failures = 0
+    try:
+        db_path = os.path.join(workdir, 'bot_statistics.db')
+        schema.migrate(db_path)
+        conn = sqlite3.connect(db_path)
+
+        missing = [name for name in dir(queries) if name.isupper() and name not in EXPECTED_PLANS]
+        for name in missing:
+            print(f"❌ {name}: нет ожидаемого плана в EXPECTED_PLANS")
+            failures += 1
+
+        for name, (params, index_name) in EXPECTED_PLANS.items():
+            plan = query_plan(conn, getattr(queries, name), params)
+            problems = []
+            if not any(index_name in step for step in plan):
+                problems.append(f"не используется {index_name}")
+            if full_table_scan(plan):
+                problems.append("полное сканирование таблицы")
+
+            status = "❌" if problems else "✅"
+            print(f"{status} {name}: {' | '.join(plan)}")
+            for problem in problems:
+                print(f"   ↳ {problem}")
+            failures += bool(problems)
+
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(f"Схема версии {schema.SCHEMA_VERSION}, проблем: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
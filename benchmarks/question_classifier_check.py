@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка классификатора типов вопросов (question_classifier.py).
+
+TEST_QUESTIONS - размеченные вопросы, которых нет в SEED_QUESTIONS (другие
+формулировки, опечатки, длинные вопросы). Считается:
+1. точность модели на встроенных примерах и доля/точность вопросов,
+   которые бот ответит шаблоном (уверенность >= ROUTE_THRESHOLD, тип из
+   ROUTED_TYPES), - неверно распознанный вопрос получит чужой шаблон;
+2. офлайн-обучение (analytics/train_question_classifier.py) на временной
+   базе, куда записаны вопросы TEST_QUESTIONS с небольшими изменениями,
+   и та же проверка для обученной модели;
+3. время классификации одного сообщения.
+
+Запуск:
+    python benchmarks/question_classifier_check.py
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import schema, train_question_classifier  # noqa: E402
+import question_classifier  # noqa: E402
+from question_classifier import ROUTE_THRESHOLD, ROUTED_TYPES, QuestionClassifier, seed_examples  # noqa: E402
+
+TEST_QUESTIONS = [
+    ("Сколько стоит эта экскурсия на двоих взрослых?", 'price'),
+    ("А какая цена для ребенка 7 лет и двух взрослых?", 'price'),
+    ("Почём выйдет на всю семью?", 'price'),
+    ("сколько стоит", 'price'),
+    ("Цена указана за человека или за лодку?", 'price'),
+    ("Какая стоимость тура?", 'price'),
+    ("А дешевле бывает?", 'price'),
+    ("А с ребенком 3 лет можно?", 'children'),
+    ("Малышу 8 месяцев, возьмут?", 'children'),
+    ("Детям там не скучно будет?", 'children'),
+    ("Есть ли жилеты детского размера?", 'children'),
+    ("С какого возраста пускают детей?", 'children'),
+    ("сыну 10 лет ему понравится?", 'children'),
+    ("Жена беременна, можно?", 'pregnancy'),
+    ("Беременным разрешено на катамаран?", 'pregnancy'),
+    ("Я на 4 месяце беременности, это опасно?", 'pregnancy'),
+    ("В какие дни ходит?", 'schedule'),
+    ("Во сколько выезжаем утром?", 'schedule'),
+    ("Сколько по времени длится экскурсия?", 'schedule'),
+    ("Есть выезд в субботу?", 'schedule'),
+    ("Когда возвращаемся в отель?", 'schedule'),
+    ("Расписание на неделю какое?", 'schedule'),
+    ("Кормят обедом?", 'food'),
+    ("Что входит в питание?", 'food'),
+    ("Вода на лодке есть?", 'food'),
+    ("Можно ли вегану поесть?", 'food'),
+    ("Трансфер из Патонга бесплатный?", 'transfer'),
+    ("Вы забираете из Най Харна?", 'transfer'),
+    ("Сколько доплата за трансфер из Маи Кхао?", 'transfer'),
+    ("Заберут прямо от отеля?", 'transfer'),
+    ("Как добраться до пирса, трансфер есть?", 'transfer'),
+    ("Можно оплатить наличными на месте?", 'payment'),
+    ("Как внести предоплату?", 'payment'),
+    ("Если отменят из-за погоды, деньги вернете?", 'payment'),
+    ("Оплату картой принимаете?", 'payment'),
+    ("Можно заплатить рублями переводом?", 'payment'),
+    ("Какая там вода, прозрачная?", 'other'),
+    ("Гид говорит по-русски?", 'other'),
+    ("Что брать с собой?", 'other'),
+    ("На лодке укачивает?", 'other'),
+    ("Там много туристов?", 'other'),
+    ("Какие фото можно сделать?", 'other'),
+    ("Добрый день", 'other'),
+    ("Нужны ли документы?", 'other'),
+]
+
+
+def evaluate(model, questions):
+    correct = routed = routed_correct = 0
+    mistakes = []
+    for text, label in questions:
+        predicted, confidence = model.predict(text)
+        correct += predicted == label
+        if predicted in ROUTED_TYPES and confidence >= ROUTE_THRESHOLD:
+            routed += 1
+            routed_correct += predicted == label
+            if predicted != label:
+                mistakes.append((text, label, predicted, confidence))
+    return correct, routed, routed_correct, mistakes
+
+
+def report(title, model, questions):
+    correct, routed, routed_correct, mistakes = evaluate(model, questions)
+    routable = sum(1 for _, label in questions if label in ROUTED_TYPES)
+    print(f"{title}: точность {correct}/{len(questions)} ({correct / len(questions) * 100:.0f}%), "
+          f"шаблоном {routed} из {routable} вопросов шаблонных типов, верно {routed_correct}/{routed}")
+    for text, label, predicted, confidence in mistakes:
+        print(f"   ⚠️ '{text}': {label} -> {predicted} ({confidence:.2f})")
+
+
+def perturb(text, rng):
+    """Та же мысль другими словами: приставка/хвост, регистр, без знаков"""
+    prefix = rng.choice(['', 'Здравствуйте! ', 'подскажите, ', 'а ', 'Скажите пожалуйста '])
+    suffix = rng.choice(['', ' спасибо', ' заранее спасибо', '??', ' )'])
+    text = prefix + text + suffix
+    return text.lower() if rng.random() < 0.5 else text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка классификатора типов вопросов")
+    parser.add_argument('--runs', type=int, default=20000)
+    parser.add_argument('--logged', type=int, default=400, help="Сколько вопросов записать во временную базу")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed_model = QuestionClassifier.train(seed_examples())
+    print(f"🧪 Модель на встроенных примерах: {len(seed_model.table)} признаков, "
+          f"{(time.perf_counter() - started) * 1000:.1f} мс")
+    report("📊 Встроенные примеры", seed_model, TEST_QUESTIONS)
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stats.db')
+        schema.migrate(db_path)
+        conn = sqlite3.connect(db_path)
+        now = datetime.now()
+        conn.executemany(
+            "INSERT INTO user_questions (user_id, question_text, timestamp) VALUES (?, ?, ?)",
+            [(i, perturb(rng.choice(TEST_QUESTIONS)[0], rng), now) for i in range(args.logged)]
+        )
+        conn.commit()
+        conn.close()
+
+        model, train_report = train_question_classifier.train(db_path, days=30, today=now.date())
+        print(f"\n🗂 Вопросов в логах: {train_report['logged']}, размечено словами: {train_report['labeled']}, "
+              f"примеров: {train_report['examples']}, {train_report['seconds'] * 1000:.0f} мс")
+        print(f"   на отложенных: точность {train_report.get('holdout_accuracy')}, "
+              f"охват {train_report.get('holdout_coverage')}, "
+              f"точность при пороге {train_report.get('holdout_routed_precision')}")
+        model_path = os.path.join(tmp, 'question_classifier.json')
+        question_classifier.save_question_classifier(model, model_path)
+        loaded = question_classifier.load_question_classifier(model_path)
+        print(f"💾 Модель: {os.path.getsize(model_path)} байт, загружена: {loaded is not None}")
+        report("📊 После обучения по логам", loaded, TEST_QUESTIONS)
+
+    texts = [text for text, _ in TEST_QUESTIONS]
+    started = time.perf_counter()
+    for i in range(args.runs):
+        seed_model.predict(texts[i % len(texts)])
+    per_message = (time.perf_counter() - started) / args.runs * 1e6
+    print(f"\n⚡ Классификация: {per_message:.1f} мкс на сообщение")
+
+
+if __name__ == "__main__":
+    main()
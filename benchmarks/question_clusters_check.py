@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка кластеризации вопросов (analytics/question_clusters.py).
+
+Во временную базу пишется --rows синтетических вопросов: TEMPLATES в
+разных вариантах (приставки, хвосты, регистр, опечатки, пропущенные
+знаки) плюс --noise уникальных случайных вопросов. Затем:
+1. время кластеризации (загрузка из базы, подписи, LSH, union-find);
+2. чистота: доля вопросов, попавших в кластер, где большинство - их
+   же шаблон;
+3. полнота: на сколько кластеров распался каждый шаблон (в идеале 1);
+4. индекс LSH для бота: время поиска почти дубликата одного вопроса.
+
+Запуск:
+    python benchmarks/question_clusters_check.py --rows 300000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import question_clusters, schema  # noqa: E402
+from near_duplicates import LSHIndex  # noqa: E402
+from singleflight import normalize_question  # noqa: E402
+
+TEMPLATES = [
+    ("сколько стоит трансфер из патонга", "Симиланы, Катамаран"),
+    ("можно ли с ребенком 2 года", "Пхи-Пхи, Спидбот"),
+    ("кормят ли обедом на экскурсии", "Джеймс Бонд, Каноэ"),
+    ("что взять с собой на острова", "Симиланы, Катамаран"),
+    ("будет ли сильно качать на лодке", "Рача, Спидбот"),
+    ("можно ли беременным на катамаран", "Пхи-Пхи, Катамаран"),
+    ("во сколько заберут из отеля", "Джеймс Бонд, Каноэ"),
+    ("как оплатить картой российского банка", None),
+    ("есть ли русскоговорящий гид", "Пхи-Пхи, Спидбот"),
+    ("какие дни выезда на симиланы", "Симиланы, Катамаран"),
+]
+PREFIXES = ['', 'Здравствуйте! ', 'подскажите ', 'а ', 'Добрый день, ', 'Скажите, ']
+SUFFIXES = ['', '?', '??', ' спасибо', ' заранее спасибо!', ')']
+WORDS = ('пляж слон храм обезьяна закат рафтинг зиплайн каяк рыбалка дайвинг остров водопад '
+         'маска ласты фото дрон еда отель аэропорт такси виза деньги').split()
+
+
+def vary(text, rng):
+    """Вариант вопроса: приставка, хвост, регистр, иногда опечатка"""
+    if rng.random() < 0.3:
+        i = rng.randrange(1, len(text) - 1)
+        text = text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i] + text[i:]
+    text = rng.choice(PREFIXES) + text + rng.choice(SUFFIXES)
+    return text.capitalize() if rng.random() < 0.5 else text
+
+
+def fill(db_path, rows, noise, rng):
+    """Возвращает {нормализованный текст: номер шаблона или None}"""
+    labels = {}
+    now = datetime.now()
+    batch = []
+    conn = sqlite3.connect(db_path)
+    for i in range(rows):
+        if rng.random() < noise:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 7))) + f" {rng.randrange(10 ** 6)}"
+            template, tour = None, None
+        else:
+            template = rng.randrange(len(TEMPLATES))
+            base, tour = TEMPLATES[template]
+            text = vary(base, rng)
+        labels[normalize_question(text)] = template
+        batch.append((i, text, tour, None, now - timedelta(minutes=rng.randrange(60 * 24 * 20))))
+        if len(batch) >= 50000:
+            conn.executemany("INSERT INTO user_questions (user_id, question_text, tour_name, question_type, "
+                             "timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO user_questions (user_id, question_text, tour_name, question_type, "
+                         "timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка кластеризации вопросов")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--noise', type=float, default=0.3, help="Доля уникальных случайных вопросов")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stats.db')
+        schema.migrate(db_path)
+        started = time.perf_counter()
+        labels = fill(db_path, args.rows, args.noise, rng)
+        print(f"🗂 Вопросов: {args.rows}, заполнение {time.perf_counter() - started:.1f} с")
+
+        today = datetime.now().date()
+        report = question_clusters.compute_clusters(today - timedelta(days=30), today, db_path)
+        print(f"⚡ Кластеризация: {report['seconds']:.2f} с, уникальных формулировок {report['unique']}, "
+              f"кластеров {len(report['clusters'])}")
+
+    # Чистота и полнота по шаблонам
+    pure = total = 0
+    template_clusters = Counter()
+    for cluster in report['clusters']:
+        members = [labels.get(normalize_question(text)) for text in cluster['variants']]
+        majority = Counter(members).most_common(1)[0][0]
+        if majority is not None:
+            template_clusters[majority] += 1
+        total += cluster['count']
+        if all(member == majority for member in members):
+            pure += cluster['count']
+    print(f"🎯 Чистота (по вариантам): {pure / total * 100:.1f}% вопросов")
+    big = [cluster for cluster in report['clusters'] if cluster['count'] >= 10]
+    print(f"🧩 Кластеров от 10 вопросов: {len(big)} (шаблонов {len(TEMPLATES)}); "
+          f"покрывают {sum(c['count'] for c in big) / total * 100:.1f}% вопросов")
+    print()
+    print(question_clusters.format_report(report, top=len(TEMPLATES)))
+
+    index = LSHIndex()
+    for cluster in report['clusters'][:50]:
+        index.add_many(cluster['variants'], [cluster['key']] * len(cluster['variants']))
+    probes = [vary(base, rng) for base, _ in TEMPLATES for _ in range(20)]
+    started = time.perf_counter()
+    found = sum(1 for probe in probes if index.query(probe)[0] is not None)
+    per_query = (time.perf_counter() - started) / len(probes) * 1e6
+    print(f"🔎 Поиск в индексе бота: найдено {found}/{len(probes)}, {per_query:.0f} мкс на вопрос")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка подборки туров в промпт DeepSeek, когда тур не выбран
+(bot.retrieve_tours + prompts.PromptBuilder.facts).
+
+Запросы - размеченный корпус benchmarks/search_corpus.py, профили
+групп - без ограничений, с беременной, с ребенком 1 года. Считаются:
+1. качество: доля запросов, где в подборке есть релевантный тур, и доля
+   релевантных среди подобранных; вопросы не про экскурсии не должны
+   получать подборку (пороги RAG_MIN_SCORE и RAG_MIN_STEM_RELEVANCE);
+2. безопасность: ни одного тура, который фильтр группы бы не пропустил;
+3. бюджет: строки фактов не длиннее FACTS_TOKENS (estimate_tokens);
+4. время подбора на вопрос;
+5. вызовы локального фейкового DeepSeek (тот же, что в load_test.py)
+   без подборки и с ней: токены промпта (usage) и время ответа.
+
+Запуск:
+    python benchmarks/rag_context_check.py --llm-latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.load_test import make_deepseek_handler, start_server  # noqa: E402
+from benchmarks.search_corpus import OFF_TOPIC, QUERIES, relevant_ids  # noqa: E402
+from conversation import estimate_tokens  # noqa: E402
+
+PROFILES = {
+    'без ограничений': {'adults': 2},
+    'беременная': {'adults': 2, 'pregnant': True},
+    'ребенок 1 год': {'adults': 2, 'children': [12]},
+}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def call_llm(bot, questions, with_facts):
+    """(токенов промпта в среднем, среднее и p95 время ответа) через generate_deepseek_response"""
+    before = bot.PROMPT_CACHE_STATS.snapshot()
+    latencies = []
+    for question, user_data in questions:
+        facts = bot.PROMPTS.facts(bot.retrieve_tours(question, user_data))[0] if with_facts else None
+        started = time.perf_counter()
+        await bot.generate_deepseek_response(question, None, "Состав группы: 2 взрослых", facts=facts)
+        latencies.append(time.perf_counter() - started)
+    after = bot.PROMPT_CACHE_STATS.snapshot()
+    prompt_tokens = (after['prompt_tokens'] - before['prompt_tokens']) / len(questions)
+    return prompt_tokens, sum(latencies) / len(latencies), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка подборки туров в промпт DeepSeek")
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    parser.add_argument('--runs', type=int, default=200, help="Повторов замера времени подбора")
+    args = parser.parse_args()
+
+    counter = {'calls': 0}
+    server = start_server(make_deepseek_handler(args.llm_latency, counter))
+    workdir = tempfile.mkdtemp(prefix='alex_rag_')
+    shutil.copy(os.path.join(REPO_DIR, 'Price22.12.2025.csv'), workdir)
+    os.chdir(workdir)
+    os.environ['DEEPSEEK_API_KEY'] = 'sk-ragcheck'
+    os.environ['DEEPSEEK_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    import logging
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    try:
+        import bot
+        bot.load_tours()
+        bot.get_semantic_index()
+        from prompts import FACTS_TOKENS
+
+        found = precise = picked = off_topic_facts = unsafe = max_tokens = 0
+        for query, tags, ids in QUERIES:
+            relevant = relevant_ids(bot.CATALOG.tours, tags, ids)
+            for profile in PROFILES.values():
+                tours = bot.retrieve_tours(query, profile)
+                facts, fact_ids = bot.PROMPTS.facts(tours)
+                max_tokens = max(max_tokens, estimate_tokens(facts or ''))
+                unsafe += len(tours) - len(bot.filter_tours_by_safety(tours, profile))
+                if profile is PROFILES['без ограничений']:
+                    found += any(tour_id in relevant for tour_id in fact_ids)
+                    precise += sum(tour_id in relevant for tour_id in fact_ids)
+                    picked += len(fact_ids)
+        for query in OFF_TOPIC:
+            off_topic_facts += bot.PROMPTS.facts(bot.retrieve_tours(query, {}))[0] is not None
+
+        print(f"🎯 Есть релевантный тур в подборке: {found}/{len(QUERIES)}, "
+              f"релевантных среди подобранных {precise / max(picked, 1):.0%} "
+              f"(в среднем {picked / len(QUERIES):.1f} тура)")
+        print(f"🚫 Не про экскурсии, но с подборкой: {off_topic_facts}/{len(OFF_TOPIC)}")
+        print(f"🛡 Небезопасных туров в подборках: {unsafe}")
+        print(f"📏 Строки фактов: максимум {max_tokens} токенов (бюджет {FACTS_TOKENS})")
+
+        queries = [query for query, _, _ in QUERIES]
+        started = time.perf_counter()
+        for run in range(args.runs):
+            query = queries[run % len(queries)]
+            bot.PROMPTS.facts(bot.retrieve_tours(query, PROFILES['ребенок 1 год']))
+        print(f"⚡ Подбор: {(time.perf_counter() - started) / args.runs * 1e6:.0f} мкс на вопрос")
+
+        questions = [(query, {'adults': 2}) for query in queries + OFF_TOPIC]
+        for title, with_facts in (("без подборки", False), ("с подборкой", True)):
+            tokens, mean, p95 = asyncio.run(call_llm(bot, questions, with_facts))
+            bot._deepseek_client = None   # клиент привязан к event loop прошлого asyncio.run
+            print(f"🤖 {title:<13} промпт {tokens:.0f} токенов, ответ в среднем {mean * 1000:.0f} мс, "
+                  f"p95 {p95 * 1000:.0f} мс")
+
+        ok = (unsafe == 0 and max_tokens <= FACTS_TOKENS and found >= len(QUERIES) * 0.8
+              and off_topic_facts == 0)
+        print("✅ Все проверки пройдены" if ok else "❌ Есть расхождения")
+    finally:
+        server.shutdown()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк и наглядная проверка ранжирования по приоритетам (ranking.py).
+
+1. Сколько туров прайса получают ненулевой признак по каждому приоритету
+   сейчас и при прежнем подсчете по подстрокам (он читал несуществующие
+   столбцы "Описание" и "Время начала").
+2. Топ-5 туров по каждому приоритету.
+3. Время ранжирования всего каталога: прежний подсчет против скалярного
+   произведения с кешем баллов.
+
+Запуск:
+    python benchmarks/ranking_benchmark.py --runs 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import catalog  # noqa: E402
+import ranking  # noqa: E402
+
+PRIORITY_SETS = [['комфорт'], ['бюджет'], ['фотографии'], ['не рано вставать'], ['без толп'],
+                 ['комфорт', 'без толп'], ['бюджет', 'фотографии', 'не рано вставать']]
+
+
+def legacy_score(tour, priorities, book):
+    """Прежний tour_priority_score из bot.py (подстроки по названию и "Описание")"""
+    score = 0
+    tour_name = tour.get("Название", "").lower()
+    tour_description = tour.get("Описание", "").lower()
+    for priority in priorities:
+        if priority == 'комфорт':
+            if any(k in tour_name or k in tour_description for k in ['комфорт', 'люкс', 'vip', 'индивидуал', 'част']):
+                score += 3
+            elif 'маленьк' in tour_description or 'минигрупп' in tour_description:
+                score += 2
+        elif priority == 'бюджет':
+            price = book.get(tour.get('ID', ''))
+            if price and price.adult:
+                if price.adult < 2000:
+                    score += 3
+                elif price.adult < 3500:
+                    score += 1
+        elif priority == 'фотографии':
+            if any(k in tour_name or k in tour_description
+                   for k in ['фото', 'instagram', 'инстаграм', 'красив', 'живописн', 'панорам']):
+                score += 3
+        elif priority == 'не рано вставать':
+            start_time = tour.get("Время начала", "").lower()
+            if start_time and 'утр' in start_time:
+                if '9' in start_time or '10' in start_time or '11' in start_time:
+                    score += 3
+                elif '8' not in start_time and '7' not in start_time:
+                    score += 2
+            elif not start_time:
+                score += 1
+        elif priority == 'без толп':
+            if any(k in tour_description for k in ['маленьк групп', 'индивидуал', 'част', 'уединен']):
+                score += 3
+            elif 'групп' in tour_description and 'больш' not in tour_description:
+                score += 1
+    return score
+
+
+def legacy_rank(tours, priorities, book):
+    scored = [(legacy_score(tour, priorities, book), tour) for tour in tours]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [tour for _, tour in scored]
+
+
+def timed(func, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    return (time.perf_counter() - started) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк ранжирования по приоритетам")
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    cat, _ = catalog.load_catalog(os.path.join(REPO_DIR, 'Price22.12.2025.csv'), use_snapshot=False)
+    tours, features = cat.tours, cat.features
+
+    print(f"📊 Туров: {len(tours)}. Туров с баллом > 0 (было -> стало):")
+    for priority in ranking.PRIORITY_WEIGHTS:
+        old = sum(1 for tour in tours if legacy_score(tour, [priority], cat.prices) > 0)
+        new = sum(1 for tour in tours if features.score(tour, [priority]) > 0)
+        print(f"   {priority:<18} {old:>3} -> {new:>3}")
+
+    for priority in ranking.PRIORITY_WEIGHTS:
+        top = features.rank(tours, [priority])[:5]
+        print(f"\n🎯 {priority}:")
+        for tour in top:
+            print(f"   {features.score(tour, [priority]):.1f}  {tour['ID']:>3} {tour['Название'][:50]}")
+
+    print(f"\n⏱ Ранжирование всего каталога, среднее за {args.runs} прогонов:")
+    for priorities in PRIORITY_SETS:
+        old = timed(lambda: legacy_rank(tours, priorities, cat.prices), args.runs)
+        new = timed(lambda: features.rank(tours, priorities), args.runs)
+        print(f"   {', '.join(priorities):<40} было {old * 1e6:8.1f} мкс, стало {new * 1e6:6.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка хранения по месяцам: партиции, сводки, очистка и VACUUM.
+
+Заполняет временную БД синтетическими событиями за несколько месяцев,
+считает итоги /stats, запускает analytics.retention.run_maintenance() и
+проверяет, что итоги "за все время" не изменились, а живая база
+уменьшилась. Код выхода 1 при расхождении.
+
+Запуск:
+    python benchmarks/retention_check.py --events 200000 --months 12
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from analytics import queries, retention, schema  # noqa: E402
+
+ACTIONS = ('started_bot', 'chose_category', 'viewed_tour', 'booking_completed')
+TOUR_NAMES = [f"Экскурсия {i}" for i in range(40)]
+QUESTION_TYPES = ('price', 'children', 'schedule', 'food', 'transfer', 'other')
+
+
+def fill(conn, events, months, now):
+    rng = random.Random(42)
+    span = int(months * 30.5 * 24 * 3600)
+
+    def moment():
+        return now - timedelta(seconds=rng.randrange(span))
+
+    def chronological(rows):
+        # Бот пишет события по мере поступления: rowid растет вместе с timestamp
+        return sorted(rows, key=lambda row: row[-1])
+
+    conn.executemany(
+        "INSERT INTO user_actions (user_id, action, timestamp) VALUES (?, ?, ?)",
+        chronological([(rng.randrange(5000), rng.choice(ACTIONS), moment()) for _ in range(events)])
+    )
+    conn.executemany(
+        "INSERT INTO actions (user_id, action_type, action_details, timestamp) VALUES (?, ?, ?, ?)",
+        chronological([(rng.randrange(5000), rng.choice(ACTIONS), '', moment()) for _ in range(events // 4)])
+    )
+    conn.executemany(
+        "INSERT INTO tour_views (user_id, tour_id, tour_name, view_time_seconds, timestamp) VALUES (?, ?, ?, ?, ?)",
+        chronological([(rng.randrange(5000), i, rng.choice(TOUR_NAMES), rng.choice([None, rng.randrange(300)]),
+                        moment()) for i in range(events // 4)])
+    )
+    conn.executemany(
+        "INSERT INTO user_questions (user_id, question_text, question_type, timestamp) VALUES (?, ?, ?, ?)",
+        chronological([(rng.randrange(5000), 'Вопрос', rng.choice(QUESTION_TYPES), moment())
+                       for _ in range(events // 10)])
+    )
+    conn.commit()
+
+
+def totals(conn):
+    """Итоги "за все время" из /stats"""
+    result = {}
+    for action in ACTIONS:
+        result[action] = conn.execute(queries.DISTINCT_USERS_BY_ACTION, {'action': action}).fetchone()[0]
+    result['top_tours'] = [
+        (name, views, round(avg or 0, 6)) for name, views, avg in conn.execute(queries.TOP_TOURS)
+    ]
+    result['question_types'] = conn.execute(queries.FREQUENT_QUESTION_TYPES).fetchall()
+    return result
+
+
+def live_rows(conn):
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in retention.PARTITIONED_TABLES)
+
+
+def db_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка хранения аналитики по месяцам")
+    parser.add_argument('--events', type=int, default=100000, help="Событий user_actions")
+    parser.add_argument('--months', type=int, default=12, help="За сколько месяцев события")
+    parser.add_argument('--retention-days', type=int, default=retention.RETENTION_DAYS)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='alex_retention_')
+    try:
+        db_path = os.path.join(workdir, 'bot_statistics.db')
+        schema.migrate(db_path)
+        now = datetime.now()
+
+        conn = sqlite3.connect(db_path)
+        fill(conn, args.events, args.months, now)
+        before = totals(conn)
+        rows_before = live_rows(conn)
+        conn.close()
+        size_before = db_size(db_path)
+
+        summary = retention.run_maintenance(db_path, retention_days=args.retention_days, now=now)
+        # Повторный запуск ничего не должен переносить
+        second = retention.run_maintenance(db_path, retention_days=args.retention_days, now=now)
+
+        conn = sqlite3.connect(db_path)
+        after = totals(conn)
+        rows_after = live_rows(conn)
+        conn.close()
+        size_after = db_size(db_path)
+
+        archive_dir = retention.archive_dir_for(db_path)
+        archived_rows = 0
+        for name in sorted(os.listdir(archive_dir)):
+            part = sqlite3.connect(os.path.join(archive_dir, name))
+            archived_rows += sum(
+                part.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in retention.PARTITIONED_TABLES
+            )
+            part.close()
+
+        print("=" * 60)
+        print("🗄 ХРАНЕНИЕ АНАЛИТИКИ ПО МЕСЯЦАМ")
+        print("=" * 60)
+        print(f"Окно хранения: {args.retention_days} дней (граница {summary['cutoff']})")
+        print(f"Партиций: {len(summary['archived'])}, перенесено строк: {sum(summary['archived'].values())}")
+        print(f"Строк в живой базе: {rows_before} → {rows_after}")
+        print(f"Размер живой базы: {size_before / 1024:.0f} КБ → {size_after / 1024:.0f} КБ "
+              f"(VACUUM: {summary['vacuum']})")
+        print(f"Обслуживание: {summary['seconds'] * 1000:.0f} мс, повторный запуск перенес "
+              f"{sum(second['archived'].values())} строк")
+        print(f"Пачек: {summary['batches']}, самая долгая транзакция "
+              f"{summary['max_batch_seconds'] * 1000:.0f} мс")
+
+        problems = []
+        if before != after:
+            problems.append("итоги /stats изменились после сжатия")
+        if rows_before - rows_after != archived_rows:
+            problems.append(f"в партициях {archived_rows} строк, из живой базы ушло {rows_before - rows_after}")
+        if sum(second['archived'].values()):
+            problems.append("повторный запуск перенес строки")
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print("✅ Итоги /stats совпадают, все удаленные строки есть в партициях")
+        sys.exit(1 if problems else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк поиска туров по свободному тексту на размеченном корпусе
+(benchmarks/search_corpus.py).
+
+Сравниваются:
+- "по словам" - прежний гибридный поиск без смыслового шага
+  (точная фраза -> основы слов -> difflib);
+- "смысловой" - только индекс TF-IDF + LSA (semantic_search.py);
+- "итого" - search_tours_by_keywords_hybrid: точная фраза -> смысловой
+  поиск -> основы слов (stemmer.py) -> difflib.
+
+Метрики: hit@3 (в первых трех результатах есть релевантный тур), доля
+запросов без результатов (они ушли бы в платный вызов DeepSeek), ложные
+срабатывания на запросах не про экскурсии и время на запрос.
+
+Запуск (из корня репозитория, нужен прайс рядом):
+    python benchmarks/search_benchmark.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+import bot  # noqa: E402
+from benchmarks.search_corpus import OFF_TOPIC, QUERIES, relevant_ids  # noqa: E402
+
+
+def keyword_only(query):
+    """Гибридный поиск без смыслового шага"""
+    original = bot.search_tours_semantic
+    bot.search_tours_semantic = lambda q, limit=None: []
+    try:
+        return bot.search_tours_by_keywords_hybrid(query)[0]
+    finally:
+        bot.search_tours_semantic = original
+
+
+def semantic_only(query):
+    return bot.search_tours_semantic(query)
+
+
+def combined(query):
+    return bot.search_tours_by_keywords_hybrid(query)[0]
+
+
+def evaluate(search, runs):
+    hits, empty, timings, misses = 0, 0, [], []
+    for query, tags, ids in QUERIES:
+        relevant = relevant_ids(bot.TOURS, tags, ids)
+        started = time.perf_counter()
+        for _ in range(runs):
+            results = search(query)
+        timings.append((time.perf_counter() - started) / runs)
+        top = [str(tour.get('ID', '')).strip() for tour, _, _ in results[:3]]
+        if not results:
+            empty += 1
+        if relevant & set(top):
+            hits += 1
+        else:
+            misses.append(query)
+    false_positives = sum(1 for query in OFF_TOPIC if search(query))
+    return hits, empty, false_positives, timings, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска туров по свободному тексту")
+    parser.add_argument('--runs', type=int, default=20, help="Повторов каждого запроса для замера времени")
+    parser.add_argument('--misses', action='store_true', help="Показать запросы без попадания")
+    args = parser.parse_args()
+
+    bot.load_tours()
+    started = time.perf_counter()
+    bot.get_semantic_index()
+    print(f"🧭 Подготовка индекса: {(time.perf_counter() - started) * 1000:.0f} мс\n")
+
+    total = len(QUERIES)
+    print(f"{'поиск':<12} {'hit@3':>8} {'пусто':>7} {'не по теме':>11} {'медиана':>10} {'p95':>10}")
+    for title, search in (("по словам", keyword_only), ("смысловой", semantic_only), ("итого", combined)):
+        hits, empty, false_positives, timings, misses = evaluate(search, args.runs)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{title:<12} {hits:>4}/{total:<3} {empty:>7} {false_positives:>5}/{len(OFF_TOPIC):<5} "
+              f"{statistics.median(timings) * 1000:>7.2f} мс {p95 * 1000:>7.2f} мс")
+        if args.misses and misses:
+            print("   мимо: " + "; ".join(misses))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Размеченный корпус запросов клиентов для бенчмарков поиска.
+
+Запись: (запрос, теги, ID). Релевантные туры - те, у которых в
+'Теги (Безопасность)' есть хотя бы один из тегов, плюс перечисленные ID.
+Запросы нарочно в косвенных падежах и своими словами, как пишут клиенты.
+"""
+
+QUERIES = [
+    ("хочу поплавать с рыбками без толпы", ('#снорклинг', '#рыбки'), ()),
+    ("посмотреть на слонов", ('#слоны', '#слоник'), (75, 77, 82, 83, 84)),
+    ("покормить слоника", ('#слоны', '#слоник', '#кормление'), (83,)),
+    ("покататься на квадроциклах", ('#квадроциклы',), (73, 74, 75, 76, 77)),
+    ("морская рыбалка с уловом", ('#рыбалка',), (8, 9, 39, 40, 41)),
+    ("романтический вечер на закате для двоих", ('#романтика', '#закат', '#для_пар', '#пары'), ()),
+    ("огненное шоу", ('#огненное_шоу',), ()),
+    ("белоснежный песок и бирюзовая вода", ('#белый_песок', '#бирюзовая_вода', '#мальдивы'), ()),
+    ("буддийские храмы и история", ('#храмы', '#история', '#культура'), ()),
+    ("тайский бокс муай тай", (), (92,)),
+    ("хочется адреналина и экстрима", ('#экстрим', '#драйв'), ()),
+    ("пещеры на каяках", ('#пещеры', '#каяки', '#каноэ'), ()),
+    ("спокойный отдых на пляже без спешки", ('#релакс', '#спокойно', '#без_спешки'), ()),
+    ("переночевать на острове", ('#ночевка', '#палатки'), ()),
+    ("вечеринка на яхте с диджеем", ('#тусовка', '#вечеринка', '#диджей'), ()),
+    ("смотровые площадки с красивыми видами", ('#смотровая', '#виды', '#обзорная'), ()),
+    ("горячие источники", ('#горячий_источник', '#источники', '#Горячий_водопад'), ()),
+    ("стеклянный мост", ('#стеклянный_мост',), ()),
+    ("бухта майя бей", ('#майя_бей', '#майя_бэй'), ()),
+    ("арендовать яхту своей компанией", ('#аренда', '#своя_компания', '#приват'), ()),
+    ("под парусом", ('#парус',), ()),
+    ("джунгли и дикая природа", ('#джунгли', '#дикая_природа', '#эко_туризм'), ()),
+    ("куда пойти с малышами", ('#малыши', '#можно_младенцам', '#семья', '#семейный'), ()),
+    ("ангкор ват", (), (96,)),
+    ("полетать на самолете", ('#полет', '#самолет', '#вертолет'), (78, 79)),
+    ("параплан над морем", ('#параплан', '#парамотор'), (80, 81)),
+    ("аквапарк с горками", ('#аквапарк', '#горка'), (85,)),
+    ("дельфинов посмотреть", ('#дельфины',), (86,)),
+    ("крокодилов", ('#крокодилы',), (88,)),
+    ("парк с птицами", ('#птицы',), (89,)),
+    ("кабаре трансвеститов", ('#кабаре',), (91,)),
+    ("ужин на высоте", (), (93,)),
+    ("светящийся планктон ночью", ('#светящийся_планктон',), ()),
+    ("остров джеймса бонда", ('#бонд',), (29, 30, 31, 58, 59, 62, 63)),
+    ("пхи пхи на катамаране", (), (19, 23, 24, 26)),
+    ("симиланские острова", (), (1, 2, 3, 4)),
+    ("коралловый остров", ('#коралловый_остров',), (10, 11, 12, 13, 14, 15, 16)),
+    ("зиплайны в джунглях", ('#зиплайн',), (72, 73, 74)),
+    ("рафтинг по реке", ('#рафтинг',), (77,)),
+    ("сафари на джипах", ('#сафари', '#джипы'), (61, 69)),
+    ("озеро чео лан", ('#чео_лан', '#озеро'), (65, 66, 67, 68)),
+    ("шопинг в бангкоке", ('#шопинг', '#бангкок'), (95,)),
+    ("диснейленд", ('#диснейленд',), (99,)),
+    ("спа и массаж", ('#спа',), (60, 62, 63)),
+    ("лобстеры на яхте", ('#лобстер',), (45,)),
+]
+
+# Запросы не про экскурсии: хороший поиск не должен ничего находить
+OFF_TOPIC = [
+    "какая завтра погода",
+    "сколько стоит такси до аэропорта",
+    "asdf qwerty",
+    "где купить сим карту",
+    "как поменять деньги",
+]
+
+
+def relevant_ids(tours, tags, ids):
+    """ID релевантных туров (строки) по тегам и явному списку"""
+    result = {str(tour_id) for tour_id in ids}
+    for tour in tours:
+        tour_tags = str(tour.get('Теги (Безопасность)', '')).split()
+        if any(tag in tour_tags for tag in tags):
+            result.add(str(tour.get('ID', '')).strip())
+    return result
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк холодного старта бота.
+
+Каждый замер - новый процесс Python (как при деплое или перезапуске после падения):
+1. время `import bot`;
+2. время фаз run_startup() (каталог, схема БД);
+3. самые дорогие прямые импорты bot.py по `python -X importtime`.
+
+Запуск:
+    python benchmarks/startup_benchmark.py --runs 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Выполняется в дочернем процессе - печатает JSON с замерами последней строкой
+CHILD_CODE = r"""
+import json, sys, time
+sys.path.insert(0, REPO_DIR)
+started = time.perf_counter()
+import bot
+import_seconds = time.perf_counter() - started
+timings = bot.run_startup()
+print(json.dumps({
+    'import': import_seconds,
+    'phases': timings,
+    'openai_loaded': 'openai' in sys.modules,
+    'pandas_loaded': 'pandas' in sys.modules,
+    'difflib_loaded': 'difflib' in sys.modules,
+    'pyarrow_loaded': 'pyarrow' in sys.modules,
+}))
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('TELEGRAM_BOT_TOKEN', '123456:BENCHMARK')
+    return env
+
+
+def run_child(workdir):
+    code = f"REPO_DIR = {REPO_DIR!r}\n" + CHILD_CODE
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=workdir, env=child_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def top_imports(workdir, limit):
+    """Самые тяжелые модули, которые напрямую импортирует bot.py (по накопленному времени)"""
+    code = f"import sys; sys.path.insert(0, {REPO_DIR!r}); import bot"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=workdir, env=child_env(), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.replace('import time:', '').split('|')
+        # Прямые зависимости bot.py - второй уровень дерева (отступ в три пробела),
+        # их время уже включает вложенные импорты
+        if name.startswith('   ') and not name.startswith('    '):
+            rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта бота")
+    parser.add_argument('--runs', type=int, default=5, help="Сколько раз запускать новый процесс")
+    parser.add_argument('--top', type=int, default=10, help="Сколько самых тяжелых импортов показать")
+    args = parser.parse_args()
+
+    # Отдельная папка: свежая БД на каждый прогон не мешает рабочей статистике
+    workdir = tempfile.mkdtemp(prefix='alex_startup_')
+    for name in os.listdir(REPO_DIR):
+        if name.endswith('.csv'):
+            shutil.copy(os.path.join(REPO_DIR, name), workdir)
+
+    try:
+        samples = [run_child(workdir) for _ in range(args.runs)]
+        heavy = top_imports(workdir, args.top)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("=" * 60)
+    print("🚀 ХОЛОДНЫЙ СТАРТ БОТА")
+    print("=" * 60)
+    imports = [s['import'] for s in samples]
+    print(f"import bot: медиана {statistics.median(imports) * 1000:.1f} мс "
+          f"(мин {min(imports) * 1000:.1f}, макс {max(imports) * 1000:.1f}) на {args.runs} запусках")
+    for phase in samples[0]['phases']:
+        values = [s['phases'][phase] for s in samples]
+        print(f"фаза {phase}: медиана {statistics.median(values) * 1000:.1f} мс")
+    total = [s['import'] + sum(s['phases'].values()) for s in samples]
+    print(f"Итого до готовности: медиана {statistics.median(total) * 1000:.1f} мс")
+    print()
+    print("Ленивые модули после старта (должны быть False):")
+    for module in ('openai', 'pandas', 'difflib', 'pyarrow'):
+        print(f"  {module}: {samples[-1][module + '_loaded']}")
+    print()
+    print(f"Топ-{args.top} прямых импортов bot.py:")
+    for cumulative_us, name in heavy:
+        print(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк шага "поиск по отдельным словам" гибридного поиска на размеченном
+корпусе (benchmarks/search_corpus.py).
+
+Сравниваются:
+- "словоформы" - прежний шаг: варианты слова из get_lemma_variants
+  (11 основ вручную + отрезание -ов/-ах/-ой) и полный проход по прайсу
+  на каждый вариант;
+- "основы" - стеммер Snowball (stemmer.py) и индекс основ каталога
+  (Catalog.stem_index).
+
+Метрики: доля содержательных слов запросов, которые нашлись в индексе
+(остальные уходят в difflib или DeepSeek), hit@3 одного этого шага и время
+на запрос (для основ - с пустым и с прогретым кешем стеммера).
+Дополнительно - сверка стеммера с эталонными основами Snowball.
+
+Запуск (из корня репозитория, нужен прайс рядом):
+    python benchmarks/stemmer_benchmark.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.chdir(REPO_DIR)
+
+import bot  # noqa: E402
+import stemmer  # noqa: E402
+from benchmarks.search_corpus import QUERIES, relevant_ids  # noqa: E402
+
+# Эталонные основы алгоритма Snowball для русского языка
+REFERENCE_STEMS = {
+    'слонов': 'слон', 'слонам': 'слон', 'слоны': 'слон', 'островах': 'остров',
+    'покататься': 'поката', 'красивыми': 'красив', 'пещерах': 'пещер',
+    'рыбками': 'рыбк', 'квадроциклах': 'квадроцикл', 'джунглях': 'джунгл',
+    'бирюзовая': 'бирюзов', 'экскурсии': 'экскурс', 'историю': 'истор',
+    'возможность': 'возможн', 'красивейший': 'красив', 'вскочивший': 'вскоч',
+    'монастыря': 'монастыр', 'черепахами': 'черепах', 'водопадов': 'водопад',
+}
+
+
+def lemma_variants(word):
+    """Прежний get_lemma_variants из bot.py (для сравнения)"""
+    variants = {word}
+    lemma_dict = {
+        'слон': ['слон', 'слона', 'слонов', 'слонам', 'слонами', 'слонах'],
+        'черепа': ['черепаха', 'черепахи', 'черепаху', 'черепахой', 'черепах', 'черепаховая', 'черепаховой'],
+        'дельфин': ['дельфин', 'дельфина', 'дельфинов', 'дельфинам'],
+        'остров': ['остров', 'острова', 'островов', 'островам'],
+        'пещер': ['пещер', 'пещера', 'пещеры', 'пещерах'],
+        'рафтинг': ['рафтинг', 'рафтинга', 'рафтингом'],
+        'аквапарк': ['аквапарк', 'аквапарка', 'аквапарков'],
+        'каток': ['каток', 'катка', 'катков', 'катке'],
+        'храм': ['храм', 'храма', 'храмов', 'храме'],
+        'монастырь': ['монастырь', 'монастыря', 'монастырей'],
+        'водопад': ['водопад', 'водопада', 'водопадов'],
+    }
+    for variants_list in lemma_dict.values():
+        if word in variants_list:
+            variants.update(variants_list)
+            break
+    if len(word) > 4 and word.endswith(('ов', 'ах', 'ой')):
+        variants.add(word[:-2])
+        variants.add(word[:-2] + 'а')
+    return list(variants)
+
+
+def content_words(query):
+    words = [w for w in query.lower().split() if len(w) > 3 and w not in bot.SEARCH_STOP_WORDS]
+    return sorted(words, key=len, reverse=True)
+
+
+def lemma_step(query):
+    found = {}
+    for word in content_words(query):
+        for variant in lemma_variants(word):
+            for tour, category, relevance in bot.search_tours_by_keywords(variant):
+                found.setdefault(tour.get('ID'), (tour, category, relevance))
+    return list(found.values())
+
+
+def stem_step(query):
+    results, _ = bot.CATALOG.search_stems([stemmer.stem(word) for word in content_words(query)])
+    return results
+
+
+def word_hit_rate():
+    words = [word for query, _, _ in QUERIES for word in content_words(query)]
+    lemma_hits = sum(1 for word in words if any(bot.search_tours_by_keywords(v) for v in lemma_variants(word)))
+    stem_hits = sum(1 for word in words if stemmer.stem(word) in bot.CATALOG.stem_index)
+    return len(words), lemma_hits, stem_hits
+
+
+def evaluate(step, runs, cold=False):
+    hits, timings = 0, []
+    for query, tags, ids in QUERIES:
+        relevant = relevant_ids(bot.TOURS, tags, ids)
+        elapsed = 0.0
+        for _ in range(runs):
+            if cold:
+                stemmer.stem.cache_clear()
+            started = time.perf_counter()
+            results = step(query)
+            elapsed += time.perf_counter() - started
+        timings.append(elapsed / runs)
+        top = {str(item[0].get('ID', '')).strip() for item in results[:3]}
+        if relevant & top:
+            hits += 1
+    return hits, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк стеммера и индекса основ")
+    parser.add_argument('--runs', type=int, default=20, help="Повторов каждого запроса для замера времени")
+    args = parser.parse_args()
+
+    wrong = {word: (stemmer.stem(word), expected) for word, expected in REFERENCE_STEMS.items()
+             if stemmer.stem(word) != expected}
+    print(f"🔤 Эталонные основы: {len(REFERENCE_STEMS) - len(wrong)}/{len(REFERENCE_STEMS)}")
+    for word, (got, expected) in wrong.items():
+        print(f"   {word}: {got} вместо {expected}")
+
+    bot.load_tours()
+    print(f"📚 Индекс основ: {len(bot.CATALOG.stem_index)} основ, {len(bot.TOURS)} туров\n")
+
+    total_words, lemma_hits, stem_hits = word_hit_rate()
+    print(f"🎯 Слова запросов в индексе: словоформы {lemma_hits}/{total_words} "
+          f"({lemma_hits / total_words:.0%}), основы {stem_hits}/{total_words} ({stem_hits / total_words:.0%})\n")
+
+    total = len(QUERIES)
+    print(f"{'шаг':<20} {'hit@3':>8} {'медиана':>10} {'p95':>10}")
+    for title, step, cold in (("словоформы", lemma_step, False),
+                              ("основы, пустой кеш", stem_step, True),
+                              ("основы", stem_step, False)):
+        hits, timings = evaluate(step, args.runs, cold)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{title:<20} {hits:>4}/{total:<3} {statistics.median(timings) * 1000:>7.3f} мс {p95 * 1000:>7.3f} мс")
+
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import csv
 import logging
 import re
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
@@ -13,12 +12,38 @@ from telegram.ext import (
     CallbackQueryHandler,
 )
 import sqlite3
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 import asyncio
 
 # === АНАЛИТИКА ===
 from analytics.logger import logger
+from analytics import queries as stats_queries
+from analytics.schema import SCHEMA_VERSION, USER_ANALYTICS_TABLES, migrate
+from analytics.retention import RETENTION_DAYS, run_maintenance
+from analytics.export import FORMATS as EXPORT_FORMATS, export_analytics, parse_date
+from analytics.funnel import compute_funnel, format_report as format_funnel_report
+from analytics.question_clusters import (QUESTION_CLUSTERS_PATH, compute_clusters, load_clusters,
+                                         format_report as format_clusters_report)
+from analytics.reader import StatsReader, StatsTimeout
 from config import ADMIN_ID, BOT_STAGES, QUESTION_TYPES, ERROR_TYPES, EMOJI, pluralize_excursions, pluralize_hits
+from catalog import Catalog, load_catalog
+from pricing import Quote, TourPrice, parse_price, paying_children
+from itinerary import MAX_PLAN_DAYS, plan_itinerary
+from schedule import WEEKDAY_NAMES, days_mask_in_text, format_weekdays
+from stemmer import stem
+from ranking import group_profile, load_ranking_model
+from prompts import PromptBuilder, PromptCacheStats
+from singleflight import SingleFlight, normalize_question
+from llm_pool import LLMExecutor, LLMUnavailable
+from circuit_breaker import CircuitBreaker, DeepSeekError, DeepSeekNotConfigured, DeepSeekTimeout, classify_error
+from answer_cache import AnswerCache, match_question_key
+from answer_format import ProgressiveReply, format_answer
+from conversation import ConversationMemory
+from question_classifier import (LABEL_THRESHOLD, ROUTE_THRESHOLD, ROUTED_TYPES, QuestionClassifier,
+                                 load_question_classifier, seed_examples)
+import semantic_search
 import json
 # === КОНЕЦ ИМПОРТОВ АНАЛИТИКИ ===
 
@@ -26,9 +51,8 @@ import json
 from parser_functions import parse_user_response, age_to_months, format_age_months
 # === КОНЕЦ ИМПОРТОВ ПАРСЕРА ===
 
-# === ИМПОРТ OPENAI ДЛЯ DEEPSEEK ===
-import openai
-# === КОНЕЦ ИМПОРТА OPENAI ===
+# OpenAI SDK (для DeepSeek) импортируется лениво в get_deepseek_client():
+# он тяжелый (~0.2 с на импорт) и не нужен, если DEEPSEEK_API_KEY не задан.
 
 # === НАЧАЛО БЕЗОПАСНОЙ ЗАГРУЗКИ ТОКЕНА ===
 import os
@@ -40,15 +64,19 @@ load_dotenv()
 # Пытаемся получить токен из безопасного места
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
-# Если токена в .env нет — программа упадет с понятной ошибкой ДО запуска бота,
-# а не станет использовать старый зашитый токен.
-if TELEGRAM_BOT_TOKEN is None:
-    raise ValueError(
-        "❌ ТОКЕН БОТА НЕ НАЙДЕН!\n"
-        "1. Убедитесь, что в папке с bot.py есть файл .env\n"
-        "2. В файле .env должна быть строка: TELEGRAM_BOT_TOKEN=ваш_токен_здесь\n"
-        "3. НИКОГДА не загружайте файл .env на GitHub!"
-    )
+def require_bot_token():
+    """
+    Если токена в .env нет — программа упадет с понятной ошибкой ДО запуска бота,
+    а не станет использовать старый зашитый токен.
+    """
+    if TELEGRAM_BOT_TOKEN is None:
+        raise ValueError(
+            "❌ ТОКЕН БОТА НЕ НАЙДЕН!\n"
+            "1. Убедитесь, что в папке с bot.py есть файл .env\n"
+            "2. В файле .env должна быть строка: TELEGRAM_BOT_TOKEN=ваш_токен_здесь\n"
+            "3. НИКОГДА не загружайте файл .env на GitHub!"
+        )
+    return TELEGRAM_BOT_TOKEN
 
 # Загружаем API ключ для DeepSeek
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
@@ -56,6 +84,9 @@ if DEEPSEEK_API_KEY is None:
     print("⚠️ DEEPSEEK_API_KEY не найден. DeepSeek интеграция будет отключена.")
     DEEPSEEK_API_KEY = None
 
+# Адрес DeepSeek API (можно переопределить, например, для нагрузочного теста с фейковым сервером)
+DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com/v1")
+
 # === КОНЕЦ БЛОКА БЕЗОПАСНОЙ ЗАГРУЗКИ ТОКЕНА ===
 
 # ==================== GIF АНИМАЦИИ ОТКЛЮЧЕНЫ ====================
@@ -67,6 +98,23 @@ GOOGLE_REVIEWS_URL = "https://www.google.com/maps/place/%D0%AD%D0%BA%D1%81%D0%BA
 # ==================== БАЗА ДАННЫХ ====================
 DB_FILE = "bot_statistics.db"
 
+# Сырые события старше окна хранения уходят в помесячные партиции и сводки
+# (analytics/retention.py); обслуживание идет в фоне раз в N часов
+ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', RETENTION_DAYS))
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv('ANALYTICS_MAINTENANCE_HOURS', 6)) * 3600
+MAINTENANCE_FIRST_DELAY_SECONDS = 60  # не нагружаем диск в первые секунды после старта
+
+# Выгрузки /export (Parquet / Arrow) складываются сюда; больше лимита Telegram - только на диск
+EXPORT_DIR = "exports"
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+# Выгрузка читает много строк - свой срок, длиннее запросов /stats
+EXPORT_TIMEOUT = float(os.getenv('EXPORT_TIMEOUT', 120))
+
+# Запросы админ-команд статистики идут через отдельное соединение только для
+# чтения в своем потоке (analytics/reader.py) и прерываются по таймауту;
+# /stats_funnel и /stats_questions читают и партиции - тот же срок на весь отчет
+STATS_QUERY_TIMEOUT = float(os.getenv('STATS_QUERY_TIMEOUT', 5))
+
 # ==================== НАСТРОЙКИ ====================
 # Замените на ваш токен!
 CSV_FILE = "Price22.12.2025.csv"
@@ -80,87 +128,177 @@ logging.basicConfig(
 )
 
 # ==================== ЗАГРУЗКА ДАННЫХ ====================
-def load_tours():
-    """Загружает экскурсии из CSV файла"""
-    tours = []
-    try:
-        with open(CSV_FILE, 'r', encoding='utf-8-sig') as f:  # utf-8-sig для обработки BOM
-            reader = csv.DictReader(f, delimiter=';')
-            
-            for row in reader:
-                # Очищаем значения от лишних пробелов
-                clean_row = {key.strip(): (value.strip() if value else "") for key, value in row.items()}
-                tours.append(clean_row)
-            
-            return tours
-    except Exception as e:
-        print(f"❌ Ошибка загрузки CSV: {e}")
-        import traceback
-        traceback.print_exc()
-        return []
+def build_catalog_state():
+    """
+    Собирает все, что зависит от прайса (каталог, блоки промптов, смысловой
+    индекс, модели, готовые ответы), в локальные объекты - глобальное состояние не меняется,
+    поэтому можно вызывать в asyncio.to_thread. Каталог читается из бинарного
+    снимка рядом с CSV, если прайс не менялся, иначе CSV разбирается и снимок
+    пересобирается (см. catalog.py).
+    Возвращает (состояние или None, если прайс не загрузился; источник).
+    """
+    catalog, source = load_catalog(CSV_FILE)
+    if source == 'error':
+        return None, source
+    state = {'catalog': catalog, 'prompts': PromptBuilder(catalog.tours),
+             'semantic_index': build_semantic_index(catalog)}
+    # Модель ранжирования, обученная по логам (python -m analytics.learn_to_rank)
+    state['ranking_model'] = load_ranking_model()
+    if state['ranking_model'] is not None:
+        print(f"🎯 Модель ранжирования: обучена {state['ranking_model'].meta.get('trained_at', '?')}")
+    # Классификатор типов вопросов (python -m analytics.train_question_classifier);
+    # без файла модели - обучается на встроенных примерах
+    classifier = load_question_classifier()
+    if classifier is None:
+        classifier = QuestionClassifier.train(seed_examples())
+    else:
+        print(f"❓ Классификатор вопросов: обучен {classifier.meta.get('trained_at', '?')}")
+    state['question_classifier'] = classifier
+    # Заранее сгенерированные ответы (python -m analytics.pregenerate_answers) -
+    # только для строк прайса, которые не менялись после генерации
+    answers = AnswerCache()
+    if answers.load(DB_FILE, catalog.tours):
+        print(f"💬 Готовых ответов по турам: {len(answers)}")
+        # Частые кластеры вопросов клиентов (python -m analytics.question_clusters)
+        if answers.load_clusters(load_clusters(QUESTION_CLUSTERS_PATH)):
+            print("🧩 Частые вопросы клиентов узнаются по кластерам")
+    state['answers'] = answers
+    return state, source
+
+def install_catalog_state(state):
+    """Подменяет каталог и все, что от него зависит, собранным в build_catalog_state()"""
+    global CATALOG, PROMPTS, RANKING_MODEL, QUESTION_CLASSIFIER, PREGENERATED_ANSWERS, _semantic_index
+    CATALOG = state['catalog']
+    TOURS[:] = CATALOG.tours
+    PROMPTS = state['prompts']
+    _semantic_index = state['semantic_index']
+    RANKING_MODEL = state['ranking_model']
+    QUESTION_CLASSIFIER = state['question_classifier']
+    PREGENERATED_ANSWERS = state['answers']
 
-# Загружаем данные при старте
-TOURS = load_tours()
+def load_tours():
+    """
+    Загружает каталог и заменяет CATALOG, TOURS и зависимые объекты
+    (при старте; /reload собирает их в отдельном потоке). Если прайс не
+    загрузился, прежний каталог остается. Возвращает источник загрузки.
+    """
+    state, source = build_catalog_state()
+    if state is not None:
+        install_catalog_state(state)
+    return source
+
+def get_tour_by_id(tour_id):
+    """Тур по ID через индекс каталога (вместо перебора TOURS)"""
+    return CATALOG.get(tour_id)
+
+# Каталог заполняется в run_startup() - импорт модуля не читает CSV
+CATALOG = Catalog([])
+TOURS = []
+RANKING_MODEL = None
+# Промпты DeepSeek: блоки туров пересобираются в load_tours(), счетчики кеша - для /stats
+PROMPTS = PromptBuilder()
+PROMPT_CACHE_STATS = PromptCacheStats()
+# Одинаковые одновременные вопросы к DeepSeek - один вызов на всех (singleflight.py)
+LLM_FLIGHTS = SingleFlight()
+# Пул вызовов DeepSeek: лимит одновременных запросов, справедливая очередь (llm_pool.py)
+LLM_POOL = LLMExecutor()
+# Предохранитель DeepSeek: при сбоях сразу отвечаем без LLM, таймаут по p95 (circuit_breaker.py)
+LLM_BREAKER = CircuitBreaker()
+# Тип вопроса без DeepSeek (question_classifier.py), загружается в load_tours(); счетчики - для /stats
+QUESTION_CLASSIFIER = None
+QUESTION_ROUTE_STATS = {'classified': 0, 'templated': 0, 'pregenerated': 0}
+# Ответы на частые вопросы по турам, сгенерированные офлайн (answer_cache.py)
+PREGENERATED_ANSWERS = AnswerCache()
 
 # ==================== БАЗА ДАННЫХ ====================
 def init_database():
-    """Инициализация базы данных для сбора статистики"""
+    """
+    Доводит схему базы статистики до актуальной версии.
+    Все таблицы и индексы описаны в analytics/schema.py.
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Таблица пользователей
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT,
-            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Таблица действий
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS actions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            action_type TEXT,
-            action_details TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        ''')
-        
-        # Таблица диалогов
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            category TEXT,
-            adults INTEGER DEFAULT 0,
-            children_count INTEGER DEFAULT 0,
-            children_ages TEXT,
-            pregnant BOOLEAN,
-            priorities TEXT,
-            health_issues TEXT,
-            selected_tour_id INTEGER,
-            conversation_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            conversation_end TIMESTAMP,
-            successful BOOLEAN DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ База данных {DB_FILE} создана")
+        migrate(DB_FILE)
+        print(f"✅ База данных {DB_FILE} готова (схема v{SCHEMA_VERSION})")
     except Exception as e:
         print(f"⚠️ Предупреждение БД: {e}")
 
-# Инициализируем БД
-init_database()
+# ==================== ОБСЛУЖИВАНИЕ БАЗЫ СТАТИСТИКИ ====================
+async def analytics_maintenance_loop():
+    """
+    Фоновая задача: переносит старые события в партиции и сводки пачками,
+    делает checkpoint WAL и инкрементальный VACUUM. Сама работа с SQLite
+    идет в отдельном потоке, чтобы не блокировать обработку сообщений.
+    """
+    await asyncio.sleep(MAINTENANCE_FIRST_DELAY_SECONDS)
+    while True:
+        try:
+            summary = await asyncio.to_thread(run_maintenance, DB_FILE, ANALYTICS_RETENTION_DAYS)
+            moved = sum(summary['archived'].values())
+            print(f"🧹 Обслуживание БД: перенесено {moved} событий старше {summary['cutoff']}, "
+                  f"VACUUM: {summary['vacuum'] or 'не нужен'}, {summary['seconds']:.1f} с")
+            if summary['needs_vacuum']:
+                print("⚠️ База статистики без auto_vacuum=INCREMENTAL - остановите бота и выполните "
+                      "python -m analytics.retention --vacuum")
+        except Exception as e:
+            print(f"⚠️ Ошибка обслуживания БД: {e}")
+            logger.log_error(
+                error_type=ERROR_TYPES['db_error'],
+                error_message=f"maintenance error: {str(e)}"
+            )
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+async def start_background_jobs(application):
+    """post_init: запускает фоновые задачи после старта приложения"""
+    application.bot_data['maintenance_task'] = asyncio.create_task(analytics_maintenance_loop())
+
+async def stop_background_jobs(application):
+    """post_shutdown: останавливает фоновые задачи"""
+    task = application.bot_data.pop('maintenance_task', None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    close_stats_reader()
+
+# ==================== ЧТЕНИЕ СТАТИСТИКИ ====================
+_stats_reader = None
+
+def get_stats_reader():
+    """Создает читателя статистики при первой админ-команде"""
+    global _stats_reader
+    if _stats_reader is None:
+        _stats_reader = StatsReader(DB_FILE, timeout=STATS_QUERY_TIMEOUT)
+    return _stats_reader
+
+def close_stats_reader():
+    global _stats_reader
+    if _stats_reader is not None:
+        _stats_reader.close()
+        _stats_reader = None
+
+# ==================== ФАЗА СТАРТА ====================
+def run_startup():
+    """
+    Загружает каталог и готовит БД. Вызывается из main() (и из бенчмарков),
+    а не при импорте модуля - так импорт остается быстрым, а каждая фаза
+    старта измеряется отдельно.
+    Возвращает словарь {фаза: секунды}.
+    """
+    timings = {}
+    
+    started = time.perf_counter()
+    source = load_tours()
+    timings['catalog'] = time.perf_counter() - started
+    print(f"📚 Каталог: {len(TOURS)} экскурсий (источник: {source})")
+    
+    started = time.perf_counter()
+    init_database()
+    timings['database'] = time.perf_counter() - started
+    
+    print("⏱ Старт: " + ", ".join(f"{phase} {seconds * 1000:.1f} мс" for phase, seconds in timings.items()))
+    return timings
 
 def log_user_action(user_id, action_type, action_details=""):
     """Логирование действий пользователя"""
@@ -241,12 +379,7 @@ def update_conversation_log(conv_id, **kwargs):
 # ==================== КАТЕГОРИИ ====================
 # Берем уникальные категории из CSV
 def get_categories():
-    categories = set()
-    for tour in TOURS:
-        category = tour.get("Для информации", "").strip()
-        if category:
-            categories.add(category)
-    return sorted(list(categories))
+    return list(CATALOG.categories)
 
 def is_general_recommendation_question(text):
     """
@@ -315,56 +448,20 @@ def is_likely_question(text):
 
 def format_deepseek_answer(text):
     """
-    Красиво форматирует ответ DeepSeek для отправки в Telegram.
-    Добавляет разбиение на абзацы и улучшает визуальное восприятие.
+    Красиво форматирует ответ DeepSeek для отправки в Telegram (parse_mode='HTML'):
+    абзацы, буллеты, эмодзи; Markdown ответа переводится в сбалансированный
+    HTML за один проход (answer_format.py)
     """
     if not text:
         return text
-    
-    # Заменяем двойные точки на иконки для лучшего формата
-    text = text.replace('•', '▪️')
-    
-    # Если текст содержит точки - разбиваем на абзацы (каждое предложение на новую строку)
-    # но сохраняем список буллетов
-    sentences = text.split('. ')
-    if len(sentences) > 2:
-        # Есть несколько предложений - разделяем их
-        formatted_lines = []
-        for i, sentence in enumerate(sentences):
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-            # Добавляем точку обратно если её нет
-            if not sentence.endswith('.'):
-                sentence += '.'
-            formatted_lines.append(sentence)
-        
-        # Группируем по 2 предложения в абзац для лучшего восприятия
-        text = '\n\n'.join(formatted_lines)
-    
-    # Дополняем эмодзи в нужных местах для визуального интереса
-    emoji_replacements = {
-        'Пхи-Пхи': '🏝️ Пхи-Пхи',
-        'Симилан': '🌊 Симилан',
-        'тур': '🎫 тур',
-        'цена': '💰 цена',
-        'группа': '👥 группа',
-        'кораллы': '🪸 кораллы',
-        'дайвинг': '🤿 дайвинг',
-        'снорклинг': '🏊 снорклинг',
-        'пляж': '🏖️ пляж',
-        'рыба': '🐠 рыба',
-        'Юг': '⛵ Юг',
-        'Север': '🧭 Север',
-    }
-    
-    # Очень осторожно добавляем эмодзи чтобы не переделать всё
-    for key, emoji in emoji_replacements.items():
-        # Только если этот emoji ещё не добавлен
-        if key in text and emoji not in text:
-            text = text.replace(key, emoji, 1)  # Только первое вхождение
-    
-    return text
+    return format_answer(text)
+
+# Стоп-слова которые не помогают в поиске экскурсий
+SEARCH_STOP_WORDS = {'хочу', 'давайте', 'укажите', 'ответьте', 'посоветуйте',
+                     'что', 'как', 'где', 'когда', 'приложить', 'пожалуйста',
+                     'буду', 'нужна', 'нужны', 'можно', 'есть', 'все', 'если',
+                     'про', 'рассказать', 'ищу', 'посмотреть', 'увидеть', 'видеть',
+                     'показать', 'узнать', 'расскажи'}
 
 def search_tours_by_keywords(query):
     """
@@ -392,8 +489,8 @@ def search_tours_by_keywords(query):
             keywords_lower = str(keywords).lower()
             if query_lower in keywords_lower:
                 relevance += 50
-            # Ищем по отдельным словам
-            query_words = query_lower.split()
+            # Ищем по отдельным словам (предлоги вроде "на", "с" совпадали с любым туром)
+            query_words = [w for w in query_lower.split() if len(w) > 3 and w not in SEARCH_STOP_WORDS]
             for word in query_words:
                 if word in keywords_lower:
                     relevance += 10
@@ -423,54 +520,18 @@ def search_tours_by_keywords(query):
     return results
 
 # ==================== ГИБРИДНЫЙ ПОИСК С НОРМАЛИЗАЦИЕЙ ====================
-def get_lemma_variants(word):
-    """
-    Возвращает возможные морфологические варианты слова для поиска.
-    Простая лемматизация без использования pymorphy2.
-    """
-    variants = {word}  # Добавляем исходное слово
-    
-    # Словарь известных мор-вариантов для туризма
-    lemma_dict = {
-        'слон': ['слон', 'слона', 'слонов', 'слонам', 'слонами', 'слонах'],
-        'черепа': ['черепаха', 'черепахи', 'черепаху', 'черепахой', 'черепах', 'черепаховая', 'черепаховой'],
-        'дельфин': ['дельфин', 'дельфина', 'дельфинов', 'дельфинам'],
-        'остров': ['остров', 'острова', 'островов', 'островам'],
-        'пещер': ['пещер', 'пещера', 'пещеры', 'пещерах'],
-        'рафтинг': ['рафтинг', 'рафтинга', 'рафтингом'],
-        'аквапарк': ['аквапарк', 'аквапарка', 'аквапарков'],
-        'каток': ['каток', 'катка', 'катков', 'катке'],
-        'храм': ['храм', 'храма', 'храмов', 'храме'],
-        'монастырь': ['монастырь', 'монастыря', 'монастырей'],
-        'водопад': ['водопад', 'водопада', 'водопадов'],
-    }
-    
-    # Проверяем есть ли слово в словаре
-    for base, variants_list in lemma_dict.items():
-        if word in variants_list:
-            # Добавляем все варианты этого слова
-            variants.update(variants_list)
-            break
-    
-    # Для других слов пытаемся удалить окончания
-    if len(word) > 4:
-        # Удаляем окончания -ов, -ов/-ов, -ах, -ой
-        if word.endswith(('ов', 'ов', 'ах', 'ой')):
-            base = word[:-2]
-            variants.add(base)
-            variants.add(base + 'а')
-    
-    return list(variants)
-
 def search_tours_by_keywords_hybrid(query):
     """
     ГИБРИДНЫЙ ПОИСК с нормализацией и лемматизацией:
     1. Точный поиск (как раньше)
-    2. Поиск в отдельных словах фразы (для "хочу увидеть слонов")
-       - Лемматизация слов (слон/слонов/слонам)
+    2. Смысловой поиск по описаниям (TF-IDF + LSA, semantic_search.py) -
+       "хочу поплавать с рыбками без толпы", "покататься на квадроциклах"
+    3. Поиск по основам отдельных слов фразы (для "хочу увидеть слонов")
+       - Основы слов стеммером Snowball (слон/слонов/слонам -> слон, stemmer.py)
+         по готовому индексу каталога CATALOG.stem_index
        - Отсеиваем стоп-слова типа "хочу", "давайте", "укажите"
-    3. Размытый поиск (difflib) если точный не дал результатов
-    4. Если всё равно ничего - возвращает пусто для DeepSeek
+    4. Размытый поиск (difflib) если точный не дал результатов
+    5. Если всё равно ничего - возвращает пусто для DeepSeek
     """
     from difflib import get_close_matches
     
@@ -479,46 +540,30 @@ def search_tours_by_keywords_hybrid(query):
     if results:
         return results, query
     
-    # Шаг 2: Поиск в отдельных словах фразы (с отсеиванием стоп-слов и лемматизацией)
-    words = query.lower().split()
+    # Шаг 2: Смысловой поиск - на размеченных запросах точнее поиска по отдельным
+    # словам (benchmarks/search_benchmark.py) и не требует difflib или DeepSeek
+    results = search_tours_semantic(query)
+    if results:
+        return results, query
     
-    # Стоп-слова которые не помогают в поиске экскурсий
-    stop_words = {'хочу', 'давайте', 'укажите', 'ответьте', 'посоветуйте',
-                  'что', 'как', 'где', 'когда', 'приложить', 'пожалуйста',
-                  'буду', 'нужна', 'нужны', 'можно', 'есть', 'все', 'если',
-                  'про', 'рассказать', 'ищу', 'посмотреть', 'увидеть', 'видеть',
-                  'показать', 'узнать', 'расскажи'}
+    # Шаг 3: Поиск по основам слов фразы (с отсеиванием стоп-слов)
+    words = query.lower().split()
     
     # Сортируем слова по длине (longer = более специфичные)
     # и отсеиваем стоп-слова
-    content_words = [w for w in words if len(w) > 3 and w not in stop_words]
+    content_words = [w for w in words if len(w) > 3 and w not in SEARCH_STOP_WORDS]
     content_words.sort(key=len, reverse=True)  # Сначала длинные слова
     
-    # Пытаемся искать каждое слово и его варианты
-    # Собираем ВСЕ результаты по всем вариантам лемм для максимального покрытия
-    all_lemma_results = {}  # tour_id -> (tour, category, relevance)
-    found_word = None
-    
-    for word in content_words:
-        # Получаем варианты слова (лемматизация)
-        lemma_variants = get_lemma_variants(word)
-        
-        # Ищем по всем вариантам
-        for variant in lemma_variants:
-            results = search_tours_by_keywords(variant)
-            if results:
-                found_word = word  # Запоминаем первое слово которое дало результаты
-                for tour, category, relevance in results:
-                    tour_id = tour.get('ID')
-                    if tour_id not in all_lemma_results:
-                        all_lemma_results[tour_id] = (tour, category, relevance)
-    
-    # Если нашли результаты - возвращаем все уникальные
-    if all_lemma_results:
-        results = list(all_lemma_results.values())
+    # Основы слов запроса кешируются в stemmer.stem, туры по основам - из индекса каталога
+    stems = [stem(word) for word in content_words]
+    found, matched = CATALOG.search_stems(stems)
+    if found:
+        found_word = content_words[stems.index(matched[0])]  # Первое слово, которое дало результаты
+        results = [(tour, tour.get('Для информации', 'Неизвестная категория'), relevance)
+                   for tour, relevance in found]
         return results, found_word
     
-    # Шаг 3: Размытый поиск (для опечаток и словоформ)
+    # Шаг 4: Размытый поиск (для опечаток и словоформ)
     all_searchable = set()
     
     for tour in TOURS:
@@ -553,9 +598,79 @@ def search_tours_by_keywords_hybrid(query):
                 if results:
                     return results, close[0]
     
-    # Шаг 4: Если ничего не найдено - пусто
+    # Шаг 5: Если ничего не найдено - пусто
     return [], query
 
+# ==================== СМЫСЛОВОЙ ПОИСК ====================
+_semantic_index = None
+
+def build_semantic_index(catalog):
+    """
+    Смысловой индекс каталога: читается из файла рядом с CSV или строится
+    (~0.25 с). Вызывается из build_catalog_state() - при старте и в потоке
+    /reload, а не в обработчиках. None - numpy недоступен.
+    """
+    try:
+        started = time.perf_counter()
+        index, source = semantic_search.load_or_build(catalog, CSV_FILE)
+    except ImportError as e:
+        print(f"⚠️ Смысловой поиск недоступен: {e}")
+        return None
+    print(f"🧭 Смысловой индекс: {len(index.tour_ids)} туров "
+          f"({source}, {(time.perf_counter() - started) * 1000:.0f} мс)")
+    return index
+
+def get_semantic_index():
+    """Смысловой индекс текущего каталога (подменяется вместе с CATALOG); None - поиск выключен"""
+    return _semantic_index
+
+def search_tours_semantic(query, limit=semantic_search.TOP_K):
+    """Туры, близкие к запросу по смыслу: список (тур, категория, релевантность) как у поиска по словам"""
+    index = get_semantic_index()
+    if index is None:
+        return []
+    results = []
+    for tour_id, score in index.search(query, k=limit):
+        tour = get_tour_by_id(tour_id)
+        if tour:
+            results.append((tour, tour.get('Для информации', 'Неизвестная категория'), int(score * 100)))
+    return results
+
+# Сколько туров подбирать в промпт DeepSeek, когда тур не выбран (строки фактов - PROMPTS.facts)
+RAG_TOP_K = 5
+RAG_CANDIDATES = 15
+RAG_RELATIVE_SCORE = 0.6      # туры с близостью ниже этой доли от лучшего - шум, в промпт не идут
+# Нижние пороги: лучший тур ближе RAG_MIN_SCORE (смысловой индекс) или с релевантностью
+# по основам слов от RAG_MIN_STEM_RELEVANCE - иначе вопрос не про экскурсии ("погода",
+# "такси до аэропорта"), фактов нет. Подобраны по benchmarks/rag_context_check.py
+RAG_MIN_SCORE = 0.45
+RAG_MIN_STEM_RELEVANCE = 50
+
+def retrieve_tours(question, user_data=None, k=RAG_TOP_K):
+    """
+    Туры, о которых, скорее всего, вопрос без выбранного тура: смысловой
+    индекс (лучший не ниже RAG_MIN_SCORE, остальные не дальше
+    RAG_RELATIVE_SCORE от него), без результата - основы слов
+    (CATALOG.search_stems, релевантность от RAG_MIN_STEM_RELEVANCE); только
+    безопасные для группы (filter_tours_by_safety), не больше k.
+    Пустой список - подходящих туров нет.
+    """
+    found = []
+    index = get_semantic_index()
+    if index is not None:
+        scored = index.search(question, k=RAG_CANDIDATES)
+        if scored and scored[0][1] >= RAG_MIN_SCORE:
+            found = [get_tour_by_id(tour_id) for tour_id, score in scored
+                     if score >= scored[0][1] * RAG_RELATIVE_SCORE]
+    if not any(found):
+        words = [w for w in normalize_question(question).split() if len(w) > 3 and w not in SEARCH_STOP_WORDS]
+        stem_found, _ = CATALOG.search_stems([stem(word) for word in words])
+        found = [tour for tour, relevance in stem_found[:RAG_CANDIDATES] if relevance >= RAG_MIN_STEM_RELEVANCE]
+    found = [tour for tour in found if tour]
+    if user_data:
+        found = filter_tours_by_safety(found, user_data)
+    return found[:k]
+
 # === ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ ВИЗУАЛА ===
 
 async def send_message_with_effect(update, text, reply_markup=None, parse_mode='Markdown', use_effect=True):
@@ -757,6 +872,12 @@ def save_partial_data(context, new_data):
         for issue in new_data['health_issues']:
             if issue not in user_data['health_issues']:
                 user_data['health_issues'].append(issue)
+    
+    # Дни поездки ("будем с 24.12 по 28.12", "только в выходные") - маска дней недели
+    if new_data.get('raw_text'):
+        days_mask = days_mask_in_text(new_data['raw_text'])
+        if days_mask:
+            user_data['travel_days_mask'] = days_mask
 
 def check_missing_points(user_data):
     """Проверяет, какие данные отсутствуют"""
@@ -1152,71 +1273,25 @@ def rank_tours_by_hits_and_priorities(tours, user_data):
 
 def rank_tours_by_priorities(tours, user_data):
     """
-    Ранжирует экскурсии по приоритетам пользователя
+    Ранжирует экскурсии по приоритетам пользователя.
+    Векторы признаков туров посчитаны при загрузке каталога (ranking.py),
+    балл - скалярное произведение с весами приоритетов (+ веса модели,
+    обученной по логам, для профиля группы); при равных баллах порядок
+    сохраняется.
     """
     priorities = user_data.get('priorities', [])
+    model_weights = RANKING_MODEL.weights_for(group_profile(user_data)) if RANKING_MODEL else None
     
-    if not priorities or not tours:
+    if not (priorities or model_weights) or not tours:
         return tours
     
-    scored_tours = []
-    
-    for tour in tours:
-        score = 0
-        tour_name = tour.get("Название", "").lower()
-        tour_description = tour.get("Описание", "").lower()
-        tour_price = tour.get("Цена Взр", "")
-        
-        # Проверяем каждый приоритет
-        for priority in priorities:
-            if priority == 'комфорт':
-                if any(keyword in tour_name or keyword in tour_description 
-                      for keyword in ['комфорт', 'люкс', 'vip', 'индивидуал', 'част']):
-                    score += 3
-                elif 'маленьк' in tour_description or 'минигрупп' in tour_description:
-                    score += 2
-            
-            elif priority == 'бюджет':
-                try:
-                    # Пробуем извлечь цену
-                    price = int(''.join(filter(str.isdigit, tour_price)))
-                    if price < 2000:  # Дешевые экскурсии
-                        score += 3
-                    elif price < 3500:  # Средние по цене
-                        score += 1
-                except:
-                    pass
-            
-            elif priority == 'фотографии':
-                if any(keyword in tour_name or keyword in tour_description 
-                      for keyword in ['фото', 'instagram', 'инстаграм', 'красив', 'живописн', 'панорам']):
-                    score += 3
-            
-            elif priority == 'не рано вставать':
-                start_time = tour.get("Время начала", "").lower()
-                if start_time and 'утр' in start_time:
-                    # Если начинается позже 9 утра
-                    if '9' in start_time or '10' in start_time or '11' in start_time:
-                        score += 3
-                    elif '8' not in start_time and '7' not in start_time:
-                        score += 2
-                elif not start_time:  # Если время не указано, предполагаем что не рано
-                    score += 1
-            
-            elif priority == 'без толп':
-                if any(keyword in tour_description 
-                      for keyword in ['маленьк групп', 'индивидуал', 'част', 'уединен']):
-                    score += 3
-                elif 'групп' in tour_description and 'больш' not in tour_description:
-                    score += 1
-        
-        scored_tours.append((score, tour))
-    
-    # Сортируем по убыванию баллов
-    scored_tours.sort(key=lambda x: x[0], reverse=True)
-    
-    # Возвращаем только экскурсии (без баллов)
-    return [tour for _, tour in scored_tours]
+    return CATALOG.features.rank(tours, priorities, model_weights)
+
+def tour_priority_score(tour, priorities):
+    """Баллы тура по приоритетам пользователя (используется ранжированием и /plan)"""
+    if not priorities:
+        return 0
+    return CATALOG.features.score(tour, priorities)
 
 # ==================== ФОРМАТИРОВАНИЕ ОПИСАНИЙ (НОВОЕ - в стиле Алекса) ====================
 
@@ -1226,49 +1301,47 @@ def calculate_total_cost(tour, adults, children_ages):
     Возвращает красиво отформатированную строку с расчетом.
     """
     try:
-        price_adult_str = str(tour.get('Цена Взр', '0')).replace('฿', '').strip()
-        price_child_str = str(tour.get('Цена Дет', '0')).replace('฿', '').strip()
-        
-        # Обработка диапазонов цен (например "2900 / 2700")
-        if '/' in price_adult_str:
-            price_adult = int(price_adult_str.split('/')[0].strip())
-        else:
-            price_adult = int(price_adult_str) if price_adult_str.isdigit() else 0
-        
-        if price_child_str and price_child_str != "⛔️" and price_child_str.lower() != "уточняйте":
-            if '/' in price_child_str:
-                price_child = int(price_child_str.split('/')[0].strip())
-            else:
-                price_child = int(price_child_str) if price_child_str.isdigit() else 0
-        else:
-            price_child = 0
-        
-        # Расчет для взрослых
-        adults_total = adults * price_adult
-        
-        # Расчет для детей
-        kids_total = 0
-        kids_count = 0
-        for age_months in children_ages:
-            if age_months >= 12:  # Дети старше 1 года платят
-                kids_count += 1
-                kids_total += price_child if price_child > 0 else price_adult
-        
-        total = adults_total + kids_total
+        # Цены разобраны при загрузке каталога (pricing.py), расчет для группы кешируется
+        quote = CATALOG.prices.quote(tour.get('ID', ''), adults, children_ages)
+        if quote is None:
+            # Тур не из каталога (нет ID) - разбираем цену на месте
+            quote = Quote(TourPrice.from_row(tour), adults, paying_children(children_ages))
+        
+        price_adult = quote.adult_price
+        adults_total = quote.adults_total
+        kids_count = quote.kids
+        kids_total = quote.kids_total
+        total = quote.total
         
         # Красивое форматирование
         breakdown = f"\n💰 <b>ИТОГО для вашей группы: {total}฿</b>\n"
         breakdown += f"• Взрослые: {adults} × {price_adult}฿ = {adults_total}฿\n"
         
         if kids_count > 0:
-            price_per_kid = price_child if price_child > 0 else price_adult
-            breakdown += f"• Дети: {kids_count} × {price_per_kid}฿ = {kids_total}฿\n"
+            breakdown += f"• Дети: {kids_count} × {quote.child_price}฿ = {kids_total}฿\n"
+        
+        if total and quote.prepayment_percent < 100:
+            breakdown += f"• Предоплата {quote.prepayment_percent}%: {quote.prepayment}฿, остаток в день тура\n"
         
         return breakdown
     except Exception as e:
         logging.error(f"Ошибка расчета стоимости: {e}")
         return ""
 
+def format_cheapest_tours(tours, user_data, limit=3):
+    """Блок "самые выгодные для вашей группы" (Markdown) по уже отфильтрованным турам"""
+    adults = user_data.get('adults', 0) or 1
+    cheapest = CATALOG.prices.cheapest(tours, adults, user_data.get('children', []), limit)
+    if not cheapest:
+        return ""
+    
+    text = "\n💸 *Самые выгодные для вашей группы*\n"
+    for tour, quote in cheapest:
+        name = tour.get("Название", "").replace("(ХИТ)", "").replace("ХИТ", "").strip()
+        price_note = "" if quote.exact else " (от)"
+        text += f"• {name} — *{quote.total}฿*{price_note}, предоплата {quote.prepayment}฿\n"
+    return text
+
 def format_tour_card_compact(tour, index=None):
     """
     Форматирует тур в компактную КАРТОЧКУ без излишеств.
@@ -1951,7 +2024,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return await proceed_to_tours(update, context, context.user_data['user_data'])
         
         # Запрашиваем данные пользователя
-        category_tours = [t for t in TOURS if t.get("Для информации", "") == user_choice]
+        category_tours = CATALOG.tours_in_category(user_choice)
         context.user_data['filtered_tours'] = category_tours
         
         hit_tours = [t for t in category_tours if "ХИТ" in t.get("Название", "")]
@@ -1998,7 +2071,9 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         tour_examples = "\n".join([f"• {t.get('Название', 'Тур')}" for t in sample_tours])
         
-        deepseek_comment = generate_deepseek_response(
+        deepseek_comment = await deepseek_or_fallback(
+            user.id,
+            fallback=f"По вашему запросу нашел {len(matching_tours)} экскурсий. Вот примеры:\n{tour_examples}",
             user_query=f"Пользователь спросил про: {user_choice}. Я нашел {len(matching_tours)} экскурсий по этому запросу. "
                        f"Вот примеры: {tour_examples}",
             tour_data=None,
@@ -2019,7 +2094,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pass
         await update.message.reply_text(
             deepseek_comment, 
-            parse_mode='Markdown',
+            parse_mode='HTML',
             reply_markup=ReplyKeyboardRemove()  # 🔨 УБИРАЕМ СТАРУЮ КЛАВИАТУРУ
         )
         await asyncio.sleep(0.8)  # 🔨 УВЕЛИЧЕННАЯ ПАУЗА (0.8 сек вместо 0.3)
@@ -2079,7 +2154,8 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # === АНАЛИТИКА ===
         track_user_session(context, BOT_STAGES['category_selection'], {'search_query': user_choice})
-        logger.log_action(user.id, "searched_tours", stage=BOT_STAGES['category_selection'], query=user_choice, found=len(matching_tours))
+        logger.log_action(user.id, "searched_tours", stage=BOT_STAGES['category_selection'],
+                          session_data={'query': user_choice, 'found': len(matching_tours)})
         context.user_data['last_action'] = 'search_query'
         # === КОНЕЦ АНАЛИТИКИ ===
         
@@ -2089,22 +2165,13 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if is_general_recommendation_question(user_choice):
         # ✅ ОБЩИЙ ВОПРОС - ПОКАЗЫВАЕМ ТОП-3 ХИТА
         # Получаем ТОП-3 хита по ID: 4, 20, 56
-        top_3_hits = []
-        for tour in TOURS:
-            tour_id = str(tour.get('ID', '')).strip()
-            if tour_id in ['4', '20', '56']:
-                top_3_hits.append(tour)
-        
-        # Сортируем в нужном порядке: 4, 20, 56
-        top_3_sorted = []
-        for tid in ['4', '20', '56']:
-            for tour in top_3_hits:
-                if str(tour.get('ID', '')).strip() == tid:
-                    top_3_sorted.append(tour)
-                    break
+        # (в нужном порядке: 4, 20, 56)
+        top_3_sorted = [tour for tour in map(get_tour_by_id, ['4', '20', '56']) if tour]
         
         if top_3_sorted:
-            deepseek_answer = generate_deepseek_response(
+            deepseek_answer = await deepseek_or_fallback(
+                user.id,
+                fallback="Вот три самые популярные экскурсии — смотрите описания и выбирайте:",
                 user_query=user_choice,
                 tour_data=None,
                 context_info=f"Пользователь спросил общий вопрос о рекомендациях. Показываю ТОП-3 самые популярные экскурсии: {', '.join([t.get('Название', '') for t in top_3_sorted])}",
@@ -2113,7 +2180,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             deepseek_answer = format_deepseek_answer(deepseek_answer)
             
-            await update.message.reply_text(deepseek_answer, parse_mode='Markdown', reply_markup=ReplyKeyboardRemove())
+            await update.message.reply_text(deepseek_answer, parse_mode='HTML', reply_markup=ReplyKeyboardRemove())
             
             # Сохраняем ТОП-3 для показа
             context.user_data['selected_category'] = "ТОП-3 хита"
@@ -2129,7 +2196,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # === АНАЛИТИКА ===
             track_user_session(context, BOT_STAGES['category_selection'], {'query': user_choice, 'showed_top_hits': True})
-            logger.log_action(user.id, "showed_top_3_hits", stage=BOT_STAGES['category_selection'], query=user_choice)
+            logger.log_action(user.id, "showed_top_3_hits", stage=BOT_STAGES['category_selection'], session_data={'query': user_choice})
             context.user_data['last_action'] = 'top_hits_shown'
             # === КОНЕЦ АНАЛИТИКИ ===
             
@@ -2138,7 +2205,10 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ВАРИАНТ 4: ТУРЫ НЕ НАЙДЕНЫ - ПРОВЕРЯЕМ, ЭТО ВОПРОС?
     if is_likely_question(user_choice):
         # ✅ ЭТО ВОПРОС - ОТВЕЧАЕМ DEEPSEEK
-        deepseek_answer = generate_deepseek_response(
+        deepseek_answer = await deepseek_or_fallback(
+            user.id,
+            # Поиск по прайсу для запасного ответа - только если DeepSeek не ответит
+            fallback=lambda: fallback_answer(user_choice),
             user_query=user_choice,
             tour_data=None,
             context_info="Пользователь еще не выбрал категорию, задает вопрос о Пхукете",
@@ -2147,7 +2217,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         deepseek_answer = format_deepseek_answer(deepseek_answer)
         
-        await update.message.reply_text(deepseek_answer, parse_mode='Markdown', reply_markup=ReplyKeyboardRemove())
+        await update.message.reply_text(deepseek_answer, parse_mode='HTML', reply_markup=ReplyKeyboardRemove())
         
         await update.message.reply_text(
             "📋 *Теперь выбирайте категорию экскурсий:*",
@@ -2157,7 +2227,7 @@ async def handle_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # === АНАЛИТИКА ===
         track_user_session(context, BOT_STAGES['category_selection'])
-        logger.log_action(user.id, "asked_question_at_category", stage=BOT_STAGES['category_selection'], query=user_choice)
+        logger.log_action(user.id, "asked_question_at_category", stage=BOT_STAGES['category_selection'], session_data={'query': user_choice})
         context.user_data['last_action'] = 'category_question'
         # === КОНЕЦ АНАЛИТИКИ ===
         
@@ -2192,7 +2262,7 @@ async def handle_category_choice(update: Update, context: ContextTypes.DEFAULT_T
             user_data = context.user_data['user_data']
             
             # Фильтруем морские туры (даже если они не подходят по ограничениям)
-            sea_tours = [t for t in TOURS if t.get("Для информации", "") == category]
+            sea_tours = CATALOG.tours_in_category(category)
             context.user_data['ranked_tours'] = sea_tours
             context.user_data['tour_offset'] = 0
             
@@ -2528,7 +2598,7 @@ async def handle_confirmation_choice(update: Update, context: ContextTypes.DEFAU
     elif user_choice == "📋 Только ознакомиться с морскими":
         # Показываем морские экскурсии, несмотря на ограничения
         category = "Море"
-        category_tours = [tour for tour in TOURS if tour.get("Для информации", "").strip() == "Море"]
+        category_tours = CATALOG.tours_in_category("Море")
         
         context.user_data['ranked_tours'] = category_tours
         context.user_data['tour_offset'] = 0
@@ -2639,6 +2709,16 @@ async def proceed_to_tours(update: Update, context: ContextTypes.DEFAULT_TYPE, u
     
     # 1. Фильтруем по безопасности
     safe_tours = filter_tours_by_safety(category_tours, user_data)
+    
+    # 1.1 Оставляем туры с выездом в дни поездки (пересечение масок, см. schedule.py).
+    # Если в эти дни нет ничего - показываем все, клиент может сдвинуть даты
+    travel_days_mask = user_data.get('travel_days_mask')
+    days_note = ""
+    if travel_days_mask:
+        tours_on_days = CATALOG.available_on(travel_days_mask, safe_tours)
+        if tours_on_days:
+            safe_tours = tours_on_days
+            days_note = f"📅 Только туры с выездом в ваши дни: {format_weekdays(travel_days_mask)}\n"
     context.user_data['safe_tours'] = safe_tours
     
     # 2. ЖЕСТКАЯ приоритизация: ХИТы сначала, потом остальные
@@ -2691,6 +2771,7 @@ async def proceed_to_tours(update: Update, context: ContextTypes.DEFAULT_TYPE, u
     hits = [t for t in ranked_tours if t.get('', '').strip() == 'ХИТ']
     
     response = f"🎉 Отлично! Подобрал для вас ЛУЧШИЕ экскурсии в категории *{category}*\n"
+    response += days_note
     
     if hits:
         response += f"\n🏆 *Наши ХИТы* ({len(hits)} всего)\n"
@@ -2703,6 +2784,10 @@ async def proceed_to_tours(update: Update, context: ContextTypes.DEFAULT_TYPE, u
         if len(hits) > 3:
             response += f"\n💡 Всего ХИТов: {len(hits)}. Остальные можно посмотреть ниже!\n"
     
+    # Для тех, кто экономит - самые дешевые из безопасных с итогом на всю группу
+    if 'бюджет' in user_data.get('priorities', []):
+        response += format_cheapest_tours(safe_tours, user_data)
+    
     response += "\n💡 Нажимайте на любой тур для полного описания!"
     
     await update.message.reply_text(
@@ -2719,6 +2804,22 @@ async def proceed_to_tours(update: Update, context: ContextTypes.DEFAULT_TYPE, u
     
     return TOUR_DETAILS
 
+def log_tour_opened(user_id, context, tour):
+    """
+    Открытие карточки тура: ID, категория, позиция в показанном списке и
+    профиль группы - примеры для обучения ранжирования (analytics/learn_to_rank.py)
+    """
+    tour_id = str(tour.get('ID', '')).strip()
+    ranked_ids = [str(t.get('ID', '')).strip() for t in context.user_data.get('ranked_tours', [])]
+    logger.log_action(
+        user_id, "viewed_tour", stage=BOT_STAGES['tour_details'],
+        tour_id=tour_id or None, category=context.user_data.get('category'),
+        session_data={
+            'profile': group_profile(context.user_data.get('user_data', {})),
+            'position': ranked_ids.index(tour_id) if tour_id in ranked_ids else None,
+        }
+    )
+
 async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик выбора конкретной экскурсии"""
     query = update.callback_query
@@ -2729,7 +2830,9 @@ async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TY
     # === АНАЛИТИКА: ПРОСМОТР ЭКСКУРСИИ ===
     user = query.from_user
     track_user_session(context, BOT_STAGES['tour_details'])
-    logger.log_action(user.id, "viewed_tour", stage=BOT_STAGES['tour_details'])
+    # Открытие карточки логируется ниже, с ID тура и профилем группы (для обучения ранжирования)
+    if not callback_data.startswith("tour_"):
+        logger.log_action(user.id, "viewed_tour", stage=BOT_STAGES['tour_details'])
     context.user_data['last_action'] = 'tour_view'
     # === КОНЕЦ АНАЛИТИКИ ===
     
@@ -2739,22 +2842,8 @@ async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TY
         try:
             tour_id = callback_data.split("tour_id_")[1]
             
-            # Ищем тур по ID в ranked_tours или во всех TOURS
-            ranked_tours = context.user_data.get('ranked_tours', [])
-            tour = None
-            
-            # Сначала ищем в ranked_tours
-            for t in ranked_tours:
-                if str(t.get('ID', '')).strip() == tour_id:
-                    tour = t
-                    break
-            
-            # Если не нашли, ищем во всех турах
-            if not tour:
-                for t in TOURS:
-                    if str(t.get('ID', '')).strip() == tour_id:
-                        tour = t
-                        break
+            # Ищем тур по ID через индекс каталога
+            tour = get_tour_by_id(tour_id)
             
             if not tour:
                 await query.answer("❌ Экскурсия не найдена", show_alert=True)
@@ -2785,6 +2874,8 @@ async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TY
     
     # Общая обработка для обоих форматов - показываем описание тура
     if 'tour' in locals() and tour:
+        log_tour_opened(user.id, context, tour)
+        
         # ДОБАВЛЯЕМ ПОДСКАЗКУ ПЕРЕД ОПИСАНИЕМ
         tip_text = f"💡 *Совет:* Если у вас есть вопросы по экскурсии, просто спросите!\n\n"
         
@@ -2815,17 +2906,7 @@ async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TY
         tour_id = callback_data.split("more_info_id_")[1]
         
         # Ищем тур по ID
-        ranked_tours = context.user_data.get('ranked_tours', [])
-        tour = None
-        for t in ranked_tours:
-            if str(t.get('ID', '')).strip() == tour_id:
-                tour = t
-                break
-        if not tour:
-            for t in TOURS:
-                if str(t.get('ID', '')).strip() == tour_id:
-                    tour = t
-                    break
+        tour = get_tour_by_id(tour_id)
         
         if tour:
             additional_info = get_tour_additional_info(tour)
@@ -2928,17 +3009,7 @@ async def handle_tour_selection(update: Update, context: ContextTypes.DEFAULT_TY
         tour_id = callback_data.split("book_id_")[1]
         
         # Ищем тур по ID
-        ranked_tours = context.user_data.get('ranked_tours', [])
-        tour = None
-        for t in ranked_tours:
-            if str(t.get('ID', '')).strip() == tour_id:
-                tour = t
-                break
-        if not tour:
-            for t in TOURS:
-                if str(t.get('ID', '')).strip() == tour_id:
-                    tour = t
-                    break
+        tour = get_tour_by_id(tour_id)
         
         if tour:
             user_data = context.user_data.get('user_data', {})
@@ -3092,6 +3163,126 @@ async def show_tours(update: Update, context: ContextTypes.DEFAULT_TYPE):
     response += f"Всего в базе: {len(TOURS)} экскурсий"
     await update.message.reply_text(response, parse_mode='Markdown')
 
+PLAN_HIT_BONUS = 2  # ХИТ в программе ценнее обычного тура
+
+# Дата старта в /plan: ДД.ММ или ДД.ММ.ГГГГ ("20.000" - бюджет, а не дата)
+PLAN_DATE_RE = re.compile(r'^(\d{1,2})\.(\d{1,2})(?:\.(\d{2}|\d{4}))?$')
+PLAN_FROM_WORDS = ('с', 'c', 'from')
+
+def parse_plan_date(text, today):
+    """'24.12' -> date (без года и в прошлом - следующий год); None - это не дата"""
+    match = PLAN_DATE_RE.match(text)
+    if not match:
+        return None
+    day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+    if year:
+        year = int(year) + (2000 if len(year) == 2 else 0)
+    try:
+        start = datetime(year or today.year, month, day).date()
+    except ValueError:
+        return None
+    if not year and start < today:
+        start = start.replace(year=today.year + 1)
+    return start
+
+def parse_plan_args(args, today):
+    """
+    Аргументы /plan: <дней> <бюджет> [с ДД.ММ или ДД.ММ.ГГГГ].
+    Бюджет можно писать с пробелами или точками: /plan 5 20 000, /plan 5 20.000.
+    Последнее слово - дата, только если это настоящий ДД.ММ. ValueError при ошибке.
+    """
+    args = [arg.strip().lower() for arg in args if arg.strip()]
+    start = today + timedelta(days=1)
+    if len(args) >= 2 and args[-2] in PLAN_FROM_WORDS:
+        # "с 24.12" - после "с" обязательно дата
+        start = parse_plan_date(args[-1], today)
+        if start is None:
+            raise ValueError("Дата старта в формате ДД.ММ")
+        args = args[:-2]
+    elif len(args) >= 3 and parse_plan_date(args[-1], today):
+        start = parse_plan_date(args[-1], today)
+        args = args[:-1]
+    
+    if len(args) < 2:
+        raise ValueError("Нужны число дней и бюджет")
+    days = int(args[0])
+    budget_text = ''.join(args[1:]).replace('฿', '').replace('.', '').replace(',', '')
+    if not budget_text.isdigit():
+        raise ValueError("Бюджет - число")
+    budget = int(budget_text)
+    if not 1 <= days <= MAX_PLAN_DAYS or budget <= 0:
+        raise ValueError("Дней от 1 до 14, бюджет больше нуля")
+    return days, budget, start
+
+async def plan_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Программа на несколько дней под бюджет для группы пользователя.
+    /plan <дней> <бюджет> [с ДД.ММ], например /plan 5 20000 с 24.12
+    """
+    user = update.effective_user
+    # Данные группы, собранные в диалоге (save_partial_data)
+    user_data = context.user_data.get('user_data', {})
+    
+    try:
+        days, budget, start_date = parse_plan_args(list(context.args or []), datetime.now().date())
+    except (ValueError, IndexError):
+        await update.message.reply_text(
+            "📅 Подберу программу на несколько дней под ваш бюджет!\n\n"
+            "Формат: /plan <дней> <бюджет> [с ДД.ММ]\n"
+            "Например: /plan 5 20000 с 24.12"
+        )
+        return
+    
+    # Состав группы из диалога; если его еще не было - считаем на 2 взрослых
+    adults = user_data.get('adults', 0)
+    children_ages = user_data.get('children', [])
+    group_known = adults > 0 or bool(children_ages)
+    if not group_known:
+        adults = 2
+    
+    priorities = user_data.get('priorities', [])
+    safe_tours = filter_tours_by_safety(TOURS, user_data)
+    
+    def score(tour):
+        bonus = PLAN_HIT_BONUS if tour.get('', '').strip() == 'ХИТ' else 0
+        return 1 + bonus + tour_priority_score(tour, priorities)
+    
+    dates = [start_date + timedelta(days=i) for i in range(days)]
+    # Оптимизация ограничена по времени (itinerary.PLAN_TIME_LIMIT), но все равно не в event loop
+    plan = await asyncio.to_thread(
+        plan_itinerary, safe_tours, dates, budget, adults, children_ages, CATALOG.prices, score,
+        weekday_mask=CATALOG.weekday_mask
+    )
+    
+    logger.log_action(
+        user.id, "planned_itinerary", stage=BOT_STAGES['filtering'],
+        session_data={'days': days, 'budget': budget, 'tours': len(plan.tours), 'total': plan.total}
+    )
+    
+    if not plan.tours:
+        await update.message.reply_text(
+            f"😔 На {budget}฿ не получается собрать программу для вашей группы.\n"
+            "Попробуйте увеличить бюджет или посмотрите категории: /start"
+        )
+        return
+    
+    group_text = f"{adults} взр." + (f" + детей: {len(children_ages)}" if children_ages else "")
+    response = f"📅 ПРОГРАММА НА {days} ДН. ({group_text}), бюджет {budget}฿\n\n"
+    for day, tour, quote in plan.days:
+        day_name = f"{WEEKDAY_NAMES[day.weekday()]} {day:%d.%m}"
+        if tour is None:
+            response += f"{day_name} — свободный день 🏖\n"
+            continue
+        name = tour.get("Название", "").replace("(ХИТ)", "").replace("ХИТ", "").strip()
+        response += f"{day_name} — {name}: {quote.total}฿\n"
+    
+    response += f"\n💰 Итого: {plan.total}฿" + ("" if plan.exact else " (часть цен - \"от\")") + "\n"
+    response += f"💳 Предоплата: {plan.prepayment}฿\n"
+    if not group_known:
+        response += "\nℹ️ Посчитал на 2 взрослых. Для точного расчета с детьми начните с /start"
+    
+    await update.message.reply_text(response)
+
 async def debug_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда для отладки - показывает что бот запомнил"""
     if 'user_data' not in context.user_data:
@@ -3131,6 +3322,17 @@ async def debug_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(response, parse_mode='Markdown')
 
 
+def delete_user_analytics(target_user_id):
+    """Удаляет все данные пользователя из аналитики (вызывается из потока)"""
+    # timeout - ожидание блокировки записи, если в этот момент пишут логи
+    conn = sqlite3.connect(DB_FILE, timeout=STATS_QUERY_TIMEOUT)
+    try:
+        with conn:
+            for table in USER_ANALYTICS_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (target_user_id,))
+    finally:
+        conn.close()
+
 async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Очистить контекст пользователя - ТОЛЬКО ДЛЯ АДМИНОВ"""
     user_id = update.effective_user.id
@@ -3155,21 +3357,148 @@ async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Удаляем все данные пользователя из аналитики
-        cursor.execute("DELETE FROM user_actions WHERE user_id = ?", (target_user_id,))
-        cursor.execute("DELETE FROM drop_off_points WHERE user_id = ?", (target_user_id,))
-        cursor.execute("DELETE FROM analytics WHERE user_id = ?", (target_user_id,))
-        
-        conn.commit()
-        conn.close()
-        
+        # DELETE по четырем таблицам - в отдельном потоке, диалоги клиентов не ждут
+        await asyncio.to_thread(delete_user_analytics, target_user_id)
         await update.message.reply_text(f"✅ Контекст пользователя {target_user_id} очищен")
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при очистке: {e}")
 
+async def reload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Перечитать прайс без перезапуска бота - ТОЛЬКО ДЛЯ АДМИНОВ"""
+    user_id = update.effective_user.id
+
+    # Проверка на администратора
+    ADMINS = [7966971037]  # Ваш Telegram ID
+
+    if user_id not in ADMINS:
+        await update.message.reply_text("❌ Эта команда только для администраторов")
+        return
+
+    # Разбор CSV, снимок и модели - в отдельном потоке, клиенты не ждут;
+    # подмена каталога - только после успешной сборки
+    started = time.perf_counter()
+    try:
+        state, source = await asyncio.to_thread(build_catalog_state)
+    except Exception as e:
+        print(f"❌ Ошибка перезагрузки каталога: {e}")
+        state, source = None, 'error'
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if state is None:
+        await update.message.reply_text(
+            f"❌ Не удалось загрузить прайс, подробности в логах\n"
+            f"Остается прежний каталог: {len(TOURS)} экскурсий"
+        )
+        return
+    install_catalog_state(state)
+
+    source_text = "снимок (прайс не менялся)" if source == 'snapshot' else "CSV, снимок пересобран"
+    await update.message.reply_text(
+        f"✅ Каталог перезагружен: {len(TOURS)} экскурсий\n"
+        f"Источник: {source_text}\n"
+        f"Время: {elapsed_ms:.1f} мс"
+    )
+
+def parse_date_range(args, default_days=30):
+    """
+    Период из аргументов команды: [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД].
+    Без аргументов - последние default_days дней. ValueError при ошибке.
+    """
+    date_to = parse_date(args[1]) if len(args) > 1 else datetime.now().date()
+    date_from = parse_date(args[0]) if args else date_to - timedelta(days=default_days)
+    if date_from > date_to:
+        raise ValueError("Начало периода позже конца")
+    return date_from, date_to
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Выгрузка аналитики в Parquet / Arrow IPC - ТОЛЬКО ДЛЯ АДМИНОВ
+    /export [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД] [parquet|arrow]
+    По умолчанию - последние 30 дней в Parquet.
+    """
+    user_id = update.effective_user.id
+
+    # Проверка на администратора
+    ADMINS = [7966971037]  # Ваш Telegram ID
+
+    if user_id not in ADMINS:
+        await update.message.reply_text("❌ Эта команда только для администраторов")
+        return
+
+    args = list(context.args or [])
+    file_format = 'parquet'
+    if args and args[-1].lower() in EXPORT_FORMATS:
+        file_format = args.pop().lower()
+
+    try:
+        date_from, date_to = parse_date_range(args)
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Формат: /export [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД] [parquet|arrow]\n"
+            "Например: /export 2025-12-01 2025-12-31 parquet"
+        )
+        return
+
+    await update.message.reply_text(f"⏳ Выгружаю данные с {date_from} по {date_to} ({file_format})...")
+
+    out_dir = os.path.join(EXPORT_DIR, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    try:
+        # Чтение БД и запись файлов - в отдельном потоке, бот продолжает отвечать
+        results, seconds = await asyncio.to_thread(
+            export_analytics, out_dir, date_from, date_to, file_format, None, DB_FILE, EXPORT_TIMEOUT
+        )
+    except StatsTimeout:
+        print(f"⚠️ /export прерван: дольше {EXPORT_TIMEOUT:g} с")
+        await update.message.reply_text("⏳ Выгрузка идет слишком долго - возьмите период поменьше "
+                                        "или запустите python -m analytics.export на сервере")
+        return
+    except ImportError:
+        await update.message.reply_text("❌ Для выгрузки нужен pyarrow: pip install -r requirements.txt")
+        return
+    except Exception as e:
+        logger.log_error(
+            error_type=ERROR_TYPES['db_error'],
+            error_message=f"export error: {str(e)}",
+            user_id=user_id
+        )
+        await update.message.reply_text(f"❌ Ошибка выгрузки: {e}")
+        return
+
+    for table, path, rows in results:
+        size = os.path.getsize(path)
+        if size > TELEGRAM_DOCUMENT_LIMIT:
+            await update.message.reply_text(
+                f"📁 {table}: {rows} строк, {size / 1024 / 1024:.1f} МБ - больше лимита Telegram, "
+                f"файл сохранен на сервере: {path}"
+            )
+            continue
+        with open(path, 'rb') as f:
+            await update.message.reply_document(
+                document=f,
+                filename=os.path.basename(path),
+                caption=f"{table}: {rows} строк"
+            )
+
+    await update.message.reply_text(f"✅ Выгрузка готова за {seconds:.1f} с. Копия на сервере: {out_dir}")
+
+def collect_stats(conn):
+    """Все запросы /stats одним заходом (выполняется в потоке StatsReader)"""
+    cursor = conn.cursor()
+    data = {}
+    
+    for action in ('started_bot', 'chose_category', 'viewed_tour'):
+        cursor.execute(stats_queries.DISTINCT_USERS_BY_ACTION, {'action': action})
+        data[action] = cursor.fetchone()[0] or 0
+    
+    data['drop_offs'] = cursor.execute(stats_queries.DROP_OFFS_BY_STAGE).fetchall()
+    data['popular_tours'] = cursor.execute(stats_queries.TOP_TOURS).fetchall()
+    data['frequent_questions'] = cursor.execute(stats_queries.FREQUENT_QUESTION_TYPES).fetchall()
+    data['recent_errors'] = cursor.execute(stats_queries.RECENT_ERRORS).fetchall()
+    data['avg_session'] = cursor.execute(stats_queries.AVG_SESSION_DURATION).fetchone()[0]
+    data['today_actions'] = cursor.execute(stats_queries.TODAY_ACTIONS).fetchone()[0]
+    data['today_users'] = cursor.execute(stats_queries.TODAY_USERS).fetchone()[0]
+    return data
+
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать расширенную статистику бота с аналитикой - ТОЛЬКО ДЛЯ АДМИНОВ"""
     user_id = update.effective_user.id
@@ -3183,20 +3512,15 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # ==================== ОБЩАЯ СТАТИСТИКА ====================
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        # Запросы - в потоке чтения, event loop в это время обслуживает клиентов
+        data = await get_stats_reader().run(collect_stats)
         
         response = "📊 РАСШИРЕННАЯ СТАТИСТИКА БОТА АЛЕКСА\n\n"
         
         # 1. БАЗОВАЯ СТАТИСТИКА
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM user_actions WHERE action='started_bot'")
-        started_bot = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM user_actions WHERE action='chose_category'")
-        chose_category = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM user_actions WHERE action='viewed_tour'")
-        viewed_tour = cursor.fetchone()[0] or 0
+        started_bot = data['started_bot']
+        chose_category = data['chose_category']
+        viewed_tour = data['viewed_tour']
         
         response += "📈 КОНВЕРСИЯ ПО ЭТАПАМ:\n"
         response += f"• /start: {started_bot} пользователей\n"
@@ -3204,13 +3528,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         response += f"• Просмотр экскурсий: {viewed_tour} ({(viewed_tour/started_bot*100 if started_bot > 0 else 0):.1f}% от стартов)\n\n"
         
         # 2. ТОЧКИ УХОДА (DROP-OFFS)
-        cursor.execute('''
-            SELECT drop_off_stage, COUNT(*) as count 
-            FROM drop_off_points 
-            GROUP BY drop_off_stage 
-            ORDER BY count DESC
-        ''')
-        drop_offs = cursor.fetchall()
+        drop_offs = data['drop_offs']
         
         if drop_offs:
             response += "📍 ТОЧКИ УХОДА КЛИЕНТОВ:\n"
@@ -3219,15 +3537,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             response += "\n"
         
         # 3. САМЫЕ ПОПУЛЯРНЫЕ ЭКСКУРСИИ
-        cursor.execute('''
-            SELECT tour_name, COUNT(*) as views, AVG(view_time_seconds) as avg_time 
-            FROM tour_views 
-            WHERE tour_name IS NOT NULL 
-            GROUP BY tour_name 
-            ORDER BY views DESC 
-            LIMIT 5
-        ''')
-        popular_tours = cursor.fetchall()
+        popular_tours = data['popular_tours']
         
         if popular_tours:
             response += "🏆 ТОП-5 ЭКСКУРСИЙ:\n"
@@ -3238,31 +3548,16 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             response += "\n"
         
         # 4. ЧАСТЫЕ ВОПРОСЫ
-        cursor.execute('''
-            SELECT question_type, COUNT(*) as count 
-            FROM user_questions 
-            WHERE question_type IS NOT NULL 
-            GROUP BY question_type 
-            ORDER BY count DESC 
-            LIMIT 5
-        ''')
-        frequent_questions = cursor.fetchall()
+        frequent_questions = data['frequent_questions']
         
         if frequent_questions:
             response += "❓ ЧАСТЫЕ ВОПРОСЫ:\n"
             for q_type, count in frequent_questions:
-                response += f"• {q_type}: {count} раз\n"
+                response += f"• {QUESTION_TYPES.get(q_type, q_type)}: {count} раз\n"
             response += "\n"
         
         # 5. ОШИБКИ (ТОЛЬКО ЗА ПОСЛЕДНИЕ 7 ДНЕЙ)
-        cursor.execute('''
-            SELECT error_type, COUNT(*) as count 
-            FROM error_logs 
-            WHERE timestamp > datetime('now', '-7 days')
-            GROUP BY error_type 
-            ORDER BY count DESC
-        ''')
-        recent_errors = cursor.fetchall()
+        recent_errors = data['recent_errors']
         
         if recent_errors:
             response += "⚠️ ОШИБКИ (7 ДНЕЙ):\n"
@@ -3271,8 +3566,7 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             response += "\n"
         
         # 6. ВРЕМЯ СЕССИЙ
-        cursor.execute('SELECT AVG(session_duration) FROM drop_off_points WHERE session_duration > 0')
-        avg_session = cursor.fetchone()[0]
+        avg_session = data['avg_session']
         
         if avg_session:
             avg_min = int(avg_session // 60)
@@ -3280,26 +3574,54 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             response += f"⏱️ Среднее время в боте: {avg_min} минут {avg_sec} секунд\n\n"
         
         # 7. АКТИВНОСТЬ СЕГОДНЯ
-        cursor.execute("SELECT COUNT(*) FROM user_actions WHERE DATE(timestamp) = DATE('now')")
-        today_actions = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM user_actions WHERE DATE(timestamp) = DATE('now')")
-        today_users = cursor.fetchone()[0]
-        
-        response += f"🚀 СЕГОДНЯ: {today_users} пользователей, {today_actions} действий\n"
-        
-        conn.close()
+        response += f"🚀 СЕГОДНЯ: {data['today_users']} пользователей, {data['today_actions']} действий\n"
+        
+        # 8. DEEPSEEK С ЗАПУСКА БОТА: кеш промптов и объединенные вопросы
+        cache = PROMPT_CACHE_STATS.snapshot()
+        flights = LLM_FLIGHTS.snapshot()
+        if cache['calls'] or flights['calls'] or LLM_POOL.shed or LLM_BREAKER.rejected or QUESTION_ROUTE_STATS['classified']:
+            response += f"\n🧠 DEEPSEEK (с запуска):\n"
+            if QUESTION_ROUTE_STATS['classified']:
+                response += (f"• Ответ без DeepSeek: шаблоном {QUESTION_ROUTE_STATS['templated']}, "
+                             f"готовым ответом по туру {QUESTION_ROUTE_STATS['pregenerated']} "
+                             f"из {QUESTION_ROUTE_STATS['classified']} вопросов\n")
+            response += f"• Вызовов: {cache['calls']}, из кеша: {cache['cached_calls']}\n"
+            response += (f"• Токены промпта: {cache['hit_tokens']} из кеша / {cache['miss_tokens']} без кеша "
+                         f"({cache['hit_share'] * 100:.1f}% из кеша)\n")
+            if cache['avg_cached'] is not None and cache['avg_uncached'] is not None:
+                response += (f"• Время ответа: {cache['avg_cached']:.2f} с из кеша, "
+                             f"{cache['avg_uncached']:.2f} с без кеша\n")
+            if flights['shared']:
+                response += (f"• Одинаковые одновременные вопросы: {flights['shared']} из {flights['calls']} "
+                             f"получили общий ответ (сэкономлено вызовов)\n")
+            pool = LLM_POOL.snapshot()
+            response += (f"• Очередь: ожидание p50 {pool['wait_p50']:.2f} с, p95 {pool['wait_p95']:.2f} с, "
+                         f"макс. глубина {pool['max_depth']} (лимит {pool['concurrency']} одновременно)\n")
+            if pool['shed'] or pool['cancelled']:
+                response += (f"• Без DeepSeek из-за очереди: {pool['shed']}, "
+                             f"отменено по таймауту: {pool['cancelled']}\n")
+            breaker = LLM_BREAKER.snapshot()
+            p95 = f"{breaker['p95']:.2f} с" if breaker['p95'] is not None else "нет данных"
+            response += (f"• Предохранитель: {breaker['state']}, размыкался {breaker['opened']} раз, "
+                         f"без DeepSeek {breaker['rejected']} вопросов; таймаут {breaker['timeout']:.1f} с (p95 {p95})\n")
+            if breaker['errors']:
+                response += "• Ошибки API: " + ", ".join(f"{kind} {count}" for kind, count in breaker['errors'].items()) + "\n"
         
         # Добавляем подсказки для администратора
         response += "\n" + "="*40 + "\n"
         response += "📋 КОМАНДЫ АНАЛИТИКИ:\n"
         response += "/stats_drops - Детали уходов\n"
+        response += "/stats_funnel - Воронка по категориям, дням и когортам\n"
         response += "/stats_errors - Все ошибки\n"
-        response += "/stats_questions - Все вопросы\n"
+        response += "/stats_questions - Частые вопросы\n"
         response += "/stats_tours - Все экскурсии\n"
         
         await update.message.reply_text(response)
         
+    except StatsTimeout:
+        print(f"⚠️ /stats прерван: дольше {STATS_QUERY_TIMEOUT:g} с")
+        await update.message.reply_text("⏳ Статистика считается слишком долго, попробуйте позже")
+        
     except Exception as e:
         print(f"❌ Ошибка статистики: {e}")
         import traceback
@@ -3328,21 +3650,7 @@ async def stats_drops_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT drop_off_stage, COUNT(*) as count, 
-                   AVG(session_duration) as avg_time,
-                   MIN(timestamp) as first_occurrence,
-                   MAX(timestamp) as last_occurrence
-            FROM drop_off_points 
-            GROUP BY drop_off_stage 
-            ORDER BY count DESC
-        ''')
-        
-        drops = cursor.fetchall()
-        conn.close()
+        drops = await get_stats_reader().fetchall(stats_queries.DROP_OFF_DETAILS)
         
         response = "📍 ДЕТАЛЬНАЯ СТАТИСТИКА УХОДОВ:\n\n"
         
@@ -3360,6 +3668,8 @@ async def stats_drops_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         await update.message.reply_text(response)
         
+    except StatsTimeout:
+        await update.message.reply_text("⏳ Статистика считается слишком долго, попробуйте позже")
     except Exception as e:
         logger.log_error(
             error_type=ERROR_TYPES['db_error'],
@@ -3368,8 +3678,83 @@ async def stats_drops_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         await update.message.reply_text("❌ Ошибка получения данных об уходах")
 
+async def stats_funnel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Воронка /start → категория → просмотр → бронь с разрезами по категориям,
+    дням и когортам - ТОЛЬКО ДЛЯ АДМИНОВ
+    /stats_funnel [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД], по умолчанию последние 30 дней
+    """
+    user_id = update.effective_user.id
+    ADMINS = [7966971037]
+
+    if user_id not in ADMINS:
+        await update.message.reply_text("❌ Только для администраторов")
+        return
+
+    try:
+        date_from, date_to = parse_date_range(context.args or [])
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Формат: /stats_funnel [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД]\n"
+            "Например: /stats_funnel 2025-12-01 2025-12-31"
+        )
+        return
+
+    try:
+        # pandas и чтение БД - в отдельном потоке, бот продолжает отвечать
+        report = await asyncio.to_thread(compute_funnel, date_from, date_to, DB_FILE, STATS_QUERY_TIMEOUT)
+        await update.message.reply_text(format_funnel_report(report))
+    except StatsTimeout:
+        print(f"⚠️ /stats_funnel прерван: дольше {STATS_QUERY_TIMEOUT:g} с")
+        await update.message.reply_text("⏳ Статистика считается слишком долго, попробуйте позже")
+    except Exception as e:
+        logger.log_error(
+            error_type=ERROR_TYPES['db_error'],
+            error_message=f"stats_funnel error: {str(e)}",
+            user_id=user_id
+        )
+        await update.message.reply_text("❌ Ошибка расчета воронки")
+
+async def stats_questions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Частые вопросы клиентов: почти одинаковые формулировки склеены в
+    кластеры (MinHash/LSH) - ТОЛЬКО ДЛЯ АДМИНОВ
+    /stats_questions [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД], по умолчанию последние 30 дней
+    """
+    user_id = update.effective_user.id
+    ADMINS = [7966971037]
+
+    if user_id not in ADMINS:
+        await update.message.reply_text("❌ Только для администраторов")
+        return
+
+    try:
+        date_from, date_to = parse_date_range(context.args or [])
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Формат: /stats_questions [с ГГГГ-ММ-ДД] [по ГГГГ-ММ-ДД]\n"
+            "Например: /stats_questions 2025-12-01 2025-12-31"
+        )
+        return
+
+    try:
+        # Чтение БД и кластеризация - в отдельном потоке, бот продолжает отвечать
+        report = await asyncio.to_thread(compute_clusters, date_from, date_to, DB_FILE,
+                                         timeout=STATS_QUERY_TIMEOUT)
+        await update.message.reply_text(format_clusters_report(report))
+    except StatsTimeout:
+        print(f"⚠️ /stats_questions прерван: дольше {STATS_QUERY_TIMEOUT:g} с")
+        await update.message.reply_text("⏳ Статистика считается слишком долго, попробуйте позже")
+    except Exception as e:
+        logger.log_error(
+            error_type=ERROR_TYPES['db_error'],
+            error_message=f"stats_questions error: {str(e)}",
+            user_id=user_id
+        )
+        await update.message.reply_text("❌ Ошибка расчета частых вопросов")
+
 # Аналогично можно добавить:
-# stats_errors_command, stats_questions_command, stats_tours_command
+# stats_errors_command, stats_tours_command
 
 # ==================== КНОПКА "ЗАДАТЬ ВОПРОС" (ШАГ 5) ====================
 def make_question_keyboard():
@@ -3452,6 +3837,157 @@ FAQ_ANSWERS = {
 """,
 }
 
+# Ответ без DeepSeek (очередь переполнена): поле тура по теме вопроса, раздел FAQ
+# или поиск по прайсу. Темы проверяются по порядку, слова - по вхождению
+FALLBACK_TOUR_FIELDS = [
+    (('взять', 'с собой', 'одежд', 'надеть'), 'Что взять с собой'),
+    (('еда', 'еды', 'питани', 'обед', 'завтрак', 'ужин', 'корм'), 'Питание'),
+    (('гид', 'русскоговор', 'по-русски'), 'Гид'),
+    (('дни', 'какой день', 'расписани', 'выезд'), 'Дни выезда'),
+    (('важн', 'ограничен', 'можно ли', 'нельзя'), 'Важная информация'),
+]
+FALLBACK_FAQ_TOPICS = [
+    (('оплат', 'возврат', 'отмен', 'деньг', 'предоплат'), "💰 Вопрос про оплату"),
+    (('ребен', 'ребён', 'дет', 'малыш'), "👶 Вопрос про детей"),
+    (('трансфер', 'забер', 'отел'), "🚗 Вопрос про трансфер"),
+    (('дата', 'даты', 'расписани'), "📅 Вопрос про даты"),
+]
+
+def fallback_answer(question, tour_data=None):
+    """
+    Короткий ответ без DeepSeek, когда очередь к нему слишком длинная:
+    1. поле выбранного тура по теме вопроса ("что взять с собой" -> 'Что взять с собой');
+    2. раздел FAQ по теме;
+    3. туры из поиска по прайсу;
+    4. предложение написать менеджеру.
+    """
+    text = question.lower()
+    header = "⏳ *Сейчас много вопросов, отвечаю коротко по данным экскурсии.*\n\n"
+    
+    if tour_data:
+        for words, field in FALLBACK_TOUR_FIELDS:
+            value = str(tour_data.get(field, '')).strip()
+            if value and any(word in text for word in words):
+                return header + f"*{field}* ({tour_data.get('Название', 'экскурсия')}):\n{value}"
+    
+    for words, faq_key in FALLBACK_FAQ_TOPICS:
+        if any(word in text for word in words):
+            return FAQ_ANSWERS[faq_key]
+    
+    results, _ = search_tours_by_keywords_hybrid(question)
+    if results:
+        names = "\n".join(f"• {tour.get('Название', 'Тур')}" for tour, _, _ in results[:3])
+        return header + f"По вашему вопросу нашел в прайсе:\n{names}"
+    
+    return ("⏳ *Сейчас много вопросов.*\n\n"
+            "Отправьте свой вопрос напрямую менеджеру — ответим в течение дня!")
+
+# Шаблонные ответы по строке тура для уверенно распознанных типов вопросов
+# (question_classifier.py). Слова - для выбора фраз из "Важной информации"
+TEMPLATE_NOTE_WORDS = {
+    'children': ('дет', 'ребен', 'ребён', 'младен'),
+    'transfer': ('трансфер', 'с пляжей', 'район'),
+    'schedule': ('выезд', 'время', 'возвращ'),
+}
+TEMPLATE_FAQ = {
+    'children': "👶 Вопрос про детей",
+    'transfer': "🚗 Вопрос про трансфер",
+    'payment': "💰 Вопрос про оплату",
+    'schedule': "📅 Вопрос про даты",
+}
+
+def tour_notes(tour, words):
+    """Фразы из "Важной информации" тура, где есть одно из слов"""
+    notes = []
+    for sentence in str(tour.get('Важная информация', '')).split('.'):
+        sentence = sentence.strip()
+        if sentence and any(word in sentence.lower() for word in words):
+            notes.append(sentence)
+    return notes
+
+def templated_answer(question_type, tour_data, user_data):
+    """
+    Ответ без DeepSeek на вопрос известного типа (price, children, transfer,
+    payment, schedule) по строке выбранного тура. Без тура - раздел FAQ;
+    None - шаблона нет (вопрос уходит в DeepSeek). Детская цена - только
+    если в 'Цена Дет' число; ограничения по возрасту из тегов - отказ,
+    "⛔️"/"по запросу" при вопросе о детях - в DeepSeek.
+    """
+    if not tour_data:
+        faq_key = TEMPLATE_FAQ.get(question_type)
+        return FAQ_ANSWERS[faq_key] if faq_key else None
+    
+    name = tour_data.get('Название', 'Экскурсия').replace("(ХИТ)", "").strip()
+    adults = user_data.get('adults', 0) or 1
+    children_ages = user_data.get('children', [])
+    quote = CATALOG.prices.quote(tour_data.get('ID', ''), adults, children_ages)
+    if quote is None:
+        quote = Quote(TourPrice.from_row(tour_data), adults, paying_children(children_ages))
+    notes = tour_notes(tour_data, TEMPLATE_NOTE_WORDS.get(question_type, ()))
+    text = f"📌 *{name}*\n\n"
+    # Детская цена - только настоящее число ("⛔️", "по запросу" - None)
+    child_price, _ = parse_price(tour_data.get('Цена Дет', ''))
+    min_age = child_min_age_months(tour_data)
+    adults_only = min_age >= ADULTS_ONLY_MONTHS
+    
+    if question_type in ('price', 'children'):
+        # Дети группы не проходят по возрасту - отказ, а не цена
+        restrictions = check_tour_restrictions(tour_data, {'children': children_ages})
+        if restrictions:
+            return restrictions
+    
+    if question_type == 'price':
+        if not quote.priced:
+            return text + "💰 Цена этой экскурсии — по запросу, точную стоимость назовет менеджер."
+        if quote.kids and child_price is None:
+            return None     # цена за ребенка не указана - пусть ответит DeepSeek по строке тура
+        price_note = "" if quote.exact else " (от)"
+        text += f"💰 Взрослый: {quote.adult_price}฿{price_note}\n"
+        if adults_only:
+            text += "🔞 Только для взрослых (от 18 лет)\n"
+        elif child_price is not None:
+            text += f"👶 Детский: {child_price}฿\n"
+        text += f"\n*Для вашей группы:* {quote.total}฿"
+        if quote.prepayment_percent < 100:
+            text += f", предоплата {quote.prepayment_percent}% — {quote.prepayment}฿, остаток в день тура"
+        return text
+    
+    if question_type == 'children':
+        if adults_only:
+            return text + "🔞 Экскурсия только для взрослых (от 18 лет) — детей на нее не берут."
+        if child_price is None and str(tour_data.get('Цена Дет', '')).strip():
+            return None     # "⛔️" / "по запросу" - условия для детей уточнит DeepSeek по строке тура
+        if not notes and child_price is None and not min_age:
+            return FAQ_ANSWERS[TEMPLATE_FAQ['children']]
+        if min_age:
+            text += f"• Детей берут с {format_age_limit(min_age)}\n"
+        text += "".join(f"• {note}\n" for note in notes)
+        if child_price is not None:
+            text += f"• Детский билет: {child_price}฿\n"
+        return text
+    
+    if question_type == 'transfer':
+        if not notes:
+            return FAQ_ANSWERS[TEMPLATE_FAQ['transfer']]
+        text += "🚐 " + ".\n🚐 ".join(notes) + ".\n\n"
+        return text + "*Точную стоимость трансфера из вашего отеля уточнит менеджер после выбора экскурсии.*"
+    
+    if question_type == 'payment':
+        text += f"💳 Предоплата: {tour_data.get('Предоплата', '50%')}"
+        if quote.priced and quote.total:
+            text += f" — {quote.prepayment}฿ для вашей группы"
+        return text + "\n" + FAQ_ANSWERS[TEMPLATE_FAQ['payment']]
+    
+    if question_type == 'schedule':
+        days = format_weekdays(CATALOG.weekday_mask(tour_data)) or str(tour_data.get('Дни выезда', '')).strip()
+        if not days:
+            return FAQ_ANSWERS[TEMPLATE_FAQ['schedule']]
+        text += f"📅 Дни выезда: {days}\n"
+        text += "".join(f"• {note}\n" for note in notes)
+        return text + "\n*Точное время выезда из вашего отеля сообщит менеджер после бронирования.*"
+    
+    return None
+
 async def handle_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # === ЭФФЕКТ САЛЮТА НА СООБЩЕНИИ КЛИЕНТА ===
@@ -3549,13 +4085,58 @@ async def handle_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
         tour_data = None
         if selected_tour:
             # Ищем тур по ID или названию
-            for tour in TOURS:
-                if tour.get('ID') == selected_tour or tour.get('Название') == selected_tour:
-                    tour_data = tour
-                    break
+            tour_data = get_tour_by_id(selected_tour)
+            if not tour_data:
+                for tour in TOURS:
+                    if tour.get('Название') == selected_tour:
+                        tour_data = tour
+                        break
 
         # Получаем контекст пользователя
         user_data = context.user_data.get('user_data', {})
+        
+        # Тип вопроса (десятки микросекунд): уверенные вопросы про цену, детей,
+        # трансфер, оплату и расписание - ответ шаблоном по строке тура
+        question_type, confidence = 'other', 0.0
+        if QUESTION_CLASSIFIER is not None:
+            question_type, confidence = QUESTION_CLASSIFIER.predict(update.message.text)
+            QUESTION_ROUTE_STATS['classified'] += 1
+        if confidence < LABEL_THRESHOLD:
+            question_type = 'other'
+        tour_name = tour_data.get('Название') if tour_data else None
+        confident = confidence >= ROUTE_THRESHOLD
+        # Память диалога по этому туру (conversation.py) - чтобы DeepSeek понял уточнения вроде "а детям?"
+        memory = context.user_data.get('conversation')
+        if memory is None:
+            memory = context.user_data['conversation'] = ConversationMemory()
+        tour_id = str(tour_data.get('ID', '')).strip() if tour_data else ''
+        history = memory.history(tour_id)
+        answer = None
+        # Частый вопрос по выбранному туру - готовый ответ, сгенерированный офлайн
+        answer_key = match_question_key(update.message.text, question_type, confident) if tour_data else None
+        if tour_data and not answer_key:
+            # Почти такой же вопрос, как в частом кластере (analytics/question_clusters.py)
+            answer_key = PREGENERATED_ANSWERS.cluster_key(update.message.text)
+        if answer_key:
+            answer = PREGENERATED_ANSWERS.get(tour_data.get('ID', ''), answer_key)
+            if answer:
+                QUESTION_ROUTE_STATS['pregenerated'] += 1
+                answer = format_deepseek_answer(answer)
+        if not answer and question_type in ROUTED_TYPES and confident:
+            answer = templated_answer(question_type, tour_data, user_data)
+            if answer:
+                QUESTION_ROUTE_STATS['templated'] += 1
+                answer = format_answer(answer, decorate=False)
+        if answer:
+            memory.add(tour_id, update.message.text, answer)
+            logger.log_question(user.id, update.message.text, tour_name, answer, question_type)
+            await update.message.reply_text(
+                answer,
+                parse_mode='HTML',
+                reply_markup=make_question_keyboard()
+            )
+            return QUESTION
+        
         context_info = f"Состав группы: {user_data.get('adults', 0)} взрослых"
         if user_data.get('children'):
             context_info += f", {len(user_data['children'])} детей"
@@ -3564,37 +4145,76 @@ async def handle_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Показываем typing indicator - бот "думает"
         # ИСПРАВЛЕНО: добавляем таймаут для DeepSeek, чтобы не зависнуть
+        # Тур не выбран - факты о подходящих турах из прайса, в бюджете токенов
+        facts, fact_ids = None, ()
+        if not tour_data:
+            facts, fact_ids = PROMPTS.facts(retrieve_tours(update.message.text, user_data))
+
+        answered = False
+        # Ответ DeepSeek показывается по мере генерации - правками одного сообщения
+        reply = ProgressiveReply(
+            send=lambda html: update.message.reply_text(html, parse_mode='HTML'),
+            edit=lambda message, html: message.edit_text(html, parse_mode='HTML')
+        )
         try:
-            # Создаем таску с таймаутом (максимум 10 секунд на ответ)
+            # Общий срок - по предохранителю (llm_deadline), а не фиксированные 10 с.
+            # Одинаковые одновременные вопросы (тот же тур или подборка, состав
+            # группы и история диалога) ждут один вызов DeepSeek. Ответ может
+            # достаться другим клиентам, поэтому имя в промпт не передается;
+            # потоком видит ответ только тот, чей вызов выполняется, остальные - сразу целиком
+            flight_key = (
+                normalize_question(update.message.text),
+                tour_id,
+                fact_ids,
+                context_info,
+                memory.fingerprint(),
+            )
             deepseek_answer = await asyncio.wait_for(
-                asyncio.to_thread(
-                    generate_deepseek_response,
+                LLM_FLIGHTS.run(flight_key, lambda: ask_deepseek(
+                    user.id,
                     update.message.text,
                     tour_data,
                     context_info,
-                    update.effective_user.first_name
-                ),
-                timeout=10.0
+                    history=history,
+                    facts=facts,
+                    on_delta=reply.feed
+                )),
+                timeout=llm_deadline()
             )
-        except asyncio.TimeoutError:
-            deepseek_answer = "⏳ *Не успел обработать вопрос в срок.*\n\nОтправьте свой вопрос напрямую менеджеру — ответим в течение дня!"
+            answered = True
+        except (LLMUnavailable, DeepSeekError, asyncio.TimeoutError):
+            # Очередь к DeepSeek слишком длинная, цепь предохранителя разомкнута,
+            # вызов не удался или не успел - отвечаем шаблоном по туру, иначе
+            # по прайсу и FAQ; в память диалога такой ответ не идет
+            deepseek_answer = (templated_answer(question_type, tour_data, user_data)
+                               or fallback_answer(update.message.text, tour_data))
         except Exception as e:
             print(f"❌ Ошибка при обработке вопроса: {e}")
             deepseek_answer = "😟 *Что-то пошло не так.*\n\nОтправьте вопрос напрямую менеджеру — помогу с удовольствием!"
 
         # Красиво форматируем ответ
         deepseek_answer = format_deepseek_answer(deepseek_answer)
-
-        await update.message.reply_text(
-            deepseek_answer,
-            parse_mode='Markdown',
-            reply_markup=make_question_keyboard()
-        )
+        if answered:
+            memory.add(tour_id, update.message.text, deepseek_answer)
+        logger.log_question(user.id, update.message.text, tour_name, deepseek_answer, question_type)
+
+        # Показан потоком - итог правкой (и запасной ответ поверх оборванного потока)
+        hint_keyboard = None
+        if await reply.finish(deepseek_answer):
+            # Обычную клавиатуру правкой не добавить - она придет с подсказкой
+            hint_keyboard = make_question_keyboard()
+        else:
+            await update.message.reply_text(
+                deepseek_answer,
+                parse_mode='HTML',
+                reply_markup=make_question_keyboard()
+            )
         
         # ДОБАВЛЯЕМ ПОДСКАЗКУ ПОСЛЕ ОТВЕТА
         await update.message.reply_text(
             "💡 *Совет:* Можете задать ещё вопросы или вернуться к выбору экскурсий",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            reply_markup=hint_keyboard
         )
         
         return QUESTION
@@ -3616,6 +4236,20 @@ def check_booking_requirements(user_data):
     
     return "\n".join(f"• {item}" for item in missing)
 
+# Возрастные ограничения из тегов: #от_18_лет, #дети_от_1_года, #дети_от_N_лет, #от_N_лет
+ADULTS_ONLY_MONTHS = 18 * 12
+_AGE_LIMIT_TAG = re.compile(r"#(?:дети_)?от_(\d+)_(?:лет|года|год)")
+
+def child_min_age_months(tour):
+    """С какого возраста (в месяцах) берут детей по тегам тура; 0 - ограничения нет"""
+    tags = str(tour.get("Теги (Безопасность)", "")).lower()
+    limits = [int(years) * 12 for years in _AGE_LIMIT_TAG.findall(tags)]
+    return max(limits) if limits else 0
+
+def format_age_limit(months):
+    years = months // 12
+    return "1 года" if years == 1 else f"{years} лет"
+
 def check_tour_restrictions(tour, user_data):
     """Проверяет соответствие тура ограничениям пользователя"""
     is_pregnant = user_data.get('pregnant', False)
@@ -3634,18 +4268,17 @@ def check_tour_restrictions(tour, user_data):
             restrictions.append("🤰 Беременным не рекомендуются морские экскурсии")
     
     # === 2. ПРОВЕРКА ВОЗРАСТА ДЕТЕЙ ===
-    if children_ages:
-        # Проверяем каждого ребенка на соответствие возрастным ограничениям
-        for age_months in children_ages:
-            # Если ребенок до 1 года (12 месяцев)
-            if age_months < 12:
-                if "#дети_от_1_года" in tags or "#от_18_лет" in tags or "#дети_от_2_лет" in tags or \
-                   "#дети_от_3_лет" in tags or "#дети_от_4_лет" in tags or "#дети_от_5_лет" in tags or \
-                   "#дети_от_6_лет" in tags or "#дети_от_7_лет" in tags or "#дети_от_8_лет" in tags or \
-                   "#дети_от_9_лет" in tags or "#дети_от_10_лет" in tags or "#дети_от_11_лет" in tags or \
-                   "#дети_от_12_лет" in tags or "#дети_от_13_лет" in tags or "#дети_от_14_лет" in tags or \
-                   "#дети_от_15_лет" in tags or "#дети_от_16_лет" in tags or "#дети_от_17_лет" in tags:
-                    restrictions.append(f"👶 Детям до 1 года запрещены активные и морские экскурсии")
+    min_age = child_min_age_months(tour)
+    if children_ages and min_age:
+        # Самый младший ребенок не проходит по возрасту из тегов
+        youngest = min(children_ages)
+        if youngest < min_age:
+            if min_age >= ADULTS_ONLY_MONTHS:
+                restrictions.append("🔞 Экскурсия только для взрослых (от 18 лет)")
+            elif min_age == 12:
+                restrictions.append("👶 Детям до 1 года запрещено")
+            else:
+                restrictions.append(f"👶 Детей берут с {format_age_limit(min_age)}")
     
     if restrictions:
         response = "❌ *Эта экскурсия не подходит для вашей группы:*\n\n"
@@ -3680,7 +4313,8 @@ async def confirm_booking(query, context, tour, user_data):
         )
         
         # Логируем бронирование
-        logger.log_action(user.id, "booking_completed", tour_id=tour.get('ID'), category=context.user_data.get('category'))
+        logger.log_action(user.id, "booking_completed", tour_id=tour.get('ID'), category=context.user_data.get('category'),
+                          session_data={'profile': group_profile(context.user_data.get('user_data', {}))})
         
     except Exception as e:
         await query.message.reply_text(
@@ -3890,137 +4524,152 @@ def parse_booking_info(text):
     return data
 
 # === ИНТЕГРАЦИЯ DEEPSEEK ===
-def generate_deepseek_response(user_query, tour_data=None, context_info=None, user_name=None):
+_deepseek_client = None
+
+def get_deepseek_client():
+    """
+    Создает асинхронного клиента DeepSeek при первом вызове (импорт openai -
+    тоже здесь). Запрос - корутина: отмена по таймауту сразу прерывает его
+    и освобождает место в пуле LLM_POOL
+    """
+    global _deepseek_client
+    if _deepseek_client is None:
+        import openai
+        _deepseek_client = openai.AsyncOpenAI(
+            api_key=DEEPSEEK_API_KEY,
+            base_url=DEEPSEEK_BASE_URL,  # Официальный endpoint DeepSeek (или фейковый для тестов)
+            # Один повтор на случайный сбой; при долгом сбое решает предохранитель LLM_BREAKER,
+            # а не повторы SDK с нарастающей паузой
+            max_retries=1
+        )
+    return _deepseek_client
+
+async def complete_deepseek(client, messages, on_delta=None):
+    """
+    Один вызов DeepSeek Chat: (текст ответа, usage). С on_delta ответ идет
+    потоком (stream=True), каждый новый кусок текста сразу передается в
+    on_delta - клиент видит ответ по мере генерации (ProgressiveReply)
+    """
+    stream = on_delta is not None
+    response = await client.chat.completions.create(
+        model="deepseek-chat",        # Модель: DeepSeek Chat (v3+)
+        messages=messages,
+        max_tokens=1024,              # Максимум токенов для ответа
+        temperature=0.8,              # 0.8 для естественного разговора
+        top_p=0.95,                   # Nucleus sampling для разнообразия
+        frequency_penalty=0.5,        # Избегаем повторений
+        stream=stream,
+        # usage (и кеш промпта) в потоке приходит последним куском, только если попросить
+        extra_body={'stream_options': {'include_usage': True}} if stream else None
+    )
+    if not stream:
+        return response.choices[0].message.content, getattr(response, 'usage', None)
+
+    parts, usage = [], None
+    async for chunk in response:
+        usage = getattr(chunk, 'usage', None) or usage
+        for choice in chunk.choices:
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+                on_delta(choice.delta.content)
+    # Старый SDK отдает usage куска словарем
+    if isinstance(usage, dict):
+        usage = SimpleNamespace(**usage)
+    return ''.join(parts), usage
+
+async def generate_deepseek_response(user_query, tour_data=None, context_info=None, user_name=None, history=None,
+                                     facts=None, on_delta=None):
     """
     Генерирует ответ с помощью DeepSeek Chat.
     Использует только предоставленные данные из прайса.
+    history - сообщения прошлых вопросов клиента (ConversationMemory.history),
+    facts - строки фактов подходящих туров (PROMPTS.facts), если тур не выбран,
+    on_delta - получать ответ потоком по кускам (complete_deepseek).
+    Ошибка API - исключение DeepSeekError, а не ответ: текст ошибки нельзя
+    запоминать в диалоге и раздавать через singleflight.
+    Вызывайте через ask_deepseek() - с ограничением одновременных запросов.
     """
     if not DEEPSEEK_API_KEY:
-        return "Извините, функция ИИ временно недоступна. Попробуйте позже."
+        raise DeepSeekNotConfigured("не задан DEEPSEEK_API_KEY")
 
+    started = time.perf_counter()
     try:
-        client = openai.OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com/v1"  # Официальный endpoint DeepSeek
-        )
+        # Первый вызов импортирует openai (~0.7 с) - в потоке, чтобы не стоял event loop
+        client = _deepseek_client or await asyncio.to_thread(get_deepseek_client)
 
-        # Системный промпт для роли профессионального помощника
-        user_greeting = f"Ты общаешься с пользователем {user_name}." if user_name else "Ты общаешься с пользователем."
-        system_prompt = f"""Ты - профессиональный помощник по экскурсиям в Пhuket от компании GoldenKeyTours.
-{user_greeting}
-
-Твоя ГЛАВНАЯ РОЛЬ:
-✅ Помогать клиентам найти идеальную экскурсию
-✅ Быть честным и информативным
-✅ Уважать время и бюджет клиента
-✅ Рекомендовать только реальные туры из прайса
-
-🔴 АБСОЛЮТНО ЗАПРЕЩЕНО:
-- НЕ выдумывай туры, которых нет в базе
-- НЕ меняй цены или создавай несуществующие ссылки
-- НЕ пытайся скрыть что это бот или систем
-- НЕ давай советы которые противоречат CSV данным
-
-ТОН И СТИЛЬ:
-- Профессиональный, но дружелюбный
-- Честный и прямой ("Вот что нашел..." вместо "Я рекомендую...")
-- Уважение к выбору клиента (не уговаривай)
-- Легкий юмор только когда в тему (не перебарщивай!)
-- Максимум 100-120 слов
-- Раздели на 2-3 коротких абзаца
-
-ЭМОЦИОНАЛЬНЫЕ ОПИСАНИЯ:
-- Добавляй 1-2 яркие фразы на основе "Честного обзора" из прайса
-- Примеры: "захватывающие дух панорамы", "райский пляж как с открытки"
-- НО! Используй ТОЛЬКО факты из данных экскурсии, не выдумывай!
-- Если в обзоре написано "красивый вид" → можешь сказать "виды, от которых захватывает дух"
-- Если написано "хороший пляж" → "райский пляж с белоснежным песком"
-
-ФОРМУЛА ОТВЕТА на поиск экскурсий:
-1️⃣ Подтверди что нашел экскурсии ("По вашему запросу нашел X экскурсий...")
-2️⃣ Краткое объяснение почему это интересно (1-2 предложения из описания)
-3️⃣ Предложи выбрать ("Вот полный список, выбирайте что нравится")
-4️⃣ НЕ говори "купите" - говори "смотрите, изучайте"
-
-ПРИМЕРЫ ЧЕСТНОГО ОБЩЕНИЯ:
-❌ "Слоны? Это наша гордость! Вот топ-варианты!"
-✅ "По вашему запросу нашел 8 экскурсий со слонами. 
-Самые популярные — 'Катание со слонами' (1200 THB) и 'Кормление' (900 THB).
-Смотрите описания и выбирайте что по вкусу:"
-
-❌ "Рыбалка? Обязательно попробуйте, это шикарно!"
-✅ "Есть 3 вида рыбалки — от спокойной на рассвете до экстримального Big Game.
-Все с разными ценами. Вот варианты:"
-
-ГЛАВНОЕ: Клиент должен ЧУВСТВОВАТЬ что ему помогают честно, 
-а не продают любой ценой. Это строит доверие и повышает конверсию.
-"""
+        # Общий префикс (роль, правила, стиль) -> блок тура -> персональное -> вопрос:
+        # так DeepSeek берет из кеша все, что совпадает с прошлыми запросами (prompts.py)
+        messages = PROMPTS.messages(user_query, tour_data, context_info, user_name, history, facts)
 
-        # Формируем контекст с данными тура
-        tour_context = ""
-        if tour_data:
-            tour_name = tour_data.get('Название', 'Не указано')
-            tour_price_adult = tour_data.get('Цена Взр', 'Не указана')
-            tour_price_child = tour_data.get('Цена Дет', 'Не указана')
-            tour_desc = tour_data.get('Описание (Витрина)', 'Не указано')
-            tour_review = tour_data.get('Честный обзор', 'Не указано')
-            tour_info = tour_data.get('Важная информация', 'Не указано')
-            tour_link = tour_data.get('Ссылка', 'Не указана')
-            tour_tags = tour_data.get('Теги (Безопасность)', 'Не указаны')
-            
-            tour_context = f"""
-
-ДАННЫЕ О ТУРЕ (используй ТОЛЬКО эти факты):
-Название: {tour_name}
-Цена взрослый: {tour_price_adult} THB
-Цена детский: {tour_price_child} THB
-Описание: {tour_desc}
-Честный обзор: {tour_review}
-Важная информация: {tour_info}
-Ссылка: {tour_link}
-Теги безопасности: {tour_tags}"""
-
-        # Дополнительный контекст
-        extra_context = ""
-        if context_info:
-            extra_context = f"\n\nКОНТЕКСТ: {context_info}"
-
-        # Строим сообщения - устанавливаем явно UTF-8
-        messages = [
-            {"role": "system", "content": system_prompt + tour_context + extra_context},
-            {"role": "user", "content": user_query}
-        ]
-
-        # Вызываем API с оптимальными параметрами
-        response = client.chat.completions.create(
-            model="deepseek-chat",        # Модель: DeepSeek Chat (v3+)
-            messages=messages,
-            max_tokens=1024,              # Максимум токенов для ответа
-            temperature=0.8,              # 0.8 для естественного разговора
-            top_p=0.95,                   # Nucleus sampling для разнообразия
-            frequency_penalty=0.5         # Избегаем повторений
-        )
+        # Вызываем API с оптимальными параметрами; таймаут - по p95 последних
+        # ответов (circuit_breaker.AdaptiveTimeout), зависший запрос не держит 10 с
+        timeout = LLM_BREAKER.timeout.current()
+        started = time.perf_counter()
+        try:
+            answer, usage = await asyncio.wait_for(complete_deepseek(client, messages, on_delta), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise DeepSeekTimeout(f"нет ответа за {timeout:.1f} с")
+        elapsed = time.perf_counter() - started
+        LLM_BREAKER.record_success(elapsed)
+        PROMPT_CACHE_STATS.record(usage, elapsed)
 
-        return response.choices[0].message.content.strip()
+        return answer.strip()
 
     except Exception as e:
-        error_msg = str(e)
-        print(f"❌ Ошибка DeepSeek API: {error_msg}")
-        
-        # Логируем детали ошибки для диагностики
-        if "401" in error_msg or "Unauthorized" in error_msg or "Invalid API key" in error_msg:
-            return "❌ Ошибка авторизации DeepSeek. Проверьте API ключ в .env файле."
-        elif "429" in error_msg or "rate_limit" in error_msg:
-            return "⏳ Слишком много запросов. Подождите немного и попробуйте снова"
-        elif "402" in error_msg or "insufficient_quota" in error_msg or "balance" in error_msg.lower():
-            return "💳 Недостаточно средств на счете DeepSeek. Пополните баланс на deepseek.com"
-        elif "404" in error_msg or "not found" in error_msg.lower():
-            return "❌ Модель 'deepseek-chat' не найдена. Проверьте настройки API."
-        elif "timeout" in error_msg.lower() or "connection" in error_msg.lower():
-            return "⚠️ Проблема с подключением к DeepSeek. Проверьте интернет."
-        else:
-            # Общая ошибка
-            return "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте переформулировать его."
+        # Тип ошибки - по классу исключения и HTTP-статусу, он же решает,
+        # считать ли ее сбоем DeepSeek для предохранителя
+        error = classify_error(e)
+        LLM_BREAKER.record_failure(error, time.perf_counter() - started)
+        print(f"❌ Ошибка DeepSeek API ({error.kind}): {e}")
+        raise error from e
+
+async def ask_deepseek(user_id, user_query, tour_data=None, context_info=None, user_name=None, history=None,
+                       facts=None, on_delta=None):
+    """
+    Ответ DeepSeek через пул LLM_POOL: не больше LLM_CONCURRENCY запросов
+    одновременно, очередь по кругу между пользователями. Бросает
+    LLMUnavailable, если очередь слишком длинная (LLMOverloaded) или цепь
+    предохранителя разомкнута (CircuitOpen), - тогда отвечаем без LLM
+    (fallback_answer); DeepSeekError - если вызов не удался
+    """
+    probe = LLM_BREAKER.acquire()
+
+    async def call():
+        # Пока запрос ждал в очереди, цепь могла разомкнуться
+        if not probe:
+            LLM_BREAKER.check()
+        return await generate_deepseek_response(user_query, tour_data, context_info, user_name, history, facts,
+                                                on_delta)
+
+    try:
+        return await LLM_POOL.submit(user_id, call)
+    finally:
+        LLM_BREAKER.release(probe)
+
+def llm_deadline():
+    """
+    Общий срок ответа DeepSeek: допустимое ожидание в очереди LLM_POOL плюс
+    текущий адаптивный таймаут вызова (LLM_BREAKER.timeout). Фиксированный
+    срок короче таймаута вызова обрывал бы медленные, но живые ответы
+    """
+    return LLM_POOL.max_wait + LLM_BREAKER.timeout.current()
+
+async def deepseek_or_fallback(user_id, fallback, user_query, tour_data=None, context_info=None,
+                               user_name=None, timeout=None):
+    """
+    Ответ DeepSeek или запасной текст, если DeepSeek недоступен, очередь
+    переполнена, вызов не удался или ответа нет за timeout (по умолчанию -
+    llm_deadline()). fallback - готовый текст или функция без аргументов:
+    дорогой запасной ответ (fallback_answer с поиском по прайсу) считается
+    только когда он нужен.
+    """
+    try:
+        return await asyncio.wait_for(
+            ask_deepseek(user_id, user_query, tour_data, context_info, user_name),
+            timeout=timeout or llm_deadline()
+        )
+    except (LLMUnavailable, DeepSeekError, asyncio.TimeoutError):
+        return fallback() if callable(fallback) else fallback
 
 # === КОНЕЦ ИНТЕГРАЦИИ DEEPSEEK ===
 
@@ -4049,7 +4698,8 @@ async def confirm_booking_via_message(update, context, tour, user_data):
         )
         
         # Логируем бронирование
-        logger.log_action(user.id, "booking_completed", tour_id=tour.get('ID'), category=context.user_data.get('category'))
+        logger.log_action(user.id, "booking_completed", tour_id=tour.get('ID'), category=context.user_data.get('category'),
+                          session_data={'profile': group_profile(context.user_data.get('user_data', {}))})
         
     except Exception as e:
         await update.message.reply_text(
@@ -4060,16 +4710,23 @@ async def confirm_booking_via_message(update, context, tour, user_data):
         print(f"❌ Ошибка отправки бронирования менеджеру (ADMIN_ID={ADMIN_ID}): {type(e).__name__}: {e}")
 
 # ==================== ЗАПУСК БОТА ====================
-def main():
-    """Запуск бота"""
-    print("🚀 Запуск бота Алекса...")
-    print(f"📊 Загружено экскурсий: {len(TOURS)}")
-    
-    categories = get_categories()
-    print(f"📂 Категории: {categories}")
-    
-    # Создаем приложение
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).connect_timeout(30.0).read_timeout(30.0).build()
+def build_application(token=None, base_url=None):
+    """
+    Создает приложение со всеми обработчиками.
+    base_url позволяет направить запросы к Bot API на другой сервер
+    (используется нагрузочным тестом benchmarks/load_test.py).
+    """
+    builder = (
+        Application.builder()
+        .token(token or require_bot_token())
+        .connect_timeout(30.0)
+        .read_timeout(30.0)
+        .post_init(start_background_jobs)
+        .post_shutdown(stop_background_jobs)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
     
 # Настройка диалога
     conv_handler = ConversationHandler(
@@ -4114,9 +4771,30 @@ def main():
     # Добавляем обработчики
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler("tours", show_tours))
+    application.add_handler(CommandHandler("plan", plan_command))
     application.add_handler(CommandHandler("debug", debug_info))
     application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CommandHandler("stats_drops", stats_drops_command))
     application.add_handler(CommandHandler("clear", clear_command))
+    application.add_handler(CommandHandler("reload", reload_command))
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("stats_funnel", stats_funnel_command))
+    application.add_handler(CommandHandler("stats_questions", stats_questions_command))
+    
+    return application
+
+def main():
+    """Запуск бота"""
+    require_bot_token()
+    print("🚀 Запуск бота Алекса...")
+    run_startup()
+    print(f"📊 Загружено экскурсий: {len(TOURS)}")
+    
+    categories = get_categories()
+    print(f"📂 Категории: {categories}")
+    
+    # Создаем приложение
+    application = build_application()
     
     print("✅ Бот запущен! Нажмите Ctrl+C для остановки.")
     
@@ -4124,4 +4802,4 @@ def main():
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,239 @@
+# catalog.py - каталог экскурсий: разбор CSV, индексы и бинарный снимок
+"""
+Каталог экскурсий с индексами и бинарным снимком.
+
+Разобранный прайс вместе со всеми индексами сохраняется рядом с CSV
+в файл <csv>.snapshot. Снимок привязан к SHA-256 содержимого CSV и к
+SNAPSHOT_VERSION: если прайс не менялся, при старте снимок читается одним
+f.read() и распаковывается pickle, и CSV заново не разбирается. Снимок,
+который не распаковывается (другая версия кода, поврежденный файл), -
+просто пересборка из CSV.
+
+Формат снимка:
+    SNAPSHOT_MAGIC (8 байт) | версия (uint32, little-endian) | SHA-256 CSV (32 байта) | pickle
+"""
+import csv
+import hashlib
+import io
+import os
+import pickle
+import struct
+
+from pricing import PriceBook
+from ranking import TourFeatures
+from schedule import ALL_DAYS, parse_weekdays
+from stemmer import stem_words
+
+SNAPSHOT_MAGIC = b'ALEXCAT\x00'
+# Увеличивайте при любом изменении структуры Catalog или индексов -
+# старые снимки тогда будут проигнорированы и пересобраны
+SNAPSHOT_VERSION = 6
+SNAPSHOT_SUFFIX = '.snapshot'
+
+_HEADER = struct.Struct('<8sI32s')
+
+# Поля для индекса основ слов и вес совпадения в каждом (как в поиске по фразе бота)
+STEM_FIELD_WEIGHTS = (
+    ('Название', 100),
+    ('Ключевые слова', 50),
+    ('Теги (Безопасность)', 50),
+    ('Описание (Витрина)', 30),
+    ('Честный обзор', 20),
+)
+
+
+class Catalog:
+    """Разобранный прайс и производные индексы"""
+
+    def __init__(self, tours, csv_hash=b''):
+        self.tours = tours            # строки CSV (словари) в исходном порядке
+        self.csv_hash = csv_hash      # SHA-256 содержимого CSV
+        self.by_id = {}               # ID (строка) -> тур
+        self.by_category = {}         # категория ("Для информации") -> список туров
+        self.categories = []          # отсортированные категории
+        self.hit_ids = set()          # ID туров с пометкой ХИТ (столбец без названия)
+        self.prices = PriceBook([])   # разобранные цены и расчет для группы (pricing.py)
+        self.features = TourFeatures([])  # векторы признаков для ранжирования (ranking.py)
+        self.weekday_masks = {}       # ID -> 7-битная маска дней выезда (schedule.py)
+        self.on_request_ids = set()   # ID туров с выездом "По запросу"
+        self.by_weekday = [[] for _ in range(7)]  # день недели (0 - Пн) -> туры
+        self.stem_index = {}          # основа слова (stemmer.py) -> {ID: релевантность}
+        self.build_indexes()
+
+    def build_indexes(self):
+        """Строит все индексы по self.tours"""
+        self.by_id = {}
+        self.by_category = {}
+        self.hit_ids = set()
+        self.weekday_masks = {}
+        self.on_request_ids = set()
+        self.by_weekday = [[] for _ in range(7)]
+        self.stem_index = {}
+
+        for tour in self.tours:
+            tour_id = str(tour.get('ID', '')).strip()
+            if tour_id:
+                self.by_id[tour_id] = tour
+
+            category = tour.get("Для информации", "").strip()
+            if category:
+                self.by_category.setdefault(category, []).append(tour)
+
+            if tour.get('', '').strip() == 'ХИТ':
+                self.hit_ids.add(tour_id)
+
+            mask, on_request = parse_weekdays(tour.get('Дни выезда', ''))
+            if tour_id:
+                self.weekday_masks[tour_id] = mask
+                if on_request:
+                    self.on_request_ids.add(tour_id)
+            for weekday in range(7):
+                if mask & (1 << weekday):
+                    self.by_weekday[weekday].append(tour)
+
+            if tour_id:
+                for field, weight in STEM_FIELD_WEIGHTS:
+                    for word_stem in set(stem_words(tour.get(field, ''), min_length=2)):
+                        postings = self.stem_index.setdefault(word_stem, {})
+                        postings[tour_id] = postings.get(tour_id, 0) + weight
+
+        self.categories = sorted(self.by_category)
+        self.prices = PriceBook(self.tours)
+        self.features = TourFeatures(self.tours, self.prices)
+
+    def get(self, tour_id):
+        """Тур по ID или None"""
+        return self.by_id.get(str(tour_id).strip())
+
+    def tours_in_category(self, category):
+        """Копия списка туров категории (вызывающий код может менять список)"""
+        return list(self.by_category.get(category, []))
+
+    def weekday_mask(self, tour):
+        """Маска дней выезда тура (тур не из каталога - разбирается на месте)"""
+        mask = self.weekday_masks.get(str(tour.get('ID', '')).strip())
+        if mask is None:
+            mask, _ = parse_weekdays(tour.get('Дни выезда', ''))
+        return mask
+
+    def available_on(self, days_mask, tours=None):
+        """
+        Туры, выезжающие хотя бы в один из дней маски. tours - список для
+        фильтрации (порядок сохраняется); без него - весь каталог по индексу дней.
+        """
+        if tours is not None:
+            return [tour for tour in tours if self.weekday_mask(tour) & days_mask]
+        if days_mask & ALL_DAYS == ALL_DAYS:
+            return list(self.tours)
+        # Один день - готовый список из индекса; несколько - объединение в порядке каталога
+        days = [weekday for weekday in range(7) if days_mask & (1 << weekday)]
+        if len(days) == 1:
+            return list(self.by_weekday[days[0]])
+        return [tour for tour in self.tours if self.weekday_mask(tour) & days_mask]
+
+    def search_stems(self, stems):
+        """
+        Туры, в текстах которых есть хотя бы одна из основ слов (индекс
+        stem_index). Возвращает ([(тур, релевантность)] по убыванию
+        релевантности, основы, которые нашлись в индексе).
+        """
+        relevance = {}
+        matched = []
+        for word_stem in stems:
+            postings = self.stem_index.get(word_stem)
+            if not postings:
+                continue
+            matched.append(word_stem)
+            for tour_id, weight in postings.items():
+                relevance[tour_id] = relevance.get(tour_id, 0) + weight
+        ranked = sorted(relevance.items(), key=lambda item: item[1], reverse=True)
+        return [(self.by_id[tour_id], score) for tour_id, score in ranked], matched
+
+
+def snapshot_path(csv_path):
+    return csv_path + SNAPSHOT_SUFFIX
+
+
+def parse_csv(raw_bytes):
+    """Разбирает CSV прайса (разделитель ';', UTF-8 с BOM) в список словарей"""
+    text = raw_bytes.decode('utf-8-sig')  # utf-8-sig для обработки BOM
+    reader = csv.DictReader(io.StringIO(text, newline=''), delimiter=';')
+    tours = []
+    for row in reader:
+        # Очищаем значения от лишних пробелов
+        clean_row = {key.strip(): (value.strip() if value else "") for key, value in row.items()}
+        tours.append(clean_row)
+    return tours
+
+
+def read_snapshot(path, csv_hash):
+    """Возвращает Catalog из снимка или None, если снимка нет или он устарел"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            magic, version, stored_hash = _HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or stored_hash != csv_hash:
+                return None
+            data = f.read()
+        catalog = pickle.loads(data)
+    except OSError:
+        return None
+    except (ValueError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, IndexError) as e:
+        # Снимок от другой версии кода или поврежден - пересоберем из CSV, а не упадем при старте
+        print(f"⚠️ Снимок каталога не прочитан ({type(e).__name__}), пересобираю из CSV")
+        return None
+    return catalog if isinstance(catalog, Catalog) else None
+
+
+def write_snapshot(path, catalog):
+    """Атомарно записывает снимок (через временный файл и os.replace)"""
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, catalog.csv_hash))
+            pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить снимок каталога: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def load_catalog(csv_path, use_snapshot=True):
+    """
+    Загружает каталог: из снимка, если хеш CSV совпадает, иначе разбирает CSV
+    и пересобирает снимок. Возвращает (Catalog, источник), где источник -
+    'snapshot', 'csv' или 'error'.
+    """
+    try:
+        with open(csv_path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        print(f"❌ Ошибка загрузки CSV: {e}")
+        return Catalog([]), 'error'
+
+    csv_hash = hashlib.sha256(raw).digest()
+    path = snapshot_path(csv_path)
+
+    if use_snapshot:
+        catalog = read_snapshot(path, csv_hash)
+        if catalog is not None:
+            return catalog, 'snapshot'
+
+    try:
+        catalog = Catalog(parse_csv(raw), csv_hash)
+    except Exception as e:
+        print(f"❌ Ошибка загрузки CSV: {e}")
+        import traceback
+        traceback.print_exc()
+        return Catalog([]), 'error'
+
+    if use_snapshot:
+        write_snapshot(path, catalog)
+    return catalog, 'csv'
@@ -0,0 +1,247 @@
+# circuit_breaker.py - типизированные ошибки DeepSeek, предохранитель и адаптивный таймаут
+"""
+При сбое DeepSeek или лавине 429 каждый вопрос раньше ждал полный
+таймаут (10 с), прежде чем клиент получал запасной ответ, - и следующий
+вопрос ждал столько же. Ошибки различались поиском подстрок в тексте
+исключения.
+
+1. classify_error() переводит исключение openai в класс DeepSeekError
+   по типу и HTTP-статусу: авторизация, баланс, лимит запросов, сервер
+   недоступен, таймаут, неверный запрос. У класса есть признак, считать
+   ли ошибку сбоем сервиса (trips). Вызов бросает DeepSeekError, а не
+   возвращает текст ошибки как ответ: клиент получает ответ без LLM
+   (шаблон или поиск по прайсу), а текст ошибки не попадает в память
+   диалога и в общий ответ singleflight.
+2. CircuitBreaker: после FAILURE_THRESHOLD сбоев подряд цепь
+   размыкается ("open") на cooldown секунд - вызовы сразу получают
+   CircuitOpen, и бот отвечает поиском по прайсу или FAQ. Затем цепь
+   полуоткрыта ("half_open"): проходит один пробный вызов; успех
+   замыкает цепь, сбой снова размыкает ее с удвоенным cooldown (до
+   MAX_COOLDOWN). Ошибки ключа и баланса сами не пройдут - для них
+   cooldown сразу длинный.
+3. AdaptiveTimeout: таймаут вызова - p95 последних времен ответа x
+   TIMEOUT_FACTOR в пределах [LLM_TIMEOUT_MIN, LLM_TIMEOUT_MAX].
+   Зависший запрос отваливается за пару p95, а не за 10 с. Таймаут
+   тоже идет в выборку, чтобы таймаут рос, если DeepSeek стал медленнее.
+
+Все вызовы - из event loop бота, поэтому блокировки не нужны.
+"""
+import os
+import time
+from collections import deque
+
+from llm_pool import LLMUnavailable
+
+FAILURE_THRESHOLD = 5          # сбоев подряд до размыкания
+BASE_COOLDOWN = 15.0           # сек до первой пробы
+MAX_COOLDOWN = 300.0
+CONFIG_COOLDOWN = 300.0        # ключ, баланс, модель - сами не исправятся
+
+LLM_TIMEOUT_MIN = float(os.getenv('LLM_TIMEOUT_MIN', '3'))
+LLM_TIMEOUT_MAX = float(os.getenv('LLM_TIMEOUT_MAX', '10'))
+TIMEOUT_FACTOR = 2.0
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20       # пока замеров меньше - таймаут LLM_TIMEOUT_MAX
+
+
+# ==================== ТИПИЗИРОВАННЫЕ ОШИБКИ ====================
+class DeepSeekError(Exception):
+    """Ошибка вызова DeepSeek; подклассы задают вид ошибки и влияние на предохранитель"""
+    kind = 'other'
+    trips = False              # считается сбоем сервиса
+    cooldown = None            # свой cooldown при размыкании (None - обычный)
+
+
+class DeepSeekAuthError(DeepSeekError):
+    kind = 'auth'
+    trips = True
+    cooldown = CONFIG_COOLDOWN
+
+
+class DeepSeekQuotaError(DeepSeekError):
+    kind = 'quota'
+    trips = True
+    cooldown = CONFIG_COOLDOWN
+
+
+class DeepSeekNotFound(DeepSeekError):
+    kind = 'not_found'
+    trips = True
+    cooldown = CONFIG_COOLDOWN
+
+
+class DeepSeekRateLimited(DeepSeekError):
+    kind = 'rate_limit'
+    trips = True
+
+
+class DeepSeekUnavailable(DeepSeekError):
+    kind = 'unavailable'
+    trips = True
+
+
+class DeepSeekTimeout(DeepSeekUnavailable):
+    kind = 'timeout'
+
+
+class DeepSeekBadRequest(DeepSeekError):
+    kind = 'bad_request'
+
+
+class DeepSeekNotConfigured(DeepSeekError):
+    kind = 'not_configured'
+
+
+class CircuitOpen(LLMUnavailable):
+    """Цепь разомкнута - DeepSeek не вызывается, нужен ответ без LLM"""
+
+
+def classify_error(error):
+    """Исключение клиента openai (или другое) -> экземпляр DeepSeekError"""
+    if isinstance(error, DeepSeekError):
+        return error
+    message = str(error)
+    try:
+        import openai
+    except ImportError:
+        return DeepSeekError(message)
+
+    if isinstance(error, openai.APITimeoutError):
+        return DeepSeekTimeout(message)
+    if isinstance(error, openai.APIConnectionError):
+        return DeepSeekUnavailable(message)
+    status = getattr(error, 'status_code', None)
+    if status in (401, 403):
+        return DeepSeekAuthError(message)
+    if status == 402:
+        return DeepSeekQuotaError(message)
+    if status == 404:
+        return DeepSeekNotFound(message)
+    if status == 429:
+        return DeepSeekRateLimited(message)
+    if status is not None and status >= 500:
+        return DeepSeekUnavailable(message)
+    if status in (400, 413, 422):
+        return DeepSeekBadRequest(message)
+    return DeepSeekError(message)
+
+
+# ==================== АДАПТИВНЫЙ ТАЙМАУТ ====================
+class AdaptiveTimeout:
+    """Таймаут вызова по p95 последних времен ответа"""
+
+    def __init__(self, minimum=LLM_TIMEOUT_MIN, maximum=LLM_TIMEOUT_MAX):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def current(self):
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, self.p95() * TIMEOUT_FACTOR))
+
+
+# ==================== ПРЕДОХРАНИТЕЛЬ ====================
+class CircuitBreaker:
+    """closed -> open (после сбоев) -> half_open (одна проба) -> closed или снова open"""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=BASE_COOLDOWN, clock=time.monotonic):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0              # сбоев подряд
+        self.cooldown = cooldown       # текущий (растет при неудачных пробах)
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.timeout = AdaptiveTimeout()
+        self.opened = 0                # сколько раз размыкалась
+        self.rejected = 0              # вызовов не пропущено, пока цепь разомкнута
+        self.errors = {}               # kind -> количество
+        self.last_error = None
+
+    def acquire(self):
+        """
+        Разрешение на вызов. Возвращает True, если это пробный вызов
+        полуоткрытой цепи; бросает CircuitOpen, если вызывать нельзя.
+        """
+        if self.state == 'closed':
+            return False
+        if self.state == 'open' and self.clock() >= self.open_until:
+            self.state = 'half_open'
+        if self.state == 'half_open' and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        raise CircuitOpen(f"DeepSeek недоступен ({self.last_error}), повтор через "
+                          f"{max(0.0, self.open_until - self.clock()):.0f} с")
+
+    def check(self):
+        """Для запроса, допущенного раньше и дождавшегося очереди: бросает CircuitOpen, если цепь уже не замкнута"""
+        if self.state != 'closed':
+            self.rejected += 1
+            raise CircuitOpen(f"DeepSeek недоступен ({self.last_error})")
+
+    def release(self, probe):
+        """Вызов завершен без результата (отменен, сброшен очередью) - проба снова свободна"""
+        if probe and self.state == 'half_open':
+            self.probe_in_flight = False
+
+    def record_success(self, seconds):
+        self.timeout.record(seconds)
+        self._close()
+
+    def _close(self):
+        self.failures = 0
+        if self.state != 'closed':
+            print("✅ DeepSeek снова отвечает - цепь замкнута")
+        self.state = 'closed'
+        self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+
+    def record_failure(self, error, seconds=None):
+        """Учитывает ошибку (DeepSeekError); seconds - сколько длился вызов при таймауте"""
+        self.errors[error.kind] = self.errors.get(error.kind, 0) + 1
+        self.last_error = error.kind
+        if isinstance(error, DeepSeekTimeout) and seconds is not None:
+            self.timeout.record(seconds)
+        if not error.trips:
+            if self.state == 'half_open':
+                # Сервис ответил (ошибка в самом запросе) - он жив
+                self._close()
+            return
+        self.failures += 1
+        if self.state == 'half_open':
+            self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+            self._open(error)
+        elif self.state == 'closed' and (self.failures >= self.threshold or error.cooldown):
+            self._open(error)
+
+    def _open(self, error):
+        cooldown = max(self.cooldown, error.cooldown or 0)
+        self.state = 'open'
+        self.open_until = self.clock() + cooldown
+        self.probe_in_flight = False
+        self.opened += 1
+        print(f"⚡ DeepSeek: {error.kind}, цепь разомкнута на {cooldown:.0f} с")
+
+    def snapshot(self):
+        """Словарь для /stats"""
+        return {
+            'state': self.state,
+            'opened': self.opened,
+            'rejected': self.rejected,
+            'errors': dict(self.errors),
+            'timeout': self.timeout.current(),
+            'p95': self.timeout.p95(),
+            'retry_in': max(0.0, self.open_until - self.clock()) if self.state == 'open' else 0.0,
+        }
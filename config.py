@@ -28,6 +28,56 @@ QUESTION_TYPES = {
     'other': 'Другое'
 }
 
+# Слова-признаки типов вопросов: разметка записанных вопросов для обучения
+# классификатора (analytics/train_question_classifier.py). Вопрос получает
+# тип, только если совпали слова ровно одного типа
+QUESTION_TYPE_KEYWORDS = {
+    'price': ('сколько стоит', 'цена', 'цену', 'стоимость', 'почем', 'по деньгам', 'скидк', 'обойдется'),
+    'children': ('ребен', 'ребён', 'дет', 'малыш', 'сын', 'дочк', 'дочь', 'грудничк', 'коляск'),
+    'pregnancy': ('беремен', 'в положении'),
+    'schedule': ('во сколько выезд', 'расписани', 'дни выезда', 'какие дни', 'по каким дням', 'длится', 'во сколько забира'),
+    'food': ('обед', 'завтрак', 'ужин', 'питани', 'корм', 'еда', 'еду', 'напитк'),
+    'transfer': ('трансфер', 'заберет', 'заберете', 'забирает', 'из отеля', 'водител'),
+    'payment': ('оплат', 'предоплат', 'возврат', 'вернут', 'наличн', 'картой', 'перевод'),
+}
+
+# Частые вопросы, ответы на которые заранее генерируются для каждого тура
+# (analytics/pregenerate_answers.py). question - текст для DeepSeek; вопрос
+# клиента получает этот ответ, если в нем есть одно из words или классификатор
+# уверенно отнес его к одному из types. Изменение question - повод перегенерировать
+PREGENERATED_QUESTIONS = {
+    'children': {
+        'question': "Можно ли на эту экскурсию с детьми? С какого возраста и сколько стоит детский билет?",
+        'types': ('children',),
+        'words': (),
+    },
+    'pregnancy': {
+        'question': "Можно ли на эту экскурсию беременным?",
+        'types': ('pregnancy',),
+        'words': ('беремен', 'в положении'),
+    },
+    'what_to_bring': {
+        'question': "Что взять с собой на эту экскурсию?",
+        'types': (),
+        'words': ('взять с собой', 'брать с собой', 'что взять', 'что брать', 'что надеть', 'одежд'),
+    },
+    'food': {
+        'question': "Кормят ли на экскурсии? Что входит в питание?",
+        'types': ('food',),
+        'words': (),
+    },
+    'transfer': {
+        'question': "Включен ли трансфер из отеля и бывает ли доплата за трансфер?",
+        'types': ('transfer',),
+        'words': (),
+    },
+    'seasickness': {
+        'question': "Будет ли качать? Что делать, если укачивает?",
+        'types': (),
+        'words': ('укачива', 'качает', 'качка', 'качки', 'морская болезнь', 'морской болезн', 'тошни'),
+    },
+}
+
 # Типы ошибок (для логирования)
 ERROR_TYPES = {
     'filter_error': 'Ошибка фильтрации',
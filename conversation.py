@@ -0,0 +1,158 @@
+# conversation.py - короткая память диалога для уточняющих вопросов к DeepSeek
+"""
+Без памяти каждый вызов DeepSeek видит только системный промпт, тур и
+один вопрос: на "а детям сколько?" после вопроса о цене модель не знает,
+о чем речь, и клиент переписывает вопрос длиннее.
+
+ConversationMemory хранит последние пары (вопрос, ответ) в режиме
+вопросов (QUESTION) и добавляет их в запрос после системных сообщений:
+
+    1. system: SYSTEM_PROMPT + блок тура      - общий префикс, кешируется
+    2. system: имя и контекст клиента
+    3. system: "РАНЕЕ В ДИАЛОГЕ: ..."         - сжатые старые вопросы
+    4. user / assistant ...                    - последние пары
+    5. user: новый вопрос
+
+Размер истории ограничен бюджетом MEMORY_TOKENS по локальной оценке
+токенов (estimate_tokens, без токенизатора и сети). Не помещается -
+самые старые пары уходят в сводку: от пары остается только вопрос,
+обрезанный до SUMMARY_QUESTION_TOKENS; сводка больше SUMMARY_TOKENS -
+из нее выпадают самые старые вопросы. Сжимается история сразу до
+COMPACT_SHARE бюджета, а не по одной паре: иначе начало истории менялось
+бы с каждым вопросом и DeepSeek не брал бы ее из кеша префиксов; так
+следующие вопросы только дописываются в конец. Ответ сохраняется обрезанным до
+ANSWER_TOKENS - первых предложений хватает, чтобы понять уточнение.
+
+Память лежит в context.user_data['conversation'] и очищается вместе с
+сессией (/start, "Новый поиск"); другой тур или пауза дольше
+MEMORY_IDLE_SECONDS - память начинается заново.
+"""
+import hashlib
+import html
+import os
+import re
+import time
+
+MEMORY_TOKENS = int(os.getenv('MEMORY_TOKENS', '600'))
+MEMORY_IDLE_SECONDS = int(os.getenv('MEMORY_IDLE_SECONDS', '1800'))
+ANSWER_TOKENS = 160
+SUMMARY_TOKENS = 120
+SUMMARY_QUESTION_TOKENS = 30
+COMPACT_SHARE = 0.5           # переполнение - сжать историю до этой доли бюджета
+MESSAGE_OVERHEAD = 4          # служебные токены роли и разделителей на сообщение
+
+# Кириллица в BPE DeepSeek - около 3 символов на токен, латиница - около 4
+_PIECES = re.compile(r"[A-Za-z]+|[^\W\d_A-Za-z]+|\d+|\S")
+_MARKUP = re.compile(r"</?[a-z]+>|[*_`#]+")
+SUMMARY_HEADER = "РАНЕЕ В ДИАЛОГЕ клиент спрашивал: "
+
+
+def _piece_tokens(piece):
+    first = piece[0]
+    if first.isdigit():
+        return (len(piece) + 2) // 3
+    if first.isascii() and first.isalpha():
+        return (len(piece) + 3) // 4
+    if first.isalpha():
+        return (len(piece) + 2) // 3
+    return 1
+
+
+def estimate_tokens(text):
+    """Оценка числа токенов текста (с запасом в большую сторону)"""
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text or ''))
+
+
+def clip(text, max_tokens):
+    """Начало текста не длиннее max_tokens (по словам), с многоточием, если обрезано"""
+    total = 0
+    for match in _PIECES.finditer(text):
+        total += _piece_tokens(match.group())
+        if total > max_tokens:
+            return text[:match.start()].rstrip() + '…'
+    return text
+
+
+_HEADER_TOKENS = estimate_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD
+
+
+def plain(text):
+    """Текст без разметки (HTML-теги и Markdown, answer_format.py) - в память и промпт"""
+    return html.unescape(_MARKUP.sub('', str(text or ''))).strip()
+
+
+class ConversationMemory:
+    """Последние пары вопрос-ответ одного клиента в бюджете токенов"""
+
+    __slots__ = ('tour_id', 'turns', 'summary', 'tokens', 'updated')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, tour_id=''):
+        self.tour_id = tour_id
+        self.turns = []        # [(вопрос, ответ, токенов)]
+        self.summary = []      # [(вопрос, токенов)] - вытесненные вопросы
+        self.tokens = 0        # токены истории в промпте (estimate_tokens)
+        self.updated = 0.0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def _expire(self, tour_id, now):
+        if tour_id != self.tour_id or (self.updated and now - self.updated > MEMORY_IDLE_SECONDS):
+            self.reset(tour_id)
+
+    def history(self, tour_id='', now=None):
+        """Сообщения истории для промпта (между системными сообщениями и вопросом)"""
+        self._expire(tour_id, time.time() if now is None else now)
+        messages = []
+        if self.summary:
+            questions = '; '.join(question for question, _ in self.summary)
+            messages.append({"role": "system", "content": SUMMARY_HEADER + questions})
+        for question, answer, _ in self.turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    def add(self, tour_id, question, answer, now=None):
+        """Запоминает пару; старые пары сжимаются в сводку, пока история не влезет в бюджет"""
+        now = time.time() if now is None else now
+        self._expire(tour_id, now)
+        question = clip(plain(question), ANSWER_TOKENS)
+        answer = clip(plain(answer), ANSWER_TOKENS)
+        if not question or not answer:
+            return
+        cost = estimate_tokens(question) + estimate_tokens(answer) + 2 * MESSAGE_OVERHEAD
+        self.turns.append((question, answer, cost))
+        self.tokens += cost
+        self.updated = now
+
+        if self.tokens <= MEMORY_TOKENS:
+            return
+        while self.tokens > MEMORY_TOKENS * COMPACT_SHARE and len(self.turns) > 1:
+            old_question, _, old_cost = self.turns.pop(0)
+            if not self.summary:
+                self.tokens += _HEADER_TOKENS
+            short = clip(old_question, SUMMARY_QUESTION_TOKENS)
+            short_cost = estimate_tokens(short) + 1
+            self.summary.append((short, short_cost))
+            self.tokens += short_cost - old_cost
+        summary_tokens = sum(cost for _, cost in self.summary)
+        while self.summary and (summary_tokens > SUMMARY_TOKENS or self.tokens > MEMORY_TOKENS * COMPACT_SHARE):
+            _, cost = self.summary.pop(0)
+            summary_tokens -= cost
+            self.tokens -= cost
+            if not self.summary:
+                self.tokens -= _HEADER_TOKENS
+
+    def fingerprint(self):
+        """Короткий хеш истории: '' без истории (для ключа singleflight)"""
+        if not self.turns and not self.summary:
+            return ''
+        digest = hashlib.sha1()
+        for question, _ in self.summary:
+            digest.update(question.encode('utf-8') + b'\0')
+        for question, answer, _ in self.turns:
+            digest.update(question.encode('utf-8') + b'\0' + answer.encode('utf-8') + b'\0')
+        return digest.hexdigest()[:16]
@@ -0,0 +1,207 @@
+# itinerary.py - планировщик программы на несколько дней под бюджет
+"""
+Подбирает набор экскурсий на диапазон дат: не больше одной экскурсии в
+день, каждая экскурсия не больше одного раза, только в дни выезда
+(schedule.py), суммарная стоимость для группы (pricing.py) в пределах
+бюджета. Максимизируется сумма баллов туров (score_fn - приоритеты
+клиента, ХИТы и т.п.).
+
+Алгоритм - рюкзак с ограничениями по дням: динамика по дням поездки и
+занятому бюджету (шаг BUDGET_STEP бат). В каждой клетке хранится до
+KEEP_STATES лучших планов, чтобы при запрете повторов была замена, если
+лучший план уже использовал тур. Перед динамикой кандидаты каждого дня
+недели прореживаются: тур, у которого есть не меньше N (число дней)
+туров не дороже и не хуже по баллам, никогда не понадобится.
+
+Время ограничено time_limit: если динамика не успела, возвращается
+жадный план (лучшие баллы на бат), он всегда укладывается в бюджет.
+"""
+import heapq
+import time
+
+from pricing import paying_children
+from schedule import day_bit, parse_weekdays
+
+BUDGET_STEP = 100          # бат на клетку бюджета
+KEEP_STATES = 8            # планов на клетку (день, бюджет)
+PLAN_TIME_LIMIT = 0.3      # секунды
+MAX_PLAN_DAYS = 14
+
+
+class PlanTimeout(Exception):
+    pass
+
+
+class Plan:
+    """Результат планирования"""
+
+    def __init__(self, days, budget, method, seconds):
+        self.days = days                       # [(дата, тур или None, Quote или None)]
+        self.budget = budget
+        self.method = method                   # 'dp' или 'greedy' (если не хватило времени)
+        self.seconds = seconds
+        chosen = [quote for _, _, quote in days if quote is not None]
+        self.total = sum(q.total for q in chosen)
+        self.prepayment = sum(q.prepayment for q in chosen)
+        self.exact = all(q.exact for q in chosen)
+
+    @property
+    def tours(self):
+        return [tour for _, tour, _ in self.days if tour is not None]
+
+
+class _Candidate:
+    __slots__ = ('tour', 'quote', 'cost', 'score', 'mask')
+
+    def __init__(self, tour, quote, cost, score, mask):
+        self.tour = tour
+        self.quote = quote
+        self.cost = cost          # в клетках бюджета (округление вверх)
+        self.score = score
+        self.mask = mask
+
+
+def _parsed_mask(tour):
+    mask, _ = parse_weekdays(tour.get('Дни выезда', ''))
+    return mask
+
+
+def _candidates(tours, price_book, adults, kids, budget_cells, score_fn, weekday_mask):
+    result = []
+    for tour in tours:
+        quote = price_book.quote_for(tour.get('ID', ''), adults, kids)
+        if quote is None or not quote.priced:
+            continue
+        cost = -(-quote.total // BUDGET_STEP)
+        score = score_fn(tour)
+        if cost > budget_cells or score <= 0:
+            continue
+        result.append(_Candidate(tour, quote, cost, score, weekday_mask(tour)))
+    return result
+
+
+def _prune(candidates, keep):
+    """
+    Оставляет туры, которые не доминируются keep другими (не дороже и не хуже).
+    Результат отсортирован по цене - динамика обрывает перебор по бюджету.
+    """
+    ordered = sorted(candidates, key=lambda c: (c.cost, -c.score))
+    best_scores = []   # мин-куча из keep лучших баллов среди более дешевых
+    kept = []
+    for candidate in ordered:
+        if len(best_scores) < keep or candidate.score > best_scores[0]:
+            kept.append(candidate)
+        if len(best_scores) < keep:
+            heapq.heappush(best_scores, candidate.score)
+        elif candidate.score > best_scores[0]:
+            heapq.heapreplace(best_scores, candidate.score)
+    return kept
+
+
+def _insert(cell, state):
+    """Добавляет план (score, выбор по дням) в клетку, держа KEEP_STATES лучших"""
+    if len(cell) < KEEP_STATES:
+        cell.append(state)
+        cell.sort(key=lambda s: -s[0])
+    elif state[0] > cell[-1][0]:
+        cell[-1] = state
+        cell.sort(key=lambda s: -s[0])
+
+
+def _dynamic(dates, per_day, budget_cells, deadline):
+    # клетки: занятый бюджет -> список (score, кортеж выбранных кандидатов по дням, None - отдых)
+    cells = {0: [(0.0, ())]}
+    for day_candidates in per_day:
+        next_cells = {}
+        for used, states in cells.items():
+            if time.perf_counter() > deadline:
+                raise PlanTimeout()
+            for score, path in states:
+                _insert(next_cells.setdefault(used, []), (score, path + (None,)))
+                for candidate in day_candidates:
+                    new_used = used + candidate.cost
+                    if new_used > budget_cells:
+                        break
+                    if candidate in path:
+                        continue
+                    _insert(next_cells.setdefault(new_used, []), (score + candidate.score, path + (candidate,)))
+
+        # Парето по бюджету: план дороже и не лучше KEEP_STATES более дешевых не нужен
+        cells = {}
+        best_scores = []
+        for used in sorted(next_cells):
+            kept = [s for s in next_cells[used]
+                    if len(best_scores) < KEEP_STATES or s[0] > best_scores[0]]
+            for state in kept:
+                if len(best_scores) < KEEP_STATES:
+                    heapq.heappush(best_scores, state[0])
+                elif state[0] > best_scores[0]:
+                    heapq.heapreplace(best_scores, state[0])
+            if kept:
+                cells[used] = kept
+
+    # Лучший балл; при равенстве - более дешевый план (клетки идут по возрастанию бюджета)
+    best_state = (0.0, (None,) * len(dates))
+    for used in sorted(cells):
+        for state in cells[used]:
+            if state[0] > best_state[0]:
+                best_state = state
+    return {day_index: candidate for day_index, candidate in enumerate(best_state[1]) if candidate}
+
+
+def _greedy(dates, candidates, budget_cells):
+    """Запасной план: лучшие баллы на бат в первый свободный день выезда"""
+    ordered = sorted(candidates, key=lambda c: (-c.score / c.cost, c.cost))
+    free = list(range(len(dates)))
+    chosen = {}
+    used = 0
+    for candidate in ordered:
+        if used + candidate.cost > budget_cells:
+            continue
+        for day_index in free:
+            if candidate.mask & day_bit(dates[day_index]):
+                chosen[day_index] = candidate
+                free.remove(day_index)
+                used += candidate.cost
+                break
+        if not free:
+            break
+    return chosen
+
+
+def plan_itinerary(tours, dates, budget, adults, children_ages, price_book, score_fn,
+                   time_limit=PLAN_TIME_LIMIT, weekday_mask=None):
+    """
+    План на даты dates (список date) для группы в пределах budget (бат).
+    tours - уже отфильтрованные по безопасности туры, score_fn(tour) -> балл (> 0).
+    weekday_mask(tour) -> маска дней выезда (Catalog.weekday_mask); без него
+    'Дни выезда' разбираются на месте.
+    """
+    started = time.perf_counter()
+    dates = list(dates)[:MAX_PLAN_DAYS]
+    budget_cells = int(budget) // BUDGET_STEP
+    kids = paying_children(children_ages)
+
+    candidates = _candidates(tours, price_book, adults, kids, budget_cells, score_fn,
+                             weekday_mask or _parsed_mask)
+
+    # Кандидаты каждого дня недели считаются один раз и прореживаются
+    by_weekday = {}
+    for day in dates:
+        bit = day_bit(day)
+        if bit not in by_weekday:
+            by_weekday[bit] = _prune([c for c in candidates if c.mask & bit], len(dates))
+    per_day = [by_weekday[day_bit(day)] for day in dates]
+
+    method = 'dp'
+    try:
+        chosen = _dynamic(dates, per_day, budget_cells, started + time_limit)
+    except PlanTimeout:
+        method = 'greedy'
+        chosen = _greedy(dates, candidates, budget_cells)
+
+    days = []
+    for day_index, day in enumerate(dates):
+        candidate = chosen.get(day_index)
+        days.append((day, candidate.tour if candidate else None, candidate.quote if candidate else None))
+    return Plan(days, budget, method, time.perf_counter() - started)
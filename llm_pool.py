@@ -0,0 +1,172 @@
+# llm_pool.py - ограниченный пул вызовов DeepSeek со справедливой очередью
+"""
+Вызовы DeepSeek раньше шли через asyncio.to_thread в общий пул потоков:
+без ограничения числа одновременных запросов, а после таймаута
+wait_for поток продолжал ждать ответ API и занимал место.
+
+LLMExecutor:
+- не больше concurrency запросов к API одновременно (LLM_CONCURRENCY);
+- остальные ждут в очереди, справедливой по пользователям: слоты
+  раздаются по кругу между клиентами, так что клиент, отправивший пять
+  вопросов подряд, не задерживает остальных;
+- запрос - корутина (AsyncOpenAI), поэтому отмена ожидающего (таймаут,
+  ушедший клиент) сразу снимает его из очереди или прерывает HTTP-запрос
+  и освобождает слот;
+- сброс нагрузки: если в очереди уже max_queue запросов или ожидаемое
+  ожидание (очередь x среднее время ответа / concurrency) больше
+  max_wait, submit() сразу бросает LLMOverloaded - бот отвечает без
+  DeepSeek (поиск по прайсу, FAQ), а не держит клиента до таймаута.
+
+Счетчики (ожидание в очереди, сброшенные, отмененные) - для /stats.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '16'))
+LLM_MAX_WAIT = float(os.getenv('LLM_MAX_WAIT', '6'))   # сек; дольше - отвечаем без DeepSeek
+
+WAIT_SAMPLES = 500            # сколько последних ожиданий хранить для перцентилей
+SERVICE_TIME_ALPHA = 0.2      # сглаживание среднего времени ответа API
+INITIAL_SERVICE_TIME = 2.0    # сек, пока нет ни одного замера
+
+
+class LLMUnavailable(Exception):
+    """DeepSeek сейчас не вызывается - нужен ответ без LLM (поиск по прайсу, FAQ)"""
+
+
+class LLMOverloaded(LLMUnavailable):
+    """Очередь к DeepSeek переполнена - запрос сброшен"""
+
+
+class LLMExecutor:
+    """Не больше concurrency одновременных вызовов; очередь по кругу между пользователями"""
+
+    def __init__(self, concurrency=LLM_CONCURRENCY, max_queue=LLM_MAX_QUEUE, max_wait=LLM_MAX_WAIT):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._queues = {}          # user_id -> deque[Future] ожидающих слота
+        self._rotation = deque()   # порядок обхода пользователей с непустой очередью
+        self._queued = 0
+        self.service_time = INITIAL_SERVICE_TIME
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.shed = 0
+        self.max_depth = 0
+
+    @property
+    def queued(self):
+        return self._queued
+
+    def estimated_wait(self):
+        """Сколько ждать новому запросу при текущей очереди, сек"""
+        if self.active < self.concurrency and not self._queued:
+            return 0.0
+        return (self._queued + 1) * self.service_time / self.concurrency
+
+    async def submit(self, user_id, factory):
+        """
+        Выполняет factory() (корутину вызова API), когда освободится слот.
+        Бросает LLMOverloaded, если очередь слишком длинная.
+        """
+        if self.active >= self.concurrency or self._queued:
+            if self._queued >= self.max_queue or self.estimated_wait() > self.max_wait:
+                self.shed += 1
+                raise LLMOverloaded(f"в очереди {self._queued}, ожидание ~{self.estimated_wait():.1f} с")
+            started = time.perf_counter()
+            await self._wait_turn(user_id)
+            self.waits.append(time.perf_counter() - started)
+        else:
+            self.active += 1
+            self.waits.append(0.0)
+
+        started = time.perf_counter()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            elapsed = time.perf_counter() - started
+            self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            return result
+        finally:
+            self.active -= 1
+            self._dispatch()
+
+    async def _wait_turn(self, user_id):
+        """Ждет, пока _dispatch() отдаст слот этому запросу"""
+        turn = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+        queue.append(turn)
+        self._queued += 1
+        self.max_depth = max(self.max_depth, self._queued)
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                # Слот уже выдан, но ожидающий отменен - отдаем следующему
+                self.active -= 1
+                self._dispatch()
+            else:
+                self._remove(user_id, turn)
+            self.cancelled += 1
+            raise
+
+    def _remove(self, user_id, turn):
+        queue = self._queues.get(user_id)
+        if queue and turn in queue:
+            queue.remove(turn)
+            self._queued -= 1
+            if not queue:
+                del self._queues[user_id]
+                self._rotation.remove(user_id)
+
+    def _dispatch(self):
+        """Раздает свободные слоты по кругу: по одному запросу от каждого пользователя"""
+        while self.active < self.concurrency and self._rotation:
+            user_id = self._rotation.popleft()
+            queue = self._queues[user_id]
+            turn = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._rotation.append(user_id)
+            else:
+                del self._queues[user_id]
+            if not turn.done():
+                self.active += 1
+                turn.set_result(None)
+
+    def snapshot(self):
+        """Словарь для /stats"""
+        waits = sorted(self.waits)
+
+        def percentile(pct):
+            return waits[min(len(waits) - 1, int(len(waits) * pct / 100))] if waits else 0.0
+
+        return {
+            'concurrency': self.concurrency,
+            'active': self.active,
+            'queued': self._queued,
+            'max_depth': self.max_depth,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'shed': self.shed,
+            'wait_p50': percentile(50),
+            'wait_p95': percentile(95),
+            'service_time': self.service_time,
+        }
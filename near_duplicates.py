@@ -0,0 +1,152 @@
+# near_duplicates.py - MinHash и LSH для поиска почти одинаковых вопросов
+"""
+Вопросы клиентов почти не повторяются дословно: "сколько стоит трансфер
+из Патонга?", "А трансфер с Патонга сколько стоит", "скока стоит
+трансфер из патонга". Сравнивать каждый вопрос с каждым - квадратичная
+сложность; MinHash + LSH находит похожие пары за почти линейное время.
+
+1. Текст -> множество буквенных SHINGLE_SIZE-грамм нормализованного
+   вопроса (singleflight.normalize_question) без вежливых слов
+   (FILLER_WORDS: "здравствуйте", "подскажите"...); устойчиво к опечаткам
+   и окончаниям. Шинглы хешируются crc32 - одинаково в любом процессе,
+   поэтому подписи офлайн-задачи и бота совместимы.
+2. MinHash: NUM_PERM минимумов от хешей (a*h + b) mod P. Доля совпавших
+   позиций двух подписей - оценка коэффициента Жаккара множеств.
+3. LSH: подпись режется на BANDS полос по ROWS значений; вопросы с
+   одинаковой полосой - кандидаты. Кандидаты проверяются по доле
+   совпадений подписей (SIMILARITY).
+
+Подписи многих текстов считаются пачками на numpy (minhash_signatures),
+одного текста - minhash_signature. numpy импортируется лениво.
+"""
+import zlib
+
+from singleflight import normalize_question
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY = 0.6            # оценка Жаккара, начиная с которой вопросы - почти дубликаты
+SEED = 1
+_PRIME = 4294967311         # простое > 2^32
+BATCH_SHINGLES = 200000     # шинглов в одной пачке numpy (память ~ NUM_PERM x пачка x 8 байт)
+
+_PERMUTATIONS = None
+
+# Слова, которые не меняют смысл вопроса, но сильно снижают сходство коротких текстов
+FILLER_WORDS = frozenset((
+    'здравствуйте', 'привет', 'добрый', 'день', 'вечер', 'утро', 'доброе', 'подскажите', 'скажите',
+    'пожалуйста', 'пожалуйсто', 'спасибо', 'заранее', 'а', 'и', 'вот', 'ну', 'еще', 'вопрос',
+))
+
+
+def core_text(text):
+    """Нормализованный вопрос без вежливых слов"""
+    words = normalize_question(text).split()
+    core = [word for word in words if word not in FILLER_WORDS]
+    return " ".join(core or words)
+
+
+def shingles(text):
+    """Множество crc32-хешей буквенных n-грамм нормализованного текста"""
+    text = core_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode('utf-8'))} if text else set()
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode('utf-8')) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _permutations():
+    """Коэффициенты (a, b) хеш-функций и множители полос - одинаковые во всех процессах"""
+    global _PERMUTATIONS
+    if _PERMUTATIONS is None:
+        import numpy as np
+        rng = np.random.RandomState(SEED)
+        a = rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+        b = rng.randint(0, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+        band_weights = rng.randint(1, 2 ** 31, size=ROWS).astype(np.uint64)
+        _PERMUTATIONS = (a, b, band_weights)
+    return _PERMUTATIONS
+
+
+def minhash_signatures(shingle_sets):
+    """Матрица подписей (len(shingle_sets) x NUM_PERM) для списка множеств шинглов"""
+    import numpy as np
+    a, b, _ = _permutations()
+    signatures = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint64)
+    start = 0
+    while start < len(shingle_sets):
+        # Пачка документов с суммарно ~BATCH_SHINGLES шинглов
+        end, total = start, 0
+        while end < len(shingle_sets) and (total < BATCH_SHINGLES or end == start):
+            total += max(1, len(shingle_sets[end]))
+            end += 1
+        values, offsets = [], []
+        for shingle_set in shingle_sets[start:end]:
+            offsets.append(len(values))
+            values.extend(shingle_set or (0,))
+        hashes = np.fromiter(values, dtype=np.uint64, count=len(values))
+        permuted = (a[:, None] * hashes[None, :] + b[:, None]) % _PRIME
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def minhash_signature(text):
+    """Подпись одного текста (вектор NUM_PERM)"""
+    return minhash_signatures([shingles(text)])[0]
+
+
+def band_keys(signatures):
+    """Ключи полос: матрица (документы x BANDS) целых"""
+    _, _, weights = _permutations()
+    banded = signatures.reshape(len(signatures), BANDS, ROWS)
+    return (banded * weights).sum(axis=2)      # переполнение uint64 - просто хеш
+
+
+def similarity(signature_a, signature_b):
+    """Оценка коэффициента Жаккара по двум подписям"""
+    return float((signature_a == signature_b).mean())
+
+
+class LSHIndex:
+    """Индекс подписей для поиска почти дубликата одного текста (в боте)"""
+
+    def __init__(self):
+        self.buckets = [{} for _ in range(BANDS)]   # полоса -> ключ полосы -> [номер]
+        self.signatures = []
+        self.labels = []
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add_many(self, texts, labels):
+        """Добавляет тексты; label - что вернет query() (например, ключ кластера)"""
+        if not texts:
+            return
+        signatures = minhash_signatures([shingles(text) for text in texts])
+        keys = band_keys(signatures)
+        for signature, row_keys, label in zip(signatures, keys, labels):
+            number = len(self.labels)
+            self.signatures.append(signature)
+            self.labels.append(label)
+            for band, key in enumerate(row_keys.tolist()):
+                self.buckets[band].setdefault(key, []).append(number)
+
+    def query(self, text, threshold=SIMILARITY):
+        """(label, сходство) самого похожего текста индекса или (None, 0.0)"""
+        if not self.labels:
+            return None, 0.0
+        signature = minhash_signature(text)
+        row_keys = band_keys(signature[None, :])[0].tolist()
+        candidates = set()
+        for band, key in enumerate(row_keys):
+            candidates.update(self.buckets[band].get(key, ()))
+        best, best_score = None, 0.0
+        for number in candidates:
+            score = similarity(signature, self.signatures[number])
+            if score > best_score:
+                best, best_score = self.labels[number], score
+        if best_score < threshold:
+            return None, best_score
+        return best, best_score
@@ -0,0 +1,188 @@
+# pricing.py - модель цен экскурсий и расчет стоимости для группы
+"""
+Цены из прайса разбираются один раз при загрузке каталога (Catalog строит
+PriceBook вместе с остальными индексами и сохраняет в снимок), а не при
+каждом показе карточки.
+
+Правила разбора (как в прежнем calculate_total_cost):
+- "2900 / 2700" - берется первая цена;
+- "⛔️", "уточняйте", "по запросу", пусто - детской цены нет, ребенок
+  платит как взрослый;
+- дети до 1 года (меньше 12 месяцев) бесплатно.
+Дополнительно: "от 28000" и "2500 (3-11 лет)" теперь дают число (раньше 0),
+а такие цены помечаются как неточные (exact=False).
+
+Расчет для группы зависит только от (тур, взрослые, платящие дети), поэтому
+результаты кешируются по этому ключу - списки "самые выгодные для вашей
+группы" считаются без повторного разбора и умножений.
+"""
+import heapq
+import re
+
+NO_PRICE_MARKERS = ('⛔', 'уточняйте', 'по запросу')
+DEFAULT_PREPAYMENT_PERCENT = 50
+FREE_CHILD_MONTHS = 12   # дети до года бесплатно
+QUOTE_CACHE_SIZE = 4096
+
+_NUMBER = re.compile(r'\d+')
+
+
+def parse_price(text):
+    """
+    Строка цены -> (сумма или None, точная ли цена).
+    "2900" -> (2900, True); "2900 / 2700" -> (2900, False); "⛔️" -> (None, True)
+    """
+    text = str(text or '').replace('฿', '').strip()
+    lowered = text.lower()
+    if not text or any(marker in lowered for marker in NO_PRICE_MARKERS):
+        return None, True
+    match = _NUMBER.search(text)
+    if not match:
+        return None, True
+    return int(match.group()), text.isdigit()
+
+
+def parse_prepayment(text):
+    """'50%' -> 50, '100%' -> 100; непонятное значение -> 50"""
+    match = _NUMBER.search(str(text or ''))
+    if not match:
+        return DEFAULT_PREPAYMENT_PERCENT
+    return min(100, int(match.group()))
+
+
+def paying_children(children_ages):
+    """Сколько детей платят (возраст в месяцах, с 1 года)"""
+    return sum(1 for age_months in children_ages if age_months >= FREE_CHILD_MONTHS)
+
+
+class TourPrice:
+    """Разобранная цена одной экскурсии"""
+
+    __slots__ = ('tour_id', 'adult', 'child', 'prepayment_percent', 'exact')
+
+    def __init__(self, tour_id, adult, child, prepayment_percent, exact=True):
+        self.tour_id = tour_id
+        self.adult = adult                     # цена взрослого или None ("по запросу")
+        self.child = child                     # цена ребенка или None (платит как взрослый)
+        self.prepayment_percent = prepayment_percent
+        self.exact = exact                     # False: "от ...", варианты "A / B"
+
+    @classmethod
+    def from_row(cls, tour):
+        adult, adult_exact = parse_price(tour.get('Цена Взр', ''))
+        child, child_exact = parse_price(tour.get('Цена Дет', ''))
+        return cls(
+            tour_id=str(tour.get('ID', '')).strip(),
+            adult=adult,
+            child=child,
+            prepayment_percent=parse_prepayment(tour.get('Предоплата', '')),
+            exact=adult_exact and child_exact,
+        )
+
+    @property
+    def child_or_adult(self):
+        return self.child if self.child else self.adult
+
+
+class Quote:
+    """Стоимость одной экскурсии для группы"""
+
+    __slots__ = ('tour_id', 'adults', 'kids', 'adult_price', 'child_price', 'adults_total',
+                 'kids_total', 'total', 'prepayment_percent', 'prepayment', 'exact')
+
+    def __init__(self, price, adults, kids):
+        self.tour_id = price.tour_id
+        self.adults = adults
+        self.kids = kids
+        self.adult_price = price.adult or 0
+        self.child_price = price.child_or_adult or 0
+        self.adults_total = adults * self.adult_price
+        self.kids_total = kids * self.child_price
+        self.total = self.adults_total + self.kids_total
+        # Предоплата округляется вверх до бата
+        self.prepayment_percent = price.prepayment_percent
+        self.prepayment = -(-self.total * price.prepayment_percent // 100)
+        self.exact = price.exact
+
+    @property
+    def priced(self):
+        """False, если цена только по запросу - такой тур не участвует в сравнении цен"""
+        return self.adult_price > 0
+
+
+class BasketQuote:
+    """Стоимость нескольких экскурсий для одной группы"""
+
+    def __init__(self, quotes, missing):
+        self.quotes = quotes                   # Quote по найденным турам, в порядке запроса
+        self.missing = missing                 # ID туров, которых нет в прайсе
+        priced = [q for q in quotes if q.priced]
+        self.unpriced = [q.tour_id for q in quotes if not q.priced]
+        self.total = sum(q.total for q in priced)
+        self.prepayment = sum(q.prepayment for q in priced)
+        self.exact = not self.unpriced and all(q.exact for q in priced)
+
+
+class PriceBook:
+    """Цены всех туров каталога + кеш расчетов по (тур, взрослые, платящие дети)"""
+
+    def __init__(self, tours):
+        self.prices = {}
+        for tour in tours:
+            price = TourPrice.from_row(tour)
+            if price.tour_id:
+                self.prices[price.tour_id] = price
+        self._quotes = {}
+
+    # Кеш не попадает в снимок каталога
+    def __getstate__(self):
+        return {'prices': self.prices}
+
+    def __setstate__(self, state):
+        self.prices = state['prices']
+        self._quotes = {}
+
+    def get(self, tour_id):
+        return self.prices.get(str(tour_id).strip())
+
+    def quote(self, tour_id, adults, children_ages=()):
+        """Quote для группы или None, если тура нет в прайсе"""
+        return self.quote_for(tour_id, adults, paying_children(children_ages))
+
+    def quote_for(self, tour_id, adults, kids):
+        """Quote по числу платящих детей; горячий путь - один поиск в словаре"""
+        key = (tour_id, adults, kids)
+        quote = self._quotes.get(key)
+        if quote is None:
+            price = self.get(tour_id)
+            if price is None:
+                return None
+            if len(self._quotes) >= QUOTE_CACHE_SIZE:
+                self._quotes.clear()
+            quote = self._quotes[key] = Quote(price, adults, kids)
+        return quote
+
+    def basket(self, tour_ids, adults, children_ages=()):
+        """Стоимость набора экскурсий для группы одним вызовом"""
+        kids = paying_children(children_ages)
+        quotes, missing = [], []
+        for tour_id in tour_ids:
+            quote = self.quote_for(tour_id, adults, kids)
+            if quote is None:
+                missing.append(tour_id)
+            else:
+                quotes.append(quote)
+        return BasketQuote(quotes, missing)
+
+    def cheapest(self, tours, adults, children_ages=(), limit=3):
+        """
+        limit самых дешевых для группы туров из списка (туры с ценой "по запросу"
+        пропускаются). Возвращает список (тур, Quote) по возрастанию итога.
+        """
+        kids = paying_children(children_ages)
+        candidates = []
+        for index, tour in enumerate(tours):
+            quote = self.quote_for(tour.get('ID', ''), adults, kids)
+            if quote is not None and quote.priced:
+                candidates.append((quote.total, index, tour, quote))
+        return [(tour, quote) for _, _, tour, quote in heapq.nsmallest(limit, candidates)]
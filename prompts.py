@@ -0,0 +1,242 @@
+# prompts.py - сборка промптов DeepSeek с неизменным общим префиксом
+"""
+DeepSeek кеширует префиксы промптов (context caching): если начало запроса
+байт-в-байт совпадает с уже отправленным, эти токены засчитываются как
+"cache hit" - они дешевле и быстрее обрабатываются. Поэтому сообщения
+собираются от общего к частному:
+
+    1. system: SYSTEM_PROMPT (роль, правила, стиль) + блок тура
+    2. system: факты о подходящих турах, если тур не выбран
+    3. system: персональное - имя клиента и контекст (группа, поиск)
+    4. история диалога (conversation.py), если есть
+    5. user:   вопрос
+
+SYSTEM_PROMPT одинаков для всех запросов, блок тура - для всех, кто
+спрашивает об этом туре. Имя пользователя раньше стояло во второй строке
+промпта, и общий префикс обрывался на ней.
+
+Блоки туров собираются один раз при загрузке каталога (PromptBuilder).
+Там же - короткие строки фактов (fact_line): когда тур не выбран, бот
+находит подходящие туры по индексам каталога и кладет их строки в
+промпт (PromptBuilder.facts), пока они влезают в бюджет FACTS_TOKENS, -
+иначе модель придумывает туры или отвечает общими словами. Строки
+одинаковы для всех клиентов, поэтому одинаковые подборки тоже берутся
+из кеша.
+PromptCacheStats копит токены из usage ответа API: prompt_cache_hit_tokens /
+prompt_cache_miss_tokens (DeepSeek) или prompt_tokens_details.cached_tokens
+(другие OpenAI-совместимые API) и время ответа - для /stats.
+"""
+import os
+
+from conversation import clip, estimate_tokens
+
+SYSTEM_PROMPT = """Ты - профессиональный помощник по экскурсиям в Пhuket от компании GoldenKeyTours.
+
+Твоя ГЛАВНАЯ РОЛЬ:
+✅ Помогать клиентам найти идеальную экскурсию
+✅ Быть честным и информативным
+✅ Уважать время и бюджет клиента
+✅ Рекомендовать только реальные туры из прайса
+
+🔴 АБСОЛЮТНО ЗАПРЕЩЕНО:
+- НЕ выдумывай туры, которых нет в базе
+- НЕ меняй цены или создавай несуществующие ссылки
+- НЕ пытайся скрыть что это бот или систем
+- НЕ давай советы которые противоречат CSV данным
+
+ТОН И СТИЛЬ:
+- Профессиональный, но дружелюбный
+- Честный и прямой ("Вот что нашел..." вместо "Я рекомендую...")
+- Уважение к выбору клиента (не уговаривай)
+- Легкий юмор только когда в тему (не перебарщивай!)
+- Максимум 100-120 слов
+- Раздели на 2-3 коротких абзаца
+
+ЭМОЦИОНАЛЬНЫЕ ОПИСАНИЯ:
+- Добавляй 1-2 яркие фразы на основе "Честного обзора" из прайса
+- Примеры: "захватывающие дух панорамы", "райский пляж как с открытки"
+- НО! Используй ТОЛЬКО факты из данных экскурсии, не выдумывай!
+- Если в обзоре написано "красивый вид" → можешь сказать "виды, от которых захватывает дух"
+- Если написано "хороший пляж" → "райский пляж с белоснежным песком"
+
+ФОРМУЛА ОТВЕТА на поиск экскурсий:
+1️⃣ Подтверди что нашел экскурсии ("По вашему запросу нашел X экскурсий...")
+2️⃣ Краткое объяснение почему это интересно (1-2 предложения из описания)
+3️⃣ Предложи выбрать ("Вот полный список, выбирайте что нравится")
+4️⃣ НЕ говори "купите" - говори "смотрите, изучайте"
+
+ПРИМЕРЫ ЧЕСТНОГО ОБЩЕНИЯ:
+❌ "Слоны? Это наша гордость! Вот топ-варианты!"
+✅ "По вашему запросу нашел 8 экскурсий со слонами. 
+Самые популярные — 'Катание со слонами' (1200 THB) и 'Кормление' (900 THB).
+Смотрите описания и выбирайте что по вкусу:"
+
+❌ "Рыбалка? Обязательно попробуйте, это шикарно!"
+✅ "Есть 3 вида рыбалки — от спокойной на рассвете до экстримального Big Game.
+Все с разными ценами. Вот варианты:"
+
+ГЛАВНОЕ: Клиент должен ЧУВСТВОВАТЬ что ему помогают честно, 
+а не продают любой ценой. Это строит доверие и повышает конверсию.
+"""
+
+# Доля токенов из кеша, начиная с которой вызов считается "из кеша" (для времени ответа)
+CACHED_CALL_SHARE = 0.5
+# Бюджет строк фактов о турах в промпте без выбранного тура (оценка estimate_tokens)
+FACTS_TOKENS = int(os.getenv('RAG_TOKENS', '600'))
+FACT_FIELD_TOKENS = 30        # описание и важная информация - не длиннее
+FACTS_HEADER = "ПОДХОДЯЩИЕ ТУРЫ ИЗ ПРАЙСА (используй ТОЛЬКО эти факты, другие туры не придумывай):"
+
+
+def tour_block(tour):
+    """Факты о туре из прайса - блок после SYSTEM_PROMPT"""
+    return f"""
+
+ДАННЫЕ О ТУРЕ (используй ТОЛЬКО эти факты):
+Название: {tour.get('Название', 'Не указано')}
+Цена взрослый: {tour.get('Цена Взр', 'Не указана')} THB
+Цена детский: {tour.get('Цена Дет', 'Не указана')} THB
+Описание: {tour.get('Описание (Витрина)', 'Не указано')}
+Честный обзор: {tour.get('Честный обзор', 'Не указано')}
+Важная информация: {tour.get('Важная информация', 'Не указано')}
+Ссылка: {tour.get('Ссылка', 'Не указана')}
+Теги безопасности: {tour.get('Теги (Безопасность)', 'Не указаны')}"""
+
+
+def fact_line(tour):
+    """Короткая строка фактов о туре для подборки: цены, дни, питание, описание, ограничения"""
+    def field(name):
+        return str(tour.get(name, '') or '').strip()
+
+    line = f"- {field('Название')}: взрослый {field('Цена Взр') or '?'} THB"
+    if field('Цена Дет'):
+        line += f", детский {field('Цена Дет')} THB"
+    for name, label in (('Дни выезда', 'выезд'), ('Питание', 'питание')):
+        if field(name):
+            line += f"; {label}: {field(name)}"
+    if field('Описание (Витрина)'):
+        line += f". {clip(field('Описание (Витрина)'), FACT_FIELD_TOKENS)}"
+    if field('Важная информация'):
+        line += f" Важно: {clip(field('Важная информация'), FACT_FIELD_TOKENS)}"
+    return line
+
+
+def personal_block(user_name=None, context_info=None):
+    """Персональная часть: имя клиента и контекст запроса"""
+    text = f"Ты общаешься с пользователем {user_name}." if user_name else "Ты общаешься с пользователем."
+    if context_info:
+        text += f"\n\nКОНТЕКСТ: {context_info}"
+    return text
+
+
+class PromptBuilder:
+    """Сообщения для chat.completions с заранее собранными блоками туров"""
+
+    def __init__(self, tours=()):
+        self._tour_blocks = {}    # ID тура -> блок
+        self._fact_lines = {}     # ID тура -> (строка фактов, токенов)
+        self.precompute(tours)
+
+    def precompute(self, tours):
+        """Собирает блоки всех туров каталога (вызывается при загрузке прайса)"""
+        blocks, lines = {}, {}
+        for tour in tours:
+            tour_id = str(tour.get('ID', '')).strip()
+            if tour_id:
+                blocks[tour_id] = tour_block(tour)
+                line = fact_line(tour)
+                lines[tour_id] = (line, estimate_tokens(line) + 1)
+        self._tour_blocks = blocks
+        self._fact_lines = lines
+
+    def facts(self, tours, budget=FACTS_TOKENS):
+        """
+        Строки фактов туров (по порядку релевантности), пока влезают в budget.
+        Возвращает (текст или None, ID попавших туров)
+        """
+        used = estimate_tokens(FACTS_HEADER)
+        lines, ids = [], []
+        for tour in tours:
+            tour_id = str(tour.get('ID', '')).strip()
+            line, tokens = self._fact_lines.get(tour_id) or (fact_line(tour), None)
+            if tokens is None:
+                tokens = estimate_tokens(line) + 1
+            if used + tokens > budget:
+                continue
+            used += tokens
+            lines.append(line)
+            ids.append(tour_id)
+        if not lines:
+            return None, ()
+        return FACTS_HEADER + "\n" + "\n".join(lines), tuple(ids)
+
+    def tour_block(self, tour):
+        block = self._tour_blocks.get(str(tour.get('ID', '')).strip())
+        return block if block is not None else tour_block(tour)
+
+    def messages(self, user_query, tour_data=None, context_info=None, user_name=None, history=None, facts=None):
+        system = SYSTEM_PROMPT + self.tour_block(tour_data) if tour_data else SYSTEM_PROMPT
+        return [
+            {"role": "system", "content": system},
+            # Факты подборки (facts()) - общие для всех клиентов, до персонального
+            *([{"role": "system", "content": facts}] if facts else ()),
+            {"role": "system", "content": personal_block(user_name, context_info)},
+            # История после общего префикса - он остается тем же, что и без нее
+            *(history or ()),
+            {"role": "user", "content": user_query},
+        ]
+
+
+def cached_tokens(usage):
+    """(токены промпта из кеша, токены промпта) по usage ответа API"""
+    if usage is None:
+        return 0, 0
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    hit = getattr(usage, 'prompt_cache_hit_tokens', None)
+    if hit is None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        hit = getattr(details, 'cached_tokens', 0) if details is not None else 0
+    return hit or 0, prompt_tokens
+
+
+class PromptCacheStats:
+    """
+    Счетчики кеша промптов с запуска бота. Вызовы DeepSeek - корутины в
+    event loop бота (llm_pool.py), как и /stats, поэтому блокировка не нужна.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.hit_tokens = 0
+        self.completion_tokens = 0
+        # "из кеша" / "без кеша" -> [вызовов, секунд]
+        self.latency = {'cached': [0, 0.0], 'uncached': [0, 0.0]}
+
+    def record(self, usage, seconds):
+        hit, prompt_tokens = cached_tokens(usage)
+        completion = (getattr(usage, 'completion_tokens', 0) or 0) if usage is not None else 0
+        group = 'cached' if prompt_tokens and hit / prompt_tokens >= CACHED_CALL_SHARE else 'uncached'
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.hit_tokens += hit
+        self.completion_tokens += completion
+        self.latency[group][0] += 1
+        self.latency[group][1] += seconds
+
+    def snapshot(self):
+        """Словарь для /stats: токены, доля из кеша, среднее время ответа по группам"""
+        avg = {group: (total / count if count else None) for group, (count, total) in self.latency.items()}
+        return {
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'hit_tokens': self.hit_tokens,
+            'miss_tokens': self.prompt_tokens - self.hit_tokens,
+            'completion_tokens': self.completion_tokens,
+            'hit_share': self.hit_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            'cached_calls': self.latency['cached'][0],
+            'avg_cached': avg['cached'],
+            'avg_uncached': avg['uncached'],
+        }
@@ -0,0 +1,210 @@
+# question_classifier.py - тип вопроса клиента (QUESTION_TYPES) без обращения к DeepSeek
+"""
+Наивный Байес (мультиномиальный) по словам и буквенным n-граммам вопроса.
+Классы - ключи QUESTION_TYPES из config.py: price, children, pregnancy,
+schedule, food, transfer, payment, other.
+
+Зачем:
+- уверенные вопросы про цену, детей, трансфер, оплату и расписание бот
+  отвечает шаблоном по строке тура (templated_answer в bot.py), без
+  платного и медленного вызова DeepSeek;
+- user_questions.question_type заполняется для аналитики (/stats).
+
+Обучение - офлайн (python -m analytics.train_question_classifier): примеры
+SEED_QUESTIONS плюс записанные вопросы из user_questions, размеченные
+ключевыми словами таксономии. Модель - JSON (QUESTION_MODEL_PATH); если
+файла нет, бот обучает модель на SEED_QUESTIONS при старте (миллисекунды).
+
+Для скорости у каждого признака хранится готовый вектор log P(признак|класс)
+по всем классам, так что классификация - несколько десятков поисков в
+словаре и сложений (десятки микросекунд). n-граммы одного слова зависимы,
+поэтому правдоподобие делится на число признаков на слово - иначе
+уверенность почти всегда ~1.0 и порог ROUTE_THRESHOLD ничего не отсекает.
+"""
+import json
+import math
+import os
+import re
+from datetime import datetime
+
+QUESTION_MODEL_PATH = os.getenv('QUESTION_MODEL_PATH', 'question_classifier.json')
+MODEL_VERSION = 1
+NGRAM_SIZES = (3, 4, 5)
+ALPHA = 0.1                 # сглаживание Лапласа
+ROUTE_THRESHOLD = 0.9       # с какой уверенностью отвечать шаблоном без DeepSeek
+LABEL_THRESHOLD = 0.5       # ниже - в аналитику пишется 'other'
+
+# Типы, на которые у бота есть шаблонный ответ по строке тура
+ROUTED_TYPES = ('price', 'children', 'transfer', 'payment', 'schedule')
+
+_WORD = re.compile(r'[a-zа-я0-9]+')
+
+# Примеры вопросов для каждого типа (для обучения без логов и как основа офлайн-обучения)
+SEED_QUESTIONS = {
+    'price': [
+        "сколько стоит экскурсия", "какая цена", "цена для взрослого", "сколько стоит для двоих",
+        "а по деньгам сколько выйдет", "какая стоимость на семью", "сколько это стоит в батах",
+        "почем тур", "во сколько обойдется поездка", "стоимость билета", "сколько платить за взрослого",
+        "цена на ребенка и взрослого", "дорого ли это", "есть ли скидка", "сколько будет на троих",
+        "какая итоговая сумма для нашей группы", "есть вариант подешевле",
+    ],
+    'children': [
+        "можно ли с ребенком", "подходит ли детям", "с какого возраста можно", "ребенку 2 года можно поехать",
+        "есть ли детские жилеты", "можно с малышом", "детям будет интересно", "с грудничком можно",
+        "сыну 5 лет подойдет", "дочке три года нормально будет", "берут ли детей до года",
+        "есть детское кресло в машине", "безопасно ли для детей", "нужна ли коляска",
+        "ребенок укачивается что делать", "можно ли с детьми 4 и 7 лет",
+    ],
+    'pregnancy': [
+        "можно ли беременным", "я беременна можно поехать", "жена на 5 месяце беременности",
+        "подходит ли экскурсия для беременной", "беременным на катер можно", "на каком сроке беременности нельзя",
+        "беременность 20 недель это безопасно", "а если я в положении", "для беременных есть ограничения",
+        "супруга беременна возьмут ли ее", "можно ли в положении на лодку", "беременной можно на слонов",
+    ],
+    'schedule': [
+        "во сколько выезд", "в какие дни бывает экскурсия", "когда забирают из отеля", "сколько длится тур",
+        "во сколько вернемся", "есть ли выезд в среду", "по каким дням", "можно в воскресенье",
+        "какое расписание", "во сколько начало", "экскурсия каждый день", "когда ближайшая дата",
+        "в котором часу забирают", "до скольки длится программа", "можно завтра поехать",
+        "какие дни выезда на этой неделе",
+    ],
+    'food': [
+        "кормят ли на экскурсии", "обед включен", "что с питанием", "будет ли завтрак",
+        "есть вегетарианская еда", "можно взять свою еду", "вода и фрукты включены", "какой обед",
+        "напитки входят в стоимость", "кормят морепродуктами", "есть ли еда для детей", "будет ли ужин",
+        "где обедаем", "питание входит", "а поесть там можно",
+    ],
+    'transfer': [
+        "трансфер включен", "заберете из отеля", "откуда забираете", "трансфер из карона бесплатный",
+        "доплата за трансфер", "сколько стоит трансфер из ката", "забираете с пхукет тауна",
+        "отвезете обратно в отель", "нужно ли самим добираться", "есть трансфер из камалы",
+        "трансфер из банг тао платный", "во сколько заберет водитель", "где точка сбора",
+        "живем в районе раваи заберете", "трансфер входит в цену",
+    ],
+    'payment': [
+        "как оплатить", "нужна ли предоплата", "можно ли оплатить картой", "как вернуть деньги",
+        "если отменю вернут деньги", "сколько предоплата", "можно оплатить на месте", "оплата в рублях",
+        "можно перевести на карту", "возврат при отмене", "остаток платить в день экскурсии",
+        "принимаете наличные", "как забронировать и заплатить", "предоплата возвращается",
+        "что если заболею вернете деньги", "можно оплатить переводом",
+    ],
+    'other': [
+        "а там красиво", "что посоветуете", "какие пляжи лучше", "что взять с собой", "сильно качает",
+        "будет ли гид на русском", "можно купаться", "много людей", "какая погода будет",
+        "что интереснее пхи пхи или симиланы", "есть ли снорклинг", "там есть обезьяны", "привет",
+        "спасибо", "а фотографировать можно", "нужен ли загранпаспорт", "где купить сим карту",
+        "страшно ли на рафтинге", "сколько человек в группе", "есть ли туалет на лодке",
+    ],
+}
+
+
+def normalize(text):
+    return str(text or '').lower().replace('ё', 'е')
+
+
+def features(text):
+    """Слова и буквенные n-граммы слов с границами"""
+    result = []
+    for word in _WORD.findall(normalize(text)):
+        result.append('w:' + word)
+        padded = f"<{word}>"
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                result.append(padded[start:start + size])
+    return result
+
+
+class QuestionClassifier:
+    """Мультиномиальный наивный Байес; table: признак -> log P(признак|класс) по классам"""
+
+    def __init__(self, labels, priors, table, meta=None):
+        self.labels = list(labels)
+        self.priors = list(priors)          # log P(класс)
+        self.table = table                  # признак -> список log P(признак|класс)
+        self.meta = meta or {}
+
+    @classmethod
+    def train(cls, examples, alpha=ALPHA, meta=None):
+        """examples - список (текст, тип)"""
+        labels = sorted({label for _, label in examples})
+        index = {label: i for i, label in enumerate(labels)}
+        doc_counts = [0] * len(labels)
+        counts = {}
+        totals = [0] * len(labels)
+        for text, label in examples:
+            i = index[label]
+            doc_counts[i] += 1
+            for feature in features(text):
+                row = counts.setdefault(feature, [0] * len(labels))
+                row[i] += 1
+                totals[i] += 1
+
+        vocabulary = len(counts)
+        denominators = [total + alpha * vocabulary for total in totals]
+        table = {
+            feature: [round(math.log((row[i] + alpha) / denominators[i]), 4) for i in range(len(labels))]
+            for feature, row in counts.items()
+        }
+        priors = [math.log(count / len(examples)) for count in doc_counts]
+        meta = dict(meta or {})
+        meta.setdefault('examples', len(examples))
+        meta.setdefault('trained_at', datetime.now().isoformat(timespec='seconds'))
+        return cls(labels, priors, table, meta)
+
+    def predict(self, text):
+        """(тип, уверенность 0..1); пустой или незнакомый текст - ('other', 0.0)"""
+        scores = [0.0] * len(self.priors)
+        known = words = 0
+        table = self.table
+        for feature in features(text):
+            if feature[:2] == 'w:':
+                words += 1
+            row = table.get(feature)
+            if row is not None:
+                known += 1
+                for i, value in enumerate(row):
+                    scores[i] += value
+        if not known:
+            return 'other', 0.0
+        # n-граммы одного слова сильно зависимы: без поправки уверенность
+        # почти всегда ~1.0. Правдоподобие делится на число признаков на слово
+        scale = words / known if known > words else 1.0
+        scores = [prior + score * scale for prior, score in zip(self.priors, scores)]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        top = scores[best]
+        total = sum(math.exp(score - top) for score in scores)
+        return self.labels[best], 1.0 / total
+
+    def to_dict(self):
+        return {'version': MODEL_VERSION, 'labels': self.labels, 'priors': self.priors,
+                'table': self.table, 'meta': self.meta}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError(f"версия модели {data.get('version')}, нужна {MODEL_VERSION}")
+        return cls(data['labels'], data['priors'], data['table'], data.get('meta'))
+
+
+def seed_examples():
+    return [(text, label) for label, texts in SEED_QUESTIONS.items() for text in texts]
+
+
+def load_question_classifier(path=QUESTION_MODEL_PATH):
+    """Модель из JSON или None (нет файла или он испорчен)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return QuestionClassifier.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Модель типов вопросов {path} не загружена: {e}")
+        return None
+
+
+def save_question_classifier(model, path=QUESTION_MODEL_PATH):
+    """Атомарно сохраняет модель в JSON"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
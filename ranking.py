@@ -0,0 +1,306 @@
+# ranking.py - признаки туров для ранжирования по приоритетам клиента
+"""
+Для каждого тура при загрузке каталога считается вектор признаков
+(значения от 0 до 1) по реальным столбцам прайса: тегам
+('Теги (Безопасность)'), названию, 'Описание (Витрина)', 'Честный обзор',
+'Важная информация' и разобранной цене (pricing.py):
+
+    comfort     - #комфорт, #vip, #приват...; "маленькая группа" слабее
+    photo       - #фото, #инстаграм, #закат, виды, "живописн"...
+    quiet       - #без_толп, #нет_людей, "никаких толп"; "многолюдно" -> 0
+    late_start  - 1, если нет #ранний_выезд, "Рассвет" в названии, "выезд в 5:00"
+    budget      - 1 при цене взрослого до 2000฿, 1/3 до 3500฿
+    hit         - пометка ХИТ (столбец без названия)
+
+Приоритет клиента - строка весов по признакам (PRIORITY_WEIGHTS), балл
+тура - скалярное произведение весов приоритетов на вектор тура. Баллы
+для набора приоритетов кешируются, так что ранжирование всего каталога -
+это поиск в словаре на тур и одна стабильная сортировка.
+
+Поверх приоритетов может быть загружена модель, обученная по логам
+просмотров и бронирований (analytics/learn_to_rank.py). Это таблица весов
+"признак профиля группы x признак тура": для профиля строки складываются
+в один вектор весов по признакам тура, так что модель добавляет к
+весам приоритетов еще одно слагаемое, и балл остается одним скалярным
+произведением.
+"""
+import json
+import os
+import re
+
+FEATURES = ('comfort', 'photo', 'quiet', 'late_start', 'budget', 'hit')
+COMFORT, PHOTO, QUIET, LATE_START, BUDGET, HIT = range(len(FEATURES))
+
+# Приоритет из диалога -> веса признаков (шкала прежнего подсчета: до 3 баллов)
+PRIORITY_WEIGHTS = {
+    'комфорт': (3, 0, 0, 0, 0, 0),
+    'бюджет': (0, 0, 0, 0, 3, 0),
+    'фотографии': (0, 3, 0, 0, 0, 0),
+    'не рано вставать': (0, 0, 0, 3, 0, 0),
+    'без толп': (0, 0, 3, 0, 0, 0),
+}
+
+# Признаки профиля группы для обученной модели (значения 0/1)
+PROFILE_FEATURES = ('bias', 'kids', 'infants', 'pregnant', 'big_group') + tuple(PRIORITY_WEIGHTS)
+BIG_GROUP = 4              # взрослых и детей вместе
+INFANT_MONTHS = 36         # до 3 лет
+
+RANKING_MODEL_PATH = os.getenv('RANKING_MODEL_PATH', 'ranking_model.json')
+MODEL_VERSION = 1
+
+CHEAP_PRICE = 2000
+MIDDLE_PRICE = 3500
+SCORE_CACHE_SIZE = 64   # наборов приоритетов
+
+_COMFORT_TAGS = ('#комфорт', '#vip', '#приват', '#лакшери', '#индивидуально', '#сервис',
+                 '#эксклюзив', '#нет_качки')
+_COMFORT_NAME = ('комфорт', 'vip', 'люкс', 'приват', 'индивидуал')
+_COMFORT_TEXT = ('маленькая группа', 'маленькие группы', 'мини-групп', 'минигрупп', 'комфортабельн')
+
+_PHOTO_TAGS = ('#фото', '#инстаграм', '#виды', '#смотровая', '#закат', '#рассвет',
+               '#белый_песок', '#бирюзовая_вода', '#майя_бей')
+_PHOTO_TEXT = ('фото', 'инстаграм', 'instagram', 'живописн', 'панорам')
+
+_QUIET_TAGS = ('#без_толп', '#нет_людей', '#приват', '#своя_компания', '#индивидуально')
+_QUIET_TEXT = ('без толп', 'никаких толп', 'никакой толпы', 'не любит толп', 'уединен',
+               'маленькая группа', 'маленькие группы')
+_CROWDED_TEXT = ('многолюдн',)
+
+_EARLY_TAGS = ('#ранний_выезд',)
+_EARLY_TEXT = ('ранний выезд', 'ранние подъемы')
+_EARLY_NAME = ('рассвет', 'ранний выезд')
+_EARLY_TIME = re.compile(r'выезд\w*\s+в\s+0?[3-7][:.]\d{2}')
+
+_TEXT_COLUMNS = ('Описание (Витрина)', 'Честный обзор', 'Важная информация')
+
+
+def _has(text, words):
+    return any(word in text for word in words)
+
+
+def tour_features(tour, price=None):
+    """
+    Вектор признаков тура (кортеж в порядке FEATURES).
+    price - TourPrice из PriceBook; без него бюджетный признак 0.
+    """
+    tags = str(tour.get('Теги (Безопасность)', '')).lower()
+    name = str(tour.get('Название', '')).lower()
+    text = ' '.join(str(tour.get(column, '')) for column in _TEXT_COLUMNS).lower()
+
+    if _has(tags, _COMFORT_TAGS) or _has(name, _COMFORT_NAME):
+        comfort = 1.0
+    elif _has(text, _COMFORT_TEXT):
+        comfort = 2 / 3
+    else:
+        comfort = 0.0
+
+    photo = 1.0 if _has(tags, _PHOTO_TAGS) or _has(name + ' ' + text, _PHOTO_TEXT) else 0.0
+
+    if _has(text, _CROWDED_TEXT):
+        quiet = 0.0
+    elif _has(tags, _QUIET_TAGS):
+        quiet = 1.0
+    elif _has(text, _QUIET_TEXT):
+        quiet = 2 / 3
+    else:
+        quiet = 0.0
+
+    early = (_has(tags, _EARLY_TAGS) or _has(name, _EARLY_NAME) or _has(text, _EARLY_TEXT)
+             or _EARLY_TIME.search(text))
+    late_start = 0.0 if early else 1.0
+
+    adult = price.adult if price else None
+    if adult and adult < CHEAP_PRICE:
+        budget = 1.0
+    elif adult and adult < MIDDLE_PRICE:
+        budget = 1 / 3
+    else:
+        budget = 0.0
+
+    hit = 1.0 if str(tour.get('', '')).strip() == 'ХИТ' else 0.0
+
+    return (comfort, photo, quiet, late_start, budget, hit)
+
+
+def priority_weights(priorities):
+    """Сумма строк весов приоритетов; неизвестные приоритеты не учитываются"""
+    weights = [0.0] * len(FEATURES)
+    for priority in priorities:
+        row = PRIORITY_WEIGHTS.get(priority)
+        if row:
+            for index, weight in enumerate(row):
+                weights[index] += weight
+    return tuple(weights)
+
+
+def dot(weights, vector):
+    return sum(weight * value for weight, value in zip(weights, vector))
+
+
+class TourFeatures:
+    """Векторы признаков всех туров каталога + кеш баллов по набору приоритетов"""
+
+    def __init__(self, tours, price_book=None):
+        self.vectors = {}
+        for tour in tours:
+            tour_id = str(tour.get('ID', '')).strip()
+            if tour_id:
+                price = price_book.get(tour_id) if price_book else None
+                self.vectors[tour_id] = tour_features(tour, price)
+        self._scores = {}
+
+    # Кеш не попадает в снимок каталога
+    def __getstate__(self):
+        return {'vectors': self.vectors}
+
+    def __setstate__(self, state):
+        self.vectors = state['vectors']
+        self._scores = {}
+
+    def vector(self, tour):
+        """Вектор тура (тур не из каталога - считается на месте, без цены)"""
+        vector = self.vectors.get(str(tour.get('ID', '')).strip())
+        if vector is None:
+            vector = tour_features(tour)
+        return vector
+
+    def _scores_for(self, weights):
+        """ID -> балл для вектора весов (считается один раз на вектор)"""
+        scores = self._scores.get(weights)
+        if scores is None:
+            if len(self._scores) >= SCORE_CACHE_SIZE:
+                self._scores.clear()
+            scores = self._scores[weights] = {
+                tour_id: dot(weights, vector) for tour_id, vector in self.vectors.items()
+            }
+        return scores
+
+    def score(self, tour, priorities, extra_weights=None):
+        """Балл тура по приоритетам клиента (+ веса обученной модели, если есть)"""
+        weights = combined_weights(priorities, extra_weights)
+        value = self._scores_for(weights).get(str(tour.get('ID', '')).strip())
+        if value is None:
+            value = dot(weights, self.vector(tour))
+        return value
+
+    def rank(self, tours, priorities, extra_weights=None):
+        """
+        Туры по убыванию балла. Сортировка стабильная: при равных баллах
+        сохраняется исходный порядок (например, ХИТы впереди).
+        """
+        if not tours or not (priorities or extra_weights):
+            return list(tours)
+        weights = combined_weights(priorities, extra_weights)
+        scores = self._scores_for(weights)
+
+        def sort_key(tour):
+            value = scores.get(str(tour.get('ID', '')).strip())
+            if value is None:
+                value = dot(weights, self.vector(tour))
+            return -value
+
+        return sorted(tours, key=sort_key)
+
+
+def combined_weights(priorities, extra_weights=None):
+    """Веса приоритетов + веса модели (для кеша баллов - кортеж с округлением)"""
+    weights = priority_weights(sorted(set(priorities or ())))
+    if extra_weights:
+        weights = tuple(a + b for a, b in zip(weights, extra_weights))
+    return tuple(round(weight, 6) for weight in weights)
+
+
+# ==================== ОБУЧЕННАЯ МОДЕЛЬ ====================
+
+def group_profile(user_data):
+    """Компактный профиль группы из данных диалога (пишется в логи просмотров)"""
+    children = list(user_data.get('children', []) or [])
+    return {
+        'adults': int(user_data.get('adults', 0) or 0),
+        'children': len(children),
+        'infants': sum(1 for age in children if age < INFANT_MONTHS),
+        'pregnant': bool(user_data.get('pregnant')),
+        'priorities': [p for p in user_data.get('priorities', []) or [] if p in PRIORITY_WEIGHTS],
+    }
+
+
+def profile_vector(profile):
+    """Профиль группы -> кортеж 0/1 в порядке PROFILE_FEATURES"""
+    priorities = set(profile.get('priorities', []) or [])
+    people = profile.get('adults', 0) + profile.get('children', 0)
+    values = {
+        'bias': 1.0,
+        'kids': 1.0 if profile.get('children') else 0.0,
+        'infants': 1.0 if profile.get('infants') else 0.0,
+        'pregnant': 1.0 if profile.get('pregnant') else 0.0,
+        'big_group': 1.0 if people >= BIG_GROUP else 0.0,
+    }
+    return tuple(values.get(name, 1.0 if name in priorities else 0.0) for name in PROFILE_FEATURES)
+
+
+class RankingModel:
+    """
+    Таблица весов PROFILE_FEATURES x FEATURES, обученная по логам.
+    weights_for(profile) -> вектор весов по признакам тура.
+    """
+
+    def __init__(self, weights, meta=None):
+        self.weights = weights        # [[вес по FEATURES] для каждого PROFILE_FEATURES]
+        self.meta = meta or {}
+        self._cache = {}
+
+    def weights_for(self, profile):
+        key = profile_vector(profile)
+        weights = self._cache.get(key)
+        if weights is None:
+            weights = [0.0] * len(FEATURES)
+            for value, row in zip(key, self.weights):
+                if value:
+                    for index, weight in enumerate(row):
+                        weights[index] += value * weight
+            weights = self._cache[key] = tuple(weights)
+        return weights
+
+    def to_dict(self):
+        return {
+            'version': MODEL_VERSION,
+            'tour_features': list(FEATURES),
+            'profile_features': list(PROFILE_FEATURES),
+            'weights': {name: [round(w, 6) for w in row] for name, row in zip(PROFILE_FEATURES, self.weights)},
+            **self.meta,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Модель из JSON; признаки сопоставляются по именам, лишние и недостающие - нулевые"""
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError(f"версия модели {data.get('version')}, ожидается {MODEL_VERSION}")
+        columns = [data['tour_features'].index(name) if name in data['tour_features'] else None
+                   for name in FEATURES]
+        weights = []
+        for name in PROFILE_FEATURES:
+            row = data['weights'].get(name) or []
+            weights.append([float(row[column]) if column is not None and column < len(row) else 0.0
+                            for column in columns])
+        meta = {key: value for key, value in data.items()
+                if key not in ('version', 'tour_features', 'profile_features', 'weights')}
+        return cls(weights, meta)
+
+
+def load_ranking_model(path=RANKING_MODEL_PATH):
+    """Модель из файла или None (нет файла или он битый - ранжирование только по приоритетам)"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return RankingModel.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ Модель ранжирования {path} не загружена: {e}")
+        return None
+
+
+def save_ranking_model(model, path=RANKING_MODEL_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(model.to_dict(), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
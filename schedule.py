@@ -0,0 +1,137 @@
+# schedule.py - дни выезда экскурсий в виде битовых масок
+"""
+Поле 'Дни выезда' ("Ежедневно", "Ср, Вс", "Вт, чт, сб", "По запросу")
+разбирается в 7-битную маску дней недели: бит 0 - понедельник,
+бит 6 - воскресенье (как date.weekday()).
+
+"По запросу" и непонятные значения считаются доступными в любой день,
+но помечаются флагом on_request, чтобы предупредить клиента.
+
+Запросы клиента ("что есть в среду", "мы здесь 24.12-28.12") тоже
+переводятся в маску, и доступность проверяется одним побитовым И.
+"""
+import re
+from datetime import date, timedelta
+
+WEEKDAY_NAMES = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+ALL_DAYS = 0b1111111
+
+_DAY_BITS = {name.lower(): 1 << index for index, name in enumerate(WEEKDAY_NAMES)}
+_EVERY_DAY = ('ежедневно', 'каждый день')
+
+
+def parse_weekdays(text):
+    """
+    'Дни выезда' -> (маска, on_request).
+    "Ежедневно" -> (ALL_DAYS, False); "Ср, Вс" -> (0b1000100, False);
+    "По запросу" / пусто -> (ALL_DAYS, True)
+    """
+    lowered = str(text or '').strip().lower()
+    if any(marker in lowered for marker in _EVERY_DAY):
+        return ALL_DAYS, False
+
+    mask = 0
+    for part in lowered.replace(';', ',').split(','):
+        mask |= _DAY_BITS.get(part.strip()[:2], 0)
+    if not mask:
+        return ALL_DAYS, True
+    return mask, False
+
+
+def day_bit(day):
+    """Бит дня недели для date/datetime"""
+    return 1 << day.weekday()
+
+
+def format_weekdays(mask):
+    """Маска -> 'Пн, Ср, Пт' или 'ежедневно'"""
+    if mask == ALL_DAYS:
+        return "ежедневно"
+    return ", ".join(name for index, name in enumerate(WEEKDAY_NAMES) if mask & (1 << index))
+
+
+# Дни недели в тексте клиента ("в среду", "по средам", "в субботу"). Формы слов
+# перечислены явно: просто "сред" совпало бы с "средний", "средства"
+_TEXT_DAYS = [(re.compile(pattern), bits) for pattern, bits in (
+    (r'\bпонедельник\w{0,3}\b', 0b0000001),
+    (r'\bвторник\w{0,3}\b', 0b0000010),
+    (r'\bсред(?:а|у|ы|е|ам|ами)\b', 0b0000100),
+    (r'\bчетверг\w{0,3}\b', 0b0001000),
+    (r'\bпятниц(?:а|у|ы|е|ам|ами)\b', 0b0010000),
+    (r'\bсуббот(?:а|у|ы|е|ам|ами)\b', 0b0100000),
+    (r'\bвоскресень(?:е|я|ю|ям|ями)\b', 0b1000000),
+    (r'\bвыходн(?:ые|ых|ым|ыми|ой)\b', 0b1100000),
+    (r'\bбудн(?:и|ям|ями|ие|ий)\b', 0b0011111),
+)]
+# Целые слова: "сегодняшний", "завтрак" - не дни поездки
+_RELATIVE_DAYS = ((re.compile(r'\bпослезавтра\b'), 2), (re.compile(r'\bзавтра\b'), 1),
+                  (re.compile(r'\bсегодня\b'), 0))
+# За числом не "год/лет/мес": "ребенку 1.5 года" - возраст, а не 1 мая
+_NOT_AGE = r'(?!\d|\s*(?:г\b|год|лет|мес))'
+_DAY_MONTH = r'(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?'
+_DATE_RANGE = re.compile(r'\b' + _DAY_MONTH + r'\s*(?:-|–|—|по)\s*' + _DAY_MONTH + _NOT_AGE)
+# Один день - только "на 24.12": одна дата без "на" ("прилетаем 02.01", "с 02.01") -
+# начало поездки, клиент свободен все дни после нее, дни выезда не ограничиваются
+_DATE = re.compile(r'\bна\s+' + _DAY_MONTH + _NOT_AGE)
+
+
+def _date_from_match(match, today, group=1):
+    """
+    Дата из группы регулярного выражения. Без года - ближайшая не раньше
+    today; для конца диапазона today - уже найденное начало ("28.12-03.01"
+    после 28.12 - это декабрь следующего года и январь за ним).
+    """
+    day, month, year = int(match.group(group)), int(match.group(group + 1)), match.group(group + 2)
+    if year:
+        year = int(year) + (2000 if len(year) == 2 else 0)
+    try:
+        result = date(int(year) if year else today.year, month, day)
+    except ValueError:
+        return None
+    # Без года и в прошлом - значит следующий год
+    if not year and result < today:
+        try:
+            result = result.replace(year=today.year + 1)
+        except ValueError:      # 29.02
+            return None
+    return result
+
+
+def days_mask_in_text(text, today=None):
+    """
+    Маска дней недели, упомянутых в тексте: "в среду", "по выходным",
+    "завтра", "на 24.12", "с 24.12 по 28.12". 0 - дни не ограничены.
+    Одна дата без "на" ("прилетаем 02.01") - начало поездки, а не день
+    выезда, и маску не сужает. Возраст ("1.5 года") и числа без признаков
+    даты ("2.5") датами не считаются.
+    """
+    today = today or date.today()
+    lowered = str(text or '').lower()
+    mask = 0
+    for pattern, bits in _TEXT_DAYS:
+        if pattern.search(lowered):
+            mask |= bits
+    for pattern, offset in _RELATIVE_DAYS:
+        if pattern.search(lowered):
+            mask |= day_bit(today + timedelta(days=offset))
+    for match in _DATE_RANGE.finditer(lowered):
+        first = _date_from_match(match, today)
+        last = _date_from_match(match, first, 4) if first else None
+        if first and last:
+            mask |= mask_for_dates(first + timedelta(days=i) for i in range(min((last - first).days + 1, 7)))
+            lowered = lowered.replace(match.group(), ' ')
+    for match in _DATE.finditer(lowered):
+        day = _date_from_match(match, today)
+        if day:
+            mask |= day_bit(day)
+    return mask
+
+
+def mask_for_dates(dates):
+    """Маска дней недели для списка дат (поездка с ... по ...)"""
+    mask = 0
+    for day in dates:
+        mask |= day_bit(day)
+        if mask == ALL_DAYS:
+            break
+    return mask
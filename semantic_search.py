@@ -0,0 +1,282 @@
+# semantic_search.py - смысловой поиск туров по свободному тексту (TF-IDF + LSA)
+"""
+Векторный индекс описаний туров для запросов, которые не нашлись точной
+фразой ("хочу поплавать с рыбками без толпы"). В гибридном поиске бота
+идет сразу после точного совпадения - до поиска по отдельным словам,
+difflib и вызова DeepSeek.
+
+Документ тура - название, ключевые слова и теги (с повышенным весом),
+'Описание (Витрина)' и 'Честный обзор'. Признаки - слова и буквенные
+n-граммы слов (3-4 буквы), поэтому "слонов" и "слоны", "каяках" и
+"каяки" похожи и без словаря словоформ. Веса TF-IDF (сублинейный tf),
+векторы нормированы.
+
+LSA: усеченное SVD матрицы документ x признак дает LSA_DIMS "тем";
+слова, которые встречаются в одних и тех же турах (рыбки - снорклинг -
+кораллы), сближаются. Балл тура - смесь косинуса по TF-IDF (точные
+совпадения) и по темам (близкие по смыслу слова).
+
+Индекс строится за доли секунды и сохраняется рядом с CSV в
+<csv>.semantic.npz (привязан к SHA-256 прайса, как снимок каталога).
+Собрать заранее:
+    python semantic_search.py --csv Price22.12.2025.csv
+
+numpy импортируется лениво: без него смысловой поиск просто выключен.
+"""
+import argparse
+import os
+import re
+import time
+from collections import Counter
+
+INDEX_SUFFIX = '.semantic.npz'
+INDEX_VERSION = 1
+LSA_DIMS = 48
+NGRAM_SIZES = (3, 4)
+TOP_K = 10
+MIN_SCORE = 0.2           # ниже - считаем, что ничего подходящего нет
+LSA_SHARE = 0.5           # доля балла по темам LSA
+
+# Поля документа и их вес (повтор поля = больший вес его слов)
+FIELD_WEIGHTS = (
+    ('Название', 3),
+    ('Ключевые слова', 2),
+    ('Теги (Безопасность)', 2),
+    ('Описание (Витрина)', 1),
+    ('Честный обзор', 1),
+)
+
+# Служебные и "просительные" слова запросов не несут смысла для поиска
+STOP_WORDS = frozenset("""
+и в во на с со к ко по о об от до из за для у при без под над про через а но или
+не ни же ли бы что как где когда куда какой какая какие какое это этот эта эти
+то тот та те там тут все всё весь вся мы вы я он она они мне нам вам нас вас
+хочу хотим хотелось хочется хотели можно нужно нужна нужны нужен есть был была были
+будет буду будем давайте посоветуйте подскажите покажите расскажите посмотреть
+увидеть показать узнать пожалуйста ищу ищем интересует интересно какую какие
+очень самый самые самое просто еще ещё тоже также чтобы чтоб
+""".split())
+
+_WORD = re.compile(r'[a-zа-я0-9]+')
+
+
+def tokenize(text):
+    """Слова текста без стоп-слов (нижний регистр, ё -> е, '_' в тегах - пробел)"""
+    text = str(text or '').lower().replace('ё', 'е').replace('_', ' ')
+    return [word for word in _WORD.findall(text) if word not in STOP_WORDS and len(word) > 1]
+
+
+def term_features(words):
+    """Признаки: слово целиком + буквенные n-граммы слова с границами"""
+    features = []
+    for word in words:
+        features.append('w:' + word)
+        padded = f"<{word}>"
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                features.append(padded[start:start + size])
+    return features
+
+
+def tour_document(tour):
+    words = []
+    for field, weight in FIELD_WEIGHTS:
+        words.extend(tokenize(tour.get(field, '')) * weight)
+    return words
+
+
+def index_path(csv_path):
+    return csv_path + INDEX_SUFFIX
+
+
+class SemanticIndex:
+    """TF-IDF + LSA по документам туров; поиск top-k косинусом на numpy"""
+
+    def __init__(self, tour_ids, vocabulary, idf, doc_matrix, term_topics, doc_topics, csv_hash=b''):
+        self.tour_ids = tour_ids            # список ID в порядке строк матриц
+        self.vocabulary = vocabulary        # признак -> столбец
+        self.idf = idf                      # (V,)
+        self.doc_matrix = doc_matrix        # (N, V) нормированные TF-IDF
+        self.term_topics = term_topics      # (V, K) проекция признака на темы
+        self.doc_topics = doc_topics        # (N, K) нормированные векторы тем
+        self.csv_hash = csv_hash
+
+    @classmethod
+    def build(cls, tours, csv_hash=b'', dims=LSA_DIMS):
+        import numpy as np
+
+        tour_ids, documents = [], []
+        for tour in tours:
+            tour_id = str(tour.get('ID', '')).strip()
+            if tour_id:
+                tour_ids.append(tour_id)
+                documents.append(term_features(tour_document(tour)))
+
+        vocabulary = {}
+        counted = [Counter(features) for features in documents]
+        for features in counted:
+            for feature in features:
+                vocabulary.setdefault(feature, len(vocabulary))
+
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, features in enumerate(counted):
+            counts[row, [vocabulary[f] for f in features]] = list(features.values())
+
+        df = (counts > 0).sum(axis=0)
+        idf = (np.log((1 + len(documents)) / (1 + df)) + 1).astype(np.float32)
+        doc_matrix = _normalize(_tfidf(counts, idf))
+
+        # Усеченное SVD: doc_matrix ~ U S Vt, темы признаков - первые dims строк Vt.
+        # Документов намного меньше, чем признаков, поэтому U и S берутся из
+        # собственных векторов матрицы Грама (N x N), а Vt = S^-1 U^T X
+        dims = max(1, min(dims, len(documents) - 1))
+        eigenvalues, eigenvectors = np.linalg.eigh(doc_matrix.astype(np.float64) @ doc_matrix.T)
+        order = np.argsort(eigenvalues)[::-1][:dims]
+        singular = np.sqrt(np.clip(eigenvalues[order], 1e-12, None))
+        vt = (eigenvectors[:, order].T @ doc_matrix) / singular[:, None]
+        term_topics = np.ascontiguousarray(vt.T, dtype=np.float32)
+        doc_topics = _normalize(doc_matrix @ term_topics)
+        return cls(tour_ids, vocabulary, idf, doc_matrix, term_topics, doc_topics, csv_hash)
+
+    def query_vector(self, query):
+        """(столбцы признаков запроса, их нормированные веса TF-IDF) или None"""
+        import numpy as np
+
+        columns = {}
+        for feature in term_features(tokenize(query)):
+            column = self.vocabulary.get(feature)
+            if column is not None:
+                columns[column] = columns.get(column, 0) + 1
+        if not columns:
+            return None
+        indices = np.fromiter(columns, dtype=np.int64, count=len(columns))
+        counts = np.fromiter(columns.values(), dtype=np.float32, count=len(columns))
+        weights = (1 + np.log(counts)) * self.idf[indices]
+        return indices, weights / np.linalg.norm(weights)
+
+    def scores(self, query):
+        """Балл каждого тура (N,) или None, если в запросе нет знакомых признаков"""
+        import numpy as np
+
+        vector = self.query_vector(query)
+        if vector is None:
+            return None
+        indices, weights = vector
+        lexical = self.doc_matrix[:, indices] @ weights
+        topics = weights @ self.term_topics[indices]
+        norm = np.linalg.norm(topics)
+        semantic = self.doc_topics @ (topics / norm) if norm else np.zeros_like(lexical)
+        return (1 - LSA_SHARE) * lexical + LSA_SHARE * semantic
+
+    def search(self, query, k=TOP_K, min_score=MIN_SCORE):
+        """top-k туров [(ID, балл)] по убыванию балла, только не ниже min_score"""
+        import numpy as np
+
+        scores = self.scores(query)
+        if scores is None:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.tour_ids[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def save(self, path):
+        """Атомарно сохраняет индекс в сжатый .npz (без pickle; TF-IDF матрица почти вся из нулей)"""
+        import numpy as np
+
+        terms = [None] * len(self.vocabulary)
+        for term, column in self.vocabulary.items():
+            terms[column] = term
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            version=np.array(INDEX_VERSION),
+            csv_hash=np.frombuffer(self.csv_hash, dtype=np.uint8),
+            tour_ids=np.array(self.tour_ids),
+            terms=np.array(terms),
+            idf=self.idf,
+            doc_matrix=self.doc_matrix,
+            term_topics=self.term_topics,
+            doc_topics=self.doc_topics,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, csv_hash=None):
+        """Индекс из файла или None (нет файла, другая версия или другой прайс)"""
+        import numpy as np
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != INDEX_VERSION:
+                    return None
+                stored_hash = data['csv_hash'].tobytes()
+                if csv_hash is not None and stored_hash != csv_hash:
+                    return None
+                return cls(
+                    tour_ids=data['tour_ids'].tolist(),
+                    vocabulary={term: column for column, term in enumerate(data['terms'].tolist())},
+                    idf=data['idf'],
+                    doc_matrix=data['doc_matrix'],
+                    term_topics=data['term_topics'],
+                    doc_topics=data['doc_topics'],
+                    csv_hash=stored_hash,
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def _tfidf(counts, idf):
+    import numpy as np
+
+    tf = np.zeros_like(counts)
+    mask = counts > 0
+    tf[mask] = 1 + np.log(counts[mask])
+    return tf * idf
+
+
+def _normalize(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32)
+
+
+def load_or_build(catalog, csv_path):
+    """
+    Индекс для каталога: из файла рядом с CSV, если он собран для этого же
+    прайса, иначе строится и сохраняется. Возвращает (индекс, источник).
+    """
+    path = index_path(csv_path)
+    index = SemanticIndex.load(path, catalog.csv_hash)
+    if index is not None:
+        return index, 'file'
+    index = SemanticIndex.build(catalog.tours, catalog.csv_hash)
+    try:
+        index.save(path)
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить смысловой индекс: {e}")
+    return index, 'built'
+
+
+def main():
+    from catalog import load_catalog
+
+    parser = argparse.ArgumentParser(description="Сборка смыслового индекса туров")
+    parser.add_argument('--csv', default='Price22.12.2025.csv')
+    args = parser.parse_args()
+
+    catalog, _ = load_catalog(args.csv)
+    started = time.perf_counter()
+    index = SemanticIndex.build(catalog.tours, catalog.csv_hash)
+    elapsed = time.perf_counter() - started
+    path = index_path(args.csv)
+    index.save(path)
+    print(f"✅ Индекс: {len(index.tour_ids)} туров, {len(index.vocabulary)} признаков, "
+          f"{index.term_topics.shape[1]} тем, {elapsed * 1000:.0f} мс → {path} "
+          f"({os.path.getsize(path) / 1024:.0f} КБ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# singleflight.py - объединение одинаковых одновременных запросов к DeepSeek
+"""
+Когда популярный тур выкладывают в туристический чат, десятки человек за
+несколько секунд открывают его и задают один и тот же вопрос. Без
+объединения каждый вопрос - отдельный платный вызов DeepSeek.
+
+SingleFlight.run(key, factory): первый запрос с ключом ("ведущий")
+запускает factory() как отдельную задачу, остальные с тем же ключом,
+пока она идет, просто ждут ее результат (или ее исключение). После
+завершения ключ освобождается - это не кеш ответов, а только склейка
+одновременных запросов. Если все ожидающие отменены (таймаут), задача
+тоже отменяется - вызов API не продолжается впустую.
+
+Ключ собирает вызывающий код из всего, что влияет на ответ: нормализованный
+вопрос (normalize_question), тур и класс профиля группы.
+"""
+import asyncio
+import re
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_question(text):
+    """Вопрос без регистра, знаков препинания и лишних пробелов (ё -> е)"""
+    text = str(text or '').lower().replace('ё', 'е')
+    return _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+class SingleFlight:
+    """Одна выполняющаяся задача на ключ; счетчики - для /stats"""
+
+    def __init__(self):
+        self._inflight = {}    # ключ -> [asyncio.Task, сколько запросов ее ждут]
+        self.calls = 0         # всего запросов через run()
+        self.leaders = 0       # из них реально запустили factory()
+        self.shared = 0        # дождались чужого результата (сэкономленные вызовы)
+
+    async def run(self, key, factory):
+        """
+        Результат factory() для ключа. Отмена одного ожидающего (например,
+        по таймауту) не отменяет общую задачу, пока ее ждут другие; отмена
+        последнего - отменяет.
+        """
+        self.calls += 1
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            flight = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda _, key=key: self._release(key, task))
+        else:
+            self.shared += 1
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if flight[1] == 1 and not task.done():
+                task.cancel()
+                # Следующий такой же вопрос запустит новый вызов, а не получит отмену
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            raise
+        finally:
+            flight[1] -= 1
+
+    def _release(self, key, task):
+        flight = self._inflight.get(key)
+        if flight is not None and flight[0] is task:
+            del self._inflight[key]
+        # Исключение уже получили все ожидающие; без этого asyncio пишет
+        # "Task exception was never retrieved", если ожидающих не осталось
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self):
+        return {'calls': self.calls, 'leaders': self.leaders, 'shared': self.shared,
+                'inflight': len(self._inflight)}
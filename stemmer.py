@@ -0,0 +1,143 @@
+# stemmer.py - стеммер Snowball для русского языка
+"""
+Реализация алгоритма Snowball (Porter) для русского языка без внешних
+зависимостей: "слонов", "слонам", "слоны" -> "слон"; "островах" ->
+"остров"; "покататься" -> "поката".
+
+Области слова (по описанию алгоритма):
+- RV - после первой гласной;
+- R1 - после первой согласной, идущей за гласной; R2 - то же внутри R1.
+Шаги: (1) деепричастие, иначе возвратное -ся/-сь и затем прилагательное
+(с причастием), глагол или существительное; (2) конечное "и";
+(3) словообразовательное -ост(ь) в R2; (4) "нн" -> "н", превосходная
+степень -ейш(е), мягкий знак.
+
+Основы слов запросов кешируются (lru_cache): одни и те же слова клиенты
+пишут постоянно.
+"""
+import re
+from functools import lru_cache
+
+STEM_CACHE_SIZE = 20000
+
+_VOWELS = set('аеиоуыэюя')
+_WORD = re.compile(r'[a-zа-яё0-9]+')
+
+# Окончания группы 1 засчитываются только после "а" или "я"
+_PERFECTIVE_GERUND_1 = ('вшись', 'вши', 'в')
+_PERFECTIVE_GERUND_2 = ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв')
+_ADJECTIVE = ('ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый',
+              'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+_REFLEXIVE = ('ся', 'сь')
+_VERB_1 = ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н')
+_VERB_2 = ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют',
+           'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю')
+_NOUN = ('иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей',
+         'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия', 'ья',
+         'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я')
+_SUPERLATIVE = ('ейше', 'ейш')
+_DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """Начала областей RV и R2 (индексы в слове)"""
+    rv = len(word)
+    for i, letter in enumerate(word):
+        if letter in _VOWELS:
+            rv = i + 1
+            break
+    r1 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r1 = i + 1
+            break
+    r2 = len(word)
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _ending(word, start, endings):
+    """Самое длинное из окончаний, целиком лежащее в области [start:]"""
+    for ending in sorted(endings, key=len, reverse=True):
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return ending
+    return None
+
+
+def _remove_grouped(word, start, group1, group2):
+    """
+    Убирает окончание группы 2 или группы 1 (последнее - только после "а"/"я"
+    внутри RV). Возвращает (слово, удалось ли).
+    """
+    candidates = []
+    for ending in group1:
+        cut = len(word) - len(ending)
+        if word.endswith(ending) and cut - 1 >= start and word[cut - 1] in 'ая':
+            candidates.append(ending)
+    for ending in group2:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            candidates.append(ending)
+    if not candidates:
+        return word, False
+    longest = max(candidates, key=len)
+    return word[:-len(longest)], True
+
+
+def _remove(word, start, endings):
+    ending = _ending(word, start, endings)
+    if ending is None:
+        return word, False
+    return word[:-len(ending)], True
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    """Основа слова (нижний регистр, ё -> е). Слова не на кириллице не меняются"""
+    word = word.lower().replace('ё', 'е')
+    if not any(letter in _VOWELS for letter in word):
+        return word
+    rv, r2 = _regions(word)
+
+    # Шаг 1
+    word, removed = _remove_grouped(word, rv, _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2)
+    if not removed:
+        word, _ = _remove(word, rv, _REFLEXIVE)
+        word, removed = _remove(word, rv, _ADJECTIVE)
+        if removed:
+            word, _ = _remove_grouped(word, rv, _PARTICIPLE_1, _PARTICIPLE_2)
+        else:
+            word, removed = _remove_grouped(word, rv, _VERB_1, _VERB_2)
+            if not removed:
+                word, _ = _remove(word, rv, _NOUN)
+
+    # Шаг 2
+    word, _ = _remove(word, rv, ('и',))
+
+    # Шаг 3
+    word, _ = _remove(word, r2, _DERIVATIONAL)
+
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        word, removed = _remove(word, rv, _SUPERLATIVE)
+        if removed and word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        elif not removed:
+            word, _ = _remove(word, rv, ('ь',))
+    return word
+
+
+def words(text):
+    """Слова текста в нижнем регистре"""
+    return _WORD.findall(str(text or '').lower())
+
+
+def stem_words(text, stop_words=(), min_length=1):
+    """Основы слов текста без стоп-слов и слов короче min_length"""
+    return [stem(word) for word in words(text) if len(word) >= min_length and word not in stop_words]